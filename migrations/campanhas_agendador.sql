@@ -0,0 +1,62 @@
+-- ========================================
+-- 3A FRIOS - AGENDADOR DE CAMPANHAS PROGRAMADAS
+-- ========================================
+-- Permite que várias réplicas do backend (ou o worker avulso) enviem as
+-- campanhas com status 'pendente' sem envio duplicado:
+--   * status 'enviando' marca a linha reivindicada por um worker;
+--   * reivindicar_campanhas_pendentes() faz a transição pendente -> enviando
+--     de forma atômica (FOR UPDATE SKIP LOCKED);
+--   * linhas presas em 'enviando' (worker caiu) voltam a ser elegíveis após
+--     o lease, até 3 tentativas; depois disso ficam 'falhado'.
+-- Execute este script no Supabase SQL Editor
+
+ALTER TABLE historico_campanhas DROP CONSTRAINT IF EXISTS historico_campanhas_status_check;
+ALTER TABLE historico_campanhas ADD CONSTRAINT historico_campanhas_status_check
+    CHECK (status IN ('enviado', 'falhado', 'pendente', 'enviando'));
+
+ALTER TABLE historico_campanhas ADD COLUMN IF NOT EXISTS reivindicado_por TEXT;
+ALTER TABLE historico_campanhas ADD COLUMN IF NOT EXISTS reivindicado_em TIMESTAMP;
+ALTER TABLE historico_campanhas ADD COLUMN IF NOT EXISTS tentativas INTEGER DEFAULT 0;
+
+-- Fila de envios: só as linhas pendentes, ordenadas pelo horário programado
+CREATE INDEX IF NOT EXISTS idx_historico_campanhas_fila
+ON historico_campanhas(programado_para) WHERE status = 'pendente';
+
+CREATE INDEX IF NOT EXISTS idx_historico_campanhas_enviando
+ON historico_campanhas(reivindicado_em) WHERE status = 'enviando';
+
+CREATE OR REPLACE FUNCTION reivindicar_campanhas_pendentes(
+    p_limite INTEGER DEFAULT 20,
+    p_worker TEXT DEFAULT 'worker',
+    p_lease_segundos INTEGER DEFAULT 600,
+    p_max_tentativas INTEGER DEFAULT 3
+)
+RETURNS SETOF historico_campanhas AS $$
+BEGIN
+    -- Desiste das linhas que estouraram o lease vezes demais
+    UPDATE historico_campanhas
+       SET status = 'falhado',
+           resultado = jsonb_build_object('erro', 'lease_expirado', 'tentativas', tentativas)
+     WHERE status = 'enviando'
+       AND reivindicado_em < now() - make_interval(secs => p_lease_segundos)
+       AND COALESCE(tentativas, 0) >= p_max_tentativas;
+
+    RETURN QUERY
+    UPDATE historico_campanhas h
+       SET status = 'enviando',
+           reivindicado_por = p_worker,
+           reivindicado_em = now(),
+           tentativas = COALESCE(h.tentativas, 0) + 1
+     WHERE h.id IN (
+        SELECT id FROM historico_campanhas
+         WHERE (status = 'pendente' AND programado_para <= now())
+            OR (status = 'enviando'
+                AND reivindicado_em < now() - make_interval(secs => p_lease_segundos)
+                AND COALESCE(tentativas, 0) < p_max_tentativas)
+         ORDER BY programado_para
+         LIMIT p_limite
+         FOR UPDATE SKIP LOCKED
+     )
+    RETURNING h.*;
+END;
+$$ LANGUAGE plpgsql;
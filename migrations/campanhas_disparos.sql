@@ -0,0 +1,33 @@
+-- ========================================
+-- 3A FRIOS - DISPAROS DE CAMPANHA EM MASSA
+-- ========================================
+-- POST /api/campanhas/disparos enfileira uma linha 'pendente' por
+-- destinatário em historico_campanhas (enviadas pelo agendador); o id do
+-- disparo vai em campanha_id.
+--   * contar_campanhas_telefones(): elegibilidade de todo um bloco de
+--     telefones numa consulta (mesma regra de contar_campanhas_cliente);
+--   * índice em clientes_delivery para filtrar o público por status/score.
+-- Requer campanhas_agendador.sql. Execute este script no Supabase SQL Editor
+
+CREATE INDEX IF NOT EXISTS idx_historico_campanhas_disparo
+ON historico_campanhas(campanha_id, status) WHERE campanha_id IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_clientes_delivery_publico
+ON clientes_delivery(lead_status, lead_score);
+
+CREATE OR REPLACE FUNCTION contar_campanhas_telefones(
+    p_telefones TEXT[],
+    p_tipo TEXT,
+    p_desde_tipo TIMESTAMP,
+    p_desde_dia TIMESTAMP
+)
+RETURNS TABLE (cliente_telefone TEXT, mesmo_tipo INTEGER, hoje INTEGER) AS $$
+    SELECT
+        h.cliente_telefone,
+        COUNT(*) FILTER (WHERE h.tipo_campanha = p_tipo AND h.enviado_em >= p_desde_tipo)::INTEGER,
+        COUNT(*) FILTER (WHERE h.enviado_em >= p_desde_dia)::INTEGER
+    FROM historico_campanhas h
+    WHERE h.cliente_telefone = ANY(p_telefones)
+      AND h.enviado_em >= LEAST(p_desde_tipo, p_desde_dia)
+    GROUP BY h.cliente_telefone;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,27 @@
+-- ========================================
+-- 3A FRIOS - ELEGIBILIDADE DE CAMPANHAS EM UMA CONSULTA
+-- ========================================
+-- contar_campanhas_cliente() devolve, numa única varredura do
+-- idx_historico_campanhas_dedup (cliente_telefone, tipo_campanha, enviado_em):
+--   * mesmo_tipo: campanhas do tipo desde p_desde_tipo (janela de 24h);
+--   * hoje: campanhas de qualquer tipo desde p_desde_dia (limite diário).
+-- Usada por CampaignAutomation._check_campaign_eligibility.
+-- Execute este script no Supabase SQL Editor
+
+CREATE INDEX IF NOT EXISTS idx_historico_campanhas_dedup
+ON historico_campanhas(cliente_telefone, tipo_campanha, enviado_em);
+
+CREATE OR REPLACE FUNCTION contar_campanhas_cliente(
+    p_telefone TEXT,
+    p_tipo TEXT,
+    p_desde_tipo TIMESTAMP,
+    p_desde_dia TIMESTAMP
+)
+RETURNS TABLE (mesmo_tipo INTEGER, hoje INTEGER) AS $$
+    SELECT
+        COUNT(*) FILTER (WHERE tipo_campanha = p_tipo AND enviado_em >= p_desde_tipo)::INTEGER,
+        COUNT(*) FILTER (WHERE enviado_em >= p_desde_dia)::INTEGER
+    FROM historico_campanhas
+    WHERE cliente_telefone = p_telefone
+      AND enviado_em >= LEAST(p_desde_tipo, p_desde_dia);
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,190 @@
+-- ========================================
+-- 3A FRIOS - ESTATÍSTICAS DE CAMPANHAS (ROLLUP DIÁRIO)
+-- ========================================
+-- GET /api/campanhas/historico/estatisticas passa a ler um rollup por
+-- dia/tipo em vez de varrer historico_campanhas:
+--   * campanhas_estatisticas_diarias: contadores por (dia, tipo_campanha);
+--   * campanhas_estatisticas_dias_pendentes: dias a recalcular, marcados por
+--     trigger em historico_campanhas (dia antigo E novo de enviado_em em
+--     INSERT/UPDATE/DELETE - o agendador reescreve enviado_em no envio);
+--   * atualizar_estatisticas_campanhas(): atualização incremental - recalcula
+--     só os dias pendentes;
+--   * get_campaign_stats / get_campaign_stats_by_type: leitura do rollup
+--     (nomes já usados pela API).
+-- Execute este script no Supabase SQL Editor
+
+-- 1. DIAS PENDENTES
+-- ==================
+-- Dias com linhas inseridas/alteradas/removidas desde a última atualização
+CREATE TABLE IF NOT EXISTS campanhas_estatisticas_dias_pendentes (
+    dia DATE PRIMARY KEY
+);
+
+-- Marca o dia antigo e o novo: uma linha agendada para D e enviada em D+1
+-- sai de D e entra em D+1; linha removida sai do seu dia. DO UPDATE (e não
+-- DO NOTHING) trava a marcação até o commit, então o rollup não a consome
+-- antes de enxergar a alteração
+CREATE OR REPLACE FUNCTION marcar_dia_estatisticas_campanhas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.enviado_em IS NOT DISTINCT FROM NEW.enviado_em
+       AND OLD.tipo_campanha IS NOT DISTINCT FROM NEW.tipo_campanha
+       AND OLD.status IS NOT DISTINCT FROM NEW.status
+       AND OLD.aberto IS NOT DISTINCT FROM NEW.aberto
+       AND OLD.respondido IS NOT DISTINCT FROM NEW.respondido
+       AND OLD.converteu IS NOT DISTINCT FROM NEW.converteu
+       AND OLD.valor_conversao IS NOT DISTINCT FROM NEW.valor_conversao THEN
+        -- Nada que entre nos contadores (ex.: reivindicado_em)
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.enviado_em IS NOT NULL THEN
+        INSERT INTO campanhas_estatisticas_dias_pendentes (dia)
+        VALUES (OLD.enviado_em::date) ON CONFLICT (dia) DO UPDATE SET dia = EXCLUDED.dia;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.enviado_em IS NOT NULL THEN
+        INSERT INTO campanhas_estatisticas_dias_pendentes (dia)
+        VALUES (NEW.enviado_em::date) ON CONFLICT (dia) DO UPDATE SET dia = EXCLUDED.dia;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS marcar_dia_estatisticas_campanhas ON historico_campanhas;
+CREATE TRIGGER marcar_dia_estatisticas_campanhas
+    AFTER INSERT OR UPDATE OR DELETE ON historico_campanhas
+    FOR EACH ROW
+    EXECUTE FUNCTION marcar_dia_estatisticas_campanhas();
+
+-- 2. ROLLUP
+-- =========
+CREATE TABLE IF NOT EXISTS campanhas_estatisticas_diarias (
+    dia DATE NOT NULL,
+    tipo_campanha TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    enviadas INTEGER NOT NULL DEFAULT 0,
+    falhadas INTEGER NOT NULL DEFAULT 0,
+    pendentes INTEGER NOT NULL DEFAULT 0,
+    abertas INTEGER NOT NULL DEFAULT 0,
+    respondidas INTEGER NOT NULL DEFAULT 0,
+    convertidas INTEGER NOT NULL DEFAULT 0,
+    valor_conversoes DECIMAL(12,2) NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (dia, tipo_campanha)
+);
+
+-- Linha única: trava que serializa atualizar_estatisticas_campanhas (FOR
+-- UPDATE). ultima_atualizacao não entra no cálculo (os dias vêm da tabela de
+-- pendentes); fica só para monitoramento, ex.: conferir se o pg_cron roda:
+--   SELECT ultima_atualizacao FROM campanhas_estatisticas_controle;
+CREATE TABLE IF NOT EXISTS campanhas_estatisticas_controle (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    ultima_atualizacao TIMESTAMP NOT NULL DEFAULT 'epoch'
+);
+INSERT INTO campanhas_estatisticas_controle (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- 3. ATUALIZAÇÃO INCREMENTAL
+-- ==========================
+-- Recalcula por inteiro cada dia pendente (consumindo a marcação). Dias
+-- marcados por transações ainda não confirmadas ficam para a próxima
+-- execução. Com p_completo, todos os dias do histórico e do rollup.
+-- Retorna quantos dias foram recalculados.
+CREATE OR REPLACE FUNCTION atualizar_estatisticas_campanhas(p_completo BOOLEAN DEFAULT false)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inicio TIMESTAMP := now();
+    v_dias DATE[];
+BEGIN
+    -- Uma execução por vez
+    PERFORM 1 FROM campanhas_estatisticas_controle WHERE id = 1 FOR UPDATE;
+
+    WITH consumidos AS (
+        DELETE FROM campanhas_estatisticas_dias_pendentes RETURNING dia
+    )
+    SELECT array_agg(dia) INTO v_dias FROM consumidos;
+
+    IF p_completo THEN
+        SELECT array_agg(DISTINCT d) INTO v_dias
+          FROM (
+              SELECT enviado_em::date AS d FROM historico_campanhas WHERE enviado_em IS NOT NULL
+              UNION
+              SELECT dia FROM campanhas_estatisticas_diarias
+          ) todos;
+    END IF;
+
+    IF v_dias IS NOT NULL THEN
+        DELETE FROM campanhas_estatisticas_diarias WHERE dia = ANY(v_dias);
+
+        INSERT INTO campanhas_estatisticas_diarias (
+            dia, tipo_campanha, total, enviadas, falhadas, pendentes,
+            abertas, respondidas, convertidas, valor_conversoes, atualizado_em
+        )
+        SELECT
+            enviado_em::date,
+            tipo_campanha,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE status = 'enviado'),
+            COUNT(*) FILTER (WHERE status = 'falhado'),
+            COUNT(*) FILTER (WHERE status IN ('pendente', 'enviando')),
+            COUNT(*) FILTER (WHERE aberto),
+            COUNT(*) FILTER (WHERE respondido),
+            COUNT(*) FILTER (WHERE converteu),
+            COALESCE(SUM(valor_conversao), 0),
+            v_inicio
+          FROM historico_campanhas
+         WHERE enviado_em >= (SELECT MIN(d) FROM unnest(v_dias) d)
+           AND enviado_em::date = ANY(v_dias)
+         GROUP BY enviado_em::date, tipo_campanha;
+    END IF;
+
+    UPDATE campanhas_estatisticas_controle SET ultima_atualizacao = v_inicio WHERE id = 1;
+    RETURN COALESCE(array_length(v_dias, 1), 0);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 4. LEITURA (mesmo formato da API)
+-- =================================
+CREATE OR REPLACE FUNCTION get_campaign_stats(start_date DATE DEFAULT NULL, end_date DATE DEFAULT NULL)
+RETURNS TABLE (
+    total_enviadas BIGINT,
+    enviadas_sucesso BIGINT,
+    falhadas BIGINT,
+    abertas BIGINT,
+    respondidas BIGINT,
+    convertidas BIGINT,
+    valor_total_conversoes NUMERIC,
+    taxa_sucesso NUMERIC,
+    taxa_conversao NUMERIC
+) AS $$
+    SELECT
+        COALESCE(SUM(total), 0),
+        COALESCE(SUM(enviadas), 0),
+        COALESCE(SUM(falhadas), 0),
+        COALESCE(SUM(abertas), 0),
+        COALESCE(SUM(respondidas), 0),
+        COALESCE(SUM(convertidas), 0),
+        COALESCE(SUM(valor_conversoes), 0),
+        CASE WHEN SUM(total) > 0 THEN SUM(enviadas) * 100.0 / SUM(total) ELSE 0 END,
+        CASE WHEN SUM(enviadas) > 0 THEN SUM(convertidas) * 100.0 / SUM(enviadas) ELSE 0 END
+    FROM campanhas_estatisticas_diarias
+    WHERE (start_date IS NULL OR dia >= start_date)
+      AND (end_date IS NULL OR dia <= end_date);
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION get_campaign_stats_by_type(start_date DATE DEFAULT NULL, end_date DATE DEFAULT NULL)
+RETURNS TABLE (tipo_campanha TEXT, total BIGINT, enviadas BIGINT, convertidas BIGINT) AS $$
+    SELECT e.tipo_campanha, SUM(e.total), SUM(e.enviadas), SUM(e.convertidas)
+    FROM campanhas_estatisticas_diarias e
+    WHERE (start_date IS NULL OR e.dia >= start_date)
+      AND (end_date IS NULL OR e.dia <= end_date)
+    GROUP BY e.tipo_campanha
+    ORDER BY SUM(e.total) DESC;
+$$ LANGUAGE sql STABLE;
+
+-- 5. CARGA INICIAL
+-- ================
+SELECT atualizar_estatisticas_campanhas(true);
+
+-- Opcional (pg_cron): manter o rollup atualizado sem depender da API
+-- SELECT cron.schedule('estatisticas-campanhas', '*/5 * * * *', 'SELECT atualizar_estatisticas_campanhas()');
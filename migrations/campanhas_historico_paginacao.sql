@@ -0,0 +1,17 @@
+-- ========================================
+-- 3A FRIOS - PAGINAÇÃO DO HISTÓRICO DE CAMPANHAS
+-- ========================================
+-- GET /api/campanhas/historico pagina por cursor (keyset) em
+-- (enviado_em DESC, id DESC): cada página é uma busca no índice a partir do
+-- último item da anterior, com o mesmo custo da primeira página.
+-- Execute este script no Supabase SQL Editor
+
+CREATE INDEX IF NOT EXISTS idx_historico_campanhas_keyset
+ON historico_campanhas(enviado_em DESC NULLS LAST, id DESC);
+
+-- Filtros mais comuns da tela de histórico combinados com a ordenação
+CREATE INDEX IF NOT EXISTS idx_historico_campanhas_tipo_keyset
+ON historico_campanhas(tipo_campanha, enviado_em DESC NULLS LAST, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_historico_campanhas_status_keyset
+ON historico_campanhas(status, enviado_em DESC NULLS LAST, id DESC);
@@ -0,0 +1,101 @@
+-- ========================================
+-- 3A FRIOS - RESUMO DE CONVERSAS POR LEAD
+-- ========================================
+-- GET /api/leads lista clientes_delivery com a última mensagem de cada
+-- cliente. Em vez de agregar temp_messages a cada requisição, o resumo fica
+-- em colunas de clientes_delivery mantidas por trigger:
+--   * last_message_at / ultima_mensagem / ultimo_agente: última mensagem;
+--   * total_mensagens: quantidade de mensagens do cliente.
+-- A carga inicial usa LATERAL JOIN (última mensagem por cliente pelo índice
+-- (cliente_id, timestamp DESC)).
+-- Execute este script no Supabase SQL Editor
+
+-- 1. COLUNAS DE RESUMO
+-- ====================
+ALTER TABLE public.clientes_delivery ADD COLUMN IF NOT EXISTS last_message_at timestamptz;
+ALTER TABLE public.clientes_delivery ADD COLUMN IF NOT EXISTS ultima_mensagem text;
+ALTER TABLE public.clientes_delivery ADD COLUMN IF NOT EXISTS ultimo_agente text;
+ALTER TABLE public.clientes_delivery ADD COLUMN IF NOT EXISTS total_mensagens integer DEFAULT 0 NOT NULL;
+
+-- 2. ÍNDICES
+-- ==========
+CREATE INDEX IF NOT EXISTS temp_messages_cliente_timestamp_idx
+ON public.temp_messages(cliente_id, timestamp DESC);
+
+-- Ordenações da tela de leads (sempre com id para desempate estável)
+CREATE INDEX IF NOT EXISTS clientes_delivery_last_message_idx
+ON public.clientes_delivery(last_message_at DESC NULLS LAST, id DESC);
+
+CREATE INDEX IF NOT EXISTS clientes_delivery_lead_score_idx
+ON public.clientes_delivery(lead_score DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS clientes_delivery_status_last_message_idx
+ON public.clientes_delivery(lead_status, last_message_at DESC NULLS LAST, id DESC);
+
+-- 3. TRIGGER DE MANUTENÇÃO
+-- ========================
+CREATE OR REPLACE FUNCTION atualizar_resumo_lead()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE public.clientes_delivery c
+        SET total_mensagens = c.total_mensagens + 1,
+            last_message_at = GREATEST(c.last_message_at, NEW.timestamp),
+            ultima_mensagem = CASE WHEN c.last_message_at IS NULL OR NEW.timestamp >= c.last_message_at
+                THEN left(COALESCE(NULLIF(NEW.resposta_bot, ''), NEW.mensagem_cliente), 280)
+                ELSE c.ultima_mensagem END,
+            ultimo_agente = CASE WHEN c.last_message_at IS NULL OR NEW.timestamp >= c.last_message_at
+                THEN COALESCE(NEW.agente_responsavel, c.ultimo_agente)
+                ELSE c.ultimo_agente END
+        WHERE c.id = NEW.cliente_id;
+        RETURN NEW;
+    END IF;
+
+    -- DELETE (limpeza de temp_messages): recalcula a partir do que sobrou
+    UPDATE public.clientes_delivery c
+    SET total_mensagens = GREATEST(c.total_mensagens - 1, 0),
+        last_message_at = u.timestamp,
+        ultima_mensagem = left(COALESCE(NULLIF(u.resposta_bot, ''), u.mensagem_cliente), 280),
+        ultimo_agente = u.agente_responsavel
+    FROM (SELECT OLD.cliente_id AS cliente_id) alvo
+    LEFT JOIN LATERAL (
+        SELECT m.timestamp, m.resposta_bot, m.mensagem_cliente, m.agente_responsavel
+        FROM public.temp_messages m
+        WHERE m.cliente_id = alvo.cliente_id
+        ORDER BY m.timestamp DESC
+        LIMIT 1
+    ) u ON true
+    WHERE c.id = alvo.cliente_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS temp_messages_resumo_lead ON public.temp_messages;
+CREATE TRIGGER temp_messages_resumo_lead
+    AFTER INSERT OR DELETE ON public.temp_messages
+    FOR EACH ROW
+    EXECUTE FUNCTION atualizar_resumo_lead();
+
+-- 4. CARGA INICIAL
+-- ================
+UPDATE public.clientes_delivery c
+SET total_mensagens = r.total,
+    last_message_at = r.timestamp,
+    ultima_mensagem = left(COALESCE(NULLIF(r.resposta_bot, ''), r.mensagem_cliente), 280),
+    ultimo_agente = r.agente_responsavel
+FROM (
+    SELECT t.cliente_id, t.total, u.timestamp, u.resposta_bot, u.mensagem_cliente, u.agente_responsavel
+    FROM (
+        SELECT cliente_id, count(*)::integer AS total
+        FROM public.temp_messages
+        GROUP BY cliente_id
+    ) t
+    CROSS JOIN LATERAL (
+        SELECT m.timestamp, m.resposta_bot, m.mensagem_cliente, m.agente_responsavel
+        FROM public.temp_messages m
+        WHERE m.cliente_id = t.cliente_id
+        ORDER BY m.timestamp DESC
+        LIMIT 1
+    ) u
+) r
+WHERE c.id = r.cliente_id;
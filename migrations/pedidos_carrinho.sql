@@ -0,0 +1,16 @@
+-- ========================================
+-- 3A FRIOS - CARRINHO PERSISTENTE (ROBERTO)
+-- ========================================
+-- Colunas usadas pelo write-through do carrinho em pedidos_delivery.
+-- O campo status guarda o EstadoPedido (iniciando, coletando_itens, ...,
+-- confirmando, finalizado) e forma_pagamento fica 'a_definir' até a escolha.
+-- Execute este script no Supabase SQL Editor
+
+ALTER TABLE public.pedidos_delivery ADD COLUMN IF NOT EXISTS subtotal numeric DEFAULT 0;
+ALTER TABLE public.pedidos_delivery ADD COLUMN IF NOT EXISTS taxa_entrega numeric DEFAULT 0;
+ALTER TABLE public.pedidos_delivery ADD COLUMN IF NOT EXISTS cep text;
+ALTER TABLE public.pedidos_delivery ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+
+-- Busca do carrinho aberto do cliente (cliente_id + status, mais recente)
+CREATE INDEX IF NOT EXISTS idx_pedidos_delivery_cliente_status
+    ON public.pedidos_delivery (cliente_id, status, created_at DESC);
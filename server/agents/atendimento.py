@@ -215,7 +215,7 @@ def respond(message: str, context: dict | None = None):
     
     # === TENTATIVA DE RESPOSTA COM IA ===
     try:
-        logger.debug(f"[Atendimento] Chamando OpenAI com prompt contextual")
+        logger.debug("[Atendimento] Chamando OpenAI com prompt contextual")
         ai_response = generate_response(prompt, message or '')
         
         if ai_response and len(ai_response.strip()) > 10:
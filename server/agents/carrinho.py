@@ -0,0 +1,374 @@
+"""
+Carrinho Persistente - Roberto Especialista em Pedidos
+======================================================
+
+Carrinho por telefone mantido em memória (LRU com TTL) e gravado em
+`pedidos_delivery` (write-through) ao fim de cada turno em que mudou.
+
+Cada turno aplica só a alteração da mensagem (adicionar, remover, alterar
+quantidade, CEP, pagamento, confirmação) sobre o carrinho existente; os
+totais são mantidos atualizados a cada operação e o estado do pedido
+(`EstadoPedido`) avança conforme os dados já coletados. Assim o Roberto não
+precisa reprocessar o histórico nem chamar o LLM para remontar o pedido.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from ..config import CARRINHO_EXPIRACAO_HORAS
+from .catalog_index import normalizar
+
+logger = logging.getLogger("3afrios.backend")
+
+
+# Estados do processo de pedido
+class EstadoPedido:
+    INICIANDO = "iniciando"
+    COLETANDO_ITENS = "coletando_itens"
+    VALIDANDO_PRODUTOS = "validando_produtos"
+    CALCULANDO_TOTAL = "calculando_total"
+    COLETANDO_ENDERECO = "coletando_endereco"
+    ESCOLHENDO_PAGAMENTO = "escolhendo_pagamento"
+    CONFIRMANDO = "confirmando"
+    FINALIZADO = "finalizado"
+
+
+# Estados em que o pedido ainda está aberto (carrinho editável)
+ESTADOS_ABERTOS = (
+    EstadoPedido.INICIANDO,
+    EstadoPedido.COLETANDO_ITENS,
+    EstadoPedido.VALIDANDO_PRODUTOS,
+    EstadoPedido.CALCULANDO_TOTAL,
+    EstadoPedido.COLETANDO_ENDERECO,
+    EstadoPedido.ESCOLHENDO_PAGAMENTO,
+    EstadoPedido.CONFIRMANDO,
+)
+
+# Forma de pagamento gravada enquanto o cliente não escolheu (coluna NOT NULL)
+PAGAMENTO_PENDENTE = "a_definir"
+
+
+class Carrinho:
+    """Carrinho de um telefone com totais pré-calculados"""
+
+    def __init__(self, telefone: str):
+        self.telefone = telefone
+        self.itens: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.estado = EstadoPedido.INICIANDO
+        self.cep: Optional[str] = None
+        self.forma_pagamento: Optional[str] = None
+        # Cliente sinalizou que terminou de escolher os itens ("só isso")
+        self.itens_concluidos = False
+        self.subtotal = 0.0
+        self.taxa_entrega = 0.0
+        self.pedido_id = None
+        self.alterado = False
+        self.atualizado_em = time.time()
+
+    # === ITENS ===
+
+    @staticmethod
+    def chave(produto: str) -> str:
+        return normalizar(produto)
+
+    def _tocar(self) -> None:
+        self.alterado = True
+        self.atualizado_em = time.time()
+
+    def _recalcular_item(self, item: Dict[str, Any]) -> None:
+        antigo = item.get('preco_total') or 0.0
+        preco_unit = item.get('preco_unitario')
+        item['preco_total'] = preco_unit * item['quantidade'] if preco_unit is not None else None
+        self.subtotal += (item['preco_total'] or 0.0) - antigo
+
+    def _editavel(self, operacao: str) -> bool:
+        if self.aberto:
+            return True
+        logger.debug("[Carrinho] %s: %s ignorado (pedido %s)", self.telefone, operacao, self.estado)
+        return False
+
+    def adicionar(self, item: Dict[str, Any], somar: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Adiciona item validado. Produto já no carrinho: repetir o pedido
+        ("quero 2kg de picanha" de novo) define a quantidade; só soma com
+        `somar` ("mais 1kg", "adiciona"), na mesma unidade. Pedido já
+        finalizado não muda (retorna None)
+        """
+        if not self._editavel("adicionar"):
+            return None
+        chave = self.chave(item['produto'])
+        existente = self.itens.get(chave)
+        if existente and existente.get('unidade') == item.get('unidade'):
+            existente['quantidade'] = existente['quantidade'] + item['quantidade'] if somar else item['quantidade']
+            self._recalcular_item(existente)
+        else:
+            if existente:
+                self.subtotal -= existente.get('preco_total') or 0.0
+            novo = {
+                'produto': item['produto'],
+                'quantidade': item['quantidade'],
+                'unidade': item.get('unidade', 'kg'),
+                'preco_unitario': item.get('preco_unitario'),
+                'preco_total': None,
+                'produto_encontrado': item.get('produto_encontrado'),
+            }
+            self.itens[chave] = novo
+            self._recalcular_item(novo)
+            existente = novo
+        self._tocar()
+        self.avancar()
+        return existente
+
+    def localizar(self, produto: str) -> Optional[str]:
+        """Chave do item do carrinho que corresponde ao nome informado"""
+        alvo = self.chave(produto)
+        if not alvo:
+            return None
+        if alvo in self.itens:
+            return alvo
+        for chave in self.itens:
+            if alvo in chave or chave in alvo:
+                return chave
+        palavras = set(alvo.split())
+        for chave in self.itens:
+            if palavras & set(chave.split()):
+                return chave
+        return None
+
+    def remover(self, produto: str) -> Optional[Dict[str, Any]]:
+        if not self._editavel("remover"):
+            return None
+        chave = self.localizar(produto)
+        if chave is None:
+            return None
+        item = self.itens.pop(chave)
+        self.subtotal -= item.get('preco_total') or 0.0
+        self._tocar()
+        self.avancar()
+        return item
+
+    def alterar_quantidade(self, produto: str, quantidade: float, unidade: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if not self._editavel("alterar_quantidade"):
+            return None
+        chave = self.localizar(produto)
+        if chave is None:
+            return None
+        item = self.itens[chave]
+        item['quantidade'] = quantidade
+        if unidade:
+            item['unidade'] = unidade
+        self._recalcular_item(item)
+        self._tocar()
+        self.avancar()
+        return item
+
+    def limpar(self) -> None:
+        if not self._editavel("limpar"):
+            return
+        self.itens.clear()
+        self.subtotal = 0.0
+        self._tocar()
+        self.avancar()
+
+    # === ENTREGA / PAGAMENTO ===
+
+    def concluir_itens(self) -> None:
+        self.itens_concluidos = True
+        self._tocar()
+        self.avancar()
+
+    def definir_cep(self, cep: str) -> None:
+        self.cep = cep
+        self._tocar()
+        self.avancar()
+
+    def definir_pagamento(self, forma: str) -> None:
+        self.forma_pagamento = forma
+        self._tocar()
+        self.avancar()
+
+    # === MÁQUINA DE ESTADOS ===
+
+    def avancar(self) -> str:
+        """Recalcula o estado a partir do que já foi coletado"""
+        if self.estado == EstadoPedido.FINALIZADO:
+            return self.estado
+        if not self.itens:
+            novo = EstadoPedido.INICIANDO
+        elif not self.cep:
+            novo = EstadoPedido.COLETANDO_ENDERECO if self.itens_concluidos else EstadoPedido.COLETANDO_ITENS
+        elif not self.forma_pagamento:
+            novo = EstadoPedido.ESCOLHENDO_PAGAMENTO
+        else:
+            novo = EstadoPedido.CONFIRMANDO
+        if novo != self.estado:
+            logger.debug("[Carrinho] %s: %s -> %s", self.telefone, self.estado, novo)
+            self.estado = novo
+        return self.estado
+
+    def finalizar(self) -> bool:
+        """Fecha o pedido (só a partir de CONFIRMANDO)"""
+        if self.estado != EstadoPedido.CONFIRMANDO:
+            return False
+        self.estado = EstadoPedido.FINALIZADO
+        self._tocar()
+        return True
+
+    @property
+    def aberto(self) -> bool:
+        return self.estado in ESTADOS_ABERTOS
+
+    # === TOTAIS / SERIALIZAÇÃO ===
+
+    @property
+    def total(self) -> float:
+        return self.subtotal + self.taxa_entrega
+
+    def totais(self) -> Dict[str, Any]:
+        """Totais no mesmo formato de `pedidos._calculate_order_total`"""
+        from .service import get_service_utils
+        service_utils = get_service_utils()
+        subtotal = round(self.subtotal, 2)
+        return {
+            'subtotal': subtotal,
+            'taxa_entrega': self.taxa_entrega,
+            'total': round(self.total, 2),
+            'items_validos': sum(1 for i in self.itens.values() if i.get('preco_total')),
+            'formatado': {
+                'subtotal': service_utils.formatar_valor_monetario(subtotal),
+                'taxa_entrega': service_utils.formatar_valor_monetario(self.taxa_entrega) if self.taxa_entrega > 0 else "Grátis",
+                'total': service_utils.formatar_valor_monetario(self.total)
+            }
+        }
+
+    def lista_itens(self) -> List[Dict[str, Any]]:
+        return list(self.itens.values())
+
+    def to_row(self) -> Dict[str, Any]:
+        """Colunas de `pedidos_delivery`"""
+        itens = []
+        for item in self.itens.values():
+            encontrado = (item.get('produto_encontrado') or {}).get('product') or {}
+            itens.append({
+                'produto': item['produto'],
+                'quantidade': item['quantidade'],
+                'unidade': item.get('unidade'),
+                'preco_unitario': item.get('preco_unitario'),
+                'preco_total': round(item['preco_total'], 2) if item.get('preco_total') is not None else None,
+                'descricao': encontrado.get('descricao', encontrado.get('produto')),
+                'preco': encontrado.get('preco'),
+            })
+        return {
+            'itens': itens,
+            'valor_total': round(self.total, 2),
+            'subtotal': round(self.subtotal, 2),
+            'taxa_entrega': self.taxa_entrega,
+            'forma_pagamento': self.forma_pagamento or PAGAMENTO_PENDENTE,
+            'status': self.estado,
+            'cep': self.cep,
+        }
+
+    @classmethod
+    def from_row(cls, telefone: str, row: Dict[str, Any]) -> 'Carrinho':
+        """Reidrata o carrinho a partir da linha de `pedidos_delivery`"""
+        carrinho = cls(telefone)
+        carrinho.pedido_id = row.get('id')
+        for it in row.get('itens') or []:
+            item = {
+                'produto': it.get('produto', ''),
+                'quantidade': float(it.get('quantidade') or 0),
+                'unidade': it.get('unidade') or 'kg',
+                'preco_unitario': it.get('preco_unitario'),
+                'preco_total': None,
+                'produto_encontrado': {
+                    'found': True,
+                    'product': {'descricao': it.get('descricao') or it.get('produto', ''), 'preco': it.get('preco')},
+                } if it.get('preco_unitario') is not None else None,
+            }
+            carrinho.itens[cls.chave(item['produto'])] = item
+            carrinho._recalcular_item(item)
+        carrinho.cep = row.get('cep')
+        forma = row.get('forma_pagamento')
+        carrinho.forma_pagamento = forma if forma and forma != PAGAMENTO_PENDENTE else None
+        carrinho.estado = row.get('status') or EstadoPedido.INICIANDO
+        carrinho.itens_concluidos = carrinho.estado not in (EstadoPedido.INICIANDO, EstadoPedido.COLETANDO_ITENS)
+        carrinho.avancar()
+        carrinho.alterado = False
+        return carrinho
+
+
+class CarrinhoStore:
+    """Carrinhos abertos por telefone (memória + write-through no Supabase)"""
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = CARRINHO_EXPIRACAO_HORAS * 3600):
+        self._carrinhos: 'OrderedDict[str, Carrinho]' = OrderedDict()
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+
+    def get(self, telefone: str) -> Optional[Carrinho]:
+        with self._lock:
+            carrinho = self._carrinhos.get(telefone)
+            if carrinho is None:
+                return None
+            if time.time() - carrinho.atualizado_em > self._ttl or not carrinho.aberto:
+                self._carrinhos.pop(telefone, None)
+                return None
+            self._carrinhos.move_to_end(telefone)
+            return carrinho
+
+    def _guardar(self, carrinho: Carrinho) -> None:
+        with self._lock:
+            self._carrinhos[carrinho.telefone] = carrinho
+            self._carrinhos.move_to_end(carrinho.telefone)
+            while len(self._carrinhos) > self._max_entries:
+                self._carrinhos.popitem(last=False)
+
+    async def carregar(self, telefone: str) -> Carrinho:
+        """Carrinho aberto do telefone: memória, senão banco, senão novo"""
+        carrinho = self.get(telefone)
+        if carrinho is not None:
+            return carrinho
+        from ..integrations.supabase_store import fetch_pedido_aberto
+        try:
+            row = await fetch_pedido_aberto(telefone)
+        except Exception as e:
+            logger.warning(f"[Carrinho] Falha ao carregar pedido aberto de {telefone}: {e}")
+            row = None
+        carrinho = Carrinho.from_row(telefone, row) if row else Carrinho(telefone)
+        self._guardar(carrinho)
+        return carrinho
+
+    async def persistir(self, carrinho: Carrinho) -> bool:
+        """Grava o carrinho em `pedidos_delivery` se mudou neste turno"""
+        if not carrinho.alterado:
+            return False
+        from ..integrations.supabase_store import salvar_pedido_carrinho
+        try:
+            row = await salvar_pedido_carrinho(carrinho.telefone, carrinho.to_row(), pedido_id=carrinho.pedido_id)
+        except Exception as e:
+            logger.error(f"[Carrinho] Erro ao gravar pedido de {carrinho.telefone}: {e}")
+            return False
+        if not row:
+            return False
+        carrinho.pedido_id = row.get('id', carrinho.pedido_id)
+        carrinho.alterado = False
+        if not carrinho.aberto:
+            with self._lock:
+                self._carrinhos.pop(carrinho.telefone, None)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._carrinhos.clear()
+
+
+# Instância global para uso pelo orquestrador
+_carrinho_store = CarrinhoStore()
+
+def get_carrinho_store() -> CarrinhoStore:
+    """Retorna o armazenamento global de carrinhos"""
+    return _carrinho_store
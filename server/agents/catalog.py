@@ -1,5 +1,6 @@
 from ..integrations.openai_client import generate_response
-from typing import List, Dict, Any
+from .catalog_index import CatalogIndex, get_catalog_index
+from typing import List, Dict, Any, Optional
 import unicodedata
 import logging
 
@@ -33,6 +34,41 @@ DICAS_COMERCIAIS = {
 
 logger = logging.getLogger("3afrios.backend")
 
+# Palavras ignoradas na busca de produtos
+STOPWORDS_PRODUTO = frozenset(['que','qual','quais','quanto','custa','tem','têm','teria','vende','vocês','voces','vcs','de','do','da','dos','das','o','a','os','as','um','uma','me','manda','mandar','enviar','ver','lista','catalogo','catálogo','preco','preço','valor','por','kg','quilo'])
+
+# Mapeamento de categorias para produtos (expansão de palavras-chave)
+CATEGORIAS_PRODUTO: Dict[str, List[str]] = {
+    'porco': ['calabresa', 'linguica', 'linguiça', 'pernil', 'costela', 'lombo', 'bacon'],
+    'suino': ['calabresa', 'linguica', 'linguiça', 'pernil', 'costela', 'lombo', 'bacon'],
+    'suína': ['calabresa', 'linguica', 'linguiça', 'pernil', 'costela', 'lombo', 'bacon'],
+    'gado': ['picanha', 'alcatra', 'maminha', 'contrafile', 'coxao', 'patinho', 'acem'],
+    'bovino': ['picanha', 'alcatra', 'maminha', 'contrafile', 'coxao', 'patinho', 'acem'],
+    'boi': ['picanha', 'alcatra', 'maminha', 'contrafile', 'coxao', 'patinho', 'acem'],
+    'frango': ['coxa', 'sobrecoxa', 'peito', 'asa', 'coxinha', 'filezinho'],
+    'aves': ['coxa', 'sobrecoxa', 'peito', 'asa', 'coxinha', 'filezinho', 'frango'],
+    'frios': ['mortadela', 'presunto', 'queijo', 'salamie', 'copa'],
+    'embutidos': ['calabresa', 'linguica', 'linguiça', 'salsicha', 'mortadela']
+}
+
+# Termos de combos sugeridos por Sofia (ver _suggest_combo)
+COMBO_TERMOS = {
+    'carne_nobre': ['linguiça', 'calabresa', 'sal'],
+    'queijo': ['presunto', 'mortadela'],
+    'frango': ['linguiça', 'sal', 'tempero'],
+}
+
+# Termos resolvidos já na construção do índice do catálogo
+_TERMOS_PRECOMPUTADOS = sorted(
+    {t for termos in CATEGORIAS_PRODUTO.values() for t in termos}
+    | {t for termos in COMBO_TERMOS.values() for t in termos}
+)
+
+
+def _catalog_index(items: List[Dict[str, str]]) -> CatalogIndex:
+    """Índice do snapshot atual do catálogo (construído uma vez por conteúdo)"""
+    return get_catalog_index(items, _TERMOS_PRECOMPUTADOS)
+
 
 def _norm(s: str) -> str:
     s = (s or "").strip().lower()
@@ -108,39 +144,19 @@ def _get_product_keywords(message: str) -> List[str]:
     # Remove pontuação e normaliza
     clean_msg = _norm(message.replace('?', '').replace('!', '').replace('.', '').replace(',', ''))
     raw_tokens = [t for t in clean_msg.split() if len(t) >= 3]
-    stop = set(['que','qual','quais','quanto','custa','tem','têm','teria','vende','vocês','voces','vcs','de','do','da','dos','das','o','a','os','as','um','uma','me','manda','mandar','enviar','ver','lista','catalogo','catálogo','preco','preço','valor','por','kg','quilo'])
-    keywords = [t for t in raw_tokens if t not in stop]
+    keywords = [t for t in raw_tokens if t not in STOPWORDS_PRODUTO]
     
     # Expande com sinônimos e categorias
     expanded = set(keywords)
     
-    # Mapeamento de categorias
-    categorias = {
-        'porco': ['calabresa', 'linguica', 'linguiça', 'pernil', 'costela', 'lombo', 'bacon'],
-        'suino': ['calabresa', 'linguica', 'linguiça', 'pernil', 'costela', 'lombo', 'bacon'],
-        'suína': ['calabresa', 'linguica', 'linguiça', 'pernil', 'costela', 'lombo', 'bacon'],
-        'gado': ['picanha', 'alcatra', 'maminha', 'contrafile', 'coxao', 'patinho', 'acem'],
-        'bovino': ['picanha', 'alcatra', 'maminha', 'contrafile', 'coxao', 'patinho', 'acem'],
-        'boi': ['picanha', 'alcatra', 'maminha', 'contrafile', 'coxao', 'patinho', 'acem'],
-        'frango': ['coxa', 'sobrecoxa', 'peito', 'asa', 'coxinha', 'filezinho'],
-        'aves': ['coxa', 'sobrecoxa', 'peito', 'asa', 'coxinha', 'filezinho', 'frango'],
-        'frios': ['mortadela', 'presunto', 'queijo', 'salamie', 'copa'],
-        'embutidos': ['calabresa', 'linguica', 'linguiça', 'salsicha', 'mortadela']
-    }
-    
     # Adiciona produtos da categoria se palavra for categoria
     for palavra in list(keywords):  # usa lista para não modificar durante iteração
-        if palavra in categorias:
-            expanded.update(categorias[palavra])
+        if palavra in CATEGORIAS_PRODUTO:
+            expanded.update(CATEGORIAS_PRODUTO[palavra])
     
     return list(expanded)
 
 
-def _match_product(item: Dict[str, str], keywords: List[str]) -> bool:
-    """Verifica se um produto match com as palavras-chave expandidas"""
-    desc = _norm(_format_item(item))
-    return any(k in desc for k in keywords) if keywords else False
-
 def _suggest_quantity(product_name: str, context: str = "") -> str:
     """Sugere quantidade prática baseada no produto e contexto"""
     product_lower = product_name.lower()
@@ -163,36 +179,42 @@ def _suggest_quantity(product_name: str, context: str = "") -> str:
     
     return "Sugestão: Fale comigo para calcularmos a quantidade ideal! 😊"
 
-def _suggest_combo(main_product: str, available_items: List[Dict[str, str]]) -> List[str]:
+def _suggest_combo(
+    main_product: str,
+    available_items: List[Dict[str, str]],
+    index: Optional[CatalogIndex] = None,
+    posicoes: Optional[List[int]] = None,
+) -> List[str]:
     """Sugere produtos complementares baseado no produto principal"""
     main_lower = main_product.lower()
-    suggestions = []
     
-    # Busca produtos complementares nos itens disponíveis
     if any(word in main_lower for word in ['picanha', 'alcatra']):
         # Para carnes nobis, sugere linguiça e sal
-        for item in available_items:
-            desc = _norm(_format_item(item))
-            if any(word in desc for word in ['linguiça', 'calabresa', 'sal']):
-                suggestions.append(_format_item(item, 'basic'))
-    
+        termos = COMBO_TERMOS['carne_nobre']
     elif any(word in main_lower for word in ['queijo']):
         # Para queijo, sugere presunto
-        for item in available_items:
-            desc = _norm(_format_item(item))
-            if any(word in desc for word in ['presunto', 'mortadela']):
-                suggestions.append(_format_item(item, 'basic'))
-    
+        termos = COMBO_TERMOS['queijo']
     elif any(word in main_lower for word in ['frango']):
         # Para frango, sugere linguiça
-        for item in available_items:
-            desc = _norm(_format_item(item))
-            if any(word in desc for word in ['linguiça', 'sal', 'tempero']):
-                suggestions.append(_format_item(item, 'basic'))
+        termos = COMBO_TERMOS['frango']
+    else:
+        return []
+    
+    # Busca produtos complementares nos itens disponíveis (via índice)
+    if index is None:
+        index = _catalog_index(available_items)
+        posicoes = list(range(len(index)))
+    suggestions = [_format_item(index.items[p], 'basic') for p in index.any_term(termos, posicoes or [])]
     
     return suggestions[:3]  # Máximo 3 sugestões
 
-def _build_commercial_response(produtos: List[Dict[str, str]], query: str, total_count: int) -> str:
+def _build_commercial_response(
+    produtos: List[Dict[str, str]],
+    query: str,
+    total_count: int,
+    index: Optional[CatalogIndex] = None,
+    posicoes: Optional[List[int]] = None,
+) -> str:
     """Constrói resposta comercial inteligente"""
     if not produtos:
         return _build_not_found_response(query)
@@ -221,7 +243,7 @@ def _build_commercial_response(produtos: List[Dict[str, str]], query: str, total
     # Sugestões comerciais
     if produtos:
         primeiro_produto = _pick(produtos[0], ['descricao', 'descrição', 'produto', 'nome'])
-        combos = _suggest_combo(primeiro_produto, produtos)
+        combos = _suggest_combo(primeiro_produto, produtos, index=index, posicoes=posicoes)
         
         combo_text = ""
         if combos:
@@ -326,10 +348,14 @@ def respond(message: str, context: dict | None = None):
             logger.info(f"[Catalog] Sofia buscando por: {keywords}")
 
             if keywords:
-                filtrados = [it for it in items if _match_product(it, keywords)]
+                index = _catalog_index(items)
+                posicoes = index.search(keywords)
+                filtrados = [index.items[p] for p in posicoes]
                 if filtrados:
                     # Resposta comercial inteligente
-                    resposta = _build_commercial_response(filtrados, ' '.join(keywords), len(filtrados))
+                    resposta = _build_commercial_response(
+                        filtrados, ' '.join(keywords), len(filtrados), index=index, posicoes=posicoes
+                    )
                 else:
                     # Produto não encontrado
                     resposta = _build_not_found_response(' '.join(keywords))
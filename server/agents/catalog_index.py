@@ -0,0 +1,179 @@
+"""
+Índice do Catálogo - Busca de Produtos
+======================================
+
+Índice invertido construído uma única vez por snapshot do catálogo (lista de
+itens vinda da planilha). Cada item é normalizado uma vez (sem acentos,
+minúsculas) e tem seus tokens, prefixos e trigramas indexados, de modo que as
+buscas dos agentes não precisam reformatar/normalizar o catálogo inteiro a
+cada mensagem.
+
+A busca mantém a semântica original de "palavra-chave contida na descrição"
+(substring), usando os trigramas para gerar candidatos e verificando a
+substring apenas neles. Os resultados são ranqueados: token exato > prefixo
+de token > substring.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Set, Iterable, Optional, Tuple
+
+DESC_KEYS = ['descricao', 'descrição', 'produto', 'nome', 'item', 'description']
+NAME_KEYS = ['descricao', 'produto']
+PRICE_KEYS = ['preco', 'preço', 'valor', 'price']
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(s: str) -> str:
+    """Minúsculas e sem acentos (mesma regra do `_norm` dos agentes)"""
+    s = (s or "").strip().lower()
+    s = unicodedata.normalize('NFD', s)
+    return ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')
+
+
+def trigramas(s: str) -> Set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _pick(d: Dict[str, Any], keys: List[str]) -> str:
+    for k in keys:
+        v = d.get(k)
+        if v:
+            return str(v).strip()
+    return ""
+
+
+class CatalogIndex:
+    """Índice invertido (tokens, prefixos e trigramas) de um snapshot do catálogo"""
+
+    def __init__(self, items: List[Dict[str, Any]], termos_precomputados: Iterable[str] = ()):
+        self.items: List[Dict[str, Any]] = list(items or [])
+        # Texto normalizado de busca (descrição + preço) e nome normalizado
+        self.textos: List[str] = []
+        self.nomes: List[str] = []
+        self.tokens: List[Set[str]] = []
+        self._token_postings: Dict[str, Set[int]] = {}
+        self._prefix_postings: Dict[str, Set[int]] = {}
+        self._trigram_postings: Dict[str, Set[int]] = {}
+        self._term_cache: Dict[str, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+
+        for pos, item in enumerate(self.items):
+            desc = _pick(item, DESC_KEYS)
+            texto = normalizar(f"{desc} {_pick(item, PRICE_KEYS)}") if desc else ""
+            nome = normalizar(item.get('descricao', '') or item.get('produto', ''))
+            self.textos.append(texto)
+            self.nomes.append(nome)
+            toks = set(_TOKEN_RE.findall(texto))
+            self.tokens.append(toks)
+            for tok in toks:
+                self._token_postings.setdefault(tok, set()).add(pos)
+                for n in range(3, len(tok) + 1):
+                    self._prefix_postings.setdefault(tok[:n], set()).add(pos)
+            for tri in trigramas(texto):
+                self._trigram_postings.setdefault(tri, set()).add(pos)
+
+        # Termos recorrentes (ex.: expansões de categorias) já resolvidos
+        for termo in termos_precomputados:
+            self.term_hits(termo)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def term_hits(self, termo: str) -> Tuple[int, ...]:
+        """Posições dos itens cujo texto contém `termo` (substring normalizada)"""
+        termo = normalizar(termo)
+        cached = self._term_cache.get(termo)
+        if cached is not None:
+            return cached
+        if not termo:
+            hits: Tuple[int, ...] = ()
+        elif len(termo) < 3:
+            hits = tuple(p for p, t in enumerate(self.textos) if termo in t)
+        else:
+            postings = []
+            for tri in trigramas(termo):
+                ps = self._trigram_postings.get(tri)
+                if not ps:
+                    postings = None
+                    break
+                postings.append(ps)
+            if not postings:
+                hits = ()
+            else:
+                postings.sort(key=len)
+                cand = set(postings[0])
+                for ps in postings[1:]:
+                    cand &= ps
+                    if not cand:
+                        break
+                hits = tuple(sorted(p for p in cand if termo in self.textos[p]))
+        with self._lock:
+            self._term_cache[termo] = hits
+        return hits
+
+    def search(self, keywords: Iterable[str], limit: Optional[int] = None) -> List[int]:
+        """
+        Posições dos itens que casam com alguma palavra-chave, ranqueadas por
+        relevância (token exato=3, prefixo=2, substring=1) e ordem do catálogo.
+        """
+        scores: Dict[int, int] = {}
+        for k in keywords:
+            termo = normalizar(k)
+            if not termo:
+                continue
+            exatos = self._token_postings.get(termo, ())
+            prefixos = self._prefix_postings.get(termo, ())
+            for pos in self.term_hits(termo):
+                peso = 3 if pos in exatos else 2 if pos in prefixos else 1
+                scores[pos] = scores.get(pos, 0) + peso
+        ranked = sorted(scores, key=lambda p: (-scores[p], p))
+        return ranked[:limit] if limit else ranked
+
+    def search_items(self, keywords: Iterable[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [self.items[p] for p in self.search(keywords, limit)]
+
+    def any_term(self, termos: Iterable[str], posicoes: Iterable[int]) -> List[int]:
+        """Filtra `posicoes` mantendo as que contêm algum dos termos (ordem preservada)"""
+        alvo: Set[int] = set()
+        for t in termos:
+            alvo.update(self.term_hits(t))
+        return [p for p in posicoes if p in alvo]
+
+
+# ===================================
+# CACHE DE ÍNDICES POR SNAPSHOT
+# ===================================
+
+# Chave: id() da lista do snapshot; o valor guarda a própria lista, então o
+# id não é reaproveitado enquanto a entrada existir e o acerto confere `is`
+_INDEX_CACHE: 'OrderedDict[int, Tuple[List[Dict[str, Any]], CatalogIndex]]' = OrderedDict()
+_INDEX_CACHE_MAX = 8
+_INDEX_LOCK = threading.Lock()
+
+
+def get_catalog_index(items: List[Dict[str, Any]], termos_precomputados: Iterable[str] = ()) -> CatalogIndex:
+    """
+    Retorna o índice do snapshot do catálogo. O snapshot é a lista de itens
+    do contexto (google_knowledge.GoogleServices.snapshot), o mesmo objeto
+    enquanto não vence: o índice é construído uma vez por lista, em O(1) por
+    busca. Uma lista nova (snapshot renovado, ou itens montados pelo
+    chamador) ganha índice próprio.
+    """
+    items = items if items is not None else []
+    key = id(items)
+    with _INDEX_LOCK:
+        entrada = _INDEX_CACHE.get(key)
+        if entrada is not None and entrada[0] is items:
+            _INDEX_CACHE.move_to_end(key)
+            return entrada[1]
+    idx = CatalogIndex(items, termos_precomputados)
+    with _INDEX_LOCK:
+        _INDEX_CACHE[key] = (items, idx)
+        _INDEX_CACHE.move_to_end(key)
+        while len(_INDEX_CACHE) > _INDEX_CACHE_MAX:
+            _INDEX_CACHE.popitem(last=False)
+    return idx
@@ -0,0 +1,228 @@
+"""
+Matching Tolerante a Erros - Produtos do Catálogo
+=================================================
+
+Resolve nomes de produtos digitados pelo cliente ("picanah", "linguissa")
+contra o snapshot do catálogo. Reaproveita o `CatalogIndex` (itens já
+normalizados uma única vez) e mantém um vocabulário das palavras dos nomes
+com índice de trigramas: cada palavra da mensagem gera candidatos pelos
+trigramas em comum e é ranqueada pela distância de edição (com transposição).
+
+Pedidos com vários itens são resolvidos numa única chamada (`match_many`),
+compartilhando as correções de palavras entre os itens.
+"""
+
+import re
+import threading
+import weakref
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .catalog_index import CatalogIndex, get_catalog_index, normalizar
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+# Palavras que não identificam produto
+STOPWORDS_ITEM = frozenset({'de', 'da', 'do', 'das', 'dos', 'e', 'com', 'um', 'uma', 'o', 'a'})
+
+# Limiar mínimo de similaridade (mesmo do matching por palavras original)
+SCORE_MINIMO = 0.3
+
+
+def _trigramas_palavra(w: str) -> Set[str]:
+    p = f" {w} "
+    return {p[i:i + 3] for i in range(len(p) - 2)}
+
+
+def distancia_max(palavra: str) -> int:
+    """Erros de digitação tolerados conforme o tamanho da palavra"""
+    n = len(palavra)
+    if n <= 3:
+        return 0
+    if n <= 6:
+        return 1
+    return 2
+
+
+def distancia_edicao(a: str, b: str, limite: int) -> int:
+    """
+    Distância de Damerau-Levenshtein (OSA) com corte: retorna `limite + 1`
+    assim que a distância ultrapassa o limite.
+    """
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > limite:
+        return limite + 1
+    anterior2: List[int] = []
+    anterior = list(range(lb + 1))
+    for i in range(1, la + 1):
+        atual = [i] + [0] * lb
+        menor = atual[0]
+        ca = a[i - 1]
+        for j in range(1, lb + 1):
+            custo = 0 if ca == b[j - 1] else 1
+            v = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + custo)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, anterior2[j - 2] + 1)
+            atual[j] = v
+            if v < menor:
+                menor = v
+        if menor > limite:
+            return limite + 1
+        anterior2, anterior = anterior, atual
+    return anterior[lb]
+
+
+class ProductMatcher:
+    """Matcher de produtos tolerante a erros sobre um snapshot do catálogo"""
+
+    def __init__(self, index: CatalogIndex):
+        self.index = index
+        self.palavras: List[Set[str]] = []
+        self._word_postings: Dict[str, Set[int]] = {}
+        self._vocab_trigramas: Dict[str, Set[str]] = {}
+        self._correcoes: Dict[str, Tuple[Tuple[str, float], ...]] = {}
+        self._lock = threading.Lock()
+
+        for pos, nome in enumerate(index.nomes):
+            ws = {w for w in _WORD_RE.findall(nome) if w not in STOPWORDS_ITEM}
+            self.palavras.append(ws)
+            for w in ws:
+                if w not in self._word_postings:
+                    self._word_postings[w] = set()
+                    for tri in _trigramas_palavra(w):
+                        self._vocab_trigramas.setdefault(tri, set()).add(w)
+                self._word_postings[w].add(pos)
+
+    def corrigir_palavra(self, palavra: str) -> Tuple[Tuple[str, float], ...]:
+        """Palavras do vocabulário próximas de `palavra`, com similaridade (1.0 = exata)"""
+        cached = self._correcoes.get(palavra)
+        if cached is not None:
+            return cached
+        if palavra in self._word_postings:
+            res: Tuple[Tuple[str, float], ...] = ((palavra, 1.0),)
+        else:
+            limite = distancia_max(palavra)
+            achadas: List[Tuple[str, float]] = []
+            if limite:
+                candidatas: Set[str] = set()
+                for tri in _trigramas_palavra(palavra):
+                    candidatas.update(self._vocab_trigramas.get(tri, ()))
+                for cand in candidatas:
+                    d = distancia_edicao(palavra, cand, limite)
+                    if d <= limite:
+                        achadas.append((cand, 1.0 - d / max(len(palavra), len(cand))))
+            achadas.sort(key=lambda x: (-x[1], x[0]))
+            res = tuple(achadas)
+        with self._lock:
+            self._correcoes[palavra] = res
+        return res
+
+    def _match_exato(self, item_norm: str, item_words: Set[str]) -> Optional[int]:
+        """Primeira posição (ordem do catálogo) cujo nome contém o item ou está contido nele"""
+        nomes = self.index.nomes
+        achados = [p for p in self.index.term_hits(item_norm) if item_norm in nomes[p]]
+        cand: Set[int] = set()
+        for w in item_words:
+            cand.update(self._word_postings.get(w, ()))
+        achados.extend(p for p in cand if nomes[p] and nomes[p] in item_norm)
+        return min(achados) if achados else None
+
+    def ranquear(self, item_name: str, limit: Optional[int] = None) -> List[Tuple[int, float, bool]]:
+        """
+        Candidatos para o item ranqueados por similaridade de palavras
+        (tolerante a erros). Retorna (posição, score, houve_correção).
+        """
+        item_words = {w for w in _WORD_RE.findall(normalizar(item_name)) if w not in STOPWORDS_ITEM}
+        if not item_words:
+            return []
+        # Para cada candidato: soma da melhor similaridade de cada palavra do item
+        acumulado: Dict[int, float] = {}
+        corrigido: Dict[int, bool] = {}
+        for w in item_words:
+            melhor_por_pos: Dict[int, float] = {}
+            for vocab, sim in self.corrigir_palavra(w):
+                for pos in self._word_postings.get(vocab, ()):
+                    if sim > melhor_por_pos.get(pos, 0.0):
+                        melhor_por_pos[pos] = sim
+            for pos, sim in melhor_por_pos.items():
+                acumulado[pos] = acumulado.get(pos, 0.0) + sim
+                if sim < 1.0:
+                    corrigido[pos] = True
+        ranking = [
+            (pos, total / max(len(item_words), len(self.palavras[pos])), corrigido.get(pos, False))
+            for pos, total in acumulado.items()
+        ]
+        ranking.sort(key=lambda x: (-x[1], x[0]))
+        return ranking[:limit] if limit else ranking
+
+    def match(self, item_name: str) -> Dict[str, Any]:
+        """Resolve um item contra o catálogo (mesmo formato de `_match_product_in_catalog`)"""
+        item_norm = normalizar(item_name)
+        items = self.index.items
+        if item_norm:
+            item_words = set(_WORD_RE.findall(item_norm))
+            pos = self._match_exato(item_norm, item_words)
+            if pos is not None:
+                return {
+                    'found': True,
+                    'product': items[pos],
+                    'confidence': 'alta',
+                    'match_type': 'exata'
+                }
+
+        ranking = self.ranquear(item_name)
+        if ranking and ranking[0][1] > SCORE_MINIMO:
+            pos, score, corrigido = ranking[0]
+            confidence = 'alta' if score > 0.7 else 'média' if score > 0.5 else 'baixa'
+            return {
+                'found': True,
+                'product': items[pos],
+                'confidence': confidence,
+                'match_type': 'aproximada' if corrigido else 'similar',
+                'score': score
+            }
+
+        return {
+            'found': False,
+            'candidates': [items[pos] for pos, _, _ in ranking[:3]]
+        }
+
+    def match_many(self, item_names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Resolve vários itens de uma vez (itens repetidos são resolvidos uma
+        única vez). Cada posição recebe o seu dict: o chamador anota o
+        resultado do item (ex.: `item['produto_encontrado']`) sem afetar as
+        repetições; `product`/`candidates` continuam apontando para o catálogo
+        """
+        resolvidos: Dict[str, Dict[str, Any]] = {}
+        out = []
+        for name in item_names:
+            chave = normalizar(name)
+            if chave not in resolvidos:
+                resolvidos[chave] = self.match(name)
+            resultado = dict(resolvidos[chave])
+            if 'candidates' in resultado:
+                resultado['candidates'] = list(resultado['candidates'])
+            out.append(resultado)
+        return out
+
+
+# ===================================
+# CACHE DE MATCHERS POR SNAPSHOT
+# ===================================
+
+_MATCHERS: 'weakref.WeakKeyDictionary[CatalogIndex, ProductMatcher]' = weakref.WeakKeyDictionary()
+_MATCHERS_LOCK = threading.Lock()
+
+
+def get_product_matcher(items: List[Dict[str, Any]]) -> ProductMatcher:
+    """Retorna o matcher do snapshot do catálogo (construído uma vez por índice)"""
+    index = get_catalog_index(items)
+    with _MATCHERS_LOCK:
+        matcher = _MATCHERS.get(index)
+    if matcher is None:
+        matcher = ProductMatcher(index)
+        with _MATCHERS_LOCK:
+            matcher = _MATCHERS.setdefault(index, matcher)
+    return matcher
@@ -0,0 +1,142 @@
+"""
+Estado Incremental de Qualificação - Bruno Analista Invisível
+=============================================================
+
+Mantém, por telefone, um acumulador de sinais da conversa (contagem de
+palavras-chave por grupo, maior número de pessoas citado, urgência) que é
+atualizado apenas com a mensagem nova de cada turno.
+
+A janela cobre as últimas mensagens do cliente (mesmo recorte que o Bruno
+usava ao remontar `full_conversation`), mas cada mensagem é analisada uma
+única vez: ao entrar na janela soma-se sua contribuição e, ao sair, ela é
+subtraída. O custo por turno é constante, independente do histórico.
+"""
+
+import re
+import time
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Dict, Any, List, Optional, Tuple, FrozenSet
+
+# Quantidade de mensagens do cliente consideradas na análise (histórico + atual)
+JANELA_MENSAGENS = 6
+
+# Grupos de palavras-chave usados no score do lead
+GRUPOS_PALAVRAS: Dict[str, Tuple[str, ...]] = {
+    'segmento_pj': ('empresa', 'restaurante', 'cnpj', 'corporativo'),
+    'segmento_evento': ('casamento', 'festa', 'evento', 'formatura'),
+    'urgencia_alta': ('hoje', 'amanhã', 'urgente', 'rápido'),
+    'urgencia_media': ('semana', 'próxima'),
+    'interesse_compra': ('quero', 'preciso', 'vou levar', 'comprar'),
+    'interesse_preco': ('quanto', 'preço', 'valor', 'custa'),
+    'interesse_produto': ('produto', 'catálogo', 'tem'),
+}
+
+_PESSOAS_RE = re.compile(r'(\d+)\s*pessoas?')
+
+
+def extrair_sinais(mensagem: str) -> Tuple[FrozenSet[str], Optional[int]]:
+    """Analisa uma única mensagem: grupos presentes e maior nº de pessoas citado"""
+    text = (mensagem or '').lower()
+    if not text:
+        return frozenset(), None
+    grupos = frozenset(
+        grupo for grupo, palavras in GRUPOS_PALAVRAS.items()
+        if any(p in text for p in palavras)
+    )
+    pessoas = None
+    for m in _PESSOAS_RE.finditer(text):
+        n = int(m.group(1))
+        if pessoas is None or n > pessoas:
+            pessoas = n
+    return grupos, pessoas
+
+
+class LeadFeatureState:
+    """Acumulador de sinais de um lead sobre uma janela deslizante de mensagens"""
+
+    __slots__ = ('_janela', '_contagem', 'atualizado_em')
+
+    def __init__(self, janela: int = JANELA_MENSAGENS):
+        self._janela: deque = deque(maxlen=janela)
+        self._contagem: Counter = Counter()
+        self.atualizado_em = time.time()
+
+    def add(self, mensagem: str) -> None:
+        """Incorpora uma mensagem nova (e descarta a mais antiga se a janela encher)"""
+        grupos, pessoas = extrair_sinais(mensagem)
+        if len(self._janela) == self._janela.maxlen:
+            grupos_antigos, _ = self._janela[0]
+            self._contagem.subtract(grupos_antigos)
+        self._janela.append((grupos, pessoas))
+        self._contagem.update(grupos)
+        self.atualizado_em = time.time()
+
+    def has(self, grupo: str) -> bool:
+        return self._contagem.get(grupo, 0) > 0
+
+    def contagem(self, grupo: str) -> int:
+        return max(0, self._contagem.get(grupo, 0))
+
+    @property
+    def pessoas(self) -> Optional[int]:
+        valores = [p for _, p in self._janela if p is not None]
+        return max(valores) if valores else None
+
+    @classmethod
+    def from_history(cls, conversation_history: List[Dict[str, Any]], janela: int = JANELA_MENSAGENS) -> 'LeadFeatureState':
+        """Semeia o estado a partir do histórico recente (usado só na primeira vez)"""
+        state = cls(janela)
+        recentes = [item.get('mensagem_cliente', '') for item in (conversation_history or [])[-(janela - 1):]]
+        for msg in recentes:
+            if msg:
+                state.add(msg)
+        return state
+
+
+class LeadStateStore:
+    """Armazena o estado incremental por telefone (LRU com TTL)"""
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: int = 6 * 3600):
+        self._states: 'OrderedDict[str, LeadFeatureState]' = OrderedDict()
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+
+    def get(self, telefone: str) -> Optional[LeadFeatureState]:
+        with self._lock:
+            state = self._states.get(telefone)
+            if state is None:
+                return None
+            if time.time() - state.atualizado_em > self._ttl:
+                self._states.pop(telefone, None)
+                return None
+            self._states.move_to_end(telefone)
+            return state
+
+    def update(self, telefone: str, mensagem: str, conversation_history: List[Dict[str, Any]]) -> LeadFeatureState:
+        """
+        Aplica a mensagem nova ao estado do telefone. Na primeira vez (ou após
+        expirar) o estado é semeado com o histórico recebido.
+        """
+        state = self.get(telefone)
+        with self._lock:
+            if state is None:
+                state = LeadFeatureState.from_history(conversation_history)
+                self._states[telefone] = state
+                while len(self._states) > self._max_entries:
+                    self._states.popitem(last=False)
+            state.add(mensagem)
+        return state
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+
+# Instância global para uso pelo orquestrador
+_lead_state_store = LeadStateStore()
+
+def get_lead_state_store() -> LeadStateStore:
+    """Retorna o armazenamento global de estado dos leads"""
+    return _lead_state_store
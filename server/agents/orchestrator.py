@@ -1,12 +1,16 @@
 # função handle_message
 from . import service, catalog, pedidos, atendimento, qualificacao, marketing
-import json
+import asyncio
 import logging
 from typing import Dict, Any, List, Tuple
 from dataclasses import dataclass
 from ..integrations.openai_client import generate_response
 from ..integrations.supabase_store import fetch_recent_messages_by_telefone
 from ..integrations.google_knowledge import build_context_for_intent
+from .lead_state import LeadFeatureState, LeadStateStore, get_lead_state_store
+from ..tracing import medir, span
+from ..logging_config import log_payload
+from ..recursos import Recursos, get_recursos
 
 # Contexto para agentes
 @dataclass
@@ -18,47 +22,48 @@ class AgentContext:
     
 logger = logging.getLogger("3afrios.orchestrator")
 
-def _bruno_analyze_conversation(message: str, conversation_history: List[Dict], context: Dict) -> Dict[str, Any]:
+def _bruno_analyze_conversation(message: str, conversation_history: List[Dict], context: Dict, phone: str = '', lead_state: LeadStateStore | None = None) -> Dict[str, Any]:
     """
     Bruno Analista Invisível - Qualifica leads silenciosamente em background
     Analisa conversas e gera insights para outros agentes
+
+    Com `phone`, usa o estado incremental do lead (só a mensagem nova é
+    analisada); sem ele, monta um estado temporário a partir do histórico.
     """
     try:
-        # Extrai dados da conversa para análise
-        recent_messages = [item.get('mensagem_cliente', '') for item in conversation_history[-5:]]
-        full_conversation = ' '.join(recent_messages + [message]).lower()
+        if phone:
+            state = (lead_state or get_lead_state_store()).update(phone, message, conversation_history)
+        else:
+            state = LeadFeatureState.from_history(conversation_history)
+            state.add(message)
         
         # === ANÁLISE DE PERFIL DO CLIENTE ===
         
         # Detecta segmento
         segmento = 'pessoa_fisica'  # default
-        if any(word in full_conversation for word in ['empresa', 'restaurante', 'cnpj', 'corporativo']):
+        if state.has('segmento_pj'):
             segmento = 'pessoa_juridica'
-        elif any(word in full_conversation for word in ['casamento', 'festa', 'evento', 'formatura']):
+        elif state.has('segmento_evento'):
             segmento = 'evento_especial'
         
         # Detecta urgência
         urgencia = 'baixa'
-        if any(word in full_conversation for word in ['hoje', 'amanhã', 'urgente', 'rápido']):
+        if state.has('urgencia_alta'):
             urgencia = 'alta'
-        elif any(word in full_conversation for word in ['semana', 'próxima']):
+        elif state.has('urgencia_media'):
             urgencia = 'media'
         
         # Detecta interesse de compra
         interesse_compra = 0
-        if any(word in full_conversation for word in ['quero', 'preciso', 'vou levar', 'comprar']):
+        if state.has('interesse_compra'):
             interesse_compra += 3
-        if any(word in full_conversation for word in ['quanto', 'preço', 'valor', 'custa']):
+        if state.has('interesse_preco'):
             interesse_compra += 2
-        if any(word in full_conversation for word in ['produto', 'catálogo', 'tem']):
+        if state.has('interesse_produto'):
             interesse_compra += 1
             
-        # Detecta quantidade de pessoas
-        pessoas = None
-        import re
-        pessoas_match = re.search(r'(\d+)\s*pessoas?', full_conversation)
-        if pessoas_match:
-            pessoas = int(pessoas_match.group(1))
+        # Detecta quantidade de pessoas (maior valor citado na janela)
+        pessoas = state.pessoas
         
         # === SCORE DO LEAD ===
         lead_score = min(10, interesse_compra)
@@ -383,9 +388,12 @@ class SmartOrchestrator:
             return intent, f"🎯 Roteamento inteligente: {', '.join(matched_terms)}", True
 
 # Atualiza para usar roteamento com confiança, override e normalização de telefone
-async def handle_message(payload: dict) -> dict:
+@medir("handle_message")
+async def handle_message(payload: dict, recursos: Recursos | None = None) -> dict:
     import logging
     logger = logging.getLogger("3afrios.backend")
+    # Container do lifespan (stores, caches, clientes); fora do app, o padrão
+    recursos = recursos or get_recursos()
     
     logger.info("[Orchestrator] Iniciando processamento de mensagem")
     acao = payload.get('acao', 'desconhecida')
@@ -399,7 +407,7 @@ async def handle_message(payload: dict) -> dict:
     cliente_id_raw = payload.get('clienteId')  # novo: id do cliente vindo do Dashboard
     dry_run = bool(payload.get('dryRun'))
     
-    logger.debug(f"[Orchestrator] Dados recebidos: acao={acao} telefone={telefone_raw} msg_len={len(mensagem)}")
+    logger.debug("[Orchestrator] Dados recebidos: acao=%s telefone=%s msg_len=%d", acao, telefone_raw, len(mensagem))
 
     telefone_normalizado = ''.join(ch for ch in str(telefone_raw) if ch.isdigit())
     historico = await fetch_recent_messages_by_telefone(telefone_normalizado or telefone_raw, limit=6)
@@ -458,14 +466,19 @@ async def handle_message(payload: dict) -> dict:
     }
     agent_mod = mapping.get(agente_responsavel, atendimento)
 
-    # NOVO: contexto do Google para o agente
-    contexto_google = build_context_for_intent(agente_responsavel)
+    # NOVO: contexto do Google para o agente (rede/SDK bloqueantes: fora do event loop)
+    with span("build_context", agent=agente_responsavel):
+        contexto_google = await asyncio.to_thread(build_context_for_intent, agente_responsavel, recursos.google)
 
     # === BRUNO ANALISTA INVISÍVEL ===
     # Análise silenciosa em background para qualificar leads
     bruno_insights = None
     try:
-        bruno_insights = _bruno_analyze_conversation(mensagem, historico, contexto_google)
+        with span("bruno_analysis"):
+            bruno_insights = _bruno_analyze_conversation(
+                mensagem, historico, contexto_google, phone=telefone_normalizado or str(telefone_raw),
+                lead_state=recursos.lead_state,
+            )
         if bruno_insights:
             # Injeta insights do Bruno no contexto do agente
             contexto_google['bruno_insights'] = bruno_insights
@@ -473,16 +486,30 @@ async def handle_message(payload: dict) -> dict:
     except Exception as e:
         logger.error(f"[Bruno Invisible] Erro na análise: {e}")
 
+    # === CARRINHO PERSISTENTE DO ROBERTO ===
+    carrinho = None
+    if agent_mod is pedidos and not dry_run and (telefone_normalizado or telefone_raw):
+        try:
+            carrinho = await recursos.carrinho.carregar(telefone_normalizado or str(telefone_raw))
+            contexto_google['carrinho'] = carrinho
+        except Exception as e:
+            logger.error(f"[Carrinho] Erro ao carregar carrinho: {e}")
+
     # Passa contexto para o agente
     try:
-        logger.debug(f"[Orchestrator] Chamando agente {agente_responsavel}")
-        logger.debug(f"[Orchestrator] Contexto da conversa: {json.dumps(contexto_curto, ensure_ascii=False)}")
-        svc = agent_mod.respond(mensagem, context=contexto_google)
-        logger.debug(f"[Orchestrator] Resposta do agente: len={len(svc.get('resposta', ''))} acao={svc.get('acao_especial')}")
+        logger.debug("[Orchestrator] Chamando agente %s", agente_responsavel)
+        log_payload(logger, "[Orchestrator] Contexto da conversa", contexto_curto)
+        with span("agent_respond", agent=agente_responsavel):
+            svc = agent_mod.respond(mensagem, context=contexto_google)
+        logger.debug("[Orchestrator] Resposta do agente: len=%d acao=%s", len(svc.get('resposta', '')), svc.get('acao_especial'))
     except Exception as e:
         logger.error(f"[Orchestrator] Erro ao processar resposta do agente: {str(e)}", exc_info=True)
         raise
 
+    # Write-through do carrinho (só quando mudou neste turno)
+    if carrinho is not None and carrinho.alterado:
+        await recursos.carrinho.persistir(carrinho)
+
     # === PROCESSADOR DE CAMPANHAS ===
     # Se agente gerou ação especial, processa automações
     acao_especial = svc.get('acao_especial')
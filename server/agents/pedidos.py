@@ -1,5 +1,9 @@
 from ..integrations.openai_client import generate_response
 from .service import get_service_utils
+from .catalog_index import get_catalog_index
+from .fuzzy_match import get_product_matcher
+from .quantidades import extrair_itens, em_kg
+from .carrinho import Carrinho, EstadoPedido
 from typing import List, Dict, Any, Tuple
 import logging
 import re
@@ -30,17 +34,6 @@ DELIVERY_INFO = {
     'horario_pedidos': 'Segunda a Sexta: 7h às 18h | Sábado: 7h às 12h'
 }
 
-# Estados do processo de pedido
-class EstadoPedido:
-    INICIANDO = "iniciando"
-    COLETANDO_ITENS = "coletando_itens"
-    VALIDANDO_PRODUTOS = "validando_produtos"
-    CALCULANDO_TOTAL = "calculando_total"
-    COLETANDO_ENDERECO = "coletando_endereco"
-    ESCOLHENDO_PAGAMENTO = "escolhendo_pagamento"
-    CONFIRMANDO = "confirmando"
-    FINALIZADO = "finalizado"
-
 logger = logging.getLogger("3afrios.backend")
 
 def _norm(s: str) -> str:
@@ -51,117 +44,76 @@ def _norm(s: str) -> str:
     return s
 
 def _extract_items_from_message(message: str) -> List[Dict[str, Any]]:
-    """Extrai itens e quantidades da mensagem do cliente"""
-    text = _norm(message)
+    """Extrai itens e quantidades da mensagem do cliente (tokenizador compartilhado)"""
     items = []
     
-    # Padrões para detectar quantidades + produtos
-    patterns = [
-        r'(\d+(?:[.,]\d+)?)\s*(kg|quilo|quilos|gramas?|g)\s+(?:de\s+)?([a-záàãâçéêíóôõú\s]+)',
-        r'(\d+(?:[.,]\d+)?)\s*([a-záàãâçéêíóôõú\s]+?)(?:\s+(?:kg|quilo|quilos|gramas?|g))?',
-        r'(?:quero|preciso|vou levar|me vende)\s+(\d+(?:[.,]\d+)?)\s*(?:kg|quilo|quilos|gramas?|g)?\s*(?:de\s+)?([a-záàãâçéêíóôõú\s]+)',
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            try:
-                if len(match.groups()) == 3:  # quantidade, unidade, produto
-                    quantidade_str, unidade, produto = match.groups()
-                else:  # quantidade, produto
-                    quantidade_str, produto = match.groups()
-                    unidade = 'kg'  # default
-                
-                # Limpa quantidade
-                quantidade = float(quantidade_str.replace(',', '.'))
-                
-                # Limpa produto
-                produto = produto.strip()
-                if len(produto) >= 3:  # produto mínimo 3 chars
-                    items.append({
-                        'produto': produto,
-                        'quantidade': quantidade,
-                        'unidade': unidade,
-                        'preco_unitario': None,
-                        'preco_total': None
-                    })
-            except (ValueError, AttributeError):
-                continue
+    for token in extrair_itens(message):
+        produto = token['produto']
+        if len(produto) < 3:  # produto mínimo 3 chars
+            continue
+        # Gramas viram kg para o preço (tabela é por kg); sem unidade assume kg
+        quantidade, unidade = em_kg(token['quantidade'], token['unidade'] or 'kg')
+        items.append({
+            'produto': produto,
+            'quantidade': quantidade,
+            'unidade': unidade,
+            'preco_unitario': None,
+            'preco_total': None
+        })
     
     return items
 
 def _match_product_in_catalog(item_name: str, catalog_items: List[Dict[str, str]]) -> Dict[str, Any]:
-    """Encontra produto no catálogo com matching inteligente"""
-    item_norm = _norm(item_name)
-    
-    # Busca exata primeiro
-    for catalog_item in catalog_items:
-        desc = _norm(catalog_item.get('descricao', '') or catalog_item.get('produto', ''))
-        if item_norm in desc or desc in item_norm:
-            return {
-                'found': True,
-                'product': catalog_item,
-                'confidence': 'alta',
-                'match_type': 'exata'
+    """Encontra produto no catálogo com matching inteligente (tolerante a erros de digitação)"""
+    return _match_items_in_catalog([item_name], catalog_items)[0]
+
+def _match_items_in_catalog(item_names: List[str], catalog_items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Resolve todos os itens do pedido numa única passada sobre o índice do catálogo"""
+    matcher = get_product_matcher(catalog_items)
+    resultados = []
+    for item_name, resultado in zip(item_names, matcher.match_many(item_names)):
+        if not resultado['found']:
+            resultado = {
+                'found': False,
+                'suggestions': _get_similar_products(item_name, catalog_items, resultado.get('candidates'))
             }
-    
-    # Busca por palavras-chave
-    item_words = set(item_norm.split())
-    best_match = None
-    best_score = 0
-    
-    for catalog_item in catalog_items:
-        desc = _norm(catalog_item.get('descricao', '') or catalog_item.get('produto', ''))
-        desc_words = set(desc.split())
-        
-        # Calcula score de similaridade
-        intersection = item_words.intersection(desc_words)
-        score = len(intersection) / max(len(item_words), len(desc_words))
-        
-        if score > best_score and score > 0.3:  # threshold mínimo
-            best_score = score
-            best_match = catalog_item
-    
-    if best_match:
-        confidence = 'alta' if best_score > 0.7 else 'média' if best_score > 0.5 else 'baixa'
-        return {
-            'found': True,
-            'product': best_match,
-            'confidence': confidence,
-            'match_type': 'similar',
-            'score': best_score
-        }
-    
-    return {
-        'found': False,
-        'suggestions': _get_similar_products(item_name, catalog_items)
-    }
+        resultados.append(resultado)
+    return resultados
+
+# Categorias para sugestão
+CATEGORIAS_SUGESTAO = {
+    'carne': ['picanha', 'alcatra', 'contrafilé', 'maminha', 'patinho'],
+    'frango': ['coxa', 'sobrecoxa', 'peito', 'asa'],
+    'porco': ['pernil', 'costela', 'lombo', 'calabresa', 'linguiça'],
+    'frios': ['presunto', 'mortadela', 'queijo', 'salame']
+}
 
-def _get_similar_products(item_name: str, catalog_items: List[Dict[str, str]]) -> List[str]:
+def _get_similar_products(item_name: str, catalog_items: List[Dict[str, str]],
+                          candidatos: List[Dict[str, str]] | None = None) -> List[str]:
     """Retorna produtos similares baseado na busca"""
     item_norm = _norm(item_name)
     suggestions = []
+    index = get_catalog_index(catalog_items)
+    
+    for categoria, produtos in CATEGORIAS_SUGESTAO.items():
+        if any(_norm(word) in item_norm for word in [categoria] + produtos):
+            # Busca produtos desta categoria no catálogo (via índice)
+            for pos in index.any_term(produtos, range(len(index))):
+                catalog_item = index.items[pos]
+                produto_nome = catalog_item.get('descricao', catalog_item.get('produto', ''))
+                if produto_nome not in suggestions:
+                    suggestions.append(produto_nome)
+                    if len(suggestions) >= 3:
+                        break
+            break
     
-    # Categorias para sugestão
-    categorias = {
-        'carne': ['picanha', 'alcatra', 'contrafilé', 'maminha', 'patinho'],
-        'frango': ['coxa', 'sobrecoxa', 'peito', 'asa'],
-        'porco': ['pernil', 'costela', 'lombo', 'calabresa', 'linguiça'],
-        'frios': ['presunto', 'mortadela', 'queijo', 'salame']
-    }
-    
-    for categoria, produtos in categorias.items():
-        if any(word in item_norm for word in [categoria] + produtos):
-            # Busca produtos desta categoria no catálogo
-            for catalog_item in catalog_items:
-                desc = _norm(catalog_item.get('descricao', ''))
-                if any(p in desc for p in produtos):
-                    produto_nome = catalog_item.get('descricao', catalog_item.get('produto', ''))
-                    if produto_nome not in suggestions:
-                        suggestions.append(produto_nome)
-                        if len(suggestions) >= 3:
-                            break
+    # Sem categoria reconhecida: usa os nomes mais próximos do matcher
+    for catalog_item in candidatos or []:
+        if len(suggestions) >= 3:
             break
+        produto_nome = catalog_item.get('descricao', catalog_item.get('produto', ''))
+        if produto_nome and produto_nome not in suggestions:
+            suggestions.append(produto_nome)
     
     return suggestions[:3]
 
@@ -203,7 +155,7 @@ def _format_order_summary(items: List[Dict[str, Any]], totals: Dict[str, Any]) -
     
     # Itens do pedido
     for i, item in enumerate(items, 1):
-        if item.get('produto_encontrado'):
+        if (item.get('produto_encontrado') or {}).get('found'):
             produto = item['produto_encontrado']['product']
             desc = produto.get('descricao', produto.get('produto', 'Produto'))
             preco_unit = produto.get('preco', 'N/A')
@@ -233,6 +185,151 @@ def _format_order_summary(items: List[Dict[str, Any]], totals: Dict[str, Any]) -
     
     return "\n".join(linhas)
 
+# Formas de pagamento reconhecidas na mensagem (texto normalizado)
+FORMAS_PAGAMENTO = {
+    'pix': 'PIX',
+    'dinheiro': 'Dinheiro na entrega',
+    'cartao': 'Cartão na entrega',
+    'credito': 'Cartão na entrega',
+    'debito': 'Cartão na entrega',
+    'transferencia': 'Transferência bancária',
+}
+
+_CEP_RE = re.compile(r'\b\d{5}-?\d{3}\b')
+
+KW_REMOVER = ['tirar', 'tira ', 'remover', 'remove ', 'retirar', 'retira ', 'excluir', 'exclui ']
+KW_ALTERAR = ['muda ', 'mudar', 'altera ', 'alterar', 'troca ', 'trocar', 'corrige', 'corrigir', 'na verdade']
+KW_CONCLUIR_ITENS = ['so isso', 'e isso', 'mais nada', 'pode prosseguir', 'prosseguir', 'pode fechar']
+KW_RESUMO = ['total', 'quanto fica', 'quanto deu', 'resumo', 'meu carrinho', 'meu pedido']
+# Pedido explícito de somar ao que já está no carrinho ("mais 1kg", "adiciona"); sem isso, repetir o item define a quantidade
+_SOMAR_RE = re.compile(r'\b(?:mais(?! nada)|adiciona\w*|acrescenta\w*)\b')
+
+def _proximo_passo(carrinho: Carrinho) -> str:
+    """Orientação do próximo passo conforme o estado do pedido"""
+    if carrinho.estado == EstadoPedido.COLETANDO_ITENS:
+        return "💬 Quer adicionar mais alguma coisa no carrinho ou posso prosseguir?"
+    if carrinho.estado == EstadoPedido.COLETANDO_ENDERECO:
+        return "📍 Me informe seu CEP para calcular a entrega!"
+    if carrinho.estado == EstadoPedido.ESCOLHENDO_PAGAMENTO:
+        return "💳 Qual a forma de pagamento? PIX, dinheiro ou cartão na entrega, ou transferência."
+    if carrinho.estado == EstadoPedido.CONFIRMANDO:
+        return (f"✅ Entrega no CEP {carrinho.cep} | Pagamento: {carrinho.forma_pagamento}\n"
+                f"Posso confirmar o pedido? Responda *confirmar* para finalizar!")
+    return "💬 Me conte o que você gostaria de pedir!"
+
+def _resumo_carrinho(carrinho: Carrinho) -> str:
+    return _format_order_summary(carrinho.lista_itens(), carrinho.totais())
+
+def _itens_mencionados(carrinho: Carrinho, text_norm: str) -> List[str]:
+    """Itens do carrinho citados na mensagem (por alguma palavra significativa)"""
+    palavras = set(re.findall(r'[a-z0-9]+', text_norm))
+    return [
+        chave for chave in carrinho.itens
+        if any(len(w) >= 4 and w in palavras for w in chave.split())
+    ]
+
+def _responder_carrinho(carrinho: Carrinho, text_norm: str, items_detectados: List[Dict[str, Any]],
+                        is_confirming: bool) -> Dict[str, Any] | None:
+    """
+    Aplica à mensagem as operações sobre um carrinho já existente (remover,
+    alterar quantidade, CEP, pagamento, resumo, confirmação). Retorna None
+    quando a mensagem não é uma operação de carrinho.
+    """
+    if not carrinho.itens:
+        return None
+    acao = '[ACAO:CRIAR_OU_ATUALIZAR_PEDIDO]'
+    
+    # Remover itens
+    if any(k in text_norm for k in KW_REMOVER):
+        removidos = [carrinho.remover(chave) for chave in _itens_mencionados(carrinho, text_norm)]
+        removidos = [r for r in removidos if r]
+        if removidos:
+            nomes = ', '.join(r['produto'] for r in removidos)
+            return {
+                'resposta': f"Pronto! Roberto aqui tirou {nomes} do carrinho. 🗑️\n\n{_resumo_carrinho(carrinho)}\n\n{_proximo_passo(carrinho)}",
+                'acao_especial': acao,
+            }
+    
+    # Alterar quantidade de itens que já estão no carrinho
+    if any(k in text_norm for k in KW_ALTERAR):
+        alterados = []
+        for item in items_detectados:
+            if carrinho.localizar(item['produto']) is not None:
+                alterados.append(carrinho.alterar_quantidade(item['produto'], item['quantidade'], item.get('unidade')))
+        if not alterados:
+            # "muda a picanha para 2kg": produto antes da quantidade
+            mencionados = _itens_mencionados(carrinho, text_norm)
+            quantidades = [em_kg(t['quantidade'], t['unidade'] or 'kg') for t in extrair_itens(text_norm)]
+            if len(mencionados) == 1 and len(quantidades) == 1:
+                alterados.append(carrinho.alterar_quantidade(mencionados[0], *quantidades[0]))
+        if alterados:
+            return {
+                'resposta': f"Feito! Quantidade atualizada no carrinho. ✏️\n\n{_resumo_carrinho(carrinho)}\n\n{_proximo_passo(carrinho)}",
+                'acao_especial': acao,
+            }
+    
+    if items_detectados:
+        return None
+    
+    # CEP para entrega
+    cep_match = _CEP_RE.search(text_norm)
+    if cep_match:
+        validacao = get_service_utils().validar_cep(cep_match.group(0))
+        if validacao.get('valido'):
+            carrinho.definir_cep(validacao['formatado'])
+            return {
+                'resposta': f"Anotado o CEP {validacao['formatado']}! 📍🚚\n\n{_resumo_carrinho(carrinho)}\n\n{_proximo_passo(carrinho)}",
+                'acao_especial': acao,
+            }
+    
+    # Forma de pagamento
+    forma = next((v for k, v in FORMAS_PAGAMENTO.items() if k in text_norm), None)
+    if forma and carrinho.estado in (EstadoPedido.ESCOLHENDO_PAGAMENTO, EstadoPedido.CONFIRMANDO,
+                                     EstadoPedido.COLETANDO_ENDERECO, EstadoPedido.COLETANDO_ITENS):
+        carrinho.definir_pagamento(forma)
+        return {
+            'resposta': f"Perfeito, pagamento via {forma}! 💳\n\n{_resumo_carrinho(carrinho)}\n\n{_proximo_passo(carrinho)}",
+            'acao_especial': acao,
+        }
+    
+    # Confirmação final
+    if is_confirming:
+        if carrinho.finalizar():
+            totais = carrinho.totais()
+            return {
+                'resposta': f"""Pedido confirmado! 🎉 Roberto da 3A Frios agradece!
+
+{_resumo_carrinho(carrinho)}
+
+📍 Entrega: CEP {carrinho.cep}
+💳 Pagamento: {carrinho.forma_pagamento}
+⏰ Prazo: {DELIVERY_INFO['prazo_entrega']}
+
+Total a pagar: {totais['formatado']['total']} 💰""",
+                'acao_especial': '[ACAO:CONFIRMAR_PEDIDO]',
+            }
+        return {
+            'resposta': f"Quase lá! 😊\n\n{_resumo_carrinho(carrinho)}\n\n{_proximo_passo(carrinho)}",
+            'acao_especial': acao,
+        }
+    
+    # Cliente terminou de escolher os itens
+    if any(k in text_norm for k in KW_CONCLUIR_ITENS) and carrinho.estado == EstadoPedido.COLETANDO_ITENS:
+        carrinho.concluir_itens()
+        return {
+            'resposta': f"Combinado! Vamos fechar seu pedido. 📋\n\n{_resumo_carrinho(carrinho)}\n\n{_proximo_passo(carrinho)}",
+            'acao_especial': acao,
+        }
+    
+    # Resumo / total do carrinho
+    if any(k in text_norm for k in KW_RESUMO):
+        return {
+            'resposta': f"Roberto aqui! 📊\n\n{_resumo_carrinho(carrinho)}\n\n{_proximo_passo(carrinho)}",
+            'acao_especial': acao,
+        }
+    
+    return None
+
 def respond(message: str, context: dict | None = None):
     """
     Roberto - Especialista em pedidos da 3A Frios
@@ -288,6 +385,16 @@ def respond(message: str, context: dict | None = None):
     
     # Detecta se tem itens na mensagem
     items_detectados = _extract_items_from_message(message)
+    somar_itens = bool(_SOMAR_RE.search(_norm(message)))
+    
+    # Carrinho do cliente (persistente quando o orquestrador fornece)
+    carrinho = (context or {}).get('carrinho') or Carrinho((context or {}).get('telefone', ''))
+    
+    # === OPERAÇÕES NO CARRINHO EXISTENTE ===
+    resposta_carrinho = _responder_carrinho(carrinho, _norm(message), items_detectados, is_confirming)
+    if resposta_carrinho:
+        logger.info(f"[Pedidos] Roberto atualizou carrinho: estado={carrinho.estado} total={carrinho.total:.2f}")
+        return resposta_carrinho
     
     # === LÓGICA PRINCIPAL DO ROBERTO ===
     
@@ -321,13 +428,17 @@ Me conte: o que você gostaria de pedir hoje?"""
             logger.info(f"[Pedidos] Roberto identificou {len(items_detectados)} itens")
             
             # Processa itens com catálogo
-            carrinho = []
             itens_validados = 0
             itens_nao_encontrados = []
             
-            for item in items_detectados:
+            resultados = (
+                _match_items_in_catalog([item['produto'] for item in items_detectados], catalog_items)
+                if catalog_items else []
+            )
+            
+            for i, item in enumerate(items_detectados):
                 if catalog_items:
-                    resultado = _match_product_in_catalog(item['produto'], catalog_items)
+                    resultado = resultados[i]
                     item['produto_encontrado'] = resultado
                     
                     if resultado['found']:
@@ -338,17 +449,16 @@ Me conte: o que você gostaria de pedir hoje?"""
                         item['preco_unitario'] = preco_unit
                         item['preco_total'] = preco_total
                         itens_validados += 1
+                        carrinho.adicionar(dict(item, produto=produto.get('descricao', produto.get('produto', item['produto']))), somar=somar_itens)
                     else:
                         itens_nao_encontrados.append(item)
-                
-                carrinho.append(item)
             
-            # Calcula totais
-            totals = _calculate_order_total(carrinho)
+            # Totais já mantidos pelo carrinho
+            totals = carrinho.totais()
             
             # Constrói resposta
             if itens_validados > 0:
-                resumo = _format_order_summary(carrinho, totals)
+                resumo = _format_order_summary(carrinho.lista_itens() + itens_nao_encontrados, totals)
                 
                 if itens_nao_encontrados:
                     resposta = f"""Oi! Roberto da 3A Frios aqui! 😊
@@ -0,0 +1,133 @@
+"""
+Extração de Quantidades e Itens - Tokenizador Único
+===================================================
+
+Tokenizador de "quantidade + unidade + produto" compartilhado pelo Roberto
+(`pedidos._extract_items_from_message`) e pelo `ServiceUtils`
+(`extrair_quantidades_texto`).
+
+Uma única expressão pré-compilada percorre o texto normalizado (sem acentos,
+minúsculas) uma só vez, de modo que cada trecho gera no máximo um item (sem
+duplicatas/sobreposições entre padrões). Entende números escritos
+("meio quilo", "dois quilos", "um quilo e meio", "meia dúzia").
+"""
+
+import re
+import unicodedata
+from typing import Dict, Any, List, Optional
+
+# Números por extenso (texto já sem acentos)
+NUMEROS_ESCRITOS: Dict[str, float] = {
+    'meio': 0.5, 'meia': 0.5,
+    'um': 1, 'uma': 1,
+    'dois': 2, 'duas': 2,
+    'tres': 3, 'quatro': 4, 'cinco': 5, 'seis': 6, 'sete': 7,
+    'oito': 8, 'nove': 9, 'dez': 10, 'doze': 12,
+}
+
+# Unidade escrita -> (unidade canônica, fator)
+UNIDADES: Dict[str, tuple] = {
+    'kg': ('kg', 1), 'kgs': ('kg', 1), 'quilo': ('kg', 1), 'quilos': ('kg', 1),
+    'kilo': ('kg', 1), 'kilos': ('kg', 1),
+    'g': ('g', 1), 'gr': ('g', 1), 'grs': ('g', 1), 'grama': ('g', 1), 'gramas': ('g', 1),
+    'unidade': ('unidade', 1), 'unidades': ('unidade', 1), 'un': ('unidade', 1), 'und': ('unidade', 1),
+    'peca': ('unidade', 1), 'pecas': ('unidade', 1),
+    'duzia': ('unidade', 12), 'duzias': ('unidade', 12),
+    'litro': ('litro', 1), 'litros': ('litro', 1), 'l': ('litro', 1),
+    'pacote': ('pacote', 1), 'pacotes': ('pacote', 1),
+    'bandeja': ('bandeja', 1), 'bandejas': ('bandeja', 1),
+}
+
+_ESCRITOS_RE = '|'.join(sorted(NUMEROS_ESCRITOS, key=len, reverse=True))
+_UNIDADES_RE = '|'.join(sorted(UNIDADES, key=len, reverse=True))
+
+# Produto: palavras até vírgula/pontuação, próxima quantidade ("e 1kg", "e meio
+# quilo") ou complementos ("pra amanhã", "por favor")
+_PRODUTO_RE = (
+    rf"[a-z]+(?:\s+(?!(?:e\s+(?:\d|(?:{_ESCRITOS_RE})\b)|pra\b|para\b|por\b))[a-z]+)*"
+)
+
+ITEM_RE = re.compile(
+    rf"""
+    (?:
+        (?<![\w$-])(?<!\$\s)(?<!\d[.,])(?P<num>\d+(?:[.,]\d+)?)\s*(?:(?P<unidade>{_UNIDADES_RE})\b)?
+      |
+        \b(?P<escrito>{_ESCRITOS_RE})\s+(?P<unidade_escrito>{_UNIDADES_RE})\b
+    )
+    (?P<e_meio>\s+e\s+meio\b)?
+    (?:\s+(?:de|do|da|dos|das)\b)?
+    (?:\s*(?P<produto>{_PRODUTO_RE}))?
+    """,
+    re.VERBOSE,
+)
+
+_CONECTIVOS_FINAIS = ('e', 'mais', 'de', 'do', 'da')
+
+# Números sem unidade seguidos destas palavras não são itens ("50 pessoas")
+NAO_PRODUTOS = frozenset({
+    'pessoa', 'pessoas', 'convidado', 'convidados', 'real', 'reais', 'ano', 'anos',
+    'dia', 'dias', 'hora', 'horas', 'h', 'minuto', 'minutos', 'km', 'metro', 'metros',
+    'vez', 'vezes', 'x',
+})
+
+
+def normalizar(s: str) -> str:
+    """Minúsculas e sem acentos (o tokenizador só considera ASCII)"""
+    s = (s or "").strip().lower()
+    if s.isascii():
+        return s
+    return unicodedata.normalize('NFD', s).encode('ascii', 'ignore').decode('ascii')
+
+
+def _limpar_produto(produto: Optional[str]) -> str:
+    palavras = (produto or '').split()
+    while palavras and palavras[-1] in _CONECTIVOS_FINAIS:
+        palavras.pop()
+    return ' '.join(palavras)
+
+
+def extrair_itens(texto: str) -> List[Dict[str, Any]]:
+    """
+    Tokeniza o texto em itens {quantidade, unidade, produto, texto_quantidade,
+    inicio, fim}. `unidade` é canônica (kg, g, unidade, litro, pacote,
+    bandeja) ou None quando o cliente não informou.
+    """
+    text = normalizar(texto)
+    itens = []
+    for m in ITEM_RE.finditer(text):
+        if m.group('num') is not None:
+            quantidade = float(m.group('num').replace(',', '.'))
+            unidade_txt = m.group('unidade')
+        else:
+            quantidade = float(NUMEROS_ESCRITOS[m.group('escrito')])
+            unidade_txt = m.group('unidade_escrito')
+
+        produto = _limpar_produto(m.group('produto'))
+        if not unidade_txt and produto.split(' ', 1)[0] in NAO_PRODUTOS:
+            continue
+
+        unidade, fator = UNIDADES.get(unidade_txt, (None, 1)) if unidade_txt else (None, 1)
+        quantidade *= fator
+        if m.group('e_meio'):
+            quantidade += 0.5 * fator
+
+        fim_qtd = m.end('e_meio') if m.group('e_meio') else (
+            m.end('unidade') if m.group('unidade') else
+            m.end('unidade_escrito') if m.group('unidade_escrito') else m.end('num')
+        )
+        itens.append({
+            'quantidade': quantidade,
+            'unidade': unidade,
+            'produto': produto,
+            'texto_quantidade': text[m.start():fim_qtd],
+            'inicio': m.start(),
+            'fim': m.end(),
+        })
+    return itens
+
+
+def em_kg(quantidade: float, unidade: Optional[str]) -> tuple:
+    """Converte gramas para kg (demais unidades ficam como estão)"""
+    if unidade == 'g':
+        return quantidade / 1000, 'kg'
+    return quantidade, unidade
@@ -19,6 +19,8 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import logging
 
+from .quantidades import extrair_itens, em_kg
+
 logger = logging.getLogger("3afrios.service_utils")
 
 class ServiceUtils:
@@ -205,56 +207,18 @@ class ServiceUtils:
         """
         quantidades = []
         
-        # Padrões para detectar quantidades
-        padroes = [
-            r'(\d+(?:,\d+)?)\s*(?:kg|quilo|quilos)',
-            r'(\d+)\s*(?:g|grama|gramas)',
-            r'(\d+)\s*(?:unidade|unidades|peça|peças)',
-            r'(\d+)\s*(?:litro|litros|l)',
-            r'meio\s+(?:kg|quilo)',
-            r'um\s+(?:kg|quilo)',
-            r'dois\s+(?:kg|quilos)',
-            r'três\s+(?:kg|quilos)'
-        ]
-        
-        texto_lower = texto.lower()
-        
-        for padrao in padroes:
-            matches = re.finditer(padrao, texto_lower)
-            for match in matches:
-                if 'kg' in padrao or 'quilo' in padrao:
-                    if 'meio' in match.group(0):
-                        quantidade = 0.5
-                    elif 'um' in match.group(0):
-                        quantidade = 1.0
-                    elif 'dois' in match.group(0):
-                        quantidade = 2.0
-                    elif 'três' in match.group(0):
-                        quantidade = 3.0
-                    else:
-                        quantidade = float(match.group(1).replace(',', '.'))
-                    
-                    quantidades.append({
-                        "valor": quantidade,
-                        "unidade": "kg",
-                        "texto_original": match.group(0)
-                    })
-                
-                elif 'g' in padrao or 'grama' in padrao:
-                    quantidade = float(match.group(1)) / 1000  # Converter para kg
-                    quantidades.append({
-                        "valor": quantidade,
-                        "unidade": "kg",
-                        "texto_original": match.group(0)
-                    })
-                
-                elif 'unidade' in padrao or 'peça' in padrao:
-                    quantidade = int(match.group(1))
-                    quantidades.append({
-                        "valor": quantidade,
-                        "unidade": "unidade",
-                        "texto_original": match.group(0)
-                    })
+        # Mesmo tokenizador do Roberto; só entram trechos com unidade explícita
+        for token in extrair_itens(texto):
+            if not token['unidade']:
+                continue
+            valor, unidade = em_kg(token['quantidade'], token['unidade'])
+            if unidade == 'unidade':
+                valor = int(valor)
+            quantidades.append({
+                "valor": valor,
+                "unidade": unidade,
+                "texto_original": token['texto_quantidade']
+            })
         
         return quantidades
 
@@ -14,27 +14,13 @@ import logging
 import json
 
 # Importações locais
-try:
-    from ..integrations.supabase_store import get_supabase_client
-except ImportError:
-    # Fallback se não conseguir importar
-    def get_supabase_client():
-        class MockClient:
-            def table(self, name):
-                return type('MockTable', (), {
-                    'select': lambda *a: type('MockQuery', (), {
-                        'execute': lambda: type('MockResult', (), {'data': [], 'count': 0})(),
-                        'eq': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                        'order': lambda *a, **k: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                        'limit': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                    })(),
-                    'insert': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                    'update': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                    'delete': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                })()
-        return MockClient()
-
+from ..integrations.campaign_repository import CLIENTES_TABLE, CampaignRepositoryError, filtros_historico, get_campaign_repository
+from ..integrations.campaign_cache import get_campaign_cache
 from ..integrations.campaign_processor import CampaignAutomation
+from ..integrations.campaign_stats import get_campaign_stats
+from ..integrations.campaign_bulk import filtros_publico, get_campaign_bulk_sender
+from ..integrations.campaign_templates import VARIAVEIS_DISPONIVEIS, TemplateInvalido, validar_template
+from ..config import CAMPAIGN_SCHEDULER_ENABLED
 
 logger = logging.getLogger("3afrios.api.campaigns")
 router = APIRouter()
@@ -82,6 +68,20 @@ class CampaignTest(BaseModel):
     variaveis: Dict[str, str] = {}
     dry_run: bool = True
 
+class CampaignBulkSend(BaseModel):
+    """Disparo de campanha para um segmento de clientes"""
+    tipo_campanha: str
+    template_id: Optional[str] = None
+    lead_status: Optional[List[str]] = None
+    lead_score_min: Optional[int] = None
+    lead_score_max: Optional[int] = None
+    segmento: Optional[str] = None
+    ultima_interacao_desde: Optional[str] = None
+    ultima_interacao_ate: Optional[str] = None
+    variaveis: Dict[str, str] = {}
+    limite: Optional[int] = Field(None, ge=1)
+    dry_run: bool = False
+
 class CampaignHistoryFilter(BaseModel):
     """Filtros para histórico de campanhas"""
     data_inicio: Optional[date] = None
@@ -110,11 +110,11 @@ async def get_campaign_configs():
     Busca as configurações atuais de automação de campanhas
     """
     try:
-        supabase = get_supabase_client()
+        repo = get_campaign_repository()
         
-        result = supabase.table("configuracoes_campanhas").select("*").execute()
+        config = await repo.get_config()
         
-        if not result.data:
+        if not config:
             # Retorna configuração padrão se não existir
             return {
                 "automacao_ativa": False,
@@ -126,7 +126,6 @@ async def get_campaign_configs():
                 }
             }
         
-        config = result.data[0]
         return {
             "id": config["id"],
             "automacao_ativa": config["automacao_ativa"],
@@ -145,10 +144,7 @@ async def save_campaign_configs(config: CampaignConfig):
     Salva as configurações de automação de campanhas
     """
     try:
-        supabase = get_supabase_client()
-        
-        # Verifica se já existe configuração
-        existing = supabase.table("configuracoes_campanhas").select("id").execute()
+        repo = get_campaign_repository()
         
         config_data = {
             "automacao_ativa": config.automacao_ativa,
@@ -157,16 +153,13 @@ async def save_campaign_configs(config: CampaignConfig):
             "updated_at": datetime.now().isoformat()
         }
         
-        if existing.data:
-            # Atualiza configuração existente
-            result = supabase.table("configuracoes_campanhas").update(config_data).eq("id", existing.data[0]["id"]).execute()
-        else:
-            # Cria nova configuração
-            result = supabase.table("configuracoes_campanhas").insert(config_data).execute()
+        # Atualiza a configuração existente ou cria a primeira
+        saved = await repo.save_config(config_data)
+        get_campaign_cache().invalidate()
         
-        if result.data:
+        if saved:
             logger.info(f"Configurações salvas: automacao_ativa={config.automacao_ativa}")
-            return {"ok": True, "message": "Configurações salvas com sucesso", "data": result.data[0]}
+            return {"ok": True, "message": "Configurações salvas com sucesso", "data": saved}
         else:
             raise HTTPException(status_code=400, detail="Erro ao salvar configurações")
             
@@ -187,18 +180,9 @@ async def get_campaign_templates(
     Lista todos os templates de campanha disponíveis
     """
     try:
-        supabase = get_supabase_client()
-        
-        query = supabase.table("templates_campanhas").select("*")
+        repo = get_campaign_repository()
         
-        if tipo:
-            query = query.eq("tipo", tipo)
-        if ativo is not None:
-            query = query.eq("ativo", ativo)
-            
-        result = query.order("tipo", "nome").execute()
-        
-        return result.data or []
+        return await repo.list_templates(tipo=tipo, ativo=ativo)
         
     except Exception as e:
         logger.error(f"Erro ao buscar templates: {e}")
@@ -210,21 +194,27 @@ async def create_campaign_template(template: CampaignTemplate):
     Cria um novo template de campanha
     """
     try:
-        supabase = get_supabase_client()
+        validar_template(template.template_titulo, template.template_conteudo)
+    except TemplateInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        repo = get_campaign_repository()
         
         # Se está marcando como padrão, remove o padrão anterior do mesmo tipo
         if template.template_padrao:
-            supabase.table("templates_campanhas").update({"template_padrao": False}).eq("tipo", template.tipo).eq("template_padrao", True).execute()
+            await repo.clear_default_template(template.tipo)
         
         template_data = template.dict()
         template_data["created_at"] = datetime.now().isoformat()
         template_data["updated_at"] = datetime.now().isoformat()
         
-        result = supabase.table("templates_campanhas").insert(template_data).execute()
+        created = await repo.create_template(template_data)
+        get_campaign_cache().invalidate()
         
-        if result.data:
+        if created:
             logger.info(f"Template criado: {template.nome} ({template.tipo})")
-            return {"ok": True, "message": "Template criado com sucesso", "data": result.data[0]}
+            return {"ok": True, "message": "Template criado com sucesso", "data": created}
         else:
             raise HTTPException(status_code=400, detail="Erro ao criar template")
             
@@ -238,14 +228,22 @@ async def update_campaign_template(template_id: str, template_update: CampaignTe
     Atualiza um template de campanha existente
     """
     try:
-        supabase = get_supabase_client()
+        repo = get_campaign_repository()
         
         # Busca template atual para validações
-        current = supabase.table("templates_campanhas").select("*").eq("id", template_id).execute()
-        if not current.data:
+        current_template = await repo.get_template(template_id)
+        if not current_template:
             raise HTTPException(status_code=404, detail="Template não encontrado")
         
-        current_template = current.data[0]
+        # Valida os placeholders do texto resultante antes de gravar
+        if template_update.template_titulo is not None or template_update.template_conteudo is not None:
+            try:
+                validar_template(
+                    template_update.template_titulo if template_update.template_titulo is not None else current_template.get("template_titulo"),
+                    template_update.template_conteudo if template_update.template_conteudo is not None else current_template.get("template_conteudo"),
+                )
+            except TemplateInvalido as e:
+                raise HTTPException(status_code=400, detail=str(e))
         
         # Prepara dados para atualização (apenas campos não-None)
         update_data = {k: v for k, v in template_update.dict().items() if v is not None}
@@ -253,16 +251,19 @@ async def update_campaign_template(template_id: str, template_update: CampaignTe
         
         # Se está marcando como padrão, remove o padrão anterior do mesmo tipo
         if template_update.template_padrao:
-            supabase.table("templates_campanhas").update({"template_padrao": False}).eq("tipo", current_template["tipo"]).eq("template_padrao", True).execute()
+            await repo.clear_default_template(current_template["tipo"])
         
-        result = supabase.table("templates_campanhas").update(update_data).eq("id", template_id).execute()
+        updated = await repo.update_template(template_id, update_data)
+        get_campaign_cache().invalidate()
         
-        if result.data:
+        if updated:
             logger.info(f"Template atualizado: {template_id}")
-            return {"ok": True, "message": "Template atualizado com sucesso", "data": result.data[0]}
+            return {"ok": True, "message": "Template atualizado com sucesso", "data": updated}
         else:
             raise HTTPException(status_code=400, detail="Erro ao atualizar template")
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao atualizar template: {e}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
@@ -273,17 +274,16 @@ async def delete_campaign_template(template_id: str):
     Remove um template de campanha
     """
     try:
-        supabase = get_supabase_client()
+        repo = get_campaign_repository()
         
         # Verifica se template existe
-        existing = supabase.table("templates_campanhas").select("nome, tipo").eq("id", template_id).execute()
-        if not existing.data:
+        template_info = await repo.get_template(template_id)
+        if not template_info:
             raise HTTPException(status_code=404, detail="Template não encontrado")
         
-        template_info = existing.data[0]
-        
         # Remove template
-        result = supabase.table("templates_campanhas").delete().eq("id", template_id).execute()
+        await repo.delete_template(template_id)
+        get_campaign_cache().invalidate()
         
         logger.info(f"Template removido: {template_info['nome']} ({template_info['tipo']})")
         return {"ok": True, "message": "Template removido com sucesso"}
@@ -305,19 +305,14 @@ async def test_campaign(
     Testa o envio de uma campanha para um cliente específico
     """
     try:
-        supabase = get_supabase_client()
+        repo = get_campaign_repository()
         
         # Busca template se especificado
-        template = None
         if test_data.template_id:
-            template_result = supabase.table("templates_campanhas").select("*").eq("id", test_data.template_id).execute()
-            if template_result.data:
-                template = template_result.data[0]
+            template = await repo.get_template(test_data.template_id)
         else:
             # Busca template padrão para o tipo
-            template_result = supabase.table("templates_campanhas").select("*").eq("tipo", test_data.tipo_campanha).eq("template_padrao", True).execute()
-            if template_result.data:
-                template = template_result.data[0]
+            template = await repo.find_template(test_data.tipo_campanha, padrao=True, ativo=None)
         
         if not template:
             raise HTTPException(status_code=404, detail=f"Template não encontrado para tipo: {test_data.tipo_campanha}")
@@ -344,6 +339,99 @@ async def test_campaign(
         logger.error(f"Erro no teste de campanha: {e}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
+# ===================================
+# ENDPOINTS - DISPAROS EM MASSA
+# ===================================
+
+@router.post("/disparos", response_model=Dict[str, Any])
+async def start_bulk_campaign(disparo: CampaignBulkSend):
+    """
+    Inicia um disparo para o segmento filtrado. Responde na hora; o público
+    é resolvido e enfileirado em background (enviado pelo agendador).
+    """
+    try:
+        filtros = filtros_publico(
+            lead_status=disparo.lead_status,
+            lead_score_min=disparo.lead_score_min,
+            lead_score_max=disparo.lead_score_max,
+            segmento=disparo.segmento,
+            ultima_interacao_desde=disparo.ultima_interacao_desde,
+            ultima_interacao_ate=disparo.ultima_interacao_ate,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        # Filtro por última interação usa last_message_at, criada por
+        # migrations/leads_resumo.sql: sem ela o disparo só falharia em background
+        if disparo.ultima_interacao_desde or disparo.ultima_interacao_ate:
+            try:
+                await get_campaign_repository().select(CLIENTES_TABLE, {"select": "last_message_at", "limit": "1"})
+            except CampaignRepositoryError as e:
+                if e.status_code != 400:
+                    raise
+                raise HTTPException(
+                    status_code=400,
+                    detail="Filtro por última interação requer a coluna clientes_delivery.last_message_at (execute migrations/leads_resumo.sql)",
+                )
+        
+        template = await get_campaign_cache().template_para(disparo.tipo_campanha, disparo.template_id)
+        if not template:
+            raise HTTPException(status_code=404, detail=f"Template não encontrado para tipo: {disparo.tipo_campanha}")
+        
+        # Template salvo antes da validação pode ter variáveis desconhecidas
+        try:
+            validar_template(template.get("template_titulo"), template.get("template_conteudo"))
+        except TemplateInvalido as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        sender = get_campaign_bulk_sender()
+        execucao = sender.iniciar(
+            disparo.tipo_campanha,
+            template,
+            filtros,
+            variaveis=disparo.variaveis,
+            limite=disparo.limite,
+            dry_run=disparo.dry_run,
+        )
+        
+        if not CAMPAIGN_SCHEDULER_ENABLED and not disparo.dry_run:
+            logger.warning(f"Disparo {execucao.id} enfileirado com CAMPAIGN_SCHEDULER_ENABLED desligado neste processo")
+        
+        return {"ok": True, "agendador_ativo": CAMPAIGN_SCHEDULER_ENABLED, "disparo": execucao.to_dict()}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao iniciar disparo: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+@router.get("/disparos/{disparo_id}", response_model=Dict[str, Any])
+async def get_bulk_campaign_progress(disparo_id: str):
+    """
+    Progresso do disparo: fase do enfileiramento (memória deste processo) e
+    contagem por status das mensagens já enfileiradas
+    """
+    try:
+        sender = get_campaign_bulk_sender()
+        execucao = sender.get(disparo_id)
+        envios = await sender.status_envios(disparo_id)
+        
+        if execucao is None and not any(envios.values()):
+            raise HTTPException(status_code=404, detail="Disparo não encontrado")
+        
+        return {
+            "ok": True,
+            "disparo": execucao.to_dict() if execucao else {"id": disparo_id},
+            "envios": envios,
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao buscar progresso do disparo: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
 # ===================================
 # ENDPOINTS - HISTÓRICO
 # ===================================
@@ -355,58 +443,43 @@ async def get_campaign_history(
     tipo_campanha: Optional[str] = Query(None, description="Tipo de campanha"),
     cliente_telefone: Optional[str] = Query(None, description="Telefone do cliente"),
     status: Optional[str] = Query(None, description="Status da campanha"),
-    limit: int = Query(50, description="Limite de resultados"),
-    offset: int = Query(0, description="Offset para paginação")
+    limit: int = Query(50, ge=1, le=500, description="Limite de resultados"),
+    offset: int = Query(0, ge=0, description="Offset para paginação (prefira cursor)"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (pagination.next_cursor)"),
+    contagem: str = Query("cache", description="Total: exata, estimada, cache ou nenhuma")
 ):
     """
-    Busca histórico de campanhas enviadas com filtros
+    Busca histórico de campanhas enviadas com filtros (paginação por cursor
+    em enviado_em, id)
     """
+    if contagem not in ("exata", "estimada", "cache", "nenhuma"):
+        raise HTTPException(status_code=400, detail="contagem deve ser exata, estimada, cache ou nenhuma")
+    
     try:
-        supabase = get_supabase_client()
-        
-        query = supabase.table("historico_campanhas").select("*")
-        
-        # Aplica filtros
-        if data_inicio:
-            query = query.gte("enviado_em", f"{data_inicio}T00:00:00")
-        if data_fim:
-            query = query.lte("enviado_em", f"{data_fim}T23:59:59")
-        if tipo_campanha:
-            query = query.eq("tipo_campanha", tipo_campanha)
-        if cliente_telefone:
-            query = query.eq("cliente_telefone", cliente_telefone)
-        if status:
-            query = query.eq("status", status)
-        
-        # Aplica paginação e ordenação
-        result = query.order("enviado_em", desc=True).limit(limit).offset(offset).execute()
-        
-        # Busca total de registros para paginação
-        count_query = supabase.table("historico_campanhas").select("id", count="exact")
-        if data_inicio:
-            count_query = count_query.gte("enviado_em", f"{data_inicio}T00:00:00")
-        if data_fim:
-            count_query = count_query.lte("enviado_em", f"{data_fim}T23:59:59")
-        if tipo_campanha:
-            count_query = count_query.eq("tipo_campanha", tipo_campanha)
-        if cliente_telefone:
-            count_query = count_query.eq("cliente_telefone", cliente_telefone)
-        if status:
-            count_query = count_query.eq("status", status)
-            
-        count_result = count_query.execute()
-        total_count = count_result.count if hasattr(count_result, 'count') else len(result.data)
+        repo = get_campaign_repository()
+        
+        filtros = filtros_historico(data_inicio, data_fim, tipo_campanha, cliente_telefone, status)
+        
+        try:
+            pagina = await repo.pagina_historico(
+                filtros, limit=limit, cursor=cursor, offset=offset, contagem=contagem
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
-            "data": result.data or [],
+            "data": pagina["data"],
             "pagination": {
-                "total": total_count,
+                "total": pagina["total"],
                 "limit": limit,
-                "offset": offset,
-                "has_more": (offset + limit) < total_count
+                "offset": 0 if cursor else offset,
+                "has_more": pagina["has_more"],
+                "next_cursor": pagina["next_cursor"]
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar histórico: {e}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
@@ -420,103 +493,58 @@ async def get_campaign_statistics(
     Busca estatísticas das campanhas enviadas
     """
     try:
-        supabase = get_supabase_client()
-        
-        # Constrói filtros de data
-        date_filter = ""
-        if data_inicio and data_fim:
-            date_filter = f"AND enviado_em BETWEEN '{data_inicio}T00:00:00' AND '{data_fim}T23:59:59'"
-        elif data_inicio:
-            date_filter = f"AND enviado_em >= '{data_inicio}T00:00:00'"
-        elif data_fim:
-            date_filter = f"AND enviado_em <= '{data_fim}T23:59:59'"
-        
-        # Query para estatísticas gerais
-        stats_query = f"""
-        SELECT 
-            COUNT(*) as total_enviadas,
-            COUNT(CASE WHEN status = 'enviado' THEN 1 END) as enviadas_sucesso,
-            COUNT(CASE WHEN status = 'falhado' THEN 1 END) as falhadas,
-            COUNT(CASE WHEN aberto = true THEN 1 END) as abertas,
-            COUNT(CASE WHEN respondido = true THEN 1 END) as respondidas,
-            COUNT(CASE WHEN converteu = true THEN 1 END) as convertidas,
-            SUM(CASE WHEN valor_conversao IS NOT NULL THEN valor_conversao ELSE 0 END) as valor_total_conversoes
-        FROM historico_campanhas 
-        WHERE 1=1 {date_filter}
-        """
-        
-        # Query para estatísticas por tipo
-        tipos_query = f"""
-        SELECT 
-            tipo_campanha,
-            COUNT(*) as total,
-            COUNT(CASE WHEN status = 'enviado' THEN 1 END) as enviadas,
-            COUNT(CASE WHEN converteu = true THEN 1 END) as convertidas
-        FROM historico_campanhas 
-        WHERE 1=1 {date_filter}
-        GROUP BY tipo_campanha
-        ORDER BY total DESC
-        """
-        
-        # Executa queries (usando rpc se disponível, senão busca dados e processa)
-        try:
-            # Tenta usar função SQL personalizada
-            stats_result = supabase.rpc('get_campaign_stats', {'start_date': data_inicio, 'end_date': data_fim}).execute()
-            tipos_result = supabase.rpc('get_campaign_stats_by_type', {'start_date': data_inicio, 'end_date': data_fim}).execute()
-            
-            return {
-                "estatisticas_gerais": stats_result.data[0] if stats_result.data else {},
-                "estatisticas_por_tipo": tipos_result.data or []
-            }
-        except:
-            # Fallback: busca todos os dados e processa localmente
-            query = supabase.table("historico_campanhas").select("*")
-            if data_inicio:
-                query = query.gte("enviado_em", f"{data_inicio}T00:00:00")
-            if data_fim:
-                query = query.lte("enviado_em", f"{data_fim}T23:59:59")
-                
-            result = query.execute()
-            data = result.data or []
-            
-            # Processa estatísticas gerais
-            total_enviadas = len(data)
-            enviadas_sucesso = len([r for r in data if r["status"] == "enviado"])
-            falhadas = len([r for r in data if r["status"] == "falhado"])
-            abertas = len([r for r in data if r.get("aberto")])
-            respondidas = len([r for r in data if r.get("respondido")])
-            convertidas = len([r for r in data if r.get("converteu")])
-            valor_total = sum([r.get("valor_conversao", 0) or 0 for r in data])
-            
-            # Processa estatísticas por tipo
-            tipos_stats = {}
-            for record in data:
-                tipo = record["tipo_campanha"]
-                if tipo not in tipos_stats:
-                    tipos_stats[tipo] = {"total": 0, "enviadas": 0, "convertidas": 0}
-                tipos_stats[tipo]["total"] += 1
-                if record["status"] == "enviado":
-                    tipos_stats[tipo]["enviadas"] += 1
-                if record.get("converteu"):
-                    tipos_stats[tipo]["convertidas"] += 1
-            
-            return {
-                "estatisticas_gerais": {
-                    "total_enviadas": total_enviadas,
-                    "enviadas_sucesso": enviadas_sucesso,
-                    "falhadas": falhadas,
-                    "abertas": abertas,
-                    "respondidas": respondidas,
-                    "convertidas": convertidas,
-                    "valor_total_conversoes": valor_total,
-                    "taxa_sucesso": (enviadas_sucesso / total_enviadas * 100) if total_enviadas > 0 else 0,
-                    "taxa_conversao": (convertidas / enviadas_sucesso * 100) if enviadas_sucesso > 0 else 0
-                },
-                "estatisticas_por_tipo": [
-                    {"tipo_campanha": tipo, **stats} 
-                    for tipo, stats in tipos_stats.items()
-                ]
-            }
+        repo = get_campaign_repository()
+        
+        # Rollup diário por tipo (migrations/campanhas_estatisticas.sql)
+        resultado = await get_campaign_stats().estatisticas(data_inicio, data_fim)
+        if resultado is not None:
+            return resultado
+        
+        # Fallback sem o rollup instalado: busca o período e processa localmente
+        filtros = filtros_historico(data_inicio, data_fim)
+        
+        data, _ = await repo.select_historico(
+            filtros, select="tipo_campanha,status,aberto,respondido,converteu,valor_conversao"
+        )
+        
+        # Processa estatísticas gerais
+        total_enviadas = len(data)
+        enviadas_sucesso = len([r for r in data if r["status"] == "enviado"])
+        falhadas = len([r for r in data if r["status"] == "falhado"])
+        abertas = len([r for r in data if r.get("aberto")])
+        respondidas = len([r for r in data if r.get("respondido")])
+        convertidas = len([r for r in data if r.get("converteu")])
+        valor_total = sum([r.get("valor_conversao", 0) or 0 for r in data])
+        
+        # Processa estatísticas por tipo
+        tipos_stats = {}
+        for record in data:
+            tipo = record["tipo_campanha"]
+            if tipo not in tipos_stats:
+                tipos_stats[tipo] = {"total": 0, "enviadas": 0, "convertidas": 0}
+            tipos_stats[tipo]["total"] += 1
+            if record["status"] == "enviado":
+                tipos_stats[tipo]["enviadas"] += 1
+            if record.get("converteu"):
+                tipos_stats[tipo]["convertidas"] += 1
+        
+        return {
+            "estatisticas_gerais": {
+                "total_enviadas": total_enviadas,
+                "enviadas_sucesso": enviadas_sucesso,
+                "falhadas": falhadas,
+                "abertas": abertas,
+                "respondidas": respondidas,
+                "convertidas": convertidas,
+                "valor_total_conversoes": valor_total,
+                "taxa_sucesso": (enviadas_sucesso / total_enviadas * 100) if total_enviadas > 0 else 0,
+                "taxa_conversao": (convertidas / enviadas_sucesso * 100) if enviadas_sucesso > 0 else 0
+            },
+            "estatisticas_por_tipo": [
+                {"tipo_campanha": tipo, **stats} 
+                for tipo, stats in tipos_stats.items()
+            ]
+        }
         
     except Exception as e:
         logger.error(f"Erro ao buscar estatísticas: {e}")
@@ -548,29 +576,7 @@ async def get_template_variables():
     """
     Lista todas as variáveis disponíveis para templates
     """
-    variaveis = {
-        "cliente": [
-            "nome_cliente", "telefone_cliente", "email_cliente", 
-            "endereco_cliente", "cidade_cliente"
-        ],
-        "produto": [
-            "produto_interesse", "categoria_produto", "preco_produto",
-            "descricao_produto", "disponibilidade_produto"
-        ],
-        "oferta": [
-            "valor_oferta", "percentual_desconto", "valor_desconto",
-            "condicoes_oferta", "validade_oferta"
-        ],
-        "entrega": [
-            "prazo_entrega", "data_entrega", "taxa_entrega",
-            "endereco_entrega", "horario_entrega"
-        ],
-        "empresa": [
-            "nome_empresa", "telefone_empresa", "endereco_empresa",
-            "horario_funcionamento", "site_empresa"
-        ]
-    }
-    return variaveis
+    return VARIAVEIS_DISPONIVEIS
 
 # ===================================
 # HEALTH CHECK
@@ -583,8 +589,7 @@ async def campaigns_health():
     """
     try:
         # Testa conexão com Supabase
-        supabase = get_supabase_client()
-        supabase.table("configuracoes_campanhas").select("id").limit(1).execute()
+        await get_campaign_repository().ping()
         
         return {"status": "ok", "service": "campaigns_api", "timestamp": datetime.now().isoformat()}
     except Exception as e:
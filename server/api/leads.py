@@ -0,0 +1,66 @@
+"""
+API de Leads - 3A Frios
+=======================
+
+Listagem paginada de leads para o dashboard, com filtros, ordenação e o
+resumo da conversa de cada cliente.
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, Any, List, Optional
+import logging
+
+# Importações locais
+from ..integrations.lead_repository import ORDENACOES, filtros_leads, get_lead_repository
+
+logger = logging.getLogger("3afrios.api.leads")
+router = APIRouter()
+
+# ===================================
+# ENDPOINTS - LEADS
+# ===================================
+
+@router.get("", response_model=Dict[str, Any])
+async def list_leads(
+    busca: Optional[str] = Query(None, description="Trecho do nome ou telefone"),
+    lead_status: Optional[List[str]] = Query(None, description="Status do lead (pode repetir)"),
+    lead_score_min: Optional[int] = Query(None, description="Lead score mínimo"),
+    lead_score_max: Optional[int] = Query(None, description="Lead score máximo"),
+    mensagem_desde: Optional[str] = Query(None, description="Última mensagem a partir de (ISO 8601)"),
+    agente: Optional[str] = Query(None, description="Agente da última mensagem"),
+    ordenar: str = Query("ultima_mensagem", description=f"Ordenação: {', '.join(ORDENACOES)}"),
+    limit: int = Query(50, ge=1, le=500, description="Limite de resultados"),
+    offset: int = Query(0, ge=0, description="Offset para paginação"),
+    cache: bool = Query(True, description="Aceita resposta do cache de curta duração")
+):
+    """
+    Leads com a última mensagem, o agente e o total de mensagens de cada
+    cliente
+    """
+    try:
+        repo = get_lead_repository()
+
+        filtros = filtros_leads(busca, lead_status, lead_score_min, lead_score_max, mensagem_desde, agente)
+
+        try:
+            pagina = await repo.listar(filtros, ordenar=ordenar, limit=limit, offset=offset, usar_cache=cache)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return {
+            "data": pagina["data"],
+            "pagination": {
+                "total": pagina["total"],
+                "limit": limit,
+                "offset": offset,
+                "has_more": pagina["has_more"]
+            },
+            "resumo_conversas": repo.resumo_disponivel,
+            "cache": pagina["cache"]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao listar leads: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
@@ -0,0 +1,323 @@
+"""
+Benchmark de carga ponta a ponta dos webhooks de WhatsApp.
+
+Sobe os serviços externos falsos (`servicos_falsos.py`: Evolution, Supabase,
+Google Docs/Sheets, OpenAI), inicia `server.main:app` num processo uvicorn
+apontado para eles e dispara payloads reais de webhook (Evolution
+`messages.upsert`, Cloud API e WAHA) em `/whatsapp/webhook` a uma taxa alvo
+(carga em malha aberta: os envios não esperam as respostas anteriores).
+
+Relatório: req/s alcançado, latência p50/p95/p99/máx, erros, chamadas aos
+serviços externos por turno e os spans por etapa do próprio backend
+(`GET /metrics?formato=json`).
+
+Uso (na raiz do projeto):
+  python -m server.benchmarks.bench_carga_webhooks --rps 20 --duracao 30
+  python -m server.benchmarks.bench_carga_webhooks --rps 50 --latencia-openai 800 --falha-evolution 0.05
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+from server.benchmarks.servicos_falsos import PerfilServico, ServidoresFalsos
+
+CORPUS_PATH = Path(__file__).with_name("corpus_pedidos.txt")
+
+# Mensagens fora do fluxo de pedido, para passar pelos outros agentes
+MENSAGENS_EXTRAS = [
+    "Oi, bom dia! Quais produtos vocês têm?",
+    "Qual o preço da picanha?",
+    "Vocês entregam no centro?",
+    "Qual o horário de funcionamento?",
+    "Tem alguma promoção essa semana?",
+    "Quero fazer um pedido para minha empresa",
+    "Obrigado, até mais!",
+]
+
+FORMATOS = ("evolution", "cloud_api", "waha")
+
+
+def carregar_mensagens(path: Path = CORPUS_PATH) -> List[str]:
+    linhas = path.read_text(encoding="utf-8").splitlines()
+    return [l.strip() for l in linhas if l.strip() and not l.startswith("#")] + MENSAGENS_EXTRAS
+
+
+# ===================================
+# PAYLOADS
+# ===================================
+
+def payload_evolution(telefone: str, texto: str, event_id: str) -> Dict[str, Any]:
+    return {
+        "event": "messages.upsert",
+        "instance": "bench",
+        "data": {
+            "key": {"remoteJid": f"{telefone}@s.whatsapp.net", "fromMe": False, "id": event_id},
+            "pushName": "Cliente Bench",
+            "message": {"conversation": texto},
+            "messageType": "conversation",
+            "messageTimestamp": int(time.time()),
+        },
+    }
+
+
+def payload_cloud_api(telefone: str, texto: str, event_id: str) -> Dict[str, Any]:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "bench",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"display_phone_number": "5511900000000", "phone_number_id": "bench"},
+                    "contacts": [{"profile": {"name": "Cliente Bench"}, "wa_id": telefone}],
+                    "messages": [{
+                        "from": telefone,
+                        "id": event_id,
+                        "timestamp": str(int(time.time())),
+                        "type": "text",
+                        "text": {"body": texto},
+                    }],
+                },
+            }],
+        }],
+    }
+
+
+def payload_waha(telefone: str, texto: str, event_id: str) -> Dict[str, Any]:
+    return {
+        "typeWebhook": "incomingMessageReceived",
+        "id": event_id,
+        "senderData": {"chatId": f"{telefone}@c.us", "sender": f"{telefone}@c.us", "senderName": "Cliente Bench"},
+        "messageData": {"typeMessage": "textMessage", "textMessageData": {"textMessage": texto}},
+    }
+
+
+GERADORES = {
+    "evolution": payload_evolution,
+    "cloud_api": payload_cloud_api,
+    "waha": payload_waha,
+}
+
+
+def gerar_payloads(total: int, formatos: List[str], telefones: int, mensagens: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    (formato, payload) por requisição. Telefone e texto variam a cada envio
+    (o sufixo evita o dedupe por telefone+texto do backend)
+    """
+    ciclo = itertools.cycle(formatos)
+    saida = []
+    for i in range(total):
+        formato = next(ciclo)
+        telefone = f"55119{(i % telefones):08d}"
+        texto = f"{mensagens[i % len(mensagens)]} #{i}"
+        saida.append((formato, GERADORES[formato](telefone, texto, f"BENCH{i:08d}")))
+    return saida
+
+
+# ===================================
+# BACKEND SOB TESTE
+# ===================================
+
+def iniciar_backend(env_extra: Dict[str, str], porta: int, log_path: Path) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(env_extra)
+    log = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server.main:app", "--host", "127.0.0.1", "--port", str(porta), "--log-level", "warning"],
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def aguardar_backend(base_url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    limite = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as c:
+        while time.monotonic() < limite:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Backend encerrou com código {proc.returncode}")
+            try:
+                if (await c.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Backend não respondeu /health a tempo")
+
+
+# ===================================
+# GERADOR DE CARGA
+# ===================================
+
+def percentil(valores: List[float], q: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, max(0, int(round(q * (len(ordenados) - 1)))))
+    return ordenados[idx]
+
+
+async def disparar(base_url: str, payloads: List[Tuple[str, Dict[str, Any]]], rps: float, timeout: float = 60.0) -> Dict[str, Any]:
+    """Envia cada payload no seu instante agendado (i / rps), sem esperar os anteriores"""
+    latencias: List[float] = []
+    por_formato: Dict[str, List[float]] = {f: [] for f in FORMATOS}
+    status: Counter = Counter()
+    processados = 0
+
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as c:
+        async def _um(formato: str, payload: Dict[str, Any]) -> None:
+            nonlocal processados
+            inicio = time.perf_counter()
+            try:
+                resp = await c.post("/whatsapp/webhook", json=payload)
+                corpo = resp.json() if resp.status_code == 200 else {}
+                chave = str(resp.status_code) if corpo.get("ok") else f"{resp.status_code}/erro"
+                processados += len(corpo.get("processed") or [])
+            except httpx.HTTPError as e:
+                chave = type(e).__name__
+            duracao = time.perf_counter() - inicio
+            status[chave] += 1
+            latencias.append(duracao)
+            por_formato[formato].append(duracao)
+
+        inicio = time.perf_counter()
+        tarefas = []
+        for i, (formato, payload) in enumerate(payloads):
+            atraso = inicio + i / rps - time.perf_counter()
+            if atraso > 0:
+                await asyncio.sleep(atraso)
+            tarefas.append(asyncio.create_task(_um(formato, payload)))
+        await asyncio.gather(*tarefas)
+        duracao_total = time.perf_counter() - inicio
+
+    return {
+        "enviados": len(payloads),
+        "processados": processados,
+        "duracao_s": duracao_total,
+        "latencias": latencias,
+        "por_formato": por_formato,
+        "status": status,
+    }
+
+
+async def coletar_spans(base_url: str) -> Dict[str, Any]:
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=5) as c:
+            resp = await c.get("/metrics", params={"formato": "json"})
+            return resp.json().get("metricas", {}) if resp.status_code == 200 else {}
+    except httpx.HTTPError:
+        return {}
+
+
+# ===================================
+# RELATÓRIO
+# ===================================
+
+def imprimir_relatorio(r: Dict[str, Any], chamadas: Dict[str, Counter], falhas: Dict[str, int], spans: Dict[str, Any], rps_alvo: float) -> None:
+    lat = r["latencias"]
+    turnos = max(r["processados"], 1)
+    print(f"\nEnviados: {r['enviados']} em {r['duracao_s']:.1f}s  (alvo {rps_alvo:.1f} req/s, "
+          f"alcançado {r['enviados'] / r['duracao_s']:.1f} req/s)")
+    print(f"Turnos processados: {r['processados']}   status: {dict(r['status'])}")
+    print(f"Latência (ms): p50={percentil(lat, .5) * 1000:.0f}  p95={percentil(lat, .95) * 1000:.0f}  "
+          f"p99={percentil(lat, .99) * 1000:.0f}  máx={max(lat, default=0) * 1000:.0f}")
+    for formato, valores in r["por_formato"].items():
+        if valores:
+            print(f"  {formato:<10} n={len(valores):<5} p50={percentil(valores, .5) * 1000:.0f}ms  p95={percentil(valores, .95) * 1000:.0f}ms")
+
+    print("\nChamadas externas por turno:")
+    for servico, contagem in chamadas.items():
+        total = sum(contagem.values())
+        print(f"  {servico:<10} {total / turnos:6.2f}/turno  (total {total}, falhas injetadas {falhas.get(servico, 0)})")
+        for rota, n in contagem.most_common(8):
+            print(f"      {rota:<45} {n / turnos:6.2f}")
+
+    etapas = spans.get("tresafrios_stage_duration_seconds") or []
+    if etapas:
+        print("\nEtapas no backend (ms):")
+        for e in sorted(etapas, key=lambda x: -(x.get("p95_ms") or 0)):
+            rotulo = e.get("stage", "") + (f"[{e['agent']}]" if e.get("agent") else "") + ("" if e.get("status") == "ok" else f" ({e.get('status')})")
+            print(f"  {rotulo:<32} n={e['count']:<5} p50={e['p50_ms']}  p95={e['p95_ms']}  p99={e['p99_ms']}")
+
+
+def _perfis(args) -> Dict[str, PerfilServico]:
+    return {
+        nome: PerfilServico(
+            latencia_ms=getattr(args, f"latencia_{nome}"),
+            jitter_ms=getattr(args, f"latencia_{nome}") * args.jitter,
+            taxa_falha=getattr(args, f"falha_{nome}"),
+        )
+        for nome in ("evolution", "supabase", "google", "openai")
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de carga dos webhooks com serviços externos falsos")
+    parser.add_argument("--rps", type=float, default=10.0, help="Taxa alvo de requisições por segundo")
+    parser.add_argument("--duracao", type=float, default=20.0, help="Duração da carga em segundos")
+    parser.add_argument("--aquecimento", type=int, default=10, help="Requisições de aquecimento (fora do relatório)")
+    parser.add_argument("--formatos", default=",".join(FORMATOS), help="Formatos de payload (evolution,cloud_api,waha)")
+    parser.add_argument("--telefones", type=int, default=200, help="Clientes distintos simulados")
+    parser.add_argument("--porta", type=int, default=18080, help="Porta do backend sob teste")
+    parser.add_argument("--porta-falsos", type=int, default=18100, help="Primeira porta dos serviços falsos")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Jitter relativo da latência dos serviços falsos")
+    parser.add_argument("--latencia-evolution", type=float, default=80.0)
+    parser.add_argument("--latencia-supabase", type=float, default=25.0)
+    parser.add_argument("--latencia-google", type=float, default=120.0)
+    parser.add_argument("--latencia-openai", type=float, default=400.0)
+    parser.add_argument("--falha-evolution", type=float, default=0.0)
+    parser.add_argument("--falha-supabase", type=float, default=0.0)
+    parser.add_argument("--falha-google", type=float, default=0.0)
+    parser.add_argument("--falha-openai", type=float, default=0.0)
+    parser.add_argument("--log", default=None, help="Arquivo de log do backend (padrão: temporário)")
+    args = parser.parse_args(argv)
+
+    formatos = [f.strip() for f in args.formatos.split(",") if f.strip()]
+    desconhecidos = [f for f in formatos if f not in GERADORES]
+    if desconhecidos:
+        parser.error(f"Formatos desconhecidos: {', '.join(desconhecidos)}")
+
+    mensagens = carregar_mensagens()
+    total = max(1, int(args.rps * args.duracao))
+    payloads = gerar_payloads(args.aquecimento + total, formatos, args.telefones, mensagens)
+    log_path = Path(args.log) if args.log else Path(tempfile.gettempdir()) / "bench_carga_backend.log"
+
+    with ServidoresFalsos(_perfis(args), porta_base=args.porta_falsos) as falsos:
+        env = falsos.env_backend()
+        env["TRACING_ENABLED"] = "1"
+        proc = iniciar_backend(env, args.porta, log_path)
+        base_url = f"http://127.0.0.1:{args.porta}"
+        try:
+            asyncio.run(aguardar_backend(base_url, proc))
+            if args.aquecimento:
+                asyncio.run(disparar(base_url, payloads[:args.aquecimento], rps=max(args.rps, 1.0)))
+            falsos.zerar()
+            print(f"Backend em {base_url} (log: {log_path}); {total} requisições a {args.rps} req/s, formatos={formatos}")
+            resultado = asyncio.run(disparar(base_url, payloads[args.aquecimento:], rps=args.rps))
+            spans = asyncio.run(coletar_spans(base_url))
+            falhas = {nome: s.falhas for nome, s in falsos.servicos.items()}
+            imprimir_relatorio(resultado, falsos.chamadas(), falhas, spans, args.rps)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
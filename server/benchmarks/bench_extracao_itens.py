@@ -0,0 +1,90 @@
+"""
+Benchmark da extração de itens de pedido.
+
+Compara o tokenizador único (`agents/quantidades.py`) com a versão anterior
+de `_extract_items_from_message` (três regex sobrepostas, recompiladas a cada
+chamada) sobre o corpus de mensagens reais em `corpus_pedidos.txt`.
+
+Uso (na raiz do projeto):
+  python -m server.benchmarks.bench_extracao_itens [repeticoes]
+"""
+
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import List, Dict, Any
+
+from server.agents.pedidos import _extract_items_from_message
+from server.agents.service import ServiceUtils
+
+CORPUS_PATH = Path(__file__).with_name("corpus_pedidos.txt")
+
+
+def carregar_corpus(path: Path = CORPUS_PATH) -> List[str]:
+    linhas = path.read_text(encoding="utf-8").splitlines()
+    return [l.strip() for l in linhas if l.strip() and not l.startswith("#")]
+
+
+def _extract_items_legado(message: str) -> List[Dict[str, Any]]:
+    """Implementação anterior (referência para comparação)"""
+    text = unicodedata.normalize('NFD', (message or "").strip().lower())
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    items = []
+    patterns = [
+        r'(\d+(?:[.,]\d+)?)\s*(kg|quilo|quilos|gramas?|g)\s+(?:de\s+)?([a-záàãâçéêíóôõú\s]+)',
+        r'(\d+(?:[.,]\d+)?)\s*([a-záàãâçéêíóôõú\s]+?)(?:\s+(?:kg|quilo|quilos|gramas?|g))?',
+        r'(?:quero|preciso|vou levar|me vende)\s+(\d+(?:[.,]\d+)?)\s*(?:kg|quilo|quilos|gramas?|g)?\s*(?:de\s+)?([a-záàãâçéêíóôõú\s]+)',
+    ]
+    for pattern in patterns:
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            try:
+                if len(match.groups()) == 3:
+                    quantidade_str, unidade, produto = match.groups()
+                else:
+                    quantidade_str, produto = match.groups()
+                    unidade = 'kg'
+                quantidade = float(quantidade_str.replace(',', '.'))
+                produto = produto.strip()
+                if len(produto) >= 3:
+                    items.append({'produto': produto, 'quantidade': quantidade, 'unidade': unidade})
+            except (ValueError, AttributeError):
+                continue
+    return items
+
+
+def _medir(fn, corpus: List[str], repeticoes: int) -> float:
+    """Tempo médio por mensagem (µs)"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for msg in corpus:
+            fn(msg)
+    return (time.perf_counter() - inicio) / (repeticoes * len(corpus)) * 1e6
+
+
+def run(repeticoes: int = 200) -> Dict[str, Any]:
+    corpus = carregar_corpus()
+    legado = _medir(_extract_items_legado, corpus, repeticoes)
+    atual = _medir(_extract_items_from_message, corpus, repeticoes)
+    service = _medir(ServiceUtils.extrair_quantidades_texto, corpus, repeticoes)
+    itens_legado = sum(len(_extract_items_legado(m)) for m in corpus)
+    itens_atual = sum(len(_extract_items_from_message(m)) for m in corpus)
+    return {
+        "mensagens": len(corpus),
+        "legado_us": legado,
+        "atual_us": atual,
+        "service_us": service,
+        "itens_legado": itens_legado,
+        "itens_atual": itens_atual,
+    }
+
+
+if __name__ == "__main__":
+    rep = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    r = run(rep)
+    print(f"Corpus: {r['mensagens']} mensagens x {rep} repetições")
+    print(f"  legado (3 regex)       : {r['legado_us']:.1f} µs/msg  -> {r['itens_legado']} itens (com duplicatas)")
+    print(f"  tokenizador único      : {r['atual_us']:.1f} µs/msg  -> {r['itens_atual']} itens")
+    print(f"  extrair_quantidades    : {r['service_us']:.1f} µs/msg")
+    print(f"  speedup                : {r['legado_us'] / r['atual_us']:.2f}x")
@@ -0,0 +1,338 @@
+"""
+Micro-benchmarks dos caminhos quentes de CPU, com baseline e limite de regressão.
+
+Casos:
+  - orchestrator._score_intent
+  - orchestrator._bruno_analyze_conversation (estado temporário e incremental)
+  - catalog._get_product_keywords
+  - busca pelo índice invertido num catálogo sintético de 2.000 itens e a
+    obtenção do índice do snapshot (o que cada mensagem paga)
+  - pedidos._extract_items_from_message
+  - webhook_parser.parse_incoming_events (Evolution, Cloud API, WAHA)
+  - normalizacao.normalizar_ptbr (pipeline completo e acerto de cache)
+  - respostas.serializar (+ compactar) do resultado de um turno
+
+Os tempos são comparados em unidades relativas: cada caso é dividido pelo
+tempo de uma carga de calibração fixa medida na mesma execução, então a
+baseline gravada numa máquina continua válida em outra (dentro do ruído).
+Logging fica desligado durante as medições.
+
+Uso (na raiz do projeto):
+  python -m server.benchmarks.bench_hot_paths                 # compara com a baseline
+  python -m server.benchmarks.bench_hot_paths --salvar        # grava nova baseline
+  python -m server.benchmarks.bench_hot_paths --limite 0.15 --casos score_intent,serializar_resposta
+
+Sai com código 1 se algum caso ficar mais lento que baseline * (1 + limite).
+"""
+
+import argparse
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+BASELINE_PATH = Path(__file__).with_name("baseline_hot_paths.json")
+CORPUS_PATH = Path(__file__).with_name("corpus_pedidos.txt")
+LIMITE_PADRAO = 0.25
+
+MENSAGENS_GERAIS = [
+    "Oi, bom dia! Quais produtos vocês têm?",
+    "Qual o preço da picanha e da fraldinha?",
+    "Vocês entregam no centro? Qual o prazo de entrega?",
+    "Tem alguma promoção de frios essa semana?",
+    "Preciso fazer um pedido urgente para o restaurante, somos 80 pessoas",
+    "Quero trocar um produto que veio com problema",
+    "manda o catálogo de carnes por favor",
+    "Obrigado, até mais!",
+]
+
+
+def carregar_mensagens() -> List[str]:
+    linhas = CORPUS_PATH.read_text(encoding="utf-8").splitlines()
+    return [l.strip() for l in linhas if l.strip() and not l.startswith("#")] + MENSAGENS_GERAIS
+
+
+# ===================================
+# DADOS SINTÉTICOS
+# ===================================
+
+CORTES = [
+    "picanha", "fraldinha", "alcatra", "maminha", "contrafilé", "costela", "cupim", "acém",
+    "patinho", "coxão mole", "linguiça toscana", "linguiça calabresa", "bacon", "pernil",
+    "lombo", "frango inteiro", "coxa", "sobrecoxa", "peito de frango", "asa de frango",
+    "queijo mussarela", "queijo prato", "queijo coalho", "presunto", "mortadela", "salame",
+    "peito de peru", "tilápia", "salmão", "camarão",
+]
+MARCAS = ["Friboi", "Seara", "Sadia", "Perdigão", "Aurora", "Swift", "Minerva", "Marfrig", "Tirolez", "Quatá"]
+FORMATOS = ["resfriado", "congelado", "fatiado", "em peça", "temperado", "a vácuo", "bandeja", "granel"]
+
+
+def catalogo_sintetico(n: int = 2000, seed: int = 7) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    itens = []
+    for i in range(n):
+        corte = rng.choice(CORTES)
+        itens.append({
+            "produto": f"{corte.title()} {rng.choice(MARCAS)} {rng.choice(FORMATOS)} {i}",
+            "descricao": f"{corte} {rng.choice(FORMATOS)} - cód. {1000 + i}",
+            "preco": f"{rng.uniform(9, 150):.2f}".replace(".", ","),
+        })
+    return itens
+
+
+def historico_sintetico(n: int = 6) -> List[Dict[str, Any]]:
+    base = [
+        ("Oi, vocês têm picanha?", "Temos sim! Picanha a R$ 79,90/kg."),
+        ("Quanto fica 3kg?", "3kg ficam R$ 239,70."),
+        ("É para um evento da empresa, umas 40 pessoas", "Para 40 pessoas sugerimos 16kg."),
+        ("Preciso para amanhã cedo", "Conseguimos entregar amanhã às 8h."),
+    ]
+    return [
+        {"mensagem_cliente": c, "resposta_bot": b, "agente_responsavel": "Catálogo", "timestamp": f"2025-01-0{1 + i % 9}T10:00:00"}
+        for i, (c, b) in enumerate((base * 3)[:n])
+    ]
+
+
+def payloads_webhook(mensagens: List[str]) -> List[Dict[str, Any]]:
+    from server.benchmarks.bench_carga_webhooks import payload_cloud_api, payload_evolution, payload_waha
+    geradores = (payload_evolution, payload_cloud_api, payload_waha)
+    return [geradores[i % 3](f"55119{i:08d}", m, f"BENCH{i}") for i, m in enumerate(mensagens)]
+
+
+def resultado_turno() -> Dict[str, Any]:
+    """Resultado típico de um turno nos webhooks (com as tentativas da Evolution)"""
+    return {
+        "ok": True,
+        "acao": "receber-mensagem",
+        "dryRun": False,
+        "cliente": {"telefone": "5511999990000", "id": None},
+        "mensagem_cliente": "quero 2kg de picanha e 1kg de fraldinha",
+        "resposta_bot": "Perfeito! Anotei 2kg de Picanha (R$ 159,80) e 1kg de Fraldinha (R$ 49,90).\n\nTotal: R$ 209,70",
+        "agente_responsavel": "Pedidos",
+        "routing": {"intent": "Pedidos", "confidence": 0.8, "matched_terms": ["quero", "picanha"]},
+        "acao_especial": None,
+        "contexto_conversa": [f"C: mensagem {i}" for i in range(6)],
+        "memory_used": True,
+        "bruno_insights": {"lead_score": 7, "segmento": "pessoa_fisica", "sugestoes_agente": ["a", "b", "c"]},
+        "campaign_result": None,
+        "evolution_status": {
+            "sent": True, "variant": "apikey_path_text", "status": 201, "response": {"key": {"id": "X"}},
+            "attempts": [
+                {"variant": f"v{i}", "status_code": 404, "data": {"error": "Not Found", "path": f"/message/sendText/{i}"},
+                 "url": f"http://evolution.local/message/sendText/{i}", "retry": i % 3}
+                for i in range(150)
+            ],
+        },
+        "persistencia_supabase": {"ok": True, "results": [
+            {"endpoint": "/temp_messages", "data": [{"id": i, "mensagem_cliente": "quero 2kg de picanha", "resposta_bot": "Perfeito!"}]}
+            for i in range(10)
+        ]},
+    }
+
+
+# ===================================
+# CASOS
+# ===================================
+
+def _calibracao() -> Callable[[], Any]:
+    """Carga fixa de Python puro (strings, dicts, laços) usada como régua"""
+    palavras = [f"palavra{i}" for i in range(200)]
+
+    def carga():
+        d = {}
+        for p in palavras:
+            d[p.upper()] = len(p.replace("a", "b"))
+        return sum(d.values())
+    return carga
+
+
+def montar_casos() -> Dict[str, Tuple[Callable[[], Any], int]]:
+    """nome -> (função sem argumentos que roda o lote, chamadas por lote)"""
+    from server.agents.orchestrator import _score_intent, _bruno_analyze_conversation
+    from server.agents.catalog import _get_product_keywords, _catalog_index
+    from server.agents.pedidos import _extract_items_from_message
+    from server.integrations.webhook_parser import parse_incoming_events
+    from server.normalizacao import normalizar_ptbr
+    from server.respostas import compactar, serializar
+
+    mensagens = carregar_mensagens()
+    historico = historico_sintetico()
+    catalogo = catalogo_sintetico()
+    consultas = ["picanha friboi", "linguiça toscana", "queijo", "frango congelado", "salmão"]
+    keywords = [_get_product_keywords(c) for c in consultas]
+    indice = _catalog_index(catalogo)
+    payloads = payloads_webhook(mensagens)
+    respostas = [
+        "Perfeito!   Anotei 2kg de Picanha — R$ 159.80\n\n\n\nTotal: R$ 209.70",
+        "Olá!  Temos picanha â R$ 79.90/kg e fraldinha – R$ 49.90/kg.",
+        "Entregamos em 24-48h.\n\n\n\nPosso ajudar em algo mais?",
+    ]
+    turno = resultado_turno()
+    telefones = [f"55119{i:08d}" for i in range(50)]
+
+    def lote(fn, entradas):
+        def _rodar():
+            for e in entradas:
+                fn(e)
+        return _rodar, len(entradas)
+
+    def bruno_temporario():
+        for m in mensagens:
+            _bruno_analyze_conversation(m, historico, {})
+
+    def bruno_incremental():
+        for i, m in enumerate(mensagens):
+            _bruno_analyze_conversation(m, historico, {}, phone=telefones[i % len(telefones)])
+
+    def indice_snapshot():
+        for _ in keywords:
+            _catalog_index(catalogo)
+
+    def match_indice():
+        for kws in keywords:
+            indice.search_items(kws)
+
+    return {
+        "score_intent": lote(_score_intent, mensagens),
+        "bruno_temporario": (bruno_temporario, len(mensagens)),
+        "bruno_incremental": (bruno_incremental, len(mensagens)),
+        "product_keywords": lote(_get_product_keywords, mensagens),
+        "indice_snapshot_2000": (indice_snapshot, len(keywords)),
+        "match_indice_2000": (match_indice, len(keywords)),
+        "extract_items": lote(_extract_items_from_message, mensagens),
+        "parse_incoming_events": lote(parse_incoming_events, payloads),
+        "normalizar_ptbr": lote(normalizar_ptbr.__wrapped__, respostas),
+        "normalizar_ptbr_cache": lote(normalizar_ptbr, respostas),
+        "serializar_resposta": (lambda: serializar(compactar(turno)), 1),
+        "serializar_resposta_debug": (lambda: serializar(turno), 1),
+    }
+
+
+# ===================================
+# MEDIÇÃO
+# ===================================
+
+def _repeticoes(fn: Callable[[], Any], tempo_min: float) -> int:
+    """Quantas execuções do lote somam ao menos `tempo_min` segundos"""
+    fn()  # aquecimento (caches, lazy imports)
+    repeticoes = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            fn()
+        if time.perf_counter() - inicio >= tempo_min:
+            return repeticoes
+        repeticoes *= 2
+
+
+def _rodada(fn: Callable[[], Any], repeticoes: int, chamadas: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - inicio) / (repeticoes * chamadas) * 1e6
+
+
+def medir(fn: Callable[[], Any], chamadas: int, calibracao: Callable[[], Any], rodadas: int,
+          tempo_min: float = 0.03) -> Tuple[float, float]:
+    """(µs por chamada, tempo relativo à calibração)
+
+    Cada rodada mede a calibração logo antes do caso e guarda a razão entre os
+    dois; a mediana das razões resiste bem a máquinas ruidosas (CPU compartilhada,
+    frequência variável), e o µs reportado é o menor observado.
+    """
+    rep_caso = _repeticoes(fn, tempo_min)
+    rep_calib = _repeticoes(calibracao, tempo_min)
+    tempos, razoes = [], []
+    for _ in range(rodadas):
+        calib = _rodada(calibracao, rep_calib, 1)
+        caso = _rodada(fn, rep_caso, chamadas)
+        tempos.append(caso)
+        razoes.append(caso / calib)
+    return min(tempos), statistics.median(razoes)
+
+
+def executar(casos: Optional[List[str]] = None, rodadas: int = 9) -> Dict[str, Any]:
+    logging.disable(logging.CRITICAL)
+    try:
+        todos = montar_casos()
+        selecionados = {k: v for k, v in todos.items() if not casos or k in casos}
+        calibracao = _calibracao()
+        resultados = {}
+        for nome, (fn, chamadas) in selecionados.items():
+            us, relativo = medir(fn, chamadas, calibracao, rodadas)
+            resultados[nome] = {"us": round(us, 3), "relativo": round(relativo, 5)}
+        calibracao_us = min(_rodada(calibracao, _repeticoes(calibracao, 0.03), 1) for _ in range(rodadas))
+    finally:
+        logging.disable(logging.NOTSET)
+    return {
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "calibracao_us": round(calibracao_us, 3),
+        "casos": resultados,
+    }
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], limite: float) -> List[Dict[str, Any]]:
+    linhas = []
+    base_casos = baseline.get("casos", {})
+    for nome, r in atual["casos"].items():
+        base = base_casos.get(nome)
+        razao = r["relativo"] / base["relativo"] if base and base.get("relativo") else None
+        linhas.append({
+            "caso": nome,
+            "us": r["us"],
+            "razao": razao,
+            "regressao": razao is not None and razao > 1 + limite,
+        })
+    return linhas
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos caminhos quentes com baseline")
+    parser.add_argument("--salvar", action="store_true", help="Grava os resultados como nova baseline")
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO, help="Regressão tolerada (0.25 = 25%% mais lento)")
+    parser.add_argument("--rodadas", type=int, default=9, help="Rodadas por caso (mediana das razões)")
+    parser.add_argument("--casos", default="", help="Subconjunto de casos, separados por vírgula")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Arquivo de baseline")
+    args = parser.parse_args(argv)
+
+    casos = [c.strip() for c in args.casos.split(",") if c.strip()] or None
+    atual = executar(casos, rodadas=args.rodadas)
+    baseline_path = Path(args.baseline)
+
+    if args.salvar:
+        if casos and baseline_path.exists():
+            # Atualiza só os casos medidos, mantendo os demais
+            gravada = json.loads(baseline_path.read_text(encoding="utf-8"))
+            gravada.setdefault("casos", {}).update(atual["casos"])
+            gravada.update({k: v for k, v in atual.items() if k != "casos"})
+            atual = gravada
+        baseline_path.write_text(json.dumps(atual, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Baseline gravada em {baseline_path} (calibração {atual['calibracao_us']} µs)")
+        for nome, r in atual["casos"].items():
+            print(f"  {nome:<26} {r['us']:>10.2f} µs")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    if not baseline:
+        print(f"Sem baseline em {baseline_path}; rode com --salvar para criar.")
+    print(f"Calibração: {atual['calibracao_us']} µs (baseline {baseline.get('calibracao_us', '-')} µs); limite +{args.limite:.0%}")
+    regressoes = 0
+    for linha in comparar(atual, baseline, args.limite):
+        razao = f"{linha['razao']:.2f}x" if linha["razao"] is not None else "  -  "
+        marca = "  REGRESSÃO" if linha["regressao"] else ""
+        regressoes += linha["regressao"]
+        print(f"  {linha['caso']:<26} {linha['us']:>10.2f} µs   {razao:>6} vs baseline{marca}")
+    if regressoes:
+        print(f"{regressoes} caso(s) acima do limite de regressão")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Serviços externos falsos para os benchmarks de carga.
+
+Stand-ins locais (HTTP de verdade, via uvicorn) para as APIs que o backend
+chama num turno de conversa:
+
+- Evolution: envio de texto (qualquer POST responde 201);
+- Supabase PostgREST: tabelas em memória com filtros `eq.` e `limit`
+  (suficiente para `supabase_store`, carrinho e campanhas);
+- Google Docs/Sheets: documento de identidade e catálogo fixos
+  (o backend aponta para cá com GOOGLE_API_ENDPOINT);
+- OpenAI: `POST /v1/chat/completions` com uma resposta fixa
+  (o SDK aponta para cá com OPENAI_BASE_URL).
+
+Cada serviço tem latência (com jitter) e taxa de falha configuráveis e conta
+as chamadas recebidas por rota, para o relatório de chamadas por turno.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+CATALOGO = [
+    ["Produto", "Descrição", "Preço"],
+    ["Picanha", "Picanha bovina resfriada (kg)", "79,90"],
+    ["Fraldinha", "Fraldinha bovina (kg)", "49,90"],
+    ["Alcatra", "Alcatra bovina (kg)", "54,90"],
+    ["Linguiça Toscana", "Linguiça toscana (kg)", "24,90"],
+    ["Queijo Mussarela", "Mussarela fatiada (kg)", "44,90"],
+    ["Presunto", "Presunto cozido fatiado (kg)", "34,90"],
+    ["Frango Inteiro", "Frango congelado (kg)", "12,90"],
+    ["Costela", "Costela bovina (kg)", "32,90"],
+]
+
+DOCUMENTO_IDENTIDADE = (
+    "3A Frios - distribuidora de frios e carnes. Atendimento de segunda a sexta "
+    "das 7h às 18h e sábado das 7h às 12h. Entregas em 24-48h."
+)
+
+
+class PerfilServico:
+    """Latência e falhas injetadas em um serviço falso"""
+
+    def __init__(self, latencia_ms: float = 0.0, jitter_ms: float = 0.0, taxa_falha: float = 0.0, status_falha: int = 500):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_falha = taxa_falha
+        self.status_falha = status_falha
+
+    async def aplicar(self, rng: random.Random) -> Optional[Response]:
+        """Espera a latência sorteada; devolve a resposta de erro se a falha for sorteada"""
+        atraso = self.latencia_ms + (rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+        if self.taxa_falha and rng.random() < self.taxa_falha:
+            return JSONResponse({"error": "falha injetada"}, status_code=self.status_falha)
+        return None
+
+
+class ServicoFalso:
+    """Base: app Starlette com contagem de chamadas e perfil de latência/falha"""
+
+    nome = "servico"
+
+    def __init__(self, perfil: Optional[PerfilServico] = None, seed: int = 42):
+        self.perfil = perfil or PerfilServico()
+        self.chamadas: Counter = Counter()
+        self.falhas = 0
+        self._rng = random.Random(seed)
+        self.app = Starlette(routes=[
+            Route("/{caminho:path}", self._entrada, methods=["GET", "POST", "PATCH", "PUT", "DELETE"]),
+        ])
+
+    def rota(self, request: Request) -> str:
+        """Rota usada na contagem (sem ids/telefones, para agrupar)"""
+        return f"{request.method} {request.url.path}"
+
+    async def _entrada(self, request: Request) -> Response:
+        self.chamadas[self.rota(request)] += 1
+        erro = await self.perfil.aplicar(self._rng)
+        if erro is not None:
+            self.falhas += 1
+            return erro
+        return await self.responder(request)
+
+    async def responder(self, request: Request) -> Response:
+        raise NotImplementedError
+
+    @property
+    def total_chamadas(self) -> int:
+        return sum(self.chamadas.values())
+
+    def zerar(self) -> None:
+        self.chamadas.clear()
+        self.falhas = 0
+
+
+class EvolutionFalso(ServicoFalso):
+    nome = "evolution"
+
+    def rota(self, request: Request) -> str:
+        return f"{request.method} /message/sendText"
+
+    async def responder(self, request: Request) -> Response:
+        return JSONResponse({"key": {"id": f"BENCH{time.time_ns()}"}, "status": "PENDING"}, status_code=201)
+
+
+class SupabaseFalso(ServicoFalso):
+    """PostgREST mínimo: tabelas em memória, filtros `eq.` e `limit`"""
+
+    nome = "supabase"
+
+    def __init__(self, perfil: Optional[PerfilServico] = None, seed: int = 42):
+        super().__init__(perfil, seed)
+        self.tabelas: Dict[str, List[Dict[str, Any]]] = {}
+        self._ids = itertools.count(1)
+
+    def rota(self, request: Request) -> str:
+        # /rest/v1/<tabela> ou /rest/v1/rpc/<funcao>
+        return f"{request.method} {request.url.path.replace('/rest/v1', '')}"
+
+    @staticmethod
+    def _filtrar(rows: List[Dict[str, Any]], params) -> List[Dict[str, Any]]:
+        for coluna, valor in params.multi_items():
+            if coluna in ("select", "order", "limit", "offset", "on_conflict") or not valor.startswith("eq."):
+                continue
+            alvo = valor[3:]
+            rows = [r for r in rows if str(r.get(coluna)) == alvo]
+        return rows
+
+    async def responder(self, request: Request) -> Response:
+        partes = request.url.path.replace("/rest/v1/", "", 1).split("/")
+        if partes[0] == "rpc":
+            return JSONResponse([])
+        tabela = self.tabelas.setdefault(partes[0], [])
+
+        if request.method == "GET":
+            rows = self._filtrar(tabela, request.query_params)
+            limite = request.query_params.get("limit")
+            if limite and limite.isdigit():
+                rows = rows[-int(limite):] if request.query_params.get("order", "").endswith("desc") else rows[:int(limite)]
+            headers = {"content-range": f"0-{max(len(rows) - 1, 0)}/{len(rows)}"}
+            return JSONResponse(rows, headers=headers)
+
+        if request.method == "POST":
+            corpo = await request.json()
+            novas = corpo if isinstance(corpo, list) else [corpo]
+            gravadas = []
+            for row in novas:
+                row = dict(row)
+                row.setdefault("id", next(self._ids))
+                tabela.append(row)
+                gravadas.append(row)
+            return JSONResponse(gravadas, status_code=201)
+
+        if request.method == "PATCH":
+            corpo = await request.json()
+            alvo = self._filtrar(tabela, request.query_params)
+            for row in alvo:
+                row.update(corpo)
+            return JSONResponse(alvo)
+
+        if request.method == "DELETE":
+            alvo = self._filtrar(tabela, request.query_params)
+            self.tabelas[partes[0]] = [r for r in tabela if r not in alvo]
+            return Response(status_code=204)
+
+        return JSONResponse([])
+
+
+class GoogleFalso(ServicoFalso):
+    """Docs v1 (documents.get) e Sheets v4 (spreadsheets.get / values.get)"""
+
+    nome = "google"
+
+    def rota(self, request: Request) -> str:
+        caminho = request.url.path
+        if "/values/" in caminho:
+            return f"{request.method} sheets.values.get"
+        if "/spreadsheets/" in caminho:
+            return f"{request.method} sheets.get"
+        if "/documents/" in caminho:
+            return f"{request.method} docs.get"
+        return f"{request.method} {caminho}"
+
+    async def responder(self, request: Request) -> Response:
+        caminho = request.url.path
+        if "/values/" in caminho:
+            return JSONResponse({"range": "Catalogo!A1:Z1000", "majorDimension": "ROWS", "values": CATALOGO})
+        if "/spreadsheets/" in caminho:
+            return JSONResponse({"sheets": [{"properties": {"sheetId": 0, "title": "Catalogo"}}]})
+        if "/documents/" in caminho:
+            return JSONResponse({"body": {"content": [
+                {"paragraph": {"elements": [{"textRun": {"content": DOCUMENTO_IDENTIDADE}}]}}
+            ]}})
+        return JSONResponse({"error": "não encontrado"}, status_code=404)
+
+
+class OpenAIFalso(ServicoFalso):
+    nome = "openai"
+
+    async def responder(self, request: Request) -> Response:
+        corpo = await request.json()
+        conteudo = "Olá! Temos picanha a R$ 79,90/kg e entregamos em 24-48h. Posso ajudar com seu pedido?"
+        # Prompts de classificação esperam JSON curto
+        if "json" in json.dumps(corpo.get("messages", [])[:1], ensure_ascii=False).lower():
+            conteudo = json.dumps({"intent": "Catálogo", "confidence": 0.8})
+        return JSONResponse({
+            "id": f"chatcmpl-bench{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": corpo.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 30, "total_tokens": 130},
+        })
+
+
+class ServidoresFalsos:
+    """
+    Sobe os quatro serviços falsos em portas locais, numa thread com event
+    loop próprio (não disputa o loop do gerador de carga)
+    """
+
+    def __init__(self, perfis: Optional[Dict[str, PerfilServico]] = None, host: str = "127.0.0.1", porta_base: int = 18100):
+        perfis = perfis or {}
+        self.host = host
+        self.servicos: Dict[str, ServicoFalso] = {
+            cls.nome: cls(perfis.get(cls.nome))
+            for cls in (EvolutionFalso, SupabaseFalso, GoogleFalso, OpenAIFalso)
+        }
+        self.portas = {nome: porta_base + i for i, nome in enumerate(self.servicos)}
+        self._servers: List[uvicorn.Server] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def url(self, nome: str) -> str:
+        return f"http://{self.host}:{self.portas[nome]}"
+
+    def env_backend(self) -> Dict[str, str]:
+        """Variáveis de ambiente que apontam o backend para os serviços falsos"""
+        return {
+            "SUPABASE_URL": self.url("supabase"),
+            "SUPABASE_SERVICE_ROLE": "bench",
+            "EVOLUTION_ENABLED": "1",
+            "EVOLUTION_BASE_URL": self.url("evolution"),
+            "EVOLUTION_API_KEY": "bench",
+            "EVOLUTION_INSTANCE_ID": "bench",
+            "EVOLUTION_SEND_TEXT_PATH": "/message/sendText",
+            "OPENAI_ENABLED": "1",
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": f"{self.url('openai')}/v1",
+            "GOOGLE_ENABLED": "1",
+            "GOOGLE_OAUTH_CLIENT_ID": "bench",
+            "GOOGLE_OAUTH_CLIENT_SECRET": "bench",
+            "GOOGLE_DRIVE_TOKEN": json.dumps({"access_token": "bench"}),
+            "GOOGLE_DRIVE_TOKEN_JSON": "/nonexistent/google_token.json",
+            "GOOGLE_API_ENDPOINT": self.url("google"),
+            "GOOGLE_DOC_ID": "doc-bench",
+            "GOOGLE_SHEET_ID": "sheet-bench",
+            "GOOGLE_SHEET_TAB": "Catalogo",
+            "GOOGLE_SHEET_GID": "",
+            "GOOGLE_SHEET_TAB_DESC": "",
+            "GOOGLE_SHEET_GID_DESC": "",
+            "GOOGLE_SHEET_TAB_PRECO": "",
+            "GOOGLE_SHEET_GID_PRECO": "",
+            "CAMPAIGN_SCHEDULER_ENABLED": "0",
+        }
+
+    def iniciar(self, timeout: float = 10.0) -> "ServidoresFalsos":
+        for nome, servico in self.servicos.items():
+            config = uvicorn.Config(servico.app, host=self.host, port=self.portas[nome], log_level="warning", lifespan="off")
+            self._servers.append(uvicorn.Server(config))
+
+        async def _rodar():
+            await asyncio.gather(*(s.serve() for s in self._servers))
+
+        self._thread = threading.Thread(target=lambda: asyncio.run(_rodar()), name="servicos-falsos", daemon=True)
+        self._thread.start()
+        limite = time.monotonic() + timeout
+        while not all(s.started for s in self._servers):
+            if time.monotonic() > limite:
+                raise RuntimeError("Serviços falsos não subiram a tempo")
+            time.sleep(0.05)
+        return self
+
+    def parar(self) -> None:
+        for s in self._servers:
+            s.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def chamadas(self) -> Dict[str, Counter]:
+        return {nome: Counter(s.chamadas) for nome, s in self.servicos.items()}
+
+    def zerar(self) -> None:
+        for s in self.servicos.values():
+            s.zerar()
+
+    def __enter__(self) -> "ServidoresFalsos":
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.parar()
@@ -54,5 +54,46 @@ GOOGLE_SHEET_TAB_PRECO = os.getenv("GOOGLE_SHEET_TAB_PRECO", "")
 GOOGLE_SHEET_GID_PRECO = os.getenv("GOOGLE_SHEET_GID_PRECO", "")
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID", "")
 GOOGLE_DRIVE_TOKEN_JSON = os.getenv("GOOGLE_DRIVE_TOKEN_JSON", "./secrets/google_token.json")
+# Endpoint alternativo para Docs/Sheets (vazio = googleapis.com); usado pelo benchmark de carga
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT", "")
+# Validade do snapshot do Google Doc/planilha (contexto dos agentes) em segundos
+GOOGLE_CACHE_TTL_SECONDS = float(os.getenv("GOOGLE_CACHE_TTL_SECONDS", "300"))
 
-PORT = int(os.getenv("PORT", "7777"))
\ No newline at end of file
+PORT = int(os.getenv("PORT", "7777"))
+
+# Agendador de campanhas programadas (historico_campanhas.status = 'pendente')
+CAMPAIGN_SCHEDULER_ENABLED = _get_bool_env("CAMPAIGN_SCHEDULER_ENABLED", False)
+CAMPAIGN_SCHEDULER_INTERVAL = float(os.getenv("CAMPAIGN_SCHEDULER_INTERVAL", "15"))
+CAMPAIGN_SCHEDULER_BATCH = int(os.getenv("CAMPAIGN_SCHEDULER_BATCH", "20"))
+CAMPAIGN_SEND_RATE_PER_MIN = float(os.getenv("CAMPAIGN_SEND_RATE_PER_MIN", "30"))
+CAMPAIGN_SEND_CONCURRENCY = int(os.getenv("CAMPAIGN_SEND_CONCURRENCY", "3"))
+CAMPAIGN_CLAIM_LEASE_SECONDS = int(os.getenv("CAMPAIGN_CLAIM_LEASE_SECONDS", "600"))
+
+# Cache de configuração/templates de campanhas (invalidado pelos endpoints de edição)
+CAMPAIGN_CACHE_TTL_SECONDS = float(os.getenv("CAMPAIGN_CACHE_TTL_SECONDS", "300"))
+
+# Rollup diário de estatísticas de campanhas: intervalo mínimo entre atualizações incrementais
+CAMPAIGN_STATS_REFRESH_INTERVAL = float(os.getenv("CAMPAIGN_STATS_REFRESH_INTERVAL", "300"))
+
+# Spans por etapa + GET /metrics (desligado = sem custo nos caminhos medidos)
+TRACING_ENABLED = _get_bool_env("TRACING_ENABLED", True)
+
+# Cache das páginas de GET /api/leads
+LEADS_CACHE_TTL_SECONDS = float(os.getenv("LEADS_CACHE_TTL_SECONDS", "10"))
+
+# Carrinho aberto sem alteração há mais que isso é abandonado (não é retomado)
+CARRINHO_EXPIRACAO_HORAS = float(os.getenv("CARRINHO_EXPIRACAO_HORAS", "24"))
+
+# Logging: nível, formato (json|texto), fila assíncrona e amostragem dos dumps de payload
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+LOG_QUEUE_ENABLED = _get_bool_env("LOG_QUEUE_ENABLED", True)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+# Turnos simultâneos por entrega de webhook em lote (mesmo telefone sempre em sequência)
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "8"))
+
+# Ciclo de vida (server/recursos.py): aquecimento no startup e espera no shutdown
+STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "20"))
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "10"))
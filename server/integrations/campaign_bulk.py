@@ -0,0 +1,298 @@
+"""
+Disparos de Campanha em Massa - 3A Frios
+========================================
+
+Envio de uma campanha para um segmento de clientes (`POST /api/campanhas/disparos`).
+
+- Público resolvido por uma consulta paginada (keyset em `id`) sobre
+  `clientes_delivery` com os filtros do segmento.
+- Elegibilidade de cada página numa única consulta
+  (`CampaignRepository.contar_envios_telefones`), mais o contador em memória
+  e as regras de lead score do `CampaignAutomation`.
+- Mensagens renderizadas em lote e gravadas como `pendente` com um POST por
+  página; o `CampaignScheduler` envia respeitando o limite de vazão.
+- O disparo roda em background: a API responde na hora com o id e o
+  progresso é consultado em `GET /api/campanhas/disparos/{id}`.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from .campaign_processor import (
+    CampaignAutomation,
+    LIMITE_HORAS_MESMO_TIPO,
+    MAX_CAMPANHAS_DIA,
+    get_campaign_automation,
+)
+from .campaign_repository import CampaignRepository, get_campaign_repository
+from .campaign_templates import render_template
+
+logger = logging.getLogger("3afrios.campaign_bulk")
+
+PAGINA_PUBLICO = 500
+MAX_DISPAROS_MEMORIA = 100
+
+# Segmento do Bruno -> `interesse_declarado` gravado em clientes_delivery
+# (ver supabase_store.update_cliente_with_bruno_insights)
+SEGMENTOS_INTERESSE = {
+    "pessoa_juridica": "B2B - Fornecimento empresarial",
+    "evento_especial": "Evento especial",
+}
+
+
+def _lista_in(valores: List[str]) -> str:
+    return ",".join('"' + str(v).replace('"', '') + '"' for v in valores)
+
+
+def filtros_publico(
+    lead_status: Optional[List[str]] = None,
+    lead_score_min: Optional[int] = None,
+    lead_score_max: Optional[int] = None,
+    segmento: Optional[str] = None,
+    ultima_interacao_desde: Optional[str] = None,
+    ultima_interacao_ate: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """Filtros PostgREST do segmento sobre `clientes_delivery`"""
+    filtros: List[Tuple[str, str]] = [("telefone", "not.is.null")]
+    if lead_status:
+        filtros.append(("lead_status", f"in.({_lista_in(lead_status)})"))
+    if lead_score_min is not None:
+        filtros.append(("lead_score", f"gte.{int(lead_score_min)}"))
+    if lead_score_max is not None:
+        filtros.append(("lead_score", f"lte.{int(lead_score_max)}"))
+    if segmento:
+        if segmento in SEGMENTOS_INTERESSE:
+            filtros.append(("interesse_declarado", f"eq.{SEGMENTOS_INTERESSE[segmento]}"))
+        elif segmento == "pessoa_fisica":
+            outros = _lista_in(list(SEGMENTOS_INTERESSE.values()))
+            filtros.append(("or", f"(interesse_declarado.is.null,interesse_declarado.not.in.({outros}))"))
+        else:
+            raise ValueError(f"Segmento desconhecido: {segmento}")
+    # Última mensagem do cliente: last_message_at, mantido por trigger (migrations/leads_resumo.sql)
+    if ultima_interacao_desde:
+        filtros.append(("last_message_at", f"gte.{ultima_interacao_desde}"))
+    if ultima_interacao_ate:
+        filtros.append(("last_message_at", f"lte.{ultima_interacao_ate}"))
+    return filtros
+
+
+class DisparoCampanha:
+    """Estado/progresso de um disparo em massa"""
+
+    def __init__(self, tipo_campanha: str, template: Dict[str, Any], filtros: List[Tuple[str, str]], dry_run: bool):
+        self.id = f"disparo-{uuid.uuid4().hex[:12]}"
+        self.tipo_campanha = tipo_campanha
+        self.template = template
+        self.filtros = filtros
+        self.dry_run = dry_run
+        self.fase = "resolvendo_publico"
+        self.publico = 0
+        self.enfileirados = 0
+        self.ignorados: Dict[str, int] = {}
+        self.amostra: List[Dict[str, Any]] = []
+        self.erro: Optional[str] = None
+        self.criado_em = datetime.now()
+        self.concluido_em: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def ignorar(self, motivo: str) -> None:
+        self.ignorados[motivo] = self.ignorados.get(motivo, 0) + 1
+
+    @property
+    def concluido(self) -> bool:
+        return self.fase in ("enfileirado", "simulado", "erro")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "tipo_campanha": self.tipo_campanha,
+            "template_usado": self.template.get("nome"),
+            "dry_run": self.dry_run,
+            "fase": self.fase,
+            "publico": self.publico,
+            "enfileirados": self.enfileirados,
+            "ignorados": dict(self.ignorados),
+            "amostra": self.amostra,
+            "erro": self.erro,
+            "criado_em": self.criado_em.isoformat(),
+            "concluido_em": self.concluido_em.isoformat() if self.concluido_em else None,
+        }
+
+
+class CampaignBulkSender:
+    """Resolve o público, renderiza e enfileira os envios de um disparo"""
+
+    def __init__(
+        self,
+        repo: Optional[CampaignRepository] = None,
+        automation: Optional[CampaignAutomation] = None,
+        pagina: int = PAGINA_PUBLICO,
+    ):
+        self.repo = repo or get_campaign_repository()
+        self.automation = automation or get_campaign_automation()
+        self.pagina = pagina
+        self._disparos: "OrderedDict[str, DisparoCampanha]" = OrderedDict()
+
+    def iniciar(
+        self,
+        tipo_campanha: str,
+        template: Dict[str, Any],
+        filtros: List[Tuple[str, str]],
+        variaveis: Optional[Dict[str, str]] = None,
+        limite: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> DisparoCampanha:
+        """Cria o disparo e agenda a execução em background"""
+        disparo = DisparoCampanha(tipo_campanha, template, filtros, dry_run)
+        self._disparos[disparo.id] = disparo
+        while len(self._disparos) > MAX_DISPAROS_MEMORIA:
+            self._disparos.popitem(last=False)
+        disparo.task = asyncio.create_task(self.executar(disparo, variaveis or {}, limite))
+        logger.info(f"[Disparo] {disparo.id} iniciado: {tipo_campanha} filtros={filtros} dry_run={dry_run}")
+        return disparo
+
+    def get(self, disparo_id: str) -> Optional[DisparoCampanha]:
+        return self._disparos.get(disparo_id)
+
+    async def aguardar_pendentes(self, timeout: float) -> int:
+        """Shutdown: espera os disparos em execução até `timeout`; cancela o resto"""
+        tasks = [d.task for d in self._disparos.values() if d.task is not None and not d.task.done()]
+        if not tasks:
+            return 0
+        _, pendentes = await asyncio.wait(tasks, timeout=timeout)
+        for task in pendentes:
+            task.cancel()
+        if pendentes:
+            logger.warning(f"[Disparo] {len(pendentes)} disparos interrompidos no shutdown")
+        return len(pendentes)
+
+    async def status_envios(self, disparo_id: str) -> Dict[str, int]:
+        """Contagem por status das linhas já enfileiradas (enviadas pelo agendador)"""
+        status = ("pendente", "enviando", "enviado", "falhado")
+        totais = await asyncio.gather(*(
+            self.repo.contar_historico([("campanha_id", f"eq.{disparo_id}"), ("status", f"eq.{s}")])
+            for s in status
+        ))
+        return dict(zip(status, totais))
+
+    # ===================================
+    # EXECUÇÃO
+    # ===================================
+
+    def _variaveis(self, cliente: Dict[str, Any], base: Dict[str, str]) -> Dict[str, str]:
+        variaveis = {
+            "produto_interesse": "Produtos 3A Frios",
+            "valor_oferta": "Consulte condições especiais",
+            "prazo_entrega": "24-48h",
+            "nome_empresa": "3A Frios",
+            "horario_funcionamento": "Segunda a Sexta: 7h às 18h, Sábado: 7h às 12h",
+        }
+        variaveis.update(base)
+        variaveis["nome_cliente"] = cliente.get("nome") or "Cliente"
+        variaveis["telefone_cliente"] = cliente.get("telefone", "")
+        return variaveis
+
+    def _motivo_rejeicao(self, cliente: Dict[str, Any], tipo_campanha: str, contagem: Tuple[int, int]) -> Optional[str]:
+        telefone = cliente.get("telefone")
+        if self.automation.contador.rejeicao(telefone, tipo_campanha):
+            return "enviado_recentemente"
+        mesmo_tipo, hoje = contagem
+        if mesmo_tipo:
+            return f"mesmo_tipo_{LIMITE_HORAS_MESMO_TIPO}h"
+        if hoje >= MAX_CAMPANHAS_DIA:
+            return "limite_diario"
+        if self.automation._rejeicao_por_lead_score(tipo_campanha, cliente.get("lead_score")):
+            return "lead_score"
+        return None
+
+    async def executar(self, disparo: DisparoCampanha, variaveis: Dict[str, str], limite: Optional[int] = None) -> DisparoCampanha:
+        tipo = disparo.tipo_campanha
+        template = disparo.template
+        agora = datetime.now()
+        desde_tipo = (agora - timedelta(hours=LIMITE_HORAS_MESMO_TIPO)).isoformat()
+        desde_dia = f"{agora.date().isoformat()}T00:00:00"
+        vistos = set()
+        try:
+            async for pagina in self.repo.iter_clientes(disparo.filtros, page_size=self.pagina):
+                disparo.fase = "enfileirando"
+                clientes = []
+                for cliente in pagina:
+                    telefone = (cliente.get("telefone") or "").strip()
+                    if not telefone or telefone in vistos:
+                        continue
+                    vistos.add(telefone)
+                    clientes.append(cliente)
+                if limite is not None:
+                    clientes = clientes[:max(0, limite - disparo.publico)]
+                if not clientes:
+                    if limite is not None and disparo.publico >= limite:
+                        break
+                    continue
+                disparo.publico += len(clientes)
+
+                contagens = await self.repo.contar_envios_telefones(
+                    [c["telefone"] for c in clientes], tipo, desde_tipo, desde_dia
+                )
+                linhas = []
+                for cliente in clientes:
+                    telefone = cliente["telefone"]
+                    motivo = self._motivo_rejeicao(cliente, tipo, contagens.get(telefone, (0, 0)))
+                    if motivo:
+                        disparo.ignorar(motivo)
+                        continue
+                    vars_cliente = self._variaveis(cliente, variaveis)
+                    conteudo = render_template(template, vars_cliente)
+                    linhas.append({
+                        "campanha_id": disparo.id,
+                        "tipo_campanha": tipo,
+                        "template_usado_id": template.get("id"),
+                        "cliente_telefone": telefone,
+                        "cliente_nome": cliente.get("nome"),
+                        "cliente_id": str(cliente["id"]) if cliente.get("id") is not None else None,
+                        "titulo_enviado": conteudo["titulo"],
+                        "conteudo_enviado": conteudo["texto_completo"],
+                        "variaveis_usadas": vars_cliente,
+                        "gatilho_origem": "manual",
+                        "agente_responsavel": "dashboard",
+                        "status": "pendente",
+                        "programado_para": agora.isoformat(),
+                        "enviado_em": agora.isoformat(),
+                    })
+
+                if len(disparo.amostra) < 3:
+                    disparo.amostra.extend(
+                        {"cliente_telefone": l["cliente_telefone"], "conteudo": l["conteudo_enviado"]}
+                        for l in linhas[:3 - len(disparo.amostra)]
+                    )
+                if not disparo.dry_run and linhas:
+                    await self.repo.insert_historico_lote(linhas)
+                    for l in linhas:
+                        self.automation.contador.registrar(l["cliente_telefone"], tipo)
+                disparo.enfileirados += len(linhas)
+
+                if limite is not None and disparo.publico >= limite:
+                    break
+
+            disparo.fase = "simulado" if disparo.dry_run else "enfileirado"
+            logger.info(f"[Disparo] {disparo.id} {disparo.fase}: publico={disparo.publico} enfileirados={disparo.enfileirados} ignorados={disparo.ignorados}")
+        except Exception as e:
+            disparo.fase = "erro"
+            disparo.erro = str(e)
+            logger.error(f"[Disparo] {disparo.id} falhou: {e}", exc_info=True)
+        disparo.concluido_em = datetime.now()
+        return disparo
+
+
+# Instância global
+_campaign_bulk_sender = None
+
+def get_campaign_bulk_sender() -> CampaignBulkSender:
+    """Retorna instância global do disparador de campanhas"""
+    global _campaign_bulk_sender
+    if _campaign_bulk_sender is None:
+        _campaign_bulk_sender = CampaignBulkSender()
+    return _campaign_bulk_sender
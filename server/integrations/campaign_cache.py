@@ -0,0 +1,138 @@
+"""
+Cache de Configuração e Templates de Campanhas - 3A Frios
+=========================================================
+
+Snapshot em memória de `configuracoes_campanhas` e `templates_campanhas`
+usado nas decisões de campanha (`CampaignAutomation`), que passam a não ler
+o banco a cada mensagem roteada para Marketing.
+
+- Versionado: os endpoints de edição (`/api/campanhas/configuracoes` e
+  `/templates`) chamam `invalidate()`, que incrementa a versão e força a
+  recarga na próxima leitura.
+- TTL como rede de segurança (edições feitas direto no banco ou em outra
+  réplica).
+- Se a recarga falhar, continua servindo o último snapshot válido.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional
+
+from ..config import CAMPAIGN_CACHE_TTL_SECONDS
+from .campaign_repository import CampaignRepository, get_campaign_repository
+from .campaign_templates import compilar
+
+logger = logging.getLogger("3afrios.campaign_cache")
+
+
+class _Snapshot:
+    """Config + templates indexados por id e por tipo"""
+
+    def __init__(self, versao: int, config: Optional[Dict[str, Any]], templates: List[Dict[str, Any]]):
+        self.versao = versao
+        self.carregado_em = time.monotonic()
+        self.config = config
+        self.templates_por_id: Dict[str, Dict[str, Any]] = {}
+        self.ativos_por_tipo: Dict[str, List[Dict[str, Any]]] = {}
+        self.padrao_por_tipo: Dict[str, Dict[str, Any]] = {}
+        for t in templates:
+            self.templates_por_id[str(t.get("id"))] = t
+            # Já deixa título/conteúdo compilados para os envios
+            compilar(t.get("template_titulo") or "")
+            compilar(t.get("template_conteudo") or "")
+            if not t.get("ativo"):
+                continue
+            tipo = t.get("tipo")
+            self.ativos_por_tipo.setdefault(tipo, []).append(t)
+            if t.get("template_padrao") and tipo not in self.padrao_por_tipo:
+                self.padrao_por_tipo[tipo] = t
+
+
+class CampaignCache:
+    """Cache versionado de configuração e templates de campanha"""
+
+    def __init__(self, repo: Optional[CampaignRepository] = None, ttl_seconds: float = CAMPAIGN_CACHE_TTL_SECONDS):
+        self.repo = repo or get_campaign_repository()
+        self.ttl_seconds = ttl_seconds
+        self.versao = 0
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def invalidate(self) -> int:
+        """Descarta o snapshot atual; retorna a nova versão"""
+        self.versao += 1
+        self._snapshot = None
+        logger.info(f"[Campaign Cache] Invalidado (versão {self.versao})")
+        return self.versao
+
+    def _valido(self, snap: Optional[_Snapshot]) -> bool:
+        return (
+            snap is not None
+            and snap.versao == self.versao
+            and time.monotonic() - snap.carregado_em < self.ttl_seconds
+        )
+
+    async def _carregar(self) -> _Snapshot:
+        versao = self.versao
+        config, templates = await asyncio.gather(self.repo.get_config(), self.repo.list_templates())
+        snap = _Snapshot(versao, config, templates)
+        # Só instala se ninguém invalidou durante a carga
+        if versao == self.versao:
+            self._snapshot = snap
+        return snap
+
+    async def snapshot(self) -> _Snapshot:
+        snap = self._snapshot
+        if self._valido(snap):
+            return snap
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            snap = self._snapshot
+            if self._valido(snap):
+                return snap
+            try:
+                return await self._carregar()
+            except Exception as e:
+                if snap is not None and snap.versao == self.versao:
+                    logger.warning(f"[Campaign Cache] Falha ao recarregar, usando snapshot anterior: {e}")
+                    return snap
+                raise
+
+    # ===================================
+    # LEITURAS
+    # ===================================
+
+    async def get_config(self) -> Optional[Dict[str, Any]]:
+        return (await self.snapshot()).config
+
+    async def get_template(self, template_id: str) -> Optional[Dict[str, Any]]:
+        return (await self.snapshot()).templates_por_id.get(str(template_id))
+
+    async def template_para(self, tipo_campanha: str, template_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Template configurado (se ativo), senão o padrão do tipo, senão
+        qualquer template ativo do tipo
+        """
+        snap = await self.snapshot()
+        if template_id:
+            template = snap.templates_por_id.get(str(template_id))
+            if template and template.get("ativo"):
+                return template
+        template = snap.padrao_por_tipo.get(tipo_campanha)
+        if template:
+            return template
+        ativos = snap.ativos_por_tipo.get(tipo_campanha)
+        return ativos[0] if ativos else None
+
+
+# Instância global
+_campaign_cache = None
+
+def get_campaign_cache() -> CampaignCache:
+    """Retorna instância global do cache de campanhas"""
+    global _campaign_cache
+    if _campaign_cache is None:
+        _campaign_cache = CampaignCache()
+    return _campaign_cache
@@ -8,37 +8,72 @@ baseadas nos insights do Bruno Analista Invisível e contexto conversacional.
 
 import asyncio
 import logging
+import time
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 import json
 import re
 
-try:
-    from .supabase_store import get_supabase_client
-except ImportError:
-    # Fallback se não conseguir importar
-    def get_supabase_client():
-        class MockClient:
-            def table(self, name):
-                return type('MockTable', (), {
-                    'select': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                    'insert': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                    'update': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                    'delete': lambda *a: type('MockQuery', (), {'execute': lambda: type('MockResult', (), {'data': []})()})(),
-                })()
-        return MockClient()
-
+from .campaign_repository import get_campaign_repository
+from .campaign_cache import get_campaign_cache
+from .campaign_templates import render_template
 from .evolution import send_text
 
 logger = logging.getLogger("3afrios.campaign_processor")
 
+LIMITE_HORAS_MESMO_TIPO = 24  # Não enviar mesmo tipo em 24h
+MAX_CAMPANHAS_DIA = 3  # Max 3 campanhas por dia
+
+
+class _ContadorEnvios:
+    """
+    Campanhas registradas por este processo, por telefone (LRU). Rejeita
+    sem consultar o banco quando o próprio processo já enviou/programou o
+    mesmo tipo nas últimas 24h ou atingiu o limite do dia; nos demais casos
+    a decisão continua sendo do banco (outras réplicas também enviam).
+    """
+
+    def __init__(self, max_telefones: int = 10000):
+        self._max = max_telefones
+        self._envios: "OrderedDict[str, deque]" = OrderedDict()
+
+    def registrar(self, telefone: str, tipo_campanha: str) -> None:
+        if not telefone:
+            return
+        envios = self._envios.pop(telefone, None) or deque(maxlen=32)
+        envios.append((time.time(), tipo_campanha))
+        self._envios[telefone] = envios
+        while len(self._envios) > self._max:
+            self._envios.popitem(last=False)
+
+    def rejeicao(self, telefone: str, tipo_campanha: str) -> Optional[str]:
+        envios = self._envios.get(telefone)
+        if not envios:
+            return None
+        agora = time.time()
+        limite_tipo = agora - LIMITE_HORAS_MESMO_TIPO * 3600
+        inicio_dia = datetime.combine(datetime.now().date(), datetime.min.time()).timestamp()
+        if any(ts >= limite_tipo and tipo == tipo_campanha for ts, tipo in envios):
+            return f"Campanha {tipo_campanha} já enviada nas últimas {LIMITE_HORAS_MESMO_TIPO}h"
+        if sum(1 for ts, _ in envios if ts >= inicio_dia) >= MAX_CAMPANHAS_DIA:
+            return f"Limite diário de campanhas atingido ({MAX_CAMPANHAS_DIA}/dia)"
+        return None
+
+
+# Compartilhado entre instâncias (a API cria um CampaignAutomation por requisição)
+_contador_envios = _ContadorEnvios()
+
+
 class CampaignAutomation:
     """
     Processador principal de campanhas automáticas
     """
     
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.repo = get_campaign_repository()
+        self.cache = get_campaign_cache()
+        self.contador = _contador_envios
         
     async def process_campaign_action(
         self, 
@@ -205,12 +240,12 @@ class CampaignAutomation:
     
     async def _get_campaign_config(self) -> Dict[str, Any]:
         """
-        Busca configurações de campanha do banco
+        Busca configurações de campanha (cache versionado)
         """
         try:
-            result = self.supabase.table("configuracoes_campanhas").select("*").execute()
-            if result.data:
-                return result.data[0]
+            config = await self.cache.get_config()
+            if config:
+                return config
             return {"automacao_ativa": False, "campanhas_automaticas": {}}
         except Exception as e:
             logger.error(f"Erro ao buscar config de campanhas: {e}")
@@ -226,48 +261,36 @@ class CampaignAutomation:
         Verifica se cliente é elegível para receber a campanha
         """
         try:
-            # Verifica se cliente já recebeu campanha similar recentemente
-            limite_horas = 24  # Não enviar mesmo tipo em 24h
-            
-            result = self.supabase.table("historico_campanhas").select("enviado_em").eq(
-                "cliente_telefone", telefone
-            ).eq("tipo_campanha", tipo_campanha).gte(
-                "enviado_em", (datetime.now() - timedelta(hours=limite_horas)).isoformat()
-            ).execute()
+            # Rejeições óbvias pelo que este processo já enviou (sem ir ao banco)
+            motivo = self.contador.rejeicao(telefone, tipo_campanha)
+            if motivo:
+                return {"elegivel": False, "motivo": motivo}
+            
+            # Mesmo tipo nas últimas 24h e total do dia numa única consulta
+            agora = datetime.now()
+            mesmo_tipo, enviadas_hoje = await self.repo.contar_envios_cliente(
+                telefone,
+                tipo_campanha,
+                desde_tipo=(agora - timedelta(hours=LIMITE_HORAS_MESMO_TIPO)).isoformat(),
+                desde_dia=f"{agora.date().isoformat()}T00:00:00",
+            )
             
-            if result.data:
+            if mesmo_tipo:
                 return {
                     "elegivel": False,
-                    "motivo": f"Campanha {tipo_campanha} já enviada nas últimas {limite_horas}h"
+                    "motivo": f"Campanha {tipo_campanha} já enviada nas últimas {LIMITE_HORAS_MESMO_TIPO}h"
                 }
             
-            # Verifica limite diário de campanhas
-            hoje = datetime.now().date().isoformat()
-            result_hoje = self.supabase.table("historico_campanhas").select("id").eq(
-                "cliente_telefone", telefone
-            ).gte("enviado_em", f"{hoje}T00:00:00").execute()
-            
-            if len(result_hoje.data or []) >= 3:  # Max 3 campanhas por dia
+            if enviadas_hoje >= MAX_CAMPANHAS_DIA:
                 return {
                     "elegivel": False,
-                    "motivo": "Limite diário de campanhas atingido (3/dia)"
+                    "motivo": f"Limite diário de campanhas atingido ({MAX_CAMPANHAS_DIA}/dia)"
                 }
             
             # Validações específicas baseadas nos insights do Bruno
-            lead_score = bruno_insights.get("lead_score", 0)
-            
-            # Validações por tipo de campanha
-            if tipo_campanha == "lead_qualificado" and lead_score < 5:
-                return {
-                    "elegivel": False,
-                    "motivo": f"Lead score muito baixo ({lead_score}) para campanha de lead qualificado"
-                }
-            
-            if tipo_campanha == "oferta_personalizada" and lead_score < 7:
-                return {
-                    "elegivel": False,
-                    "motivo": f"Lead score insuficiente ({lead_score}) para oferta personalizada"
-                }
+            motivo = self._rejeicao_por_lead_score(tipo_campanha, bruno_insights.get("lead_score", 0))
+            if motivo:
+                return {"elegivel": False, "motivo": motivo}
             
             return {"elegivel": True, "motivo": "Cliente elegível"}
             
@@ -275,33 +298,25 @@ class CampaignAutomation:
             logger.error(f"Erro ao verificar elegibilidade: {e}")
             return {"elegivel": False, "motivo": f"Erro na verificação: {str(e)}"}
     
+    @staticmethod
+    def _rejeicao_por_lead_score(tipo_campanha: str, lead_score: int) -> Optional[str]:
+        """
+        Validações por tipo de campanha
+        """
+        lead_score = lead_score or 0
+        if tipo_campanha == "lead_qualificado" and lead_score < 5:
+            return f"Lead score muito baixo ({lead_score}) para campanha de lead qualificado"
+        if tipo_campanha == "oferta_personalizada" and lead_score < 7:
+            return f"Lead score insuficiente ({lead_score}) para oferta personalizada"
+        return None
+    
     async def _get_template_for_campaign(self, tipo_campanha: str, tipo_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Busca template adequado para o tipo de campanha
+        Busca template adequado para o tipo de campanha: o configurado, o
+        padrão do tipo ou qualquer template ativo do tipo (cache versionado)
         """
         try:
-            # Primeiro tenta template específico configurado
-            template_id = tipo_config.get("template_id")
-            if template_id:
-                result = self.supabase.table("templates_campanhas").select("*").eq("id", template_id).eq("ativo", True).execute()
-                if result.data:
-                    return result.data[0]
-            
-            # Senão busca template padrão para o tipo
-            result = self.supabase.table("templates_campanhas").select("*").eq(
-                "tipo", tipo_campanha
-            ).eq("template_padrao", True).eq("ativo", True).execute()
-            
-            if result.data:
-                return result.data[0]
-            
-            # Por último, qualquer template ativo do tipo
-            result = self.supabase.table("templates_campanhas").select("*").eq(
-                "tipo", tipo_campanha
-            ).eq("ativo", True).limit(1).execute()
-            
-            return result.data[0] if result.data else None
-            
+            return await self.cache.template_para(tipo_campanha, tipo_config.get("template_id"))
         except Exception as e:
             logger.error(f"Erro ao buscar template: {e}")
             return None
@@ -407,21 +422,9 @@ class CampaignAutomation:
     
     async def _process_template(self, template: Dict[str, Any], variaveis: Dict[str, str]) -> Dict[str, str]:
         """
-        Processa template substituindo variáveis
+        Processa template substituindo variáveis (forma compilada em cache)
         """
-        titulo = template["template_titulo"]
-        conteudo = template["template_conteudo"]
-        
-        # Substitui variáveis no formato {variavel}
-        for var, valor in variaveis.items():
-            titulo = titulo.replace(f"{{{var}}}", valor)
-            conteudo = conteudo.replace(f"{{{var}}}", valor)
-        
-        return {
-            "titulo": titulo,
-            "conteudo": conteudo,
-            "texto_completo": f"{titulo}\n\n{conteudo}"
-        }
+        return render_template(template, variaveis)
     
     async def _send_campaign_now(
         self,
@@ -461,7 +464,8 @@ class CampaignAutomation:
                 "enviado_em": datetime.now().isoformat()
             }
             
-            self.supabase.table("historico_campanhas").insert(historico_data).execute()
+            await self.repo.insert_historico(historico_data)
+            self.contador.registrar(telefone, tipo_campanha)
             
             logger.info(f"[Campaign Processor] Campanha enviada: {tipo_campanha} -> {telefone}")
             
@@ -510,14 +514,15 @@ class CampaignAutomation:
                 "enviado_em": datetime.now().isoformat()
             }
             
-            result = self.supabase.table("historico_campanhas").insert(historico_data).execute()
+            registro = await self.repo.insert_historico(historico_data)
+            self.contador.registrar(telefone, tipo_campanha)
             
             logger.info(f"[Campaign Processor] Campanha programada: {tipo_campanha} -> {telefone} em {envio_programado}")
             
             return {
                 "programado": True,
                 "envio_em": envio_programado.isoformat(),
-                "historico_id": result.data[0]["id"] if result.data else None
+                "historico_id": registro["id"] if registro else None
             }
             
         except Exception as e:
@@ -0,0 +1,467 @@
+"""
+Repositório Assíncrono de Campanhas - 3A Frios
+==============================================
+
+Acesso a `configuracoes_campanhas`, `templates_campanhas` e
+`historico_campanhas` via PostgREST sobre o cliente HTTP assíncrono
+compartilhado (`supabase_store._client`: o do container de recursos no app).
+
+Substitui as chamadas ao cliente síncrono supabase-py (`.execute()`) feitas
+dentro de funções `async`, que bloqueavam o event loop a cada consulta e
+faziam o tráfego de campanhas disputar o loop com os webhooks.
+"""
+
+import base64
+import json
+import logging
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
+
+from ..config import SUPABASE_URL, SUPABASE_SERVICE_ROLE
+from .supabase_store import _client
+
+logger = logging.getLogger("3afrios.campaign_repository")
+
+CONFIG_TABLE = "configuracoes_campanhas"
+TEMPLATES_TABLE = "templates_campanhas"
+HISTORICO_TABLE = "historico_campanhas"
+CLIENTES_TABLE = "clientes_delivery"
+
+
+class CampaignRepositoryError(Exception):
+    """Erro retornado pelo PostgREST"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _valor(v: Any) -> str:
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    return str(v)
+
+
+def eq(v: Any) -> str:
+    return f"eq.{_valor(v)}"
+
+
+def _prefer_count(count: Union[bool, str]) -> Optional[Dict[str, str]]:
+    # True = exata; também aceita "exact", "estimated" ou "planned" do PostgREST
+    if not count:
+        return None
+    return {"Prefer": f"count={'exact' if count is True else count}"}
+
+
+def _content_range_total(header: Optional[str]) -> Optional[int]:
+    # Formato: "0-49/1234" ou "*/0"
+    if not header or "/" not in header:
+        return None
+    total = header.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def filtros_historico(
+    data_inicio: Optional[str] = None,
+    data_fim: Optional[str] = None,
+    tipo_campanha: Optional[str] = None,
+    cliente_telefone: Optional[str] = None,
+    status: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """Filtros do histórico usados pela listagem, contagem e estatísticas"""
+    filtros: List[Tuple[str, str]] = []
+    if data_inicio:
+        filtros.append(("enviado_em", f"gte.{data_inicio}T00:00:00"))
+    if data_fim:
+        filtros.append(("enviado_em", f"lte.{data_fim}T23:59:59"))
+    if tipo_campanha:
+        filtros.append(("tipo_campanha", eq(tipo_campanha)))
+    if cliente_telefone:
+        filtros.append(("cliente_telefone", eq(cliente_telefone)))
+    if status:
+        filtros.append(("status", eq(status)))
+    return filtros
+
+
+# ===================================
+# CURSOR (keyset em enviado_em, id)
+# ===================================
+
+def codificar_cursor(row: Dict[str, Any]) -> str:
+    bruto = json.dumps([row.get("enviado_em"), str(row.get("id"))], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[str, str]:
+    """Levanta ValueError para cursor malformado"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        enviado_em, row_id = json.loads(bruto)
+    except Exception:
+        raise ValueError("Cursor inválido")
+    if not enviado_em or not row_id:
+        raise ValueError("Cursor inválido")
+    return str(enviado_em), str(row_id)
+
+
+def filtro_cursor(cursor: str) -> Tuple[str, str]:
+    """Linhas depois do cursor na ordem enviado_em desc, id desc"""
+    enviado_em, row_id = decodificar_cursor(cursor)
+    return ("or", f"(enviado_em.lt.{enviado_em},and(enviado_em.eq.{enviado_em},id.lt.{row_id}))")
+
+
+class CampaignRepository:
+    """Operações assíncronas nas tabelas de campanhas"""
+
+    def __init__(self):
+        self._rpc_contagem = True
+        self._rpc_contagem_lote = True
+        self._totais_historico: Dict[Tuple, Tuple[float, int]] = {}
+
+    @staticmethod
+    def configurado() -> bool:
+        return bool(SUPABASE_URL and SUPABASE_SERVICE_ROLE)
+
+    # ===================================
+    # PRIMITIVAS
+    # ===================================
+
+    async def select(
+        self,
+        table: str,
+        params: Optional[Dict[str, str]] = None,
+        count: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """GET na tabela; com `count=True` devolve também o total (count=exact)"""
+        query = {"select": "*"}
+        query.update(params or {})
+        headers = _prefer_count(count)
+        async with await _client() as c:
+            resp = await c.get(f"/{table}", params=query, headers=headers)
+        if not (200 <= resp.status_code < 300):
+            raise CampaignRepositoryError(f"Erro ao consultar {table}: {resp.status_code} {resp.text[:200]}", resp.status_code)
+        rows = resp.json() or []
+        total = _content_range_total(resp.headers.get("content-range")) if count else None
+        return rows, total
+
+    async def insert(self, table: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        async with await _client() as c:
+            resp = await c.post(f"/{table}", json=[data])
+        if not (200 <= resp.status_code < 300):
+            raise CampaignRepositoryError(f"Erro ao inserir em {table}: {resp.status_code} {resp.text[:200]}", resp.status_code)
+        rows = resp.json() or []
+        return rows[0] if rows else None
+
+    async def update(self, table: str, filtros: Dict[str, str], data: Dict[str, Any], retornar: bool = True) -> List[Dict[str, Any]]:
+        headers = None if retornar else {"Prefer": "return=minimal"}
+        async with await _client() as c:
+            resp = await c.patch(f"/{table}", params=filtros, json=data, headers=headers)
+        if not (200 <= resp.status_code < 300):
+            raise CampaignRepositoryError(f"Erro ao atualizar {table}: {resp.status_code} {resp.text[:200]}", resp.status_code)
+        return (resp.json() or []) if retornar else []
+
+    async def delete(self, table: str, filtros: Dict[str, str]) -> None:
+        async with await _client() as c:
+            resp = await c.delete(f"/{table}", params=filtros, headers={"Prefer": "return=minimal"})
+        if not (200 <= resp.status_code < 300):
+            raise CampaignRepositoryError(f"Erro ao remover de {table}: {resp.status_code} {resp.text[:200]}", resp.status_code)
+
+    async def rpc(self, funcao: str, params: Dict[str, Any]) -> Any:
+        async with await _client() as c:
+            resp = await c.post(f"/rpc/{funcao}", json=params)
+        if not (200 <= resp.status_code < 300):
+            raise CampaignRepositoryError(f"Erro na RPC {funcao}: {resp.status_code} {resp.text[:200]}", resp.status_code)
+        return resp.json()
+
+    # ===================================
+    # CONFIGURAÇÕES
+    # ===================================
+
+    async def get_config(self) -> Optional[Dict[str, Any]]:
+        rows, _ = await self.select(CONFIG_TABLE, {"limit": "1"})
+        return rows[0] if rows else None
+
+    async def save_config(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Atualiza a configuração existente ou cria a primeira"""
+        rows, _ = await self.select(CONFIG_TABLE, {"select": "id", "limit": "1"})
+        if rows:
+            updated = await self.update(CONFIG_TABLE, {"id": eq(rows[0]["id"])}, data)
+            return updated[0] if updated else None
+        return await self.insert(CONFIG_TABLE, data)
+
+    # ===================================
+    # TEMPLATES
+    # ===================================
+
+    async def list_templates(self, tipo: Optional[str] = None, ativo: Optional[bool] = None) -> List[Dict[str, Any]]:
+        params = {"order": "tipo.asc,nome.asc"}
+        if tipo:
+            params["tipo"] = eq(tipo)
+        if ativo is not None:
+            params["ativo"] = eq(ativo)
+        rows, _ = await self.select(TEMPLATES_TABLE, params)
+        return rows
+
+    async def get_template(self, template_id: str, ativo: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        params = {"id": eq(template_id), "limit": "1"}
+        if ativo is not None:
+            params["ativo"] = eq(ativo)
+        rows, _ = await self.select(TEMPLATES_TABLE, params)
+        return rows[0] if rows else None
+
+    async def find_template(self, tipo: str, padrao: Optional[bool] = None, ativo: Optional[bool] = True) -> Optional[Dict[str, Any]]:
+        params = {"tipo": eq(tipo), "limit": "1"}
+        if padrao is not None:
+            params["template_padrao"] = eq(padrao)
+        if ativo is not None:
+            params["ativo"] = eq(ativo)
+        rows, _ = await self.select(TEMPLATES_TABLE, params)
+        return rows[0] if rows else None
+
+    async def create_template(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.insert(TEMPLATES_TABLE, data)
+
+    async def update_template(self, template_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        rows = await self.update(TEMPLATES_TABLE, {"id": eq(template_id)}, data)
+        return rows[0] if rows else None
+
+    async def clear_default_template(self, tipo: str) -> None:
+        """Remove a marcação de padrão dos templates do tipo"""
+        await self.update(
+            TEMPLATES_TABLE,
+            {"tipo": eq(tipo), "template_padrao": eq(True)},
+            {"template_padrao": False},
+            retornar=False,
+        )
+
+    async def delete_template(self, template_id: str) -> None:
+        await self.delete(TEMPLATES_TABLE, {"id": eq(template_id)})
+
+    # ===================================
+    # HISTÓRICO
+    # ===================================
+
+    async def insert_historico(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.insert(HISTORICO_TABLE, data)
+
+    async def select_historico(
+        self,
+        filtros: List[Tuple[str, str]],
+        select: str = "*",
+        order: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        count: Union[bool, str] = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Consulta o histórico. `filtros` é uma lista de (coluna, "op.valor"),
+        permitindo repetir a coluna (ex.: enviado_em gte + lte).
+        """
+        params: List[Tuple[str, str]] = [("select", select)]
+        params.extend(filtros)
+        if order:
+            params.append(("order", order))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        if offset:
+            params.append(("offset", str(offset)))
+        headers = _prefer_count(count)
+        async with await _client() as c:
+            resp = await c.get(f"/{HISTORICO_TABLE}", params=params, headers=headers)
+        if not (200 <= resp.status_code < 300):
+            raise CampaignRepositoryError(f"Erro ao consultar histórico: {resp.status_code} {resp.text[:200]}", resp.status_code)
+        total = _content_range_total(resp.headers.get("content-range")) if count else None
+        return resp.json() or [], total
+
+    async def contar_envios_cliente(self, telefone: str, tipo_campanha: str, desde_tipo: str, desde_dia: str) -> Tuple[int, int]:
+        """
+        Em uma consulta: (campanhas do tipo desde `desde_tipo`, campanhas de
+        qualquer tipo desde `desde_dia`) para o telefone.
+
+        Usa a RPC `contar_campanhas_cliente` (migrations/campanhas_elegibilidade.sql);
+        sem ela, busca só tipo/data das linhas do período e conta localmente.
+        """
+        if self._rpc_contagem:
+            try:
+                rows = await self.rpc("contar_campanhas_cliente", {
+                    "p_telefone": telefone,
+                    "p_tipo": tipo_campanha,
+                    "p_desde_tipo": desde_tipo,
+                    "p_desde_dia": desde_dia,
+                })
+                row = (rows[0] if isinstance(rows, list) and rows else rows) or {}
+                return int(row.get("mesmo_tipo") or 0), int(row.get("hoje") or 0)
+            except CampaignRepositoryError as e:
+                if e.status_code != 404:
+                    raise
+                logger.warning("[Campaign Repo] RPC contar_campanhas_cliente ausente - contando localmente")
+                self._rpc_contagem = False
+
+        rows, _ = await self.select_historico(
+            [("cliente_telefone", eq(telefone)), ("enviado_em", f"gte.{min(desde_tipo, desde_dia)}")],
+            select="tipo_campanha,enviado_em",
+        )
+        mesmo_tipo = sum(1 for r in rows if r.get("tipo_campanha") == tipo_campanha and (r.get("enviado_em") or "") >= desde_tipo)
+        hoje = sum(1 for r in rows if (r.get("enviado_em") or "") >= desde_dia)
+        return mesmo_tipo, hoje
+
+    async def contar_envios_telefones(
+        self, telefones: List[str], tipo_campanha: str, desde_tipo: str, desde_dia: str
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+        Versão em lote de `contar_envios_cliente`: {telefone: (mesmo_tipo, hoje)},
+        só para os telefones com algum envio no período.
+        """
+        if not telefones:
+            return {}
+        if self._rpc_contagem_lote:
+            try:
+                rows = await self.rpc("contar_campanhas_telefones", {
+                    "p_telefones": telefones,
+                    "p_tipo": tipo_campanha,
+                    "p_desde_tipo": desde_tipo,
+                    "p_desde_dia": desde_dia,
+                })
+                return {
+                    r["cliente_telefone"]: (int(r.get("mesmo_tipo") or 0), int(r.get("hoje") or 0))
+                    for r in rows or []
+                }
+            except CampaignRepositoryError as e:
+                if e.status_code != 404:
+                    raise
+                logger.warning("[Campaign Repo] RPC contar_campanhas_telefones ausente - contando localmente")
+                self._rpc_contagem_lote = False
+
+        # Fallback: filtro in.(...) em blocos (limite de tamanho da URL)
+        contagens: Dict[str, Tuple[int, int]] = {}
+        for i in range(0, len(telefones), 150):
+            bloco = telefones[i:i + 150]
+            rows, _ = await self.select_historico(
+                [("cliente_telefone", f"in.({','.join(bloco)})"), ("enviado_em", f"gte.{min(desde_tipo, desde_dia)}")],
+                select="cliente_telefone,tipo_campanha,enviado_em",
+            )
+            for r in rows:
+                mesmo_tipo, hoje = contagens.get(r["cliente_telefone"], (0, 0))
+                enviado_em = r.get("enviado_em") or ""
+                if r.get("tipo_campanha") == tipo_campanha and enviado_em >= desde_tipo:
+                    mesmo_tipo += 1
+                if enviado_em >= desde_dia:
+                    hoje += 1
+                contagens[r["cliente_telefone"]] = (mesmo_tipo, hoje)
+        return contagens
+
+    async def insert_historico_lote(self, rows: List[Dict[str, Any]]) -> None:
+        """Insere várias linhas do histórico num único POST (return=minimal)"""
+        if not rows:
+            return
+        async with await _client() as c:
+            resp = await c.post(f"/{HISTORICO_TABLE}", json=rows, headers={"Prefer": "return=minimal"})
+        if not (200 <= resp.status_code < 300):
+            raise CampaignRepositoryError(f"Erro ao inserir lote no histórico: {resp.status_code} {resp.text[:200]}", resp.status_code)
+
+    async def pagina_historico(
+        self,
+        filtros: List[Tuple[str, str]],
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        contagem: str = "cache",
+        cache_segundos: float = 60.0,
+    ) -> Dict[str, Any]:
+        """
+        Página do histórico em ordem enviado_em desc, id desc.
+
+        Com `cursor` (keyset) o custo não depende da profundidade; `offset`
+        continua aceito só para compatibilidade. `contagem`:
+          - "exata": count=exact nesta requisição;
+          - "estimada": estimativa do planner (count=estimated);
+          - "cache": exata na primeira vez, reaproveitada por `cache_segundos`
+            para os mesmos filtros;
+          - "nenhuma": sem total.
+        """
+        chave = tuple(filtros)
+        modo = {"exata": "exact", "estimada": "estimated", "cache": "exact"}.get(contagem)
+        total: Optional[int] = None
+        if contagem == "cache":
+            cache = self._totais_historico.get(chave)
+            if cache and time.monotonic() - cache[0] < cache_segundos:
+                total, modo = cache[1], None
+
+        consulta = list(filtros)
+        if cursor:
+            consulta.append(filtro_cursor(cursor))
+            offset = 0
+        # Com cursor o count da página cobriria só o restante: conta à parte
+        count_na_pagina = modo if not cursor else None
+        # Uma linha a mais só para saber se há próxima página
+        rows, total_pagina = await self.select_historico(
+            consulta,
+            order="enviado_em.desc.nullslast,id.desc",
+            limit=limit + 1,
+            offset=offset,
+            count=count_na_pagina or False,
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        if modo:
+            total = total_pagina if count_na_pagina else await self.contar_historico(filtros, count=modo)
+            if contagem == "cache" and total is not None:
+                if len(self._totais_historico) >= 256:
+                    self._totais_historico.pop(next(iter(self._totais_historico)), None)
+                self._totais_historico[chave] = (time.monotonic(), total)
+
+        return {
+            "data": rows,
+            "total": total,
+            "has_more": has_more,
+            "next_cursor": codificar_cursor(rows[-1]) if has_more and rows and rows[-1].get("enviado_em") else None,
+        }
+
+    async def contar_historico(self, filtros: List[Tuple[str, str]], count: str = "exact") -> int:
+        """Total de linhas do histórico para os filtros (sem trazer as linhas)"""
+        _, total = await self.select_historico(filtros, select="id", limit=0, count=count)
+        return total or 0
+
+    # ===================================
+    # CLIENTES (público de disparos)
+    # ===================================
+
+    async def iter_clientes(
+        self,
+        filtros: List[Tuple[str, str]],
+        select: str = "id,nome,telefone,lead_score,lead_status",
+        page_size: int = 1000,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Páginas de `clientes_delivery` por keyset em `id` (sem OFFSET)"""
+        ultimo_id = None
+        while True:
+            params: List[Tuple[str, str]] = [("select", select)]
+            params.extend(filtros)
+            if ultimo_id is not None:
+                params.append(("id", f"gt.{ultimo_id}"))
+            params.extend([("order", "id.asc"), ("limit", str(page_size))])
+            async with await _client() as c:
+                resp = await c.get(f"/{CLIENTES_TABLE}", params=params)
+            if not (200 <= resp.status_code < 300):
+                raise CampaignRepositoryError(f"Erro ao consultar clientes: {resp.status_code} {resp.text[:200]}", resp.status_code)
+            rows = resp.json() or []
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            ultimo_id = rows[-1]["id"]
+
+    async def ping(self) -> None:
+        await self.select(CONFIG_TABLE, {"select": "id", "limit": "1"})
+
+
+# Instância global
+_campaign_repository = None
+
+def get_campaign_repository() -> CampaignRepository:
+    """Retorna instância global do repositório de campanhas"""
+    global _campaign_repository
+    if _campaign_repository is None:
+        _campaign_repository = CampaignRepository()
+    return _campaign_repository
@@ -0,0 +1,209 @@
+"""
+Agendador de Campanhas Programadas - 3A Frios
+=============================================
+
+Envia as campanhas gravadas como `pendente` em `historico_campanhas`
+(`CampaignAutomation._schedule_campaign_send`) quando `programado_para`
+vence.
+
+- Reivindica lotes de forma atômica (RPC `reivindicar_campanhas_pendentes`,
+  com FOR UPDATE SKIP LOCKED e lease), então várias réplicas podem rodar ao
+  mesmo tempo sem envio duplicado.
+- Envia pela Evolution API respeitando limite de vazão (envios/minuto) e de
+  concorrência.
+- Marca cada linha como `enviado` ou `falhado` (só se ainda for o dono da
+  reivindicação).
+
+Pode rodar dentro do backend (startup do FastAPI, com
+CAMPAIGN_SCHEDULER_ENABLED=true) ou como worker avulso:
+  python -m server.integrations.campaign_scheduler
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from ..config import (
+    SUPABASE_URL,
+    SUPABASE_SERVICE_ROLE,
+    CAMPAIGN_SCHEDULER_INTERVAL,
+    CAMPAIGN_SCHEDULER_BATCH,
+    CAMPAIGN_SEND_RATE_PER_MIN,
+    CAMPAIGN_SEND_CONCURRENCY,
+    CAMPAIGN_CLAIM_LEASE_SECONDS,
+)
+from .evolution import send_text
+from .supabase_store import _client
+
+logger = logging.getLogger("3afrios.campaign_scheduler")
+
+
+class _RateLimiter:
+    """Espaça os envios para no máximo `por_minuto` envios por minuto"""
+
+    def __init__(self, por_minuto: float):
+        self._intervalo = 60.0 / por_minuto if por_minuto > 0 else 0.0
+        self._proximo = 0.0
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self) -> None:
+        if not self._intervalo:
+            return
+        async with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self._intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+class CampaignScheduler:
+    """Loop que reivindica, envia e finaliza campanhas programadas"""
+
+    def __init__(
+        self,
+        batch_size: int = CAMPAIGN_SCHEDULER_BATCH,
+        intervalo_segundos: float = CAMPAIGN_SCHEDULER_INTERVAL,
+        envios_por_minuto: float = CAMPAIGN_SEND_RATE_PER_MIN,
+        concorrencia: int = CAMPAIGN_SEND_CONCURRENCY,
+        lease_segundos: int = CAMPAIGN_CLAIM_LEASE_SECONDS,
+        worker_id: Optional[str] = None,
+    ):
+        self.batch_size = batch_size
+        self.intervalo_segundos = intervalo_segundos
+        self.lease_segundos = lease_segundos
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._limiter = _RateLimiter(envios_por_minuto)
+        self._semaforo = asyncio.Semaphore(max(1, concorrencia))
+        self._parar = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # ===================================
+    # REIVINDICAÇÃO
+    # ===================================
+
+    async def _reivindicar(self) -> List[Dict[str, Any]]:
+        """Transição atômica pendente -> enviando de um lote vencido"""
+        async with await _client() as c:
+            resp = await c.post("/rpc/reivindicar_campanhas_pendentes", json={
+                "p_limite": self.batch_size,
+                "p_worker": self.worker_id,
+                "p_lease_segundos": self.lease_segundos,
+            })
+        if 200 <= resp.status_code < 300:
+            return resp.json() or []
+        if resp.status_code == 404:
+            # Sem a RPC também faltam status 'enviando' e as colunas de
+            # reivindicação: não há como reivindicar, o agendador para
+            logger.error("[Agendador] RPC reivindicar_campanhas_pendentes ausente - aplique "
+                         "migrations/campanhas_agendador.sql; agendador parado")
+            self._parar.set()
+        else:
+            logger.error(f"[Agendador] Erro ao reivindicar lote: {resp.status_code} {resp.text[:200]}")
+        return []
+
+    async def _finalizar(self, campanha_id: str, envio: Dict[str, Any]) -> bool:
+        """Marca enviado/falhado, só se este worker ainda for o dono da linha"""
+        dados = {
+            "status": "enviado" if envio.get("sent") else "falhado",
+            "resultado": envio,
+            "enviado_em": datetime.now().isoformat(),
+        }
+        async with await _client() as c:
+            resp = await c.patch(
+                "/historico_campanhas",
+                params={"id": f"eq.{campanha_id}", "status": "eq.enviando", "reivindicado_por": f"eq.{self.worker_id}"},
+                json=dados,
+                headers={"Prefer": "return=minimal"},
+            )
+            if not (200 <= resp.status_code < 300):
+                logger.error(f"[Agendador] Erro ao finalizar campanha {campanha_id}: {resp.status_code}")
+                return False
+            return True
+
+    # ===================================
+    # ENVIO
+    # ===================================
+
+    async def _enviar(self, campanha: Dict[str, Any]) -> bool:
+        async with self._semaforo:
+            await self._limiter.aguardar()
+            telefone = campanha.get("cliente_telefone", "")
+            try:
+                envio = await send_text(telefone, campanha.get("conteudo_enviado") or "")
+            except Exception as e:
+                logger.error(f"[Agendador] Erro ao enviar campanha {campanha.get('id')}: {e}")
+                envio = {"sent": False, "erro": str(e)}
+            await self._finalizar(campanha["id"], envio)
+            logger.info(f"[Agendador] Campanha {campanha.get('tipo_campanha')} -> {telefone}: {'enviado' if envio.get('sent') else 'falhado'}")
+            return bool(envio.get("sent"))
+
+    async def run_once(self) -> Dict[str, int]:
+        """Processa um lote: reivindica, envia e finaliza"""
+        if not (SUPABASE_URL and SUPABASE_SERVICE_ROLE):
+            return {"reivindicadas": 0, "enviadas": 0, "falhadas": 0}
+        campanhas = await self._reivindicar()
+        if not campanhas:
+            return {"reivindicadas": 0, "enviadas": 0, "falhadas": 0}
+        resultados = await asyncio.gather(*(self._enviar(c) for c in campanhas), return_exceptions=True)
+        enviadas = sum(1 for r in resultados if r is True)
+        return {"reivindicadas": len(campanhas), "enviadas": enviadas, "falhadas": len(campanhas) - enviadas}
+
+    # ===================================
+    # CICLO DE VIDA
+    # ===================================
+
+    async def run_forever(self) -> None:
+        logger.info(f"[Agendador] Iniciado worker={self.worker_id} intervalo={self.intervalo_segundos}s lote={self.batch_size}")
+        while not self._parar.is_set():
+            try:
+                stats = await self.run_once()
+                if stats["reivindicadas"]:
+                    logger.info(f"[Agendador] Lote processado: {stats}")
+                    # Lote cheio: provavelmente há mais vencidas, não espera
+                    if stats["reivindicadas"] >= self.batch_size:
+                        continue
+            except Exception as e:
+                logger.error(f"[Agendador] Erro no ciclo: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._parar.wait(), timeout=self.intervalo_segundos)
+            except asyncio.TimeoutError:
+                pass
+        logger.info(f"[Agendador] Encerrado worker={self.worker_id}")
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._parar.clear()
+            self._task = asyncio.create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        self._parar.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+# ===================================
+# FUNÇÕES DE CONVENIÊNCIA
+# ===================================
+
+_campaign_scheduler = None
+
+def get_campaign_scheduler() -> CampaignScheduler:
+    """Retorna instância global do agendador de campanhas"""
+    global _campaign_scheduler
+    if _campaign_scheduler is None:
+        _campaign_scheduler = CampaignScheduler()
+    return _campaign_scheduler
+
+
+if __name__ == "__main__":
+    from ..logging_config import configurar_logging
+    configurar_logging()
+    asyncio.run(CampaignScheduler().run_forever())
@@ -0,0 +1,101 @@
+"""
+Estatísticas de Campanhas - 3A Frios
+====================================
+
+Leitura do rollup diário `campanhas_estatisticas_diarias`
+(migrations/campanhas_estatisticas.sql) para o dashboard.
+
+Antes de ler, dispara a atualização incremental
+(`atualizar_estatisticas_campanhas`, que só recalcula os dias marcados
+como pendentes pelo trigger de historico_campanhas) no máximo uma vez a
+cada CAMPAIGN_STATS_REFRESH_INTERVAL segundos por processo. O custo da
+consulta passa a depender do número de dias/tipos no período, não do
+volume do histórico.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from ..config import CAMPAIGN_STATS_REFRESH_INTERVAL
+from .campaign_repository import CampaignRepository, CampaignRepositoryError, get_campaign_repository
+
+logger = logging.getLogger("3afrios.campaign_stats")
+
+
+class CampaignStats:
+    """Rollup diário de campanhas com atualização incremental"""
+
+    def __init__(self, repo: Optional[CampaignRepository] = None, intervalo_segundos: float = CAMPAIGN_STATS_REFRESH_INTERVAL):
+        self.repo = repo or get_campaign_repository()
+        self.intervalo_segundos = intervalo_segundos
+        self.disponivel = True
+        self._ultima_atualizacao = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def atualizar(self, forcar: bool = False) -> Optional[int]:
+        """Atualiza o rollup se o intervalo venceu; retorna os dias recalculados"""
+        if not self.disponivel:
+            return None
+        if not forcar and time.monotonic() - self._ultima_atualizacao < self.intervalo_segundos:
+            return None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Outra requisição pode ter atualizado enquanto esperava o lock
+            if not forcar and time.monotonic() - self._ultima_atualizacao < self.intervalo_segundos:
+                return None
+            try:
+                dias = await self.repo.rpc("atualizar_estatisticas_campanhas", {"p_completo": False})
+            except CampaignRepositoryError as e:
+                if e.status_code == 404:
+                    logger.warning("[Campaign Stats] Rollup não instalado (migrations/campanhas_estatisticas.sql)")
+                    self.disponivel = False
+                    return None
+                raise
+            self._ultima_atualizacao = time.monotonic()
+            if dias:
+                logger.info(f"[Campaign Stats] Rollup atualizado: {dias} dia(s) recalculado(s)")
+            return dias
+
+    async def estatisticas(self, data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Estatísticas gerais e por tipo lidas do rollup; None se o rollup não
+        estiver instalado (a API cai no cálculo antigo)
+        """
+        try:
+            await self.atualizar()
+        except Exception as e:
+            # Rollup desatualizado ainda é melhor que nenhum
+            logger.error(f"[Campaign Stats] Erro ao atualizar rollup: {e}")
+        if not self.disponivel:
+            return None
+
+        params = {"start_date": data_inicio, "end_date": data_fim}
+        try:
+            gerais, por_tipo = await asyncio.gather(
+                self.repo.rpc("get_campaign_stats", params),
+                self.repo.rpc("get_campaign_stats_by_type", params),
+            )
+        except CampaignRepositoryError as e:
+            if e.status_code == 404:
+                self.disponivel = False
+                return None
+            raise
+
+        return {
+            "estatisticas_gerais": gerais[0] if gerais else {},
+            "estatisticas_por_tipo": por_tipo or []
+        }
+
+
+# Instância global
+_campaign_stats = None
+
+def get_campaign_stats() -> CampaignStats:
+    """Retorna instância global das estatísticas de campanhas"""
+    global _campaign_stats
+    if _campaign_stats is None:
+        _campaign_stats = CampaignStats()
+    return _campaign_stats
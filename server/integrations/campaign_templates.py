@@ -0,0 +1,108 @@
+"""
+Compilador de Templates de Campanha - 3A Frios
+==============================================
+
+Os placeholders `{variavel}` de título e conteúdo são analisados uma vez
+(cache por texto) e o template compilado renderiza numa única passada,
+em vez de um `str.replace` por variável a cada envio.
+
+`validar_template` rejeita variáveis fora de `VARIAVEIS_DISPONIVEIS` (a mesma
+lista exposta em `GET /api/campanhas/variaveis`), então templates quebrados
+falham ao salvar e não no meio de um disparo.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Any, List
+
+VARIAVEIS_DISPONIVEIS: Dict[str, List[str]] = {
+    "cliente": [
+        "nome_cliente", "telefone_cliente", "email_cliente",
+        "endereco_cliente", "cidade_cliente"
+    ],
+    "produto": [
+        "produto_interesse", "categoria_produto", "preco_produto",
+        "descricao_produto", "disponibilidade_produto"
+    ],
+    "oferta": [
+        "valor_oferta", "percentual_desconto", "valor_desconto",
+        "condicoes_oferta", "validade_oferta"
+    ],
+    "entrega": [
+        "prazo_entrega", "data_entrega", "taxa_entrega",
+        "endereco_entrega", "horario_entrega"
+    ],
+    "empresa": [
+        "nome_empresa", "telefone_empresa", "endereco_empresa",
+        "horario_funcionamento", "site_empresa"
+    ]
+}
+
+NOMES_VARIAVEIS = frozenset(v for grupo in VARIAVEIS_DISPONIVEIS.values() for v in grupo)
+
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+class TemplateInvalido(ValueError):
+    """Template com variáveis desconhecidas"""
+
+    def __init__(self, desconhecidas: List[str]):
+        self.desconhecidas = desconhecidas
+        super().__init__(f"Variáveis desconhecidas no template: {', '.join('{' + v + '}' for v in desconhecidas)}")
+
+
+class TextoCompilado:
+    """
+    Texto quebrado uma vez em literais e placeholders: `partes` alterna
+    literal, variável, literal, ... e `slots` guarda (posição, nome, texto
+    original) de cada placeholder, então `render` só preenche as posições
+    e faz um único join
+    """
+
+    __slots__ = ("texto", "partes", "slots", "variaveis")
+
+    def __init__(self, texto: str):
+        self.texto = texto or ""
+        self.partes = tuple(PLACEHOLDER_RE.split(self.texto))
+        self.slots = tuple((i, self.partes[i], "{" + self.partes[i] + "}") for i in range(1, len(self.partes), 2))
+        self.variaveis = frozenset(nome for _, nome, _ in self.slots)
+
+    def render(self, valores: Dict[str, Any]) -> str:
+        if not self.slots:
+            return self.texto
+        saida = list(self.partes)
+        for i, nome, original in self.slots:
+            # Variável sem valor fica como estava (mesmo comportamento do replace)
+            valor = valores.get(nome, original)
+            saida[i] = valor if isinstance(valor, str) else str(valor)
+        return "".join(saida)
+
+
+@lru_cache(maxsize=512)
+def compilar(texto: str) -> TextoCompilado:
+    return TextoCompilado(texto)
+
+
+def variaveis_desconhecidas(*textos: str) -> List[str]:
+    usadas = set()
+    for texto in textos:
+        usadas |= compilar(texto or "").variaveis
+    return sorted(usadas - NOMES_VARIAVEIS)
+
+
+def validar_template(titulo: str, conteudo: str) -> None:
+    """Levanta TemplateInvalido se usar variáveis fora de VARIAVEIS_DISPONIVEIS"""
+    desconhecidas = variaveis_desconhecidas(titulo, conteudo)
+    if desconhecidas:
+        raise TemplateInvalido(desconhecidas)
+
+
+def render_template(template: Dict[str, Any], variaveis: Dict[str, Any]) -> Dict[str, str]:
+    """Título, conteúdo e texto completo renderizados numa passada cada"""
+    titulo = compilar(template.get("template_titulo") or "").render(variaveis)
+    conteudo = compilar(template.get("template_conteudo") or "").render(variaveis)
+    return {
+        "titulo": titulo,
+        "conteudo": conteudo,
+        "texto_completo": f"{titulo}\n\n{conteudo}"
+    }
@@ -4,6 +4,7 @@ import httpx
 import logging
 import json
 import asyncio
+from contextlib import asynccontextmanager
 from ..config import (
     EVOLUTION_ENABLED,
     EVOLUTION_BASE_URL,
@@ -11,39 +12,8 @@ from ..config import (
     EVOLUTION_INSTANCE_ID,
     EVOLUTION_SEND_TEXT_PATH,
 )
-
-
-def _sanitize_text(s: str) -> str:
-    s = (s or "").replace("\r\n", "\n").replace("\x0b", "\n")
-    import re
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    s = re.sub(r"[ \t]+", " ", s)
-    return s.strip()
-
-
-def _fix_mojibake(s: str) -> str:
-    try:
-        if any(ch in s for ch in ("Ã", "Â", "¤", "â")):
-            return s.encode("latin-1", errors="ignore").decode("utf-8", errors="ignore")
-    except Exception:
-        pass
-    return s
-
-
-def _normalize_ptbr(s: str) -> str:
-    if not s:
-        return ""
-    try:
-        s = s.encode("latin-1", errors="ignore").decode("utf-8", errors="ignore")
-    except Exception:
-        pass
-    s = s.replace("–", "-").replace("—", "-")
-    import re
-    s = re.sub(r"\s*â+\s*R\$", " - R$", s)
-    s = re.sub(r"(R\$\s*\d+(?:\.\d{3})*)\.(\d{2})", r"\1,\2", s)
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return _sanitize_text(s)
+from ..tracing import medir
+from ..normalizacao import normalizar_ptbr
 
 
 def _normalize_instance_id(s: str) -> str:
@@ -66,6 +36,19 @@ def _normalize_phone_br(s: str) -> str:
     return digits
 
 
+@asynccontextmanager
+async def _cliente_http():
+    """Cliente com pool do lifespan (server/recursos.py); fora do app, um por chamada"""
+    from ..recursos import get_recursos
+    client = get_recursos().http_evolution
+    if client is not None and not client.is_closed:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=10) as client:
+        yield client
+
+
+@medir("send_text")
 async def send_text(telefone: str, texto: str) -> dict:
     if not EVOLUTION_ENABLED:
         return {"sent": False, "reason": "disabled"}
@@ -73,7 +56,7 @@ async def send_text(telefone: str, texto: str) -> dict:
         return {"sent": False, "reason": "missing_config"}
 
     phone = _normalize_phone_br(telefone)
-    safe_text = _normalize_ptbr(_fix_mojibake(_sanitize_text(texto)))
+    safe_text = normalizar_ptbr(texto)
     if not phone:
         return {"sent": False, "reason": "invalid_phone"}
     if not safe_text:
@@ -206,7 +189,7 @@ async def send_text(telefone: str, texto: str) -> dict:
                 return "instance_offline"
         return "unknown"
 
-    async with httpx.AsyncClient(timeout=10) as client:
+    async with _cliente_http() as client:
         attempts = []
         max_retries = 3
         backoff_base = 0.5
@@ -247,7 +230,7 @@ async def send_text_chat(chat_id: str, texto: str) -> dict:
     if not (EVOLUTION_BASE_URL and EVOLUTION_API_KEY and EVOLUTION_INSTANCE_ID and EVOLUTION_SEND_TEXT_PATH):
         return {"sent": False, "reason": "missing_config"}
 
-    safe_text = _normalize_ptbr(_fix_mojibake(_sanitize_text(texto)))
+    safe_text = normalizar_ptbr(texto)
     chat_id = str(chat_id or "").strip()
     if not safe_text:
         return {"sent": False, "reason": "empty_text"}
@@ -303,7 +286,7 @@ async def send_text_chat(chat_id: str, texto: str) -> dict:
     variants.append(("apikey_qs_noinst_chatId_text", url_no_instance_q_apikey, headers_apikey, {"chatId": chat_id, "text": safe_text, "instance": inst}))
     variants.append(("token_qs_noinst_chatId_text", url_no_instance_q_token, headers_apikey, {"chatId": chat_id, "text": safe_text, "instance": inst}))
 
-    async with httpx.AsyncClient(timeout=10) as client:
+    async with _cliente_http() as client:
         attempts = []
         max_retries = 3
         backoff_base = 0.5
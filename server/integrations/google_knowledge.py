@@ -1,10 +1,13 @@
 import json
 import os
-from typing import Dict, Any, List
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Any, Hashable, List, Optional, Tuple
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+# googleapiclient/google.auth custam ~0,2s de import: carregados só ao
+# montar credenciais/serviços (ver _load_credentials e _build_service)
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 # trecho de imports do módulo
 from ..config import (
@@ -25,11 +28,95 @@ from ..config import (
     GOOGLE_SHEET_GID_DESC,
     GOOGLE_SHEET_TAB_PRECO,
     GOOGLE_SHEET_GID_PRECO,
+    GOOGLE_API_ENDPOINT,
+    GOOGLE_CACHE_TTL_SECONDS,
 )
 
 
-def _load_credentials() -> Credentials | None:
+def _build_service(api: str, versao: str, creds: "Credentials"):
+    from googleapiclient.discovery import build
+    if GOOGLE_API_ENDPOINT:
+        return build(api, versao, credentials=creds, client_options={"api_endpoint": GOOGLE_API_ENDPOINT})
+    return build(api, versao, credentials=creds)
+
+
+class GoogleServices:
+    """
+    Credenciais e serviços Docs/Sheets do processo, construídos uma vez (o
+    token expirado é renovado pelo próprio transporte autorizado), e snapshot
+    do documento/planilha por GOOGLE_CACHE_TTL_SECONDS. Vive no container de
+    recursos; as chamadas bloqueantes rodam fora do event loop
+    (`asyncio.to_thread` no orquestrador).
+    """
+
+    def __init__(self, ttl_seconds: float = GOOGLE_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._creds: "Credentials | None" = None
+        self._servicos: Dict[str, Any] = {}
+        self._snapshots: Dict[Hashable, Tuple[float, Any]] = {}
+        # httplib2 (transporte dos serviços) não é thread-safe: uma chamada por vez
+        self.lock = threading.RLock()
+
+    def servico(self, api: str, versao: str):
+        """Serviço `api` construído uma vez; None sem credenciais (tenta de novo na próxima)"""
+        with self.lock:
+            service = self._servicos.get(api)
+            if service is None:
+                if self._creds is None:
+                    self._creds = _load_credentials()
+                    if self._creds is None:
+                        return None
+                service = self._servicos[api] = _build_service(api, versao, self._creds)
+            return service
+
+    def snapshot(self, chave: Hashable, carregar: Callable[[], Any], guardar: Callable[[Any], bool] = bool) -> Any:
+        """
+        Resultado de `carregar()` reaproveitado por ttl_seconds: o mesmo objeto
+        entre chamadas (os índices do catálogo são chaveados por ele).
+        Resultado que `guardar` rejeita (vazio = falha) não fica em cache.
+        """
+        em_cache = self._snapshots.get(chave)
+        if em_cache and time.monotonic() - em_cache[0] < self.ttl_seconds:
+            return em_cache[1]
+        with self.lock:
+            em_cache = self._snapshots.get(chave)
+            if em_cache and time.monotonic() - em_cache[0] < self.ttl_seconds:
+                return em_cache[1]
+            valor = carregar()
+            if guardar(valor):
+                self._snapshots[chave] = (time.monotonic(), valor)
+            return valor
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self._snapshots.clear()
+
+    def aquecer(self) -> bool:
+        """Startup: importa o SDK, carrega as credenciais e constrói os serviços"""
+        import googleapiclient.discovery  # noqa: F401
+        return self.servico("docs", "v1") is not None and self.servico("sheets", "v4") is not None
+
+
+# Instância global
+_google_services: Optional[GoogleServices] = None
+
+def get_google_services() -> GoogleServices:
+    """Retorna instância global dos serviços Google"""
+    global _google_services
+    if _google_services is None:
+        _google_services = GoogleServices()
+    return _google_services
+
+
+def aquecer() -> bool:
+    """Startup: ver GoogleServices.aquecer"""
+    return get_google_services().aquecer()
+
+
+def _load_credentials() -> "Credentials | None":
     import logging
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
     logger = logging.getLogger("3afrios.backend")
     
     if not GOOGLE_ENABLED:
@@ -112,14 +199,15 @@ def _load_credentials() -> Credentials | None:
         return None
 
 
-def fetch_doc_text(doc_id: str | None = None, max_chars: int = 4000) -> str:
+def fetch_doc_text(doc_id: str | None = None, max_chars: int = 4000, servicos: Optional[GoogleServices] = None) -> str:
     if not doc_id:
         return ""
-    creds = _load_credentials()
-    if not creds:
+    servicos = servicos or get_google_services()
+    service = servicos.servico("docs", "v1")
+    if not service:
         return ""
-    service = build("docs", "v1", credentials=creds)
-    doc = service.documents().get(documentId=doc_id).execute()
+    with servicos.lock:
+        doc = service.documents().get(documentId=doc_id).execute()
     content = doc.get("body", {}).get("content", [])
 
     def _extract_text(elements: List[dict]) -> str:
@@ -149,7 +237,15 @@ from ..config import (
     GOOGLE_SHEET_RANGE,
 )
 
-def fetch_sheet_catalog(sheet_id: str | None = None, value_range: str | None = None, max_items: int = 15) -> Dict[str, Any]:
+def fetch_sheet_catalog(sheet_id: str | None = None, value_range: str | None = None, max_items: int = 15,
+                        servicos: Optional[GoogleServices] = None) -> Dict[str, Any]:
+    """Planilha do catálogo; as chamadas à API rodam sob `servicos.lock`"""
+    servicos = servicos or get_google_services()
+    with servicos.lock:
+        return _fetch_sheet_catalog(servicos, sheet_id, value_range, max_items)
+
+
+def _fetch_sheet_catalog(servicos: GoogleServices, sheet_id: str | None, value_range: str | None, max_items: int) -> Dict[str, Any]:
     import logging
     logger = logging.getLogger("3afrios.backend")
     
@@ -159,19 +255,14 @@ def fetch_sheet_catalog(sheet_id: str | None = None, value_range: str | None = N
     
     logger.info(f"[GoogleSheets] Tentando acessar planilha: {sheet_id}")
     
-    creds = _load_credentials()
-    if not creds:
-        logger.error("[GoogleSheets] Falha ao carregar credenciais")
-        return {"items": [], "headers": [], "preview": ""}
-        
-    logger.info("[GoogleSheets] Credenciais carregadas com sucesso")
-    
     try:
-        service = build("sheets", "v4", credentials=creds)
-        logger.info("[GoogleSheets] Serviço Google Sheets inicializado")
+        service = servicos.servico("sheets", "v4")
     except Exception as e:
         logger.error(f"[GoogleSheets] Erro ao inicializar serviço: {e}")
         return {"items": [], "headers": [], "preview": ""}
+    if not service:
+        logger.error("[GoogleSheets] Falha ao carregar credenciais")
+        return {"items": [], "headers": [], "preview": ""}
 
     rng = (value_range or GOOGLE_SHEET_RANGE or "A1:Z1000").strip()
 
@@ -343,22 +434,42 @@ def fetch_sheet_catalog(sheet_id: str | None = None, value_range: str | None = N
     return {"items": items, "headers": headers, "preview": "\n".join(preview_lines)}
 
 
-def build_context_for_intent(intent: str) -> Dict[str, Any]:
+def build_context_for_intent(intent: str, servicos: Optional[GoogleServices] = None) -> Dict[str, Any]:
+    """
+    Contexto do Google para o agente. Bloqueante (rede na primeira chamada
+    e quando o snapshot vence): chame via `asyncio.to_thread` no event loop.
+    Devolve um dict novo a cada chamada; as listas vêm do snapshot e são
+    compartilhadas (não altere).
+    """
+    servicos = servicos or get_google_services()
+    contexto = servicos.snapshot(
+        ("contexto", intent),
+        lambda: _montar_contexto(intent, servicos),
+        guardar=lambda ctx: bool(ctx.get("catalog_items") or ctx.get("identity_text")),
+    )
+    return dict(contexto)
+
+
+def _montar_contexto(intent: str, servicos: GoogleServices) -> Dict[str, Any]:
     import logging
     logger = logging.getLogger("3afrios.backend")
     
     logger.info(f"[GoogleKnowledge] Construindo contexto para intent: {intent}")
     
-    identity_text = fetch_doc_text(GOOGLE_DOC_ID, max_chars=2000) if GOOGLE_DOC_ID else ""
+    identity_text = (
+        servicos.snapshot("doc", lambda: fetch_doc_text(GOOGLE_DOC_ID, max_chars=2000, servicos=servicos))
+        if GOOGLE_DOC_ID else ""
+    )
     # Usa range/aba configurável e captura itens estruturados
     catalog = (
-        fetch_sheet_catalog(GOOGLE_SHEET_ID, value_range=GOOGLE_SHEET_RANGE, max_items=50)
+        servicos.snapshot("planilha", lambda: fetch_sheet_catalog(
+            GOOGLE_SHEET_ID, value_range=GOOGLE_SHEET_RANGE, max_items=50, servicos=servicos))
         if GOOGLE_SHEET_ID else {"items": [], "headers": [], "preview": ""}
     )
     
     logger.info(f"[GoogleKnowledge] Catalog fetched - items: {len(catalog.get('items', []))}, preview: {len(catalog.get('preview', ''))}")
     if catalog.get('items'):
-        logger.info(f"[GoogleKnowledge] Primeiro item: {catalog['items'][0]}")
+        logger.debug("[GoogleKnowledge] Primeiro item: %s", catalog['items'][0])
     
     ctx: Dict[str, Any] = {
         "identity_text": identity_text,
@@ -0,0 +1,166 @@
+"""
+Listagem de Leads - 3A Frios
+============================
+
+Consulta paginada de `clientes_delivery` para `GET /api/leads`, com filtros e
+ordenação no servidor e o resumo da conversa de cada cliente (última
+mensagem, agente e total) lido das colunas mantidas por trigger
+(migrations/leads_resumo.sql) - sem agregar `temp_messages` por requisição.
+
+Páginas idênticas são servidas de um cache em memória por
+LEADS_CACHE_TTL_SECONDS, então abrir/atualizar a tela de leads vira uma
+consulta barata (ou nenhuma).
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config import LEADS_CACHE_TTL_SECONDS
+from .campaign_repository import CLIENTES_TABLE, _content_range_total
+from .supabase_store import _client
+
+logger = logging.getLogger("3afrios.lead_repository")
+
+MAX_CACHE_PAGINAS = 128
+
+COLUNAS_LEAD = (
+    "id,nome,telefone,endereco,lead_score,lead_status,interesse_declarado,"
+    "frequencia_compra,valor_potencial,created_at,updated_at"
+)
+COLUNAS_RESUMO = "last_message_at,ultima_mensagem,ultimo_agente,total_mensagens"
+
+# Ordenação da API -> order do PostgREST (id desempata para páginas estáveis)
+ORDENACOES = {
+    "ultima_mensagem": "last_message_at.desc.nullslast,id.desc",
+    "lead_score": "lead_score.desc,id.desc",
+    "atualizado": "updated_at.desc,id.desc",
+    "criado": "created_at.desc,id.desc",
+    "nome": "nome.asc.nullslast,id.asc",
+}
+
+
+class LeadRepositoryError(Exception):
+    """Erro retornado pelo PostgREST"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def filtros_leads(
+    busca: Optional[str] = None,
+    lead_status: Optional[List[str]] = None,
+    lead_score_min: Optional[int] = None,
+    lead_score_max: Optional[int] = None,
+    mensagem_desde: Optional[str] = None,
+    agente: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """Filtros PostgREST sobre `clientes_delivery`"""
+    filtros: List[Tuple[str, str]] = []
+    if busca:
+        # Caracteres reservados da sintaxe or=(...) do PostgREST
+        termo = "".join(ch for ch in busca.strip() if ch not in ",()*\"")
+        if termo:
+            filtros.append(("or", f"(nome.ilike.*{termo}*,telefone.ilike.*{termo}*)"))
+    if lead_status:
+        valores = ",".join('"' + s.replace('"', '') + '"' for s in lead_status)
+        filtros.append(("lead_status", f"in.({valores})"))
+    if lead_score_min is not None:
+        filtros.append(("lead_score", f"gte.{int(lead_score_min)}"))
+    if lead_score_max is not None:
+        filtros.append(("lead_score", f"lte.{int(lead_score_max)}"))
+    if mensagem_desde:
+        filtros.append(("last_message_at", f"gte.{mensagem_desde}"))
+    if agente:
+        filtros.append(("ultimo_agente", f"eq.{agente}"))
+    return filtros
+
+
+class LeadRepository:
+    """Página de leads com resumo de conversa e cache de curta duração"""
+
+    def __init__(self, ttl_seconds: float = LEADS_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        # False se migrations/leads_resumo.sql não foi executado
+        self.resumo_disponivel = True
+        self._cache: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+    async def _consultar(self, params: List[Tuple[str, str]]) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        async with await _client() as c:
+            resp = await c.get(f"/{CLIENTES_TABLE}", params=params, headers={"Prefer": "count=exact"})
+        if not (200 <= resp.status_code < 300):
+            raise LeadRepositoryError(f"Erro ao consultar leads: {resp.status_code} {resp.text[:200]}", resp.status_code)
+        return resp.json() or [], _content_range_total(resp.headers.get("content-range"))
+
+    async def _pagina(self, filtros: List[Tuple[str, str]], ordenar: str, limit: int, offset: int) -> Dict[str, Any]:
+        if self.resumo_disponivel:
+            params = [("select", f"{COLUNAS_LEAD},{COLUNAS_RESUMO}"), *filtros,
+                      ("order", ORDENACOES[ordenar]), ("limit", str(limit)), ("offset", str(offset))]
+            try:
+                rows, total = await self._consultar(params)
+                return {"data": rows, "total": total}
+            except LeadRepositoryError as e:
+                # 400 = coluna inexistente: resumo ainda não instalado
+                if e.status_code != 400 or not any(col in str(e) for col in COLUNAS_RESUMO.split(",")):
+                    raise
+                logger.warning("[Leads] Resumo de conversas não instalado (migrations/leads_resumo.sql)")
+                self.resumo_disponivel = False
+
+        # Sem as colunas de resumo: filtros/ordenação que dependem delas são ignorados
+        filtros = [(k, v) for k, v in filtros if k not in ("last_message_at", "ultimo_agente")]
+        ordem = ORDENACOES["atualizado"] if ordenar == "ultima_mensagem" else ORDENACOES[ordenar]
+        params = [("select", COLUNAS_LEAD), *filtros,
+                  ("order", ordem), ("limit", str(limit)), ("offset", str(offset))]
+        rows, total = await self._consultar(params)
+        for row in rows:
+            row.update(last_message_at=None, ultima_mensagem=None, ultimo_agente=None, total_mensagens=None)
+        return {"data": rows, "total": total}
+
+    async def listar(
+        self,
+        filtros: List[Tuple[str, str]],
+        ordenar: str = "ultima_mensagem",
+        limit: int = 50,
+        offset: int = 0,
+        usar_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Página de leads: `{data, total, has_more, cache}`. Levanta ValueError
+        para ordenação desconhecida.
+        """
+        if ordenar not in ORDENACOES:
+            raise ValueError(f"ordenar deve ser um de: {', '.join(ORDENACOES)}")
+
+        chave = (tuple(filtros), ordenar, limit, offset)
+        agora = time.monotonic()
+        if usar_cache:
+            em_cache = self._cache.get(chave)
+            if em_cache and agora - em_cache[0] < self.ttl_seconds:
+                self._cache.move_to_end(chave)
+                return dict(em_cache[1], cache=True)
+
+        pagina = await self._pagina(filtros, ordenar, limit, offset)
+        total = pagina["total"]
+        pagina["has_more"] = offset + len(pagina["data"]) < total if total is not None else len(pagina["data"]) == limit
+
+        self._cache[chave] = (agora, pagina)
+        self._cache.move_to_end(chave)
+        while len(self._cache) > MAX_CACHE_PAGINAS:
+            self._cache.popitem(last=False)
+        return dict(pagina, cache=False)
+
+
+# Instância global
+_lead_repository = None
+
+def get_lead_repository() -> LeadRepository:
+    """Retorna instância global do repositório de leads"""
+    global _lead_repository
+    if _lead_repository is None:
+        _lead_repository = LeadRepository()
+    return _lead_repository
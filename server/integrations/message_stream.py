@@ -0,0 +1,133 @@
+"""
+Stream de Mensagens para o Dashboard - 3A Frios
+===============================================
+
+Distribui para o dashboard (SSE em `GET /api/conversas/stream`) as mensagens
+gravadas por `persist_conversation`, no lugar do polling de `temp_messages`
+a cada 2s por conversa aberta.
+
+- Filtro por assinante: um cliente (`cliente_id`/`telefone`) ou todos.
+- Backpressure: cada assinante tem uma fila limitada; se o navegador não
+  consome, os eventos mais antigos são descartados e o assinante recebe um
+  evento `resync` para recarregar a conversa pela API.
+- Buffer circular dos últimos eventos para retomar a partir de
+  `Last-Event-ID` após reconexão do EventSource.
+
+O broker é por processo: com várias réplicas, cada uma só vê as mensagens
+que ela mesma gravou (o cliente recebe `resync` ao reconectar em outra).
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional, Set
+
+logger = logging.getLogger("3afrios.message_stream")
+
+FILA_ASSINANTE = 100
+BUFFER_EVENTOS = 500
+
+
+class Assinante:
+    """Conexão SSE com seu filtro e fila limitada"""
+
+    def __init__(self, cliente_id: Optional[str] = None, telefone: Optional[str] = None, tamanho_fila: int = FILA_ASSINANTE):
+        self.cliente_id = str(cliente_id) if cliente_id not in (None, "") else None
+        self.telefone = telefone or None
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=tamanho_fila)
+        self.descartados = 0
+        self._resync_pendente = False
+
+    def aceita(self, evento: Dict[str, Any]) -> bool:
+        if self.cliente_id is None and self.telefone is None:
+            return True
+        if self.cliente_id is not None and evento.get("cliente_id") == self.cliente_id:
+            return True
+        return self.telefone is not None and evento.get("telefone") == self.telefone
+
+    def entregar(self, evento: Dict[str, Any]) -> None:
+        """Nunca bloqueia quem publica: com a fila cheia, descarta o mais antigo"""
+        try:
+            self.fila.put_nowait(evento)
+            return
+        except asyncio.QueueFull:
+            pass
+        try:
+            self.fila.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self.descartados += 1
+        self._resync_pendente = True
+        self.fila.put_nowait(evento)
+
+    def consumir_resync(self) -> bool:
+        pendente, self._resync_pendente = self._resync_pendente, False
+        return pendente
+
+
+class MessageBroker:
+    """Pub/sub em memória das mensagens de conversa"""
+
+    def __init__(self, buffer: int = BUFFER_EVENTOS):
+        self._assinantes: Set[Assinante] = set()
+        self._buffer: deque = deque(maxlen=buffer)
+        self._seq = 0
+
+    @property
+    def total_assinantes(self) -> int:
+        return len(self._assinantes)
+
+    def assinar(self, cliente_id: Optional[str] = None, telefone: Optional[str] = None, ultimo_id: Optional[int] = None) -> Assinante:
+        assinante = Assinante(cliente_id, telefone)
+        if ultimo_id is not None:
+            perdidos = [e for e in self._buffer if e["seq"] > ultimo_id and assinante.aceita(e)]
+            # Lacuna maior que o buffer: melhor recarregar do que entregar pela metade
+            if self._buffer and self._buffer[0]["seq"] > ultimo_id + 1:
+                assinante._resync_pendente = True
+            for evento in perdidos[-assinante.fila.maxsize:]:
+                assinante.entregar(evento)
+        self._assinantes.add(assinante)
+        return assinante
+
+    def cancelar(self, assinante: Assinante) -> None:
+        self._assinantes.discard(assinante)
+
+    def publicar(self, evento: Dict[str, Any]) -> Dict[str, Any]:
+        self._seq += 1
+        evento = dict(evento, seq=self._seq)
+        self._buffer.append(evento)
+        for assinante in list(self._assinantes):
+            if assinante.aceita(evento):
+                assinante.entregar(evento)
+        return evento
+
+    def encerrar(self) -> None:
+        """Shutdown: avisa cada assinante (evento `encerrando`) e esvazia a lista"""
+        for assinante in list(self._assinantes):
+            assinante.entregar({"tipo": "encerrando", "seq": self._seq})
+        self._assinantes.clear()
+
+    def publicar_mensagens(self, cliente_id, telefone: str, mensagens: List[Dict[str, Any]]) -> None:
+        """Chamado por persist_conversation após gravar em temp_messages"""
+        if not mensagens:
+            return
+        cid = str(cliente_id) if cliente_id is not None else None
+        for msg in mensagens:
+            self.publicar({"tipo": "mensagem", "cliente_id": cid, "telefone": telefone or None, "mensagem": msg})
+
+
+def formatar_sse(evento: Dict[str, Any]) -> str:
+    dados = json.dumps(evento.get("mensagem") or evento, ensure_ascii=False, default=str)
+    return f"id: {evento.get('seq', '')}\nevent: {evento.get('tipo', 'mensagem')}\ndata: {dados}\n\n"
+
+
+# Instância global
+_message_broker = None
+
+def get_message_broker() -> MessageBroker:
+    """Retorna instância global do broker de mensagens"""
+    global _message_broker
+    if _message_broker is None:
+        _message_broker = MessageBroker()
+    return _message_broker
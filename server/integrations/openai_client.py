@@ -1,12 +1,26 @@
-from openai import OpenAI
 from ..config import OPENAI_ENABLED, OPENAI_API_KEY, OPENAI_MODEL
+from ..tracing import medir
 
-_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# O SDK da OpenAI é o import mais pesado do backend (~0,5s): só é carregado
+# na primeira chamada, fora do cold start
+_client = None
 
+
+def get_openai_client():
+    """Cliente OpenAI criado sob demanda (None sem OPENAI_API_KEY)"""
+    global _client
+    if _client is None and OPENAI_API_KEY:
+        from openai import OpenAI
+        _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+
+@medir("generate_response")
 def generate_response(system_prompt: str, user_message: str) -> str:
-    if not OPENAI_ENABLED or not _client:
+    client = get_openai_client() if OPENAI_ENABLED else None
+    if not client:
         return ""
-    resp = _client.chat.completions.create(
+    resp = client.chat.completions.create(
         model=OPENAI_MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -18,14 +32,15 @@ def generate_response(system_prompt: str, user_message: str) -> str:
 
 def polish_text_ptbr(text: str) -> str:
     # Usa o modelo para revisar ortografia/pontuação sem alterar o sentido
-    if not OPENAI_ENABLED or not _client:
+    client = get_openai_client() if OPENAI_ENABLED else None
+    if not client:
         return text
     system = (
         "Você é um revisor de texto em português (pt-BR). "
         "Corrija acentuação, ortografia, pontuação e espaçamento, "
         "mantendo o sentido e sem mudar nomes/valores. Não use emojis."
     )
-    resp = _client.chat.completions.create(
+    resp = client.chat.completions.create(
         model=OPENAI_MODEL,
         messages=[
             {"role": "system", "content": system},
@@ -1,22 +1,127 @@
 import os
 import time
+import asyncio
 import httpx
 import logging
-from ..config import SUPABASE_URL, SUPABASE_SERVICE_ROLE
+from ..config import SUPABASE_URL, SUPABASE_SERVICE_ROLE, CARRINHO_EXPIRACAO_HORAS
 import typing as _t
-from .evolution import _sanitize_text, _fix_mojibake
+from ..normalizacao import limpar_texto, normalizar_ptbr
+from .message_stream import get_message_broker
+from ..tracing import medir
 
 logger = logging.getLogger(__name__)
 
+# Último (lead_score, lead_status) conhecido no banco por telefone. Alimentado
+# pelas leituras de clientes e pelos PATCHs do Bruno; evita reescrever o
+# cliente quando a qualificação não mudou.
+_LEAD_SNAPSHOT: dict[str, dict] = {}
+_LEAD_SNAPSHOT_MAX = 10000
 
-async def _client() -> httpx.AsyncClient:
+_BRUNO_LEAD_STATUS = {
+    'hot': 'pronto_para_comprar',
+    'warm': 'interessado',
+    'cold': 'novo'
+}
+
+
+# Campos que o Bruno escreve em clientes_delivery (os que entram no snapshot)
+_CAMPOS_BRUNO = ("lead_score", "lead_status", "interesse_declarado", "valor_potencial", "frequencia_compra")
+
+
+def _remember_lead_snapshot(telefone: str, dados: dict) -> None:
+    """Mescla no snapshot os campos do Bruno presentes em `dados` (linha lida ou PATCH)"""
+    if not telefone or not dados:
+        return
+    if len(_LEAD_SNAPSHOT) >= _LEAD_SNAPSHOT_MAX and telefone not in _LEAD_SNAPSHOT:
+        _LEAD_SNAPSHOT.pop(next(iter(_LEAD_SNAPSHOT)), None)
+    snapshot = _LEAD_SNAPSHOT.setdefault(telefone, {})
+    snapshot.update({k: dados[k] for k in _CAMPOS_BRUNO if k in dados})
+
+
+def _lead_sem_mudanca(telefone: str, campos: dict) -> bool:
+    """Todos os campos do PATCH já estão com esse valor no último estado conhecido"""
+    snapshot = _LEAD_SNAPSHOT.get(telefone)
+    return snapshot is not None and all(k in snapshot and snapshot[k] == v for k, v in campos.items())
+
+
+# ===================================
+# POOL DE CONEXÕES (PostgREST)
+# ===================================
+# No app, o cliente do container de recursos; fora dele, um httpx.AsyncClient
+# por event loop. Reaproveitado por todas as chamadas (keep-alive + limite de
+# conexões). `_client()` continua sendo usado com `async with`, mas a saída
+# do bloco não fecha o cliente compartilhado.
+
+_HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30)
+_HTTP_POOL: dict[int, tuple] = {}
+
+
+def new_http_client() -> httpx.AsyncClient:
+    """Cliente novo do PostgREST (o do container do lifespan ou o de um loop do pool)"""
     headers = {
         "apikey": SUPABASE_SERVICE_ROLE,
         "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE}",
         "Content-Type": "application/json",
         "Prefer": "return=representation",
     }
-    return httpx.AsyncClient(base_url=f"{SUPABASE_URL.rstrip('/')}/rest/v1", headers=headers, timeout=10)
+    return httpx.AsyncClient(
+        base_url=f"{SUPABASE_URL.rstrip('/')}/rest/v1",
+        headers=headers,
+        timeout=10,
+        limits=_HTTP_LIMITS,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente HTTP compartilhado do event loop atual"""
+    loop = asyncio.get_running_loop()
+    entry = _HTTP_POOL.get(id(loop))
+    if entry is None or entry[0] is not loop or entry[1].is_closed:
+        # Descarta clientes de loops já encerrados (ex.: asyncio.run em scripts)
+        for key, (other_loop, _) in list(_HTTP_POOL.items()):
+            if other_loop.is_closed():
+                _HTTP_POOL.pop(key, None)
+        entry = (loop, new_http_client())
+        _HTTP_POOL[id(loop)] = entry
+    return entry[1]
+
+
+async def close_http_clients() -> None:
+    """Fecha os clientes do pool (shutdown)"""
+    for key, (loop, client) in list(_HTTP_POOL.items()):
+        _HTTP_POOL.pop(key, None)
+        if not client.is_closed and not loop.is_closed():
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+
+
+class _PooledClient:
+    """`async with` sobre o cliente compartilhado, sem fechá-lo na saída"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self._client = client
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        return self._client
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+
+def _http_client_ativo() -> httpx.AsyncClient:
+    # No app, o cliente do container do lifespan (recursos.http_supabase);
+    # fora dele (scripts, benchmarks, asyncio.run), o do pool do loop atual
+    from ..recursos import get_recursos
+    client = get_recursos().http_supabase
+    if client is not None and not client.is_closed:
+        return client
+    return get_http_client()
+
+
+async def _client() -> _PooledClient:
+    return _PooledClient(_http_client_ativo())
 
 
 # Cliente Supabase síncrono para uso nas APIs
@@ -77,12 +182,14 @@ async def _find_cliente_by_telefone(telefone: str) -> dict | None:
         if 200 <= resp.status_code < 300:
             data = resp.json() or []
             if data:
+                _remember_lead_snapshot(telefone, data[0])
                 return data[0]
         # Fallback tolerante: ilike para casos com formatação divergente
         resp2 = await c.get("/clientes_delivery", params={"select": "*", "telefone": f"ilike.*{telefone}*", "limit": "1"})
         if 200 <= resp2.status_code < 300:
             data2 = resp2.json() or []
             if data2:
+                _remember_lead_snapshot(telefone, data2[0])
                 return data2[0]
         return None
 
@@ -104,74 +211,85 @@ async def _create_cliente_stub(telefone: str) -> dict | None:
         resp = await c.post("/clientes_delivery", json=[payload_snake])
         if 200 <= resp.status_code < 300:
             data = resp.json() or []
+            if data:
+                _remember_lead_snapshot(telefone, data[0])
             return data[0] if data else None
         return None
 
 
-async def update_cliente_with_bruno_insights(telefone: str, bruno_insights: dict) -> bool:
+async def update_cliente_with_bruno_insights(telefone: str, bruno_insights: dict, cliente_id=None) -> bool:
     """
     Atualiza dados do cliente no banco com insights do Bruno Analista Invisível
+
+    Só escreve quando algum dos campos do PATCH (score, status, interesse,
+    valor potencial, frequência) mudou em relação ao último valor conhecido;
+    com `cliente_id` informado não relê o cliente por telefone.
     """
     if not (SUPABASE_URL and SUPABASE_SERVICE_ROLE) or not bruno_insights:
         return False
     
     try:
-        # Busca cliente
-        cliente = await _find_cliente_by_telefone(telefone)
-        if not cliente:
-            return False
-        
-        cliente_id = cliente.get('id')
-        if not cliente_id:
-            return False
-        
-        # Prepara dados para atualização
-        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        
         # Mapeia status do Bruno para status do banco
         qualificacao_status = bruno_insights.get('qualificacao_status', 'cold')
-        lead_status_mapping = {
-            'hot': 'pronto_para_comprar',
-            'warm': 'interessado', 
-            'cold': 'novo'
-        }
-        
-        update_data = {
-            "lead_score": bruno_insights.get('lead_score', 0),
-            "lead_status": lead_status_mapping.get(qualificacao_status, 'novo'),
-            "updated_at": now
+        lead_score = bruno_insights.get('lead_score', 0)
+        lead_status = _BRUNO_LEAD_STATUS.get(qualificacao_status, 'novo')
+
+        # Prepara dados para atualização
+        campos = {
+            "lead_score": lead_score,
+            "lead_status": lead_status,
         }
         
         # Atualiza informações extras se disponíveis
         segmento = bruno_insights.get('segmento')
         if segmento == 'pessoa_juridica':
-            update_data['interesse_declarado'] = 'B2B - Fornecimento empresarial'
+            campos['interesse_declarado'] = 'B2B - Fornecimento empresarial'
         elif segmento == 'evento_especial':
-            update_data['interesse_declarado'] = 'Evento especial'
+            campos['interesse_declarado'] = 'Evento especial'
         
         pessoas = bruno_insights.get('pessoas')
         if pessoas:
             # Estima valor potencial baseado no número de pessoas
             valor_estimado = pessoas * 25  # R$ 25 por pessoa (estimativa)
-            update_data['valor_potencial'] = valor_estimado
+            campos['valor_potencial'] = valor_estimado
             
         urgencia = bruno_insights.get('urgencia')
         if urgencia == 'alta':
-            update_data['frequencia_compra'] = 'Urgente'
+            campos['frequencia_compra'] = 'Urgente'
         elif urgencia == 'media':
-            update_data['frequencia_compra'] = 'Semanal'
+            campos['frequencia_compra'] = 'Semanal'
         else:
-            update_data['frequencia_compra'] = 'Eventual'
+            campos['frequencia_compra'] = 'Eventual'
+
+        if _lead_sem_mudanca(telefone, campos):
+            logger.debug("[Bruno DB] Cliente %s sem mudança nos campos do Bruno - PATCH ignorado", telefone)
+            return False
+
+        if cliente_id is None or str(cliente_id).strip() == "":
+            # Busca cliente
+            cliente = await _find_cliente_by_telefone(telefone)
+            if not cliente:
+                return False
+            cliente_id = cliente.get('id')
+            if not cliente_id:
+                return False
+            if _lead_sem_mudanca(telefone, campos):
+                return False
+
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        update_data = dict(campos, updated_at=now)
         
         # Executa atualização
         async with await _client() as c:
             resp = await c.patch(
                 f"/clientes_delivery",
                 params={"id": f"eq.{cliente_id}"},
-                json=update_data
+                json=update_data,
+                headers={"Prefer": "return=minimal"},
             )
             
             if 200 <= resp.status_code < 300:
+                _remember_lead_snapshot(telefone, campos)
                 logger.info(f"[Bruno DB] Cliente {telefone} atualizado: score={update_data['lead_score']}, status={update_data['lead_status']}")
                 return True
             else:
@@ -192,6 +310,74 @@ async def _ensure_cliente_id(telefone: str) -> str:
     return str(cid) if cid is not None else ""
 
 
+# ===================================
+# CARRINHO / PEDIDOS (write-through do Roberto)
+# ===================================
+
+async def fetch_pedido_aberto(telefone: str) -> dict | None:
+    """
+    Pedido ainda aberto (carrinho) mais recente do cliente, se houver. Carrinho
+    sem alteração há mais de `CARRINHO_EXPIRACAO_HORAS` foi abandonado e não
+    é retomado (o cliente começa um novo).
+    """
+    if not (SUPABASE_URL and SUPABASE_SERVICE_ROLE) or not telefone:
+        return None
+    from ..agents.carrinho import ESTADOS_ABERTOS
+    cliente = await _find_cliente_by_telefone(telefone)
+    if not cliente or cliente.get("id") is None:
+        return None
+    limite = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - CARRINHO_EXPIRACAO_HORAS * 3600))
+    async with await _client() as c:
+        resp = await c.get("/pedidos_delivery", params={
+            "select": "*",
+            "cliente_id": f"eq.{cliente['id']}",
+            "status": f"in.({','.join(ESTADOS_ABERTOS)})",
+            "updated_at": f"gte.{limite}",
+            "order": "created_at.desc",
+            "limit": "1",
+        })
+        if 200 <= resp.status_code < 300:
+            data = resp.json() or []
+            return data[0] if data else None
+        logger.warning(f"[Carrinho DB] Erro ao buscar pedido aberto de {telefone}: {resp.status_code}")
+        return None
+
+
+async def salvar_pedido_carrinho(telefone: str, dados: dict, pedido_id=None) -> dict | None:
+    """
+    Grava o carrinho em `pedidos_delivery`: cria a linha no primeiro turno e
+    depois só faz PATCH (return=minimal) da mesma linha.
+    """
+    if not (SUPABASE_URL and SUPABASE_SERVICE_ROLE):
+        return None
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    payload = dict(dados, updated_at=now)
+    async with await _client() as c:
+        if pedido_id is not None:
+            resp = await c.patch(
+                "/pedidos_delivery",
+                params={"id": f"eq.{pedido_id}"},
+                json=payload,
+                headers={"Prefer": "return=minimal"},
+            )
+            if 200 <= resp.status_code < 300:
+                return {"id": pedido_id}
+            logger.error(f"[Carrinho DB] Erro ao atualizar pedido {pedido_id}: {resp.status_code} {resp.text[:200]}")
+            return None
+
+        cliente_id = await _ensure_cliente_id(telefone)
+        if not cliente_id:
+            return None
+        payload.update({"cliente_id": cliente_id, "data_pedido": now})
+        resp = await c.post("/pedidos_delivery", json=[payload])
+        if 200 <= resp.status_code < 300:
+            data = resp.json() or []
+            return data[0] if data else None
+        logger.error(f"[Carrinho DB] Erro ao criar pedido de {telefone}: {resp.status_code} {resp.text[:200]}")
+        return None
+
+
+@medir("persist_conversation")
 async def persist_conversation(result: dict) -> dict:
     if not (SUPABASE_URL and SUPABASE_SERVICE_ROLE):
         return {"ok": False, "reason": "supabase_not_configured"}
@@ -215,7 +401,7 @@ async def persist_conversation(result: dict) -> dict:
         cid_val = cliente_id  # mantém como string se não for dígito
 
     itens = []
-    msg_cliente = _fix_mojibake(_sanitize_text(result.get("mensagem_cliente") or ""))
+    msg_cliente = limpar_texto(result.get("mensagem_cliente") or "")
     if msg_cliente:
         itens.append({
             "cliente_id": cid_val,
@@ -225,7 +411,7 @@ async def persist_conversation(result: dict) -> dict:
             "acao_especial": result.get("acao_especial"),
             "timestamp": now,
         })
-    resp_bot = _fix_mojibake(_sanitize_text(result.get("resposta_bot") or ""))
+    resp_bot = normalizar_ptbr(result.get("resposta_bot") or "")
     if resp_bot:
         itens.append({
             "cliente_id": cid_val,
@@ -308,22 +494,31 @@ async def persist_conversation(result: dict) -> dict:
                 "alt_hyphen_min": {"status": r3b.status_code, "body": r3b.text},
             })
 
+    # Notifica o dashboard (SSE) das mensagens gravadas
+    if inserted:
+        try:
+            gravadas = [row for r in results for row in (r.get("data") or []) if isinstance(row, dict)]
+            get_message_broker().publicar_mensagens(cid_val, telefone, gravadas or itens)
+        except Exception as e:
+            logger.warning(f"[Stream] Falha ao publicar mensagens: {e}")
+
     # === SALVA INSIGHTS DO BRUNO NO BANCO ===
     # Atualiza dados do cliente com análise do Bruno Analista Invisível
     bruno_insights = result.get("bruno_insights")
     if bruno_insights and telefone:
         try:
-            await update_cliente_with_bruno_insights(telefone, bruno_insights)
+            await update_cliente_with_bruno_insights(telefone, bruno_insights, cliente_id=cid_val)
         except Exception as e:
             logger.error(f"[Bruno DB] Erro ao salvar insights: {e}")
 
     return {"ok": inserted > 0, "inserted": inserted, "results": results, "errors": errors}
 
 
+@medir("fetch_recent_messages")
 async def fetch_recent_messages_by_telefone(telefone: str, limit: int = 10) -> _t.List[dict]:
     """Lê histórico recente de mensagens por telefone, com múltiplos fallbacks de schema."""
     logger = logging.getLogger("3afrios.backend")
-    logger.debug(f"[Supabase] Buscando histórico para telefone {telefone}")
+    logger.debug("[Supabase] Buscando histórico para telefone %s", telefone)
     
     if not (SUPABASE_URL and SUPABASE_SERVICE_ROLE) or not (telefone or "").strip():
         logger.warning("[Supabase] Configuração incompleta ou telefone inválido")
@@ -1,256 +1,268 @@
 import typing as _t
-import json
 import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 
 logger = logging.getLogger("3afrios.backend")
 
 # Parser unificado de payloads de WhatsApp (Cloud API, WAHA, Evolution)
-# Retorna uma lista de eventos normalizados: { telefone: str, texto: str, event_id: str, from_me: bool }
+# Gera eventos normalizados: { telefone, texto, event_id, from_me, chat_id, participant }
+# Entregas em lote (messages[] / data[] / data.messages[]) geram um evento por mensagem.
+#
+# Os campos de cada provedor são declarados uma vez como caminhos ("key.remoteJid",
+# "contacts.0.wa_id") e compilados em acessores. Caminhos com "^" leem o contexto
+# da mensagem (o payload ou o `value` da Cloud API) em vez da própria mensagem.
 
 def _digits(s: str | None) -> str:
-    return "".join(ch for ch in str(s or "") if ch.isdigit())
-
-
-def _extract_evolution(payload: dict) -> _t.List[dict]:
-    events: _t.List[dict] = []
-    logger = logging.getLogger("3afrios.backend")
-
-    def is_from_me(p: dict) -> bool:
-        try:
-            k = p.get("key") or {}
-            msg = p.get("message") or {}
-            return bool(
-                p.get("fromMe") or k.get("fromMe") or msg.get("fromMe")
-            )
-        except Exception:
-            return False
-
-    def get_event_id(p: dict) -> str:
-        # Usa timestamp como fallback para garantir um ID único
-        import time
-        return (
-            ((p.get("key") or {}).get("id"))
-            or p.get("id")
-            or ((payload.get("key") or {}).get("id"))
-            or payload.get("id")
-            or f"evt-{int(time.time() * 1000)}"
-        )
-
-    # Evolution pode vir com messages[] ou data{} ou campos diretos
-    items = []
-    if isinstance(payload, dict):
-        if isinstance(payload.get("messages"), list) and payload["messages"]:
-            items = [payload["messages"][0] or {}]
-        elif isinstance(payload.get("data"), dict) and payload.get("event") == "messages.upsert":
-            logger.debug("[WebhookParser] Evolution: encontrado formato messages.upsert")
-            items = [payload["data"]]
-        else:
-            items = [payload]
-
-    for p in items:
-        if is_from_me(p):
-            events.append({"from_me": True, "telefone": "", "texto": "", "event_id": get_event_id(p), "chat_id": str(((p.get("key") or {}).get("remoteJid") or p.get("chatId") or p.get("sender") or ""))})
-            continue
-        # telefone
-        base = p.get("number") or p.get("from") or p.get("telefone") or p.get("phone") or ""
-        if not base:
-            key = p.get("key") or {}
-            remote = key.get("remoteJid") or p.get("chatId") or p.get("sender") or ""
-            if isinstance(remote, str) and "@" in remote:
-                remote = remote.split("@", 1)[0]
-            base = remote or ""
-        telefone = _digits(base)
-        # texto (apenas strings válidas; evita usar dict diretamente)
-        texto = ""
-        # chat_id e participant para controle de grupos
-        chat_id = str(((p.get("key") or {}).get("remoteJid") or p.get("chatId") or p.get("sender") or ""))
-        participant = str(p.get("participant") or ((p.get("key") or {}).get("participant") or ""))
-        for cand in [
-            p.get("text"),
-            p.get("body"),
-            p.get("mensagem"),
-            p.get("msg"),
-        ]:
-            if isinstance(cand, str) and cand.strip():
-                texto = cand.strip()
-                break
-
-        if not texto:
-            msg = p.get("message")
-            if isinstance(msg, dict):
-                for cand in [
-                    msg.get("text"),
-                    msg.get("conversation"),
-                    (msg.get("extendedTextMessage") or {}).get("text"),
-                    (msg.get("textMessage") or {}).get("text"),
-                    (msg.get("textMessageData") or {}).get("textMessage"),
-                    (msg.get("ephemeralMessage") or {}).get("message", {}).get("extendedTextMessage", {}).get("text"),
-                    (msg.get("listResponseMessage") or {}).get("title"),
-                ]:
-                    if isinstance(cand, str) and cand.strip():
-                        texto = cand.strip()
-                        logger.debug(f"[WebhookParser] Evolution: texto encontrado no campo {cand}")
-                        break
-
-        if not texto:
-            tm = p.get("textMessage")
-            if isinstance(tm, dict):
-                for cand in [
-                    tm.get("text"),
-                    tm.get("textMessage"),
-                ]:
-                    if isinstance(cand, str) and cand.strip():
-                        texto = cand.strip()
-                        break
-
-        events.append({"from_me": False, "telefone": telefone, "texto": texto, "event_id": get_event_id(p), "chat_id": chat_id, "participant": participant})
-    return events
-
-
-def _extract_cloud_api(payload: dict) -> _t.List[dict]:
-    # Meta WhatsApp Cloud API: entry[].changes[].value.messages[]
-    events: _t.List[dict] = []
-    try:
-        entries = payload.get("entry") or []
-        for e in entries:
-            changes = (e or {}).get("changes") or []
-            for ch in changes:
-                val = (ch or {}).get("value") or {}
-                msgs = val.get("messages") or []
-                for m in msgs:
-                    # ignorar tipos não-texto se necessário, mas extrair fallback
-                    tipo = m.get("type")
-                    from_me = False  # Cloud API não reenvia mensagens "from me" como inbound
-                    phone = _digits(m.get("from") or (val.get("contacts") or [{}])[0].get("wa_id") or "")
-                    texto = ""
-                    if tipo == "text":
-                        texto = str(((m.get("text") or {}).get("body") or "")).strip()
-                    elif tipo == "button":
-                        texto = str(((m.get("button") or {}).get("text") or "")).strip()
-                    elif tipo == "interactive":
-                        inter = m.get("interactive") or {}
-                        texto = (
-                            (inter.get("button_reply") or {}).get("title")
-                            or (inter.get("list_reply") or {}).get("title")
-                            or ""
-                        )
-                    else:
-                        # fallback para qualquer campo de texto
-                        texto = str(
-                            ((m.get("text") or {}).get("body")
-                             or m.get("body")
-                             or "")
-                        ).strip()
-                    event_id = m.get("id") or ""
-                    events.append({"from_me": from_me, "telefone": phone, "texto": texto, "event_id": event_id})
-    except Exception:
-        pass
-    return events
-
-
-def _extract_waha(payload: dict) -> _t.List[dict]:
+    s = str(s or "")
+    # Caso comum (JID já sem sufixo) não precisa percorrer caractere a caractere
+    return s if s.isdigit() else "".join(ch for ch in s if ch.isdigit())
+
+
+# ===================================
+# CAMINHOS COMPILADOS
+# ===================================
+
+def _compilar_caminhos(caminhos: _t.Tuple[str, ...]) -> _t.Tuple[_t.Tuple[bool, _t.Tuple[_t.Union[str, int], ...]], ...]:
+    """("key.remoteJid", "^contacts.0.wa_id") → ((False, ("key", "remoteJid")), (True, ("contacts", 0, "wa_id")))"""
+    return tuple(
+        (c.startswith("^"), tuple(int(p) if p.isdigit() else p for p in c.lstrip("^").split(".")))
+        for c in caminhos
+    )
+
+
+def compilar_campos(*caminhos: str) -> _t.Callable[..., _t.Any]:
+    """Acessor do primeiro valor preenchido entre os caminhos: f(item, contexto=None)"""
+    specs = _compilar_caminhos(caminhos)
+
+    def primeiro(item, contexto=None):
+        # Um laço só, sem chamadas por caminho: é o trecho mais quente do parser
+        for no_contexto, partes in specs:
+            obj = contexto if no_contexto else item
+            for p in partes:
+                if type(obj) is dict:
+                    obj = obj.get(p)
+                elif type(obj) is list and type(p) is int:
+                    obj = obj[p] if len(obj) > p else None
+                else:
+                    obj = None
+                    break
+            if obj:
+                return obj
+        return None
+    return primeiro
+
+
+def compilar_texto(*caminhos: str) -> _t.Callable[..., str]:
+    """Primeira string não vazia entre os caminhos (já sem espaços nas pontas)"""
+    specs = _compilar_caminhos(caminhos)
+
+    def primeiro(item, contexto=None):
+        for no_contexto, partes in specs:
+            obj = contexto if no_contexto else item
+            for p in partes:
+                if type(obj) is dict:
+                    obj = obj.get(p)
+                elif type(obj) is list and type(p) is int:
+                    obj = obj[p] if len(obj) > p else None
+                else:
+                    obj = None
+                    break
+            if type(obj) is str:
+                obj = obj.strip()
+                if obj:
+                    return obj
+        return ""
+    return primeiro
+
+
+def _sem_campo(item, contexto=None):
+    return None
+
+
+# ===================================
+# PROVEDORES
+# ===================================
+
+@dataclass(frozen=True)
+class Provedor:
+    """Campos de um formato de payload; `mensagens` devolve pares (mensagem, contexto)"""
+    nome: str
+    mensagens: _t.Callable[[dict], _t.List[_t.Tuple[dict, dict]]]
+    telefone: _t.Callable[..., _t.Any]
+    texto: _t.Callable[..., str]
+    event_id: _t.Callable[..., _t.Any]
+    from_me: _t.Callable[..., _t.Any] = _sem_campo
+    chat_id: _t.Callable[..., _t.Any] = _sem_campo
+    participant: _t.Callable[..., _t.Any] = _sem_campo
+    # Sem id na mensagem: gera um (timestamp + posição) em vez de deixar vazio
+    gerar_event_id: bool = False
+
+
+def _mensagens_evolution(payload: dict) -> _t.List[_t.Tuple[dict, dict]]:
+    """Evolution pode vir com messages[], data[], data.messages[], data{} ou campos diretos"""
+    data = payload.get("data")
+    if isinstance(payload.get("messages"), list) and payload["messages"]:
+        itens = [m for m in payload["messages"] if isinstance(m, dict)]
+    elif isinstance(data, list) and data:
+        logger.debug("[WebhookParser] Evolution: lote em data[] com %d mensagens", len(data))
+        itens = [m for m in data if isinstance(m, dict)]
+    elif isinstance(data, dict) and isinstance(data.get("messages"), list) and data["messages"]:
+        itens = [m for m in data["messages"] if isinstance(m, dict)]
+    elif isinstance(data, dict) and payload.get("event") == "messages.upsert":
+        itens = [data]
+    else:
+        itens = [payload]
+    # Em lote, id do payload não identifica a mensagem: contexto só com mensagem única
+    contexto = payload if len(itens) == 1 else {}
+    return [(m, contexto) for m in itens]
+
+
+def _mensagens_cloud_api(payload: dict) -> _t.List[_t.Tuple[dict, dict]]:
+    # Meta WhatsApp Cloud API: entry[].changes[].value.messages[] (contexto = value)
+    saida = []
+    for e in payload.get("entry") or []:
+        for ch in (e or {}).get("changes") or []:
+            val = (ch or {}).get("value") or {}
+            for m in val.get("messages") or []:
+                if isinstance(m, dict):
+                    saida.append((m, val))
+    return saida
+
+
+def _mensagens_waha(payload: dict) -> _t.List[_t.Tuple[dict, dict]]:
     # WAHA formatos comuns: senderData + messageData; ou messages[]
-    events: _t.List[dict] = []
-    try:
-        # Formato com senderData/messageData
-        if isinstance(payload.get("senderData"), dict) and isinstance(payload.get("messageData"), dict):
-            sd = payload.get("senderData") or {}
-            md = payload.get("messageData") or {}
-            phone = _digits(sd.get("sender") or (sd.get("chatId") or "").split("@", 1)[0])
-            texto = (
-                ((md.get("textMessageData") or {}).get("textMessage"))
-                or ((md.get("extendedTextMessage") or {}).get("text"))
-                or (md.get("text") or "")
-            )
-            event_id = payload.get("id") or (md.get("id") if isinstance(md.get("id"), str) else "")
-            events.append({"from_me": bool(md.get("fromMe")), "telefone": phone, "texto": str(texto or "").strip(), "event_id": event_id})
-        # Formato com messages[]
-        msgs = payload.get("messages") or []
-        for m in msgs:
-            phone = _digits((m.get("chatId") or "").split("@", 1)[0] or m.get("sender") or "")
-            texto = str(m.get("text") or m.get("body") or "").strip()
-            events.append({"from_me": bool(m.get("fromMe")), "telefone": phone, "texto": texto, "event_id": m.get("id") or ""})
-    except Exception:
-        pass
-    return events
+    saida = []
+    if isinstance(payload.get("senderData"), dict) and isinstance(payload.get("messageData"), dict):
+        saida.append((payload, payload))
+    msgs = payload.get("messages")
+    if isinstance(msgs, list):
+        saida.extend((m, payload) for m in msgs if isinstance(m, dict))
+    return saida
 
 
-def parse_incoming_events(payload: dict) -> _t.List[dict]:
+def _mensagem_generica(payload: dict) -> _t.List[_t.Tuple[dict, dict]]:
+    return [(payload, payload)]
+
+
+PROVEDORES: _t.Dict[str, Provedor] = {
+    p.nome: p for p in (
+        Provedor(
+            nome="Evolution",
+            mensagens=_mensagens_evolution,
+            telefone=compilar_campos("number", "from", "telefone", "phone", "key.remoteJid", "chatId", "sender"),
+            texto=compilar_texto(
+                "text", "body", "mensagem", "msg",
+                "message.text",
+                "message.conversation",
+                "message.extendedTextMessage.text",
+                "message.textMessage.text",
+                "message.textMessageData.textMessage",
+                "message.ephemeralMessage.message.extendedTextMessage.text",
+                "message.listResponseMessage.title",
+                "textMessage.text",
+                "textMessage.textMessage",
+            ),
+            event_id=compilar_campos("key.id", "id", "^key.id", "^id"),
+            from_me=compilar_campos("fromMe", "key.fromMe", "message.fromMe"),
+            chat_id=compilar_campos("key.remoteJid", "chatId", "sender"),
+            participant=compilar_campos("participant", "key.participant"),
+            gerar_event_id=True,
+        ),
+        Provedor(
+            nome="Cloud API",
+            mensagens=_mensagens_cloud_api,
+            telefone=compilar_campos("from", "^contacts.0.wa_id"),
+            texto=compilar_texto(
+                "text.body", "button.text", "interactive.button_reply.title", "interactive.list_reply.title", "body",
+            ),
+            event_id=compilar_campos("id"),
+            # Cloud API não reenvia mensagens "from me" como inbound
+        ),
+        Provedor(
+            nome="WAHA",
+            mensagens=_mensagens_waha,
+            telefone=compilar_campos("senderData.sender", "senderData.chatId", "chatId", "sender"),
+            texto=compilar_texto(
+                "messageData.textMessageData.textMessage", "messageData.extendedTextMessage.text", "messageData.text",
+                "text", "body",
+            ),
+            event_id=compilar_campos("id", "messageData.id"),
+            from_me=compilar_campos("messageData.fromMe", "fromMe"),
+        ),
+        Provedor(
+            nome="heurística genérica",
+            mensagens=_mensagem_generica,
+            telefone=compilar_campos("from", "number", "sender", "chatId"),
+            texto=compilar_texto("text", "message.conversation", "body", "mensagem"),
+            event_id=compilar_campos("id"),
+        ),
+    )
+}
+ORDEM_PROVEDORES = tuple(PROVEDORES)
+
+# Provedor que casou, por assinatura (chaves de topo) do payload: tentado primeiro
+_DETECCAO: "OrderedDict[_t.Tuple[str, ...], str]" = OrderedDict()
+_DETECCAO_MAX = 256
+
+
+def _eventos_do_provedor(prov: Provedor, payload: dict) -> _t.List[dict]:
+    eventos = []
+    for i, (m, ctx) in enumerate(prov.mensagens(payload)):
+        bruto = prov.event_id(m, ctx)
+        event_id = str(bruto) if bruto else ""
+        if not event_id and prov.gerar_event_id:
+            # Usa timestamp (+ posição no lote) como fallback para garantir um ID único
+            event_id = f"evt-{int(time.time() * 1000)}-{i}"
+        chat_id = str(prov.chat_id(m, ctx) or "")
+        participant = str(prov.participant(m, ctx) or "")
+        if prov.from_me(m, ctx):
+            eventos.append({"from_me": True, "telefone": "", "texto": "", "event_id": event_id, "chat_id": chat_id, "participant": participant})
+            continue
+        telefone = _digits(str(prov.telefone(m, ctx) or "").split("@", 1)[0])
+        if not telefone:
+            continue
+        texto = prov.texto(m, ctx)
+        if texto:
+            eventos.append({"from_me": False, "telefone": telefone, "texto": texto, "event_id": event_id, "chat_id": chat_id, "participant": participant})
+    return eventos
+
+
+def iter_incoming_events(payload: dict) -> _t.Iterator[dict]:
     """
-    Tenta extrair eventos de diferentes provedores.
-    Ordem: Evolution -> Cloud API -> WAHA. Se nenhum casar, tenta heurísticas genéricas.
+    Gera os eventos de uma entrega, na ordem em que chegaram.
+    Ordem de formatos: Evolution -> Cloud API -> WAHA -> heurística genérica; o formato
+    que casou fica associado à assinatura de chaves do payload e é tentado primeiro.
     """
-    logger.debug("[WebhookParser] Iniciando extração de eventos")
     if not isinstance(payload, dict):
         logger.warning("[WebhookParser] Payload inválido: não é um dicionário")
-        return []
-    
-    # Skip status update events that don't need message extraction
-    if isinstance(payload, dict):
-        event_type = payload.get("event", "")
-        # Processa explicitamente eventos de mensagens
-        if event_type in {"messages.upsert", "messages.update"}:
-            logger.info(f"[WebhookParser] Processando evento de mensagem: {event_type}")
-        # Ignora eventos que NÃO contêm mensagens
-        elif event_type in {"chats.update", "contacts.update", "send.message"}:
-            logger.debug(f"[WebhookParser] Ignorando evento de status: {event_type}")
-            return []
-
-    events: _t.List[dict] = []
-    # Evolution
-    logger.debug("[WebhookParser] Tentando extração formato Evolution")
-    ev = _extract_evolution(payload)
-    logger.debug(f"[WebhookParser] Evolution: {len(ev)} eventos brutos extraídos")
-    for e in ev:
-        txt = str(e.get("texto") or "").strip()
-        if e.get("from_me") or (e.get("telefone") and txt):
-            events.append(e)
-            logger.debug(f"[WebhookParser] Evolution: evento válido extraído - id={e.get('event_id')} telefone={e.get('telefone')} len_texto={len(txt)}")
-    if events:
-        logger.info(f"[WebhookParser] Sucesso no formato Evolution: {len(events)} eventos válidos")
-        return events
-
-    # Cloud API
-    logger.debug("[WebhookParser] Tentando extração formato Cloud API")
-    cl = _extract_cloud_api(payload)
-    logger.debug(f"[WebhookParser] Cloud API: {len(cl)} eventos brutos extraídos")
-    for e in cl:
-        txt = str(e.get("texto") or "").strip()
-        if e.get("from_me") or (e.get("telefone") and txt):
-            events.append(e)
-            logger.debug(f"[WebhookParser] Cloud API: evento válido extraído - id={e.get('event_id')} telefone={e.get('telefone')} len_texto={len(txt)}")
-    if events:
-        logger.info(f"[WebhookParser] Sucesso no formato Cloud API: {len(events)} eventos válidos")
-        return events
-
-    # WAHA
-    logger.debug("[WebhookParser] Tentando extração formato WAHA")
-    wh = _extract_waha(payload)
-    logger.debug(f"[WebhookParser] WAHA: {len(wh)} eventos brutos extraídos")
-    for e in wh:
-        txt = str(e.get("texto") or "").strip()
-        if e.get("from_me") or (e.get("telefone") and txt):
-            events.append(e)
-            logger.debug(f"[WebhookParser] WAHA: evento válido extraído - id={e.get('event_id')} telefone={e.get('telefone')} len_texto={len(txt)}")
-    if events:
-        logger.info(f"[WebhookParser] Sucesso no formato WAHA: {len(events)} eventos válidos")
-        return events
-
-    # Heurística genérica
-    logger.debug("[WebhookParser] Tentando extração via heurística genérica")
-    base_phone = _digits(
-        payload.get("from") or payload.get("number") or payload.get("sender") or (payload.get("chatId") or "").split("@", 1)[0]
-    )
-    texto = (
-        payload.get("text")
-        or (payload.get("message") or {}).get("conversation")
-        or payload.get("body")
-        or payload.get("mensagem")
-        or ""
-    )
-    if base_phone and str(texto or "").strip():
-        logger.info(f"[WebhookParser] Sucesso via heurística genérica: telefone={base_phone} len_texto={len(str(texto or '').strip())}")
-        return [{"from_me": False, "telefone": base_phone, "texto": str(texto or "").strip(), "event_id": payload.get("id") or ""}]
+        return
+
+    # Ignora eventos que NÃO contêm mensagens
+    event_type = payload.get("event", "")
+    if event_type in {"chats.update", "contacts.update", "send.message"}:
+        logger.debug("[WebhookParser] Ignorando evento de status: %s", event_type)
+        return
+
+    assinatura = tuple(sorted(payload))
+    preferido = _DETECCAO.get(assinatura)
+    ordem = ORDEM_PROVEDORES if preferido is None else (preferido,) + tuple(n for n in ORDEM_PROVEDORES if n != preferido)
+
+    for nome in ordem:
+        eventos = _eventos_do_provedor(PROVEDORES[nome], payload)
+        if eventos:
+            if preferido != nome:
+                _DETECCAO[assinatura] = nome
+                while len(_DETECCAO) > _DETECCAO_MAX:
+                    _DETECCAO.popitem(last=False)
+            logger.debug("[WebhookParser] Formato %s: %d eventos válidos", nome, len(eventos))
+            yield from eventos
+            return
 
     logger.warning("[WebhookParser] Nenhum evento extraído após tentar todos os formatos")
-    return []
\ No newline at end of file
+
+
+def parse_incoming_events(payload: dict) -> _t.List[dict]:
+    """Lista com todos os eventos da entrega (ver iter_incoming_events)"""
+    return list(iter_incoming_events(payload))
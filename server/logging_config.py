@@ -0,0 +1,166 @@
+"""
+Configuração de Logging - 3A Frios
+==================================
+
+Logging estruturado configurado por variáveis de ambiente:
+
+- LOG_LEVEL: nível do logger raiz (padrão INFO; DEBUG só quando preciso).
+- LOG_FORMAT: `json` (uma linha JSON por registro, com request_id e campos
+  de `extra=`) ou `texto` (formato legível de antes).
+- LOG_QUEUE_ENABLED: os handlers só enfileiram o registro; formatação e
+  escrita no stderr ficam numa thread (QueueListener), fora do event loop.
+  Fila cheia descarta o registro em vez de bloquear a requisição.
+- LOG_PAYLOAD_SAMPLE_RATE: fração dos dumps de payload/resultado (`log_payload`)
+  que são de fato serializados e emitidos.
+
+Nos caminhos quentes use formatação preguiçosa (`logger.debug("x=%s", x)`)
+para que mensagens abaixo do nível não custem nada, e `log_payload` para
+dumps de dicts grandes.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Any, Optional
+
+from .config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_ENABLED, LOG_QUEUE_SIZE, LOG_PAYLOAD_SAMPLE_RATE
+from .tracing import request_id_atual
+
+FORMATO_TEXTO = "[%(asctime)s] %(levelname)s - %(message)s"
+# Bibliotecas que logam cada requisição HTTP em INFO (dezenas por turno)
+LOGGERS_RUIDOSOS = ("httpx", "httpcore", "googleapiclient.discovery_cache")
+PAYLOAD_MAX_CHARS = 2000
+
+# Atributos padrão de LogRecord (o que sobrar veio de `extra=`)
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+# ===================================
+# FORMATADORES
+# ===================================
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, level, logger, msg, request_id, extras e exceção"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        saida = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = getattr(record, "request_id", None)
+        if rid:
+            saida["request_id"] = rid
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith("_"):
+                saida[chave] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            saida["exc"] = record.exc_text
+        return json.dumps(saida, ensure_ascii=False, default=str)
+
+
+class _RequestIdFilter(logging.Filter):
+    """Copia o request id do ContextVar para o registro (antes de trocar de thread)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_atual()
+        return True
+
+
+# ===================================
+# FILA
+# ===================================
+
+class _QueueHandlerNaoBloqueante(logging.handlers.QueueHandler):
+    """Enfileira sem bloquear; com a fila cheia o registro é descartado e contado"""
+
+    def __init__(self, fila: "queue.Queue"):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve msg % args e o traceback aqui (os objetos podem mudar depois);
+        # a serialização final fica com o formatter na thread do listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configurado = False
+
+
+def configurar_logging() -> None:
+    """Instala os handlers no logger raiz (idempotente)"""
+    global _listener, _configurado
+    if _configurado:
+        return
+    _configurado = True
+
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(FORMATO_TEXTO)
+    saida = logging.StreamHandler(sys.stderr)
+    saida.setFormatter(formatter)
+
+    raiz = logging.getLogger()
+    for h in list(raiz.handlers):
+        raiz.removeHandler(h)
+
+    if LOG_QUEUE_ENABLED:
+        handler: logging.Handler = _QueueHandlerNaoBloqueante(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _listener = logging.handlers.QueueListener(handler.queue, saida, respect_handler_level=True)
+        _listener.start()
+        atexit.register(parar_logging)
+    else:
+        handler = saida
+    handler.addFilter(_RequestIdFilter())
+    raiz.addHandler(handler)
+    raiz.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    for nome in LOGGERS_RUIDOSOS:
+        logging.getLogger(nome).setLevel(max(raiz.level, logging.WARNING))
+
+
+def parar_logging() -> None:
+    """Esvazia a fila e encerra a thread do listener (configurar_logging volta a instalar)"""
+    global _listener, _configurado
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _configurado = False
+
+
+# ===================================
+# DUMPS DE PAYLOAD
+# ===================================
+
+def log_payload(logger: logging.Logger, rotulo: str, obj: Any, nivel: int = logging.DEBUG) -> None:
+    """Dump amostrado de payload/resultado: só serializa se o nível está ativo e a amostra cai"""
+    if not logger.isEnabledFor(nivel) or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    try:
+        if isinstance(obj, (bytes, bytearray)):
+            texto = obj.decode("utf-8", errors="ignore")
+        else:
+            texto = json.dumps(obj, ensure_ascii=False, default=str)
+    except Exception:
+        texto = repr(obj)
+    logger.log(nivel, "%s: %s", rotulo, texto[:PAYLOAD_MAX_CHARS])
@@ -2,34 +2,34 @@
 import logging
 import json
 import time
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 try:
-    from server.config import ALLOWED_ORIGINS as ALLOWED_ORIGINS, PORT
+    from server.config import ALLOWED_ORIGINS as ALLOWED_ORIGINS, PORT, TRACING_ENABLED, WEBHOOK_CONCURRENCY
 except ImportError:
-    from .config import ALLOWED_ORIGINS, PORT
+    from .config import ALLOWED_ORIGINS, PORT, TRACING_ENABLED, WEBHOOK_CONCURRENCY
 from .agents.orchestrator import handle_message
 from .integrations.evolution import send_text
 from .integrations.supabase_store import persist_conversation
-from .integrations.webhook_parser import parse_incoming_events
-from .api import campaigns
+from .integrations.webhook_parser import parse_incoming_events, compilar_campos
+from .integrations.message_stream import formatar_sse
+from .tracing import TracingMiddleware, get_metrics_registry
+from .logging_config import configurar_logging, log_payload
+from .respostas import RespostaJSON, compactar, modo_debug
+from .normalizacao import normalizar_ptbr
+from .recursos import Recursos, get_recursos, lifespan
+from .api import campaigns, leads
 
 # após a inicialização do app
-app = FastAPI(title="3A Frios Backend", version="0.1.0")
+# Recursos compartilhados (clientes HTTP, caches, filas, agendador) no lifespan: server/recursos.py
+app = FastAPI(title="3A Frios Backend", version="0.1.0", default_response_class=RespostaJSON, lifespan=lifespan)
 
-# Configuração básica de logging
+# Logging estruturado (LOG_LEVEL / LOG_FORMAT / fila assíncrona, ver server/logging_config.py)
+configurar_logging()
 logger = logging.getLogger("3afrios.backend")
-if not logger.handlers:
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter("[%(asctime)s] %(levelname)s - %(message)s")
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-# Força nível DEBUG para capturar todos os logs
-logger.setLevel(logging.DEBUG)
-# Configura logging do uvicorn também
-uvicorn_logger = logging.getLogger("uvicorn")
-uvicorn_logger.setLevel(logging.DEBUG)
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,11 +39,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request id + latência por rota (spans das etapas ficam em server/tracing.py)
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 logger.info(f"CORS habilitado para: {ALLOWED_ORIGINS}")
 logger.info(f"Backend iniciado na porta {PORT}")
 
 # Registrar rotas da API de campanhas
 app.include_router(campaigns.router, prefix="/api/campanhas", tags=["campanhas"])
+app.include_router(leads.router, prefix="/api/leads", tags=["leads"])
+
+
+def _recursos(request: Request) -> Recursos:
+    """Container do lifespan (ou o padrão, se o app rodar sem lifespan)"""
+    return getattr(request.app.state, "recursos", None) or get_recursos()
+
+
+# Payload do dashboard/n8n: mesmos acessores compilados dos webhooks de WhatsApp
+_telefone_webhook = compilar_campos("telefone", "telefoneCliente", "cliente.telefone")
 
 
 # função: webhook (endpoint /webhook)
@@ -69,37 +83,30 @@ async def webhook(request: Request):
             if payload is None:
                 excerpt = (last_txt or raw.decode("utf-8", errors="ignore"))[:200]
                 logger.error(f"Falha ao decodificar JSON em /webhook. len={len(raw)} excerpt={excerpt!r}")
-                return JSONResponse(
-                    _json_safe({"ok": False, "error": "JSON inválido", "detail": "Falha ao decodificar corpo", "received_length": len(raw), "excerpt": excerpt}),
-                    media_type="application/json; charset=utf-8",
-                )
-        tel_log = (
-            payload.get('telefone')
-            or payload.get('telefoneCliente')
-            or (payload.get('cliente') or {}).get('telefone')
-        )
+                return RespostaJSON({"ok": False, "error": "JSON inválido", "detail": "Falha ao decodificar corpo", "received_length": len(raw), "excerpt": excerpt})
+        tel_log = _telefone_webhook(payload)
         texto = payload.get('mensagem', '')
         
         # Verifica duplicação usando cache global (exceto para mensagens manuais)
         if payload.get('acao') != 'responder-manual' and tel_log and texto:
             if _check_global_dedup(tel_log, texto):
-                return JSONResponse(_json_safe({"ok": True, "ignored": "duplicate_message", "telefone": tel_log}))
+                return RespostaJSON({"ok": True, "ignored": "duplicate_message", "telefone": tel_log})
         
         logger.info(f"POST /webhook recebido: acao={payload.get('acao')} telefone={tel_log} dryRun={payload.get('dryRun')}")
     except Exception as e:
         logger.error("Falha ao parsear JSON no /webhook", exc_info=True)
-        return JSONResponse(_json_safe({"ok": False, "error": "JSON inválido", "detail": str(e)}), media_type="application/json; charset=utf-8")
+        return RespostaJSON({"ok": False, "error": "JSON inválido", "detail": str(e)})
 
     # Protege contra erro do orquestrador
     try:
-        result = await handle_message(payload)
+        result = await handle_message(payload, recursos=_recursos(request))
     except Exception as e:
         logger.error("Falha no orquestrador", exc_info=True)
-        return JSONResponse(_json_safe({"ok": False, "error": "orchestrator_failed", "detail": str(e)}), media_type="application/json; charset=utf-8")
+        return RespostaJSON({"ok": False, "error": "orchestrator_failed", "detail": str(e)})
 
     if not isinstance(result, dict):
         logger.error("Resposta inválida do orquestrador: tipo inesperado")
-        return JSONResponse(_json_safe({"ok": False, "error": "orchestrator_invalid_response"}), media_type="application/json; charset=utf-8")
+        return RespostaJSON({"ok": False, "error": "orchestrator_invalid_response"})
     logger.info(f"Resposta orquestrador: agente={result.get('agente_responsavel')} acao_especial={result.get('acao_especial')} dryRun={result.get('dryRun')}")
     try:
         telefone = (result.get("cliente") or {}).get("telefone")
@@ -122,11 +129,11 @@ async def webhook(request: Request):
     rb = result.get("resposta_bot")
     cc = result.get("contexto_conversa")
     if isinstance(rb, str) and rb:
-        result["resposta_bot"] = _normalize_ptbr(rb)
+        result["resposta_bot"] = normalizar_ptbr(rb)
     if isinstance(cc, str) and cc:
-        result["contexto_conversa"] = _normalize_ptbr(cc)
+        result["contexto_conversa"] = normalizar_ptbr(cc)
 
-    return JSONResponse(_json_safe(result), media_type="application/json; charset=utf-8")
+    return RespostaJSON(compactar(result, modo_debug(request)))
 
 
 # função: evolution_webhook(req: Request)
@@ -143,69 +150,8 @@ async def evolution_webhook(request: Request):
             except Exception:
                 payload = {}
 
-        # NEW: detectar eventos fromMe (mensagens do próprio bot) e ignorar
-        def _is_from_me(p: dict) -> bool:
-            try:
-                k = p.get("key") or {}
-                return bool(
-                    p.get("fromMe") or
-                    k.get("fromMe") or
-                    (p.get("message") or {}).get("fromMe")
-                )
-            except Exception:
-                return False
-
-        if _is_from_me(payload):
-            return JSONResponse({"ok": True, "ignored": "from_me"})
-
-        # Usa o primeiro item quando payload agrupa mensagens em lista
-        p = payload
-        if isinstance(payload, dict) and isinstance(payload.get("messages"), list) and payload["messages"]:
-            p = (payload["messages"][0] or {})
-
-        # NEW: ignorar fromMe também no item da lista (nested)
-        if _is_from_me(p):
-            return JSONResponse({"ok": True, "ignored": "from_me_nested"})
-
-        # Fallbacks de campos comuns (inclui formatos aninhados)
-        def _extract_phone(p: dict) -> str:
-            base = p.get("number") or p.get("from") or p.get("telefone") or p.get("phone") or ""
-            if not base:
-                key = p.get("key") or {}
-                remote = key.get("remoteJid") or p.get("chatId") or p.get("sender") or ""
-                if isinstance(remote, str) and "@" in remote:
-                    remote = remote.split("@", 1)[0]
-                base = remote or ""
-            import re
-            return re.sub(r"\D", "", str(base or ""))
-
-        def _extract_text(p: dict) -> str:
-            t = p.get("text") or p.get("body") or p.get("mensagem") or p.get("msg")
-            if not t:
-                msg = p.get("message") or {}
-                if isinstance(msg, dict):
-                    t = (
-                        msg.get("text")
-                        or msg.get("conversation")
-                        or (msg.get("extendedTextMessage") or {}).get("text")
-                        or (msg.get("textMessage") or {}).get("text")
-                        or (msg.get("textMessageData") or {}).get("textMessage")
-                        or (msg.get("ephemeralMessage") or {}).get("message", {}).get("extendedTextMessage", {}).get("text")
-                        or (msg.get("listResponseMessage") or {}).get("title")
-                        or ""
-                    )
-            if not t and isinstance(p.get("textMessage"), dict):
-                tm = p.get("textMessage") or {}
-                t = tm.get("text") or tm.get("textMessage") or ""
-            return str(t or "").strip()
-
-        telefone = _extract_phone(p)
-        texto = _extract_text(p)
-
-        if isinstance(telefone, str) and "@" in telefone:
-            telefone = telefone.split("@", 1)[0]
-        import re
-        telefone = re.sub(r"\D", "", telefone or "")
+        if not isinstance(payload, dict):
+            payload = {}
 
         dr = payload.get("dryRun")
         if isinstance(dr, bool):
@@ -217,53 +163,25 @@ async def evolution_webhook(request: Request):
         else:
             dry_run = False
 
-        # NEW: event_id para debug/dedupe básico
-        event_id = (
-            ((p.get("key") or {}).get("id")) or
-            p.get("id") or
-            ((payload.get("key") or {}).get("id")) or
-            payload.get("id") or
-            f"evt-{int(time.time() * 1000)}"
-        )
-
-        # NEW: dedupe simples em memória com TTL (event_id + msg)
-        try:
-            _DEDUP_EVENT_CACHE  # type: ignore
-        except NameError:
-            _DEDUP_EVENT_CACHE = {}  # type: ignore
-
-        try:
-            _DEDUP_MSG_CACHE  # type: ignore
-        except NameError:
-            _DEDUP_MSG_CACHE = {}  # type: ignore
-
-        now = time.time()
-        ttl_seconds = DEDUPE_TTL_SECONDS
-
-        # prune expirados (event_id)
-        for k, exp in list(_DEDUP_EVENT_CACHE.items()):  # type: ignore
-            if exp < now:
-                _DEDUP_EVENT_CACHE.pop(k, None)  # type: ignore
-
-        # prune expirados (msg assinatura)
-        for k, exp in list(_DEDUP_MSG_CACHE.items()):  # type: ignore
-            if exp < now:
-                _DEDUP_MSG_CACHE.pop(k, None)  # type: ignore
-
-        # dedupe por event_id
-        if event_id in _DEDUP_EVENT_CACHE:  # type: ignore
-            return JSONResponse({"ok": True, "ignored": "duplicate_event", "event_id": event_id})
-        _DEDUP_EVENT_CACHE[event_id] = now + ttl_seconds  # type: ignore
-
-        # dedupe por assinatura de mensagem do cliente (telefone+texto)
-        msg_sig = f"{telefone}|{(texto or '').strip().lower()}"
-        if (telefone and texto) and msg_sig in _DEDUP_MSG_CACHE:  # type: ignore
-            return JSONResponse({"ok": True, "ignored": "duplicate_message", "event_id": event_id, "telefone": telefone})
-        if telefone and texto:
-            _DEDUP_MSG_CACHE[msg_sig] = now + ttl_seconds  # type: ignore
+        # Todas as mensagens da entrega (lotes em messages[] / data[]), não só a primeira
+        events = parse_incoming_events(payload)
 
         # IGNORA eventos sem texto (acks/status) para não acionar o orquestrador
-        if not texto:
+        if not events:
+            msgs = payload.get("messages")
+            if isinstance(msgs, list) and msgs:
+                p = msgs[0] or {}
+            elif isinstance(payload.get("data"), dict):
+                p = payload["data"]
+            else:
+                p = payload
+            event_id = (
+                ((p.get("key") or {}).get("id")) or
+                p.get("id") or
+                ((payload.get("key") or {}).get("id")) or
+                payload.get("id") or
+                f"evt-{int(time.time() * 1000)}"
+            )
             try:
                 sample = {
                     "top_keys": list(p.keys()),
@@ -280,86 +198,174 @@ async def evolution_webhook(request: Request):
                         "textMessageData.textMessage": (p.get("textMessageData") or {}).get("textMessage"),
                     },
                 }
-                logger.info(f"[Evolution] empty_text debug event_id={event_id} telefone={telefone} sample={json.dumps(sample, ensure_ascii=False)[:400]}")
+                log_payload(logger, f"[Evolution] empty_text debug event_id={event_id} sample", sample)
             except Exception:
                 pass
-            logger.info(f"[Evolution] inbound ignorado: empty_text telefone={telefone} event_id={event_id}")
-            return JSONResponse({"ok": True, "ignored": "empty_text", "event_id": event_id})
+            logger.info(f"[Evolution] inbound ignorado: empty_text event_id={event_id}")
+            return RespostaJSON({"ok": True, "ignored": "empty_text", "event_id": event_id})
+
+        processed, ignored = await _processar_eventos(events, modo_debug(request), dry_run=dry_run, source="evolution",
+                                                      recursos=_recursos(request))
+
+        # Mensagem única: mesmo formato de resposta de antes (resultado ou motivo do descarte)
+        if len(events) == 1:
+            if processed:
+                return RespostaJSON(processed[0])
+            return RespostaJSON({"ok": True, **ignored[0]})
+        return RespostaJSON({"ok": True, "processed": processed, "ignored": ignored})
+    except Exception as e:
+        logger.error("Falha ao processar payload na /evolution/webhook", exc_info=True)
+        return RespostaJSON({"ok": False, "error": "invalid_payload", "detail": str(e)})
+
+# ===================================
+# PROCESSAMENTO DE EVENTOS (WhatsApp / Evolution)
+# ===================================
+
+async def _processar_evento(ev: dict, debug: bool = False, dry_run: bool = False, source: str = "whatsapp",
+                            recursos: Optional[Recursos] = None) -> tuple:
+    """Um evento normalizado do parser → ("processed", resultado) ou ("ignored", motivo)"""
+    from_me = bool(ev.get("from_me"))
+    telefone = (ev.get("telefone") or "").strip()
+    texto = (ev.get("texto") or "").strip()
+    event_id = (ev.get("event_id") or f"evt-{int(time.time()*1000)}")
+    chat_id = (ev.get("chat_id") or "").strip()
+
+    # Ignora grupos e canais
+    if chat_id.endswith("@g.us") or chat_id.endswith("@broadcast") or chat_id.endswith("@newsletter"):
+        logger.info(f"[WhatsApp] inbound ignorado: group_or_broadcast chat_id={chat_id} event_id={event_id}")
+        return "ignored", {"ignored": "group_or_broadcast", "event_id": event_id, "chat_id": chat_id}
+
+    if from_me:
+        logger.info(f"[WhatsApp] inbound ignorado: from_me telefone={telefone} event_id={event_id}")
+        return "ignored", {"ignored": "from_me", "event_id": event_id, "telefone": telefone}
+    if not texto:
+        logger.info(f"[WhatsApp] inbound ignorado: empty_text telefone={telefone} event_id={event_id}")
+        return "ignored", {"ignored": "empty_text", "event_id": event_id, "telefone": telefone}
+
+    # dedupe por event_id e assinatura (antes do primeiro await: sem corrida entre eventos do lote)
+    now = time.time()
+    if event_id in _DEDUP_EVENT_CACHE:
+        return "ignored", {"ignored": "duplicate_event", "event_id": event_id}
+    _DEDUP_EVENT_CACHE[event_id] = now + DEDUPE_TTL_SECONDS
+
+    if _check_global_dedup(telefone, texto, event_id):
+        return "ignored", {"ignored": "duplicate_message", "event_id": event_id, "telefone": telefone}
+
+    logger.info(f"[WhatsApp] inbound: telefone={telefone} len(texto)={len(texto)} event_id={event_id}")
+
+    internal = {
+        "acao": "receber-mensagem",
+        "mensagem": texto,
+        "telefoneCliente": telefone,
+        "dryRun": dry_run,
+        "source": source,  # Identifica origem da mensagem
+    }
+
+    try:
+        logger.info("[WhatsApp] processando mensagem: telefone=%s len(texto)=%d", telefone, len(texto))
+        result = await handle_message(internal, recursos=recursos)
+    except Exception as e:
+        logger.error(f"Falha no orquestrador (/{source}/webhook): {str(e)}", exc_info=True)
+        return "processed", {"ok": False, "error": "orchestrator_failed", "detail": str(e), "event_id": event_id}
+
+    if not isinstance(result, dict):
+        return "processed", {"ok": False, "error": "orchestrator_invalid_response", "event_id": event_id}
+    logger.info("[WhatsApp] resposta do orquestrador: agente=%s len=%d event_id=%s",
+                result.get("agente_responsavel"), len(result.get("resposta_bot") or ""), event_id)
+    log_payload(logger, "[WhatsApp] resultado do orquestrador", result)
+
+    # normaliza texto de saída e anexa event_id
+    rb = result.get("resposta_bot")
+    cc = result.get("contexto_conversa")
+    if isinstance(rb, str) and rb:
+        result["resposta_bot"] = normalizar_ptbr(rb)
+    if isinstance(cc, str) and cc:
+        result["contexto_conversa"] = normalizar_ptbr(cc)
+    result["event_id"] = event_id
 
-        internal = {
-            "acao": "receber-mensagem",
-            "mensagem": texto,
-            "telefoneCliente": telefone,
-            "dryRun": dry_run,
-        }
+    # envio Evolution com dedupe de saída
+    try:
+        telefone_out = (result.get("cliente") or {}).get("telefone") or telefone
+        texto_out = result.get("resposta_bot")
+
+        now = time.time()
+        send_sig = f"{telefone_out}|{(texto_out or '').strip().lower()}"
+        if telefone_out and texto_out and not result.get("dryRun"):
+            if send_sig in _SENT_CACHE:
+                result["enviado_via_evolution"] = False
+                result["evolution_status"] = {"skipped": "duplicate_outgoing", "send_sig": send_sig}
+            else:
+                _SENT_CACHE[send_sig] = now + DEDUPE_TTL_SECONDS
+                evo = await send_text(telefone_out, texto_out)
+                result["enviado_via_evolution"] = bool(evo.get("sent"))
+                result["evolution_status"] = evo
 
-        # Protege contra erro do orquestrador
         try:
-            result = await handle_message(internal)
+            supa = await persist_conversation(result)
+            if not supa.get("ok"):
+                logger.error(f"[WhatsApp] Erro ao persistir no Supabase: {json.dumps(supa, ensure_ascii=False)}")
+            else:
+                logger.info("[WhatsApp] Persistência bem sucedida: event_id=%s", event_id)
+            result["persistencia_supabase"] = supa
         except Exception as e:
-            logger.error("Falha no orquestrador (Evolution)", exc_info=True)
-            return JSONResponse(_json_safe({"ok": False, "error": "orchestrator_failed", "detail": str(e)}), media_type="application/json; charset=utf-8")
-
-        # Garante tipo dict
-        if not isinstance(result, dict):
-            logger.error("Resposta inválida do orquestrador (Evolution): tipo inesperado")
-            return JSONResponse(_json_safe({"ok": False, "error": "orchestrator_invalid_response"}), media_type="application/json; charset=utf-8")
-
-        # NEW: repassa event_id para rastreio
-        result["event_id"] = event_id
-
-        # Normaliza saída
-        rb = result.get("resposta_bot")
-        cc = result.get("contexto_conversa")
-        if isinstance(rb, str) and rb:
-            result["resposta_bot"] = _normalize_ptbr(rb)
-        if isinstance(cc, str) and cc:
-            result["contexto_conversa"] = _normalize_ptbr(cc)
-
-        # Envia resposta via Evolution (primeiro) e persiste no Supabase (depois)
-        try:
-            telefone_out = (result.get("cliente") or {}).get("telefone") or telefone
-            texto_out = result.get("resposta_bot")
-
-            global _SENT_CACHE
-            now2 = time.time()
-            for k, exp in list(_SENT_CACHE.items()):
-                if exp < now2:
-                    _SENT_CACHE.pop(k, None)
-
-            send_sig = f"{telefone_out}|{(texto_out or '').strip().lower()}"
-            if telefone_out and texto_out:
-                if send_sig in _SENT_CACHE:
-                    result["enviado_via_evolution"] = False
-                    result["evolution_status"] = {"skipped": "duplicate_outgoing", "send_sig": send_sig}
-                else:
-                    evo = await send_text(telefone_out, texto_out)
-                    result["enviado_via_evolution"] = bool(evo.get("sent"))
-                    result["evolution_status"] = evo
-                    _SENT_CACHE[send_sig] = time.time() + DEDUPE_TTL_SECONDS
+            logger.error(f"[WhatsApp] Erro ao persistir conversa: {str(e)}", exc_info=True)
+            result["persistencia_supabase"] = {"ok": False, "error": str(e)}
+    except Exception:
+        pass
 
-            try:
-                supa = await persist_conversation(result)
-                result["persistencia_supabase"] = supa
-            except Exception:
-                pass
-        except Exception:
-            pass
+    return "processed", compactar(result, debug)
+
+
+async def _processar_eventos(eventos: Iterable[dict], debug: bool = False, dry_run: bool = False,
+                             source: str = "whatsapp", recursos: Optional[Recursos] = None) -> Tuple[List[dict], List[dict]]:
+    """
+    Processa todos os eventos de uma entrega: telefones diferentes em paralelo
+    (no máximo WEBHOOK_CONCURRENCY turnos ao mesmo tempo), mensagens do mesmo
+    telefone em sequência, na ordem de chegada. Saída na ordem da entrega.
+    """
+    # prune expirados (uma vez por entrega)
+    now = time.time()
+    for cache in (_DEDUP_EVENT_CACHE, _SENT_CACHE):
+        for k, exp in list(cache.items()):
+            if exp < now:
+                cache.pop(k, None)
+
+    por_telefone: Dict[str, List[Tuple[int, dict]]] = {}
+    total = 0
+    for i, ev in enumerate(eventos):
+        chave = (ev.get("telefone") or ev.get("chat_id") or ev.get("event_id") or f"#{i}").strip()
+        por_telefone.setdefault(chave, []).append((i, ev))
+        total = i + 1
+
+    saidas: List[Optional[tuple]] = [None] * total
+    limite = asyncio.Semaphore(max(1, WEBHOOK_CONCURRENCY))
+
+    async def _fila(itens: List[Tuple[int, dict]]) -> None:
+        for i, ev in itens:
+            async with limite:
+                try:
+                    saidas[i] = await _processar_evento(ev, debug, dry_run, source, recursos)
+                except Exception as e:
+                    logger.error(f"[WhatsApp] Falha ao processar evento: {e}", exc_info=True)
+                    saidas[i] = ("processed", {"ok": False, "error": "event_failed", "detail": str(e), "event_id": ev.get("event_id")})
+
+    if len(por_telefone) == 1:
+        await _fila(next(iter(por_telefone.values())))
+    else:
+        await asyncio.gather(*(_fila(itens) for itens in por_telefone.values()))
+
+    processed = [r for tipo, r in saidas if tipo == "processed"]
+    ignored = [r for tipo, r in saidas if tipo == "ignored"]
+    return processed, ignored
 
-        return JSONResponse(_json_safe(result), media_type="application/json; charset=utf-8")
-    except Exception as e:
-        logger.error("Falha ao processar payload na /evolution/webhook", exc_info=True)
-        return JSONResponse(
-            _json_safe({"ok": False, "error": "invalid_payload", "detail": str(e)}),
-            media_type="application/json; charset=utf-8",
-        )
 
 @app.post("/whatsapp/webhook")
 async def whatsapp_webhook(req: Request):
+    debug = modo_debug(req)
     try:
         try:
             raw = await req.body()
-            logger.debug(f"[WhatsApp] Raw payload recebido: {raw.decode('utf-8', errors='ignore')}")
+            log_payload(logger, "[WhatsApp] Raw payload recebido", raw)
             try:
                 payload = json.loads(raw.decode("utf-8", errors="ignore"))
                 # Identifica tipo de evento para debug
@@ -372,215 +378,110 @@ async def whatsapp_webhook(req: Request):
             logger.error(f"[WhatsApp] Erro ao ler body: {str(e)}")
             payload = {}
 
-        logger.debug(f"[WhatsApp] Payload recebido: {json.dumps(payload, ensure_ascii=False)}")
         try:
             events = parse_incoming_events(payload or {})
-            logger.debug(f"[WhatsApp] Tentativa de extração de eventos concluída")
+            logger.debug("[WhatsApp] Tentativa de extração de eventos concluída")
             if not events:
                 logger.warning("[WhatsApp] Nenhum evento extraído do payload")
-                return JSONResponse({"ok": False, "error": "no_events_extracted"})
-            logger.debug(f"[WhatsApp] Eventos extraídos com sucesso: {json.dumps(events, ensure_ascii=False)}")
+                return RespostaJSON({"ok": False, "error": "no_events_extracted"})
+            log_payload(logger, "[WhatsApp] Eventos extraídos com sucesso", events)
         except Exception as e:
             logger.error(f"[WhatsApp] Erro ao extrair eventos do payload: {str(e)}", exc_info=True)
-            return JSONResponse({"ok": False, "error": "event_extraction_failed", "detail": str(e)})
+            return RespostaJSON({"ok": False, "error": "event_extraction_failed", "detail": str(e)})
         
-        # Usa o cache global para deduplicação
-
-        processed = []
-        ignored = []
-        for ev in events:
-            from_me = bool(ev.get("from_me"))
-            telefone = (ev.get("telefone") or "").strip()
-            texto = (ev.get("texto") or "").strip()
-            event_id = (ev.get("event_id") or f"evt-{int(time.time()*1000)}")
-            chat_id = (ev.get("chat_id") or "").strip()
-
-            # Ignora grupos e canais
-            if chat_id.endswith("@g.us") or chat_id.endswith("@broadcast") or chat_id.endswith("@newsletter"):
-                logger.info(f"[WhatsApp] inbound ignorado: group_or_broadcast chat_id={chat_id} event_id={event_id}")
-                ignored.append({"ignored": "group_or_broadcast", "event_id": event_id, "chat_id": chat_id})
-                continue
-
-            if from_me:
-                logger.info(f"[WhatsApp] inbound ignorado: from_me telefone={telefone} event_id={event_id}")
-                ignored.append({"ignored": "from_me", "event_id": event_id, "telefone": telefone})
-                continue
-            if not texto:
-                logger.info(f"[WhatsApp] inbound ignorado: empty_text telefone={telefone} event_id={event_id}")
-                ignored.append({"ignored": "empty_text", "event_id": event_id, "telefone": telefone})
-                continue
-
-            # IGNORA eventos sem texto (acks/status)
-            if not texto:
-                ignored.append({"ignored": "empty_text", "event_id": event_id, "telefone": telefone})
-                continue
-
-            # dedupe por event_id e assinatura
-            import time
-            now = time.time()
-            ttl = 180  # 3 minutos de TTL para deduplicação
-            if event_id in _DEDUP_EVENT_CACHE:  # type: ignore
-                ignored.append({"ignored": "duplicate_event", "event_id": event_id})
-                continue
-            _DEDUP_EVENT_CACHE[event_id] = now + ttl  # type: ignore
-
-            # Verifica duplicação usando cache global
-            if _check_global_dedup(telefone, texto, event_id):
-                ignored.append({"ignored": "duplicate_message", "event_id": event_id, "telefone": telefone})
-                continue
-
-            logger.info(f"[WhatsApp] inbound: telefone={telefone} len(texto)={len(texto)} event_id={event_id}")
-
-            internal = {
-                "acao": "receber-mensagem",
-                "mensagem": texto,
-                "telefoneCliente": telefone,
-                "dryRun": False,
-                "source": "whatsapp",  # Identifica origem da mensagem
-            }
-
-            try:
-                logger.info(f"[WhatsApp] processando mensagem: telefone={telefone} texto={texto}")
-                result = await handle_message(internal)
-                logger.info(f"[WhatsApp] resposta do orquestrador: {json.dumps(result, ensure_ascii=False)}")
-            except Exception as e:
-                logger.error(f"Falha no orquestrador (/whatsapp/webhook): {str(e)}", exc_info=True)
-                processed.append({"ok": False, "error": "orchestrator_failed", "detail": str(e), "event_id": event_id})
-                continue
-
-            if not isinstance(result, dict):
-                processed.append({"ok": False, "error": "orchestrator_invalid_response", "event_id": event_id})
-                continue
-
-            # normaliza texto de saída e anexa event_id
-            rb = result.get("resposta_bot")
-            cc = result.get("contexto_conversa")
-            if isinstance(rb, str) and rb:
-                result["resposta_bot"] = _normalize_ptbr(rb)
-            if isinstance(cc, str) and cc:
-                result["contexto_conversa"] = _normalize_ptbr(cc)
-            result["event_id"] = event_id
-
-            # envio Evolution com dedupe de saída
-            try:
-                telefone_out = (result.get("cliente") or {}).get("telefone") or telefone
-                texto_out = result.get("resposta_bot")
-
-                # prune expirados do cache de saídas
-                global _SENT_CACHE
-                now = time.time()
-                for k, exp in list(_SENT_CACHE.items()):
-                    if exp < now:
-                        _SENT_CACHE.pop(k, None)
-
-                send_sig = f"{telefone_out}|{(texto_out or '').strip().lower()}"
-                if telefone_out and texto_out:
-                    if send_sig in _SENT_CACHE:
-                        result["enviado_via_evolution"] = False
-                        result["evolution_status"] = {"skipped": "duplicate_outgoing", "send_sig": send_sig}
-                    else:
-                        evo = await send_text(telefone_out, texto_out)
-                        result["enviado_via_evolution"] = bool(evo.get("sent"))
-                        result["evolution_status"] = evo
-                        _SENT_CACHE[send_sig] = now + DEDUPE_TTL_SECONDS
-
-                try:
-                    logger.info(f"[WhatsApp] Tentando persistir conversa: {json.dumps(result, ensure_ascii=False)}")
-                    supa = await persist_conversation(result)
-                    if not supa.get("ok"):
-                        logger.error(f"[WhatsApp] Erro ao persistir no Supabase: {json.dumps(supa, ensure_ascii=False)}")
-                    else:
-                        logger.info(f"[WhatsApp] Persistência bem sucedida: {json.dumps(supa, ensure_ascii=False)}")
-                    result["persistencia_supabase"] = supa
-                except Exception as e:
-                    logger.error(f"[WhatsApp] Erro ao persistir conversa: {str(e)}", exc_info=True)
-                    result["persistencia_supabase"] = {"ok": False, "error": str(e)}
-            except Exception:
-                pass
-
-            processed.append(_json_safe(result))
-
-        return JSONResponse({"ok": True, "processed": processed, "ignored": ignored}, media_type="application/json; charset=utf-8")
+        processed, ignored = await _processar_eventos(events, debug, source="whatsapp", recursos=_recursos(req))
+        return RespostaJSON({"ok": True, "processed": processed, "ignored": ignored})
     except Exception as e:
         logger.error("Falha ao processar /whatsapp/webhook", exc_info=True)
-        return JSONResponse(_json_safe({"ok": False, "error": "invalid_payload", "detail": str(e)}), media_type="application/json; charset=utf-8")
+        return RespostaJSON({"ok": False, "error": "invalid_payload", "detail": str(e)})
 
 @app.get("/")
 async def root():
     return {
         "ok": True,
         "service": "3A Frios Backend",
-        "endpoints": ["/webhook", "/evolution/webhook", "/whatsapp/webhook", "/docs"],
+        "endpoints": ["/webhook", "/evolution/webhook", "/whatsapp/webhook", "/health", "/ready", "/docs"],
     }
 
 
+# Liveness: o processo responde (não depende do aquecimento)
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
-# função utilitária: _json_safe
-def _json_safe(obj, _depth=3):
-    if _depth < 0:
-        return "**omitted**"
-    if obj is None or isinstance(obj, (str, int, float, bool)):
-        return obj
-    if isinstance(obj, (list, tuple, set)):
-        return [_json_safe(x, _depth - 1) for x in obj]
-    if isinstance(obj, dict):
-        return {str(_json_safe(k, _depth - 1)): _json_safe(v, _depth - 1) for k, v in obj.items()}
-    # Tenta Pydantic v2
-    try:
-        return obj.model_dump()
-    except Exception:
-        pass
-    # Tenta dataclass
-    try:
-        import dataclasses
-        if dataclasses.is_dataclass(obj):
-            return {f.name: _json_safe(getattr(obj, f.name), _depth - 1) for f in dataclasses.fields(obj)}
-    except Exception:
-        pass
-    # Último fallback
-    try:
-        json.dumps(obj)
-        return obj
-    except Exception:
-        return repr(obj)
-
-# função utilitária: _normalize_ptbr
-def _normalize_ptbr(s: str) -> str:
-    if not isinstance(s, str):
-        return ""
-    if not s:
-        return ""
-    import unicodedata
-    s = unicodedata.normalize("NFC", s)  # preserva acentuação corretamente
-    # Substitui traços largos por hífen simples (opcional; remova se quiser manter "—"/"–")
-    s = s.replace("–", "-").replace("—", "-")
-    import re
-    # Corrige artefatos "â R$" ocasionais
-    s = re.sub(r"\s*â+\s*R\$", " - R$", s)
-    # Usa vírgula em valores monetários
-    s = re.sub(r"(R\$\s*\d+(?:\.\d{3})*)\.(\d{2})", r"\1,\2", s)
-    # Espaços e quebras
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
+# função: ready (readiness: 503 até o aquecimento do lifespan terminar e durante o shutdown)
+@app.get("/ready")
+async def ready(request: Request):
+    recursos = getattr(request.app.state, "recursos", None)
+    if recursos is None:
+        return RespostaJSON({"pronto": False, "aquecimento": {}}, status_code=503)
+    return RespostaJSON(recursos.estado(), status_code=200 if recursos.pronto else 503)
+
+
+# função: metrics (endpoint /metrics no formato do Prometheus)
+@app.get("/metrics")
+async def metrics(formato: str = "prometheus"):
+    registry = get_metrics_registry()
+    if formato == "json":
+        return {"tracing": TRACING_ENABLED, "metricas": registry.resumo()}
+    return PlainTextResponse(registry.exportar_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# função: conversas_stream (SSE /api/conversas/stream)
+@app.get("/api/conversas/stream")
+async def conversas_stream(request: Request, cliente_id: str | None = None, telefone: str | None = None):
+    """
+    Server-Sent Events com as mensagens gravadas por persist_conversation.
+    Sem filtro recebe todas (lista de conversas recentes); com cliente_id ou
+    telefone, só as daquele cliente.
+    """
+    broker = _recursos(request).broker
+    ultimo_id = request.headers.get("last-event-id")
+    assinante = broker.assinar(
+        cliente_id=cliente_id,
+        telefone=telefone,
+        ultimo_id=int(ultimo_id) if ultimo_id and ultimo_id.isdigit() else None,
+    )
+
+    async def eventos():
+        try:
+            # Reconexão do EventSource a cada 3s se a conexão cair
+            yield "retry: 3000\n\n"
+            while True:
+                if assinante.consumir_resync():
+                    yield "event: resync\ndata: {}\n\n"
+                try:
+                    evento = await asyncio.wait_for(assinante.fila.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Heartbeat mantém proxies/load balancers com a conexão aberta
+                    yield ": ping\n\n"
+                    continue
+                yield formatar_sse(evento)
+                if evento.get("tipo") == "encerrando":
+                    break
+        finally:
+            broker.cancelar(assinante)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.exception_handler(Exception)
 async def _global_exception_handler(request: Request, exc: Exception):
     logger.error("Exceção não tratada", exc_info=True)
-    safe = _json_safe({"ok": False, "error": "internal_server_error", "detail": str(exc)})
-    return JSONResponse(safe, media_type="application/json; charset=utf-8", status_code=500)
+    return RespostaJSON({"ok": False, "error": "internal_server_error", "detail": str(exc)}, status_code=500)
 
 
 # Caches globais e TTL para dedup
 DEDUPE_TTL_SECONDS = 180
 _GLOBAL_DEDUP_CACHE = {}  # Cache unificado para todas as mensagens
 _DEDUP_EVENT_CACHE = {}
-_DEDUP_MSG_CACHE = {}
 _SENT_CACHE = {}
 
 def _check_global_dedup(telefone: str, texto: str, event_id: str = "") -> bool:
@@ -0,0 +1,133 @@
+"""
+Normalização de Texto - 3A Frios
+================================
+
+Pipeline único para o texto das mensagens, usado pelos webhooks (main),
+pelo envio (evolution.send_text) e pela persistência (supabase_store):
+
+    sanitização → correção de mojibake → NFC → formatação pt-BR
+
+- `limpar_texto`: sanitização (quebras de linha, espaços), mojibake e NFC.
+  Não altera o conteúdo; usado para a mensagem do cliente.
+- `normalizar_ptbr`: `limpar_texto` + travessões, artefato "â R$" e valores
+  monetários com vírgula (R$ 79.90 → R$ 79,90). Usado nas respostas do bot.
+
+As duas funções são idempotentes e memorizadas (LRU): o resultado também é
+guardado como chave de si mesmo, então a resposta normalizada no webhook
+chega ao send_text e ao persist_conversation como acerto de cache.
+"""
+
+import functools
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Callable
+
+CACHE_MAX = 1024
+
+_RE_QUEBRAS = re.compile(r"\n{3,}")
+# Só sequências que mudam (tab ou 2+ espaços): espaço simples não gera substituição
+_RE_ESPACOS = re.compile(r"\t[ \t]*| [ \t]+")
+_RE_ARTEFATO_REAIS = re.compile(r"\s*â+\s*R\$")
+_RE_CENTAVOS = re.compile(r"(R\$\s*\d+(?:\.\d{3})*)\.(\d{2})(?!\d)")
+_MARCAS_MOJIBAKE = ("Ã", "Â", "¤", "â")
+
+
+def _corrigir_mojibake(s: str) -> str:
+    """UTF-8 lido como latin-1 ("OlÃ¡" → "Olá"); só aplica se a volta for válida"""
+    if not any(ch in s for ch in _MARCAS_MOJIBAKE):
+        return s
+    try:
+        return s.encode("latin-1").decode("utf-8")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        # Texto já correto ("câmera") ou com caracteres fora do latin-1 (emoji)
+        return s
+
+
+def _ate_estabilizar(passada: Callable[[str], str], s: str) -> str:
+    """Repete a passada enquanto sobrarem marcas de mojibake e o texto mudar.
+
+    Uma passada pode destravar a correção da seguinte (codificação dupla,
+    nbsp nas pontas removido pelo strip); sem repetir, normalizar o
+    resultado de novo daria outro texto.
+    """
+    s = passada(s)
+    for _ in range(3):
+        if not any(ch in s for ch in _MARCAS_MOJIBAKE):
+            break
+        r = passada(s)
+        if r == s:
+            break
+        s = r
+    return s
+
+
+def _trocar_travessoes(s: str) -> str:
+    return s.replace("–", "-").replace("—", "-")
+
+
+def _limpar_passada(s: str) -> str:
+    s = s.replace("\r\n", "\n").replace("\r", "\n").replace("\x0b", "\n")
+    s = _corrigir_mojibake(s)
+    s = unicodedata.normalize("NFC", s)
+    s = _RE_ESPACOS.sub(" ", s)
+    if "\n\n\n" in s:
+        s = _RE_QUEBRAS.sub("\n\n", s)
+    return s.strip()
+
+
+def _normalizar_passada(s: str) -> str:
+    # Artefato antes do mojibake: o "â" solto impede a volta latin-1 → UTF-8
+    # do resto ("OlÃ¡ â R$ 9"), que só seria corrigido numa segunda passada
+    if "R$" in s and "â" in s:
+        s = _RE_ARTEFATO_REAIS.sub(" - R$", s)
+    # Travessões antes (fora do latin-1, travariam a correção) e depois do
+    # mojibake ("â\x80\x93" → "–")
+    s = _trocar_travessoes(_limpar_passada(_trocar_travessoes(s)))
+    if "R$" in s:
+        if "â" in s:
+            s = _RE_ARTEFATO_REAIS.sub(" - R$", s).strip()
+        s = _RE_CENTAVOS.sub(r"\1,\2", s)
+    return s
+
+
+def _limpar(s: str) -> str:
+    return _ate_estabilizar(_limpar_passada, s)
+
+
+def _normalizar(s: str) -> str:
+    return _ate_estabilizar(_normalizar_passada, s)
+
+
+def _memorizar(func: Callable[[str], str]) -> Callable[[str], str]:
+    cache: "OrderedDict[str, str]" = OrderedDict()
+
+    @functools.wraps(func)
+    def wrapper(s: str) -> str:
+        if not s or not isinstance(s, str):
+            return ""
+        r = cache.get(s)
+        if r is not None:
+            cache.move_to_end(s)
+            return r
+        r = func(s)
+        cache[s] = r
+        cache[r] = r  # idempotente: normalizar de novo é acerto de cache
+        while len(cache) > CACHE_MAX:
+            cache.popitem(last=False)
+        return r
+
+    wrapper.cache = cache
+    return wrapper
+
+
+@_memorizar
+def limpar_texto(s: str) -> str:
+    """Sanitização + mojibake + NFC, sem mudar o conteúdo"""
+    return _limpar(s)
+
+
+@_memorizar
+def normalizar_ptbr(s: str) -> str:
+    """Texto de saída do bot pronto para WhatsApp/Supabase/dashboard"""
+    return _normalizar(s)
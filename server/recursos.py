@@ -0,0 +1,221 @@
+"""
+Recursos Compartilhados - 3A Frios
+==================================
+
+Container com tudo que vive o processo inteiro, criado no `lifespan` do
+FastAPI (`app.state.recursos`) e passado aos agentes pelo orquestrador:
+
+- Clientes HTTP com pool: PostgREST do Supabase e Evolution.
+- Serviços Google (Docs/Sheets) construídos uma vez, com snapshot do contexto.
+- Stores e caches: carrinho, estado incremental do lead, cache de campanhas.
+- Filas: broker das mensagens do dashboard (SSE) e disparos em massa.
+- Agendador de campanhas programadas (CAMPAIGN_SCHEDULER_ENABLED).
+
+Startup: cria os clientes e aquece em paralelo (cache de campanhas, SDKs da
+OpenAI e do Google) em background, até STARTUP_WARMUP_TIMEOUT. O processo
+já responde `/health` (liveness); `/ready` só fica 200 quando o aquecimento
+termina. Falha de um aquecedor não impede o readiness: fica registrada em
+`aquecimento` e aquele recurso é carregado sob demanda como antes.
+
+Shutdown: `/ready` volta a 503, o agendador para, disparos em andamento
+têm SHUTDOWN_DRAIN_TIMEOUT para terminar, assinantes SSE são encerrados,
+os clientes HTTP fechados e a fila de logs esvaziada.
+
+Fora do app (scripts, benchmarks, `asyncio.run`) `get_recursos()` devolve
+um container padrão com as mesmas instâncias globais e sem clientes
+próprios: cada integração cai no comportamento sob demanda.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from .config import (
+    CAMPAIGN_SCHEDULER_ENABLED,
+    EVOLUTION_ENABLED,
+    GOOGLE_ENABLED,
+    OPENAI_ENABLED,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    STARTUP_WARMUP_TIMEOUT,
+    SUPABASE_SERVICE_ROLE,
+    SUPABASE_URL,
+)
+from .agents.carrinho import CarrinhoStore, get_carrinho_store
+from .agents.lead_state import LeadStateStore, get_lead_state_store
+from .integrations.campaign_bulk import CampaignBulkSender, get_campaign_bulk_sender
+from .integrations.campaign_cache import CampaignCache, get_campaign_cache
+from .integrations.campaign_scheduler import CampaignScheduler, get_campaign_scheduler
+from .integrations.google_knowledge import GoogleServices, get_google_services
+from .integrations.message_stream import MessageBroker, get_message_broker
+from .integrations.supabase_store import close_http_clients, new_http_client
+from .logging_config import configurar_logging, parar_logging
+
+logger = logging.getLogger("3afrios.recursos")
+
+# Pool do cliente da Evolution (envios de resposta, campanhas e disparos)
+_EVOLUTION_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30)
+
+
+@dataclass
+class Recursos:
+    """Recursos compartilhados do processo (ver docstring do módulo)"""
+    carrinho: CarrinhoStore = field(default_factory=get_carrinho_store)
+    lead_state: LeadStateStore = field(default_factory=get_lead_state_store)
+    campaign_cache: CampaignCache = field(default_factory=get_campaign_cache)
+    broker: MessageBroker = field(default_factory=get_message_broker)
+    bulk: CampaignBulkSender = field(default_factory=get_campaign_bulk_sender)
+    # Credenciais/serviços Docs e Sheets (construídos uma vez) e snapshot do contexto
+    google: GoogleServices = field(default_factory=get_google_services)
+    # Só no lifespan: fora dele as integrações criam clientes sob demanda
+    http_supabase: Optional[httpx.AsyncClient] = None
+    http_evolution: Optional[httpx.AsyncClient] = None
+    scheduler: Optional[CampaignScheduler] = None
+    pronto: bool = False
+    aquecimento: Dict[str, str] = field(default_factory=dict)
+    _tarefa_aquecimento: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def estado(self) -> Dict[str, Any]:
+        """Resumo para GET /ready"""
+        return {"pronto": self.pronto, "aquecimento": dict(self.aquecimento)}
+
+
+# ===================================
+# AQUECIMENTO
+# ===================================
+
+async def _aquecer_campanhas(recursos: Recursos) -> None:
+    await recursos.campaign_cache.snapshot()
+
+
+async def _aquecer_openai(recursos: Recursos) -> None:
+    # Import do SDK (~0,5s) numa thread, fora do primeiro turno de conversa
+    from .integrations.openai_client import get_openai_client
+    await asyncio.to_thread(get_openai_client)
+
+
+async def _aquecer_google(recursos: Recursos) -> None:
+    if not await asyncio.to_thread(recursos.google.aquecer):
+        raise RuntimeError("credenciais Google indisponíveis")
+
+
+def _aquecedores() -> Dict[str, Callable[[Recursos], Awaitable[None]]]:
+    aquecedores = {}
+    if SUPABASE_URL and SUPABASE_SERVICE_ROLE:
+        aquecedores["campanhas"] = _aquecer_campanhas
+    if OPENAI_ENABLED:
+        aquecedores["openai"] = _aquecer_openai
+    if GOOGLE_ENABLED:
+        aquecedores["google"] = _aquecer_google
+    return aquecedores
+
+
+async def _executar_aquecedor(recursos: Recursos, nome: str, aquecedor: Callable[[Recursos], Awaitable[None]]) -> None:
+    inicio = time.perf_counter()
+    try:
+        await aquecedor(recursos)
+        recursos.aquecimento[nome] = f"ok ({(time.perf_counter() - inicio) * 1000:.0f} ms)"
+    except Exception as e:
+        recursos.aquecimento[nome] = f"erro: {e}"
+        logger.warning(f"[Recursos] Aquecimento de {nome} falhou: {e}")
+
+
+async def aquecer(recursos: Recursos) -> None:
+    """Roda os aquecedores em paralelo e marca o container como pronto"""
+    aquecedores = _aquecedores()
+    for nome in aquecedores:
+        recursos.aquecimento[nome] = "pendente"
+    tarefas = asyncio.gather(*(_executar_aquecedor(recursos, nome, a) for nome, a in aquecedores.items()))
+    try:
+        await asyncio.wait({tarefas}, timeout=STARTUP_WARMUP_TIMEOUT)
+    finally:
+        # Timeout ou shutdown antes do fim: cancela e recolhe o gather aqui,
+        # sem deixar exceção pendente para o GC reportar depois
+        if not tarefas.done():
+            tarefas.cancel()
+        await asyncio.gather(tarefas, return_exceptions=True)
+    if "pendente" in recursos.aquecimento.values():
+        for nome, estado in recursos.aquecimento.items():
+            if estado == "pendente":
+                recursos.aquecimento[nome] = "timeout"
+        logger.warning(f"[Recursos] Aquecimento excedeu {STARTUP_WARMUP_TIMEOUT}s: {recursos.aquecimento}")
+    recursos.pronto = True
+    logger.info(f"[Recursos] Pronto: {recursos.aquecimento}")
+
+
+# ===================================
+# CICLO DE VIDA
+# ===================================
+
+async def iniciar() -> Recursos:
+    """Cria os clientes, inicia o agendador e dispara o aquecimento em background"""
+    global _recursos
+    configurar_logging()
+    recursos = Recursos(
+        http_supabase=new_http_client(),
+        http_evolution=httpx.AsyncClient(timeout=10, limits=_EVOLUTION_LIMITS) if EVOLUTION_ENABLED else None,
+    )
+    if CAMPAIGN_SCHEDULER_ENABLED:
+        recursos.scheduler = get_campaign_scheduler()
+        recursos.scheduler.start()
+        logger.info("Agendador de campanhas iniciado")
+    recursos._tarefa_aquecimento = asyncio.create_task(aquecer(recursos))
+    _recursos = recursos
+    return recursos
+
+
+async def encerrar(recursos: Recursos) -> None:
+    """Para o agendador, drena filas e disparos e fecha os clientes"""
+    global _recursos
+    recursos.pronto = False
+    tarefa = recursos._tarefa_aquecimento
+    if tarefa is not None and not tarefa.done():
+        tarefa.cancel()
+        await asyncio.gather(tarefa, return_exceptions=True)
+
+    if recursos.scheduler is not None:
+        await recursos.scheduler.stop()
+    await recursos.bulk.aguardar_pendentes(SHUTDOWN_DRAIN_TIMEOUT)
+    recursos.broker.encerrar()
+
+    if recursos.http_evolution is not None:
+        await recursos.http_evolution.aclose()
+    if recursos.http_supabase is not None:
+        await recursos.http_supabase.aclose()
+    await close_http_clients()
+    if _recursos is recursos:
+        _recursos = None
+    logger.info("[Recursos] Encerrado")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """`FastAPI(lifespan=lifespan)`: container em `app.state.recursos`"""
+    recursos = await iniciar()
+    app.state.recursos = recursos
+    try:
+        yield
+    finally:
+        try:
+            await encerrar(recursos)
+        finally:
+            # Por último: nada mais do ciclo de vida loga depois daqui
+            parar_logging()
+
+
+# Instância global (a do lifespan ativo; senão um container padrão)
+_recursos: Optional[Recursos] = None
+_recursos_padrao: Optional[Recursos] = None
+
+def get_recursos() -> Recursos:
+    """Retorna o container do lifespan ativo, ou o padrão fora do app"""
+    global _recursos_padrao
+    if _recursos is not None:
+        return _recursos
+    if _recursos_padrao is None:
+        _recursos_padrao = Recursos()
+    return _recursos_padrao
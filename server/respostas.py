@@ -0,0 +1,91 @@
+"""
+Serialização de Respostas - 3A Frios
+====================================
+
+`RespostaJSON` serializa em uma única passada com orjson (fallback para o
+json da stdlib se o pacote não estiver instalado). Dataclasses, datetimes e
+UUIDs saem nativamente; modelos Pydantic, sets e o resto passam pelo
+`_default` (model_dump / list / repr), então não é preciso reconstruir a
+estrutura antes de responder.
+
+`compactar` tira do resultado do orquestrador os campos de depuração
+(tentativas da Evolution, resultados brutos do Supabase, contexto e insights)
+que o WhatsApp e o dashboard não leem. Os webhooks devolvem a versão completa
+com `?debug=1`.
+"""
+
+import dataclasses
+import json
+from typing import Any, Dict
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Campos do resultado do orquestrador que só interessam para depuração
+CAMPOS_DEBUG = ("contexto_conversa", "bruno_insights", "info")
+# O que fica de evolution_status / persistencia_supabase no modo compacto
+RESUMO_EVOLUTION = ("sent", "status", "variant", "reason", "classification", "skipped")
+RESUMO_PERSISTENCIA = ("ok", "error")
+
+
+def _default(obj: Any) -> Any:
+    model_dump = getattr(obj, "model_dump", None)
+    if callable(model_dump):
+        return model_dump()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode("utf-8", errors="replace")
+    return repr(obj)
+
+
+if orjson is not None:
+    _OPCOES = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def serializar(conteudo: Any) -> bytes:
+        return orjson.dumps(conteudo, default=_default, option=_OPCOES)
+else:
+    def serializar(conteudo: Any) -> bytes:
+        return json.dumps(conteudo, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespostaJSON(Response):
+    """JSONResponse serializada com orjson"""
+
+    media_type = "application/json; charset=utf-8"
+
+    def render(self, content: Any) -> bytes:
+        return serializar(content)
+
+
+def modo_debug(request: Request) -> bool:
+    """`?debug=1` pede o resultado completo"""
+    return (request.query_params.get("debug") or "").strip().lower() in ("1", "true", "sim")
+
+
+def _resumo(valor: Any, chaves) -> Any:
+    if not isinstance(valor, dict):
+        return valor
+    return {k: valor[k] for k in chaves if k in valor}
+
+
+def compactar(resultado: Dict[str, Any], debug: bool = False) -> Dict[str, Any]:
+    """Cópia rasa do resultado sem os campos de depuração (ou o próprio resultado com debug)"""
+    if debug or not isinstance(resultado, dict):
+        return resultado
+    saida = {k: v for k, v in resultado.items() if k not in CAMPOS_DEBUG}
+    if "evolution_status" in saida:
+        saida["evolution_status"] = _resumo(saida["evolution_status"], RESUMO_EVOLUTION)
+    if "persistencia_supabase" in saida:
+        saida["persistencia_supabase"] = _resumo(saida["persistencia_supabase"], RESUMO_PERSISTENCIA)
+    routing = saida.get("routing")
+    if isinstance(routing, dict) and "matched_terms" in routing:
+        saida["routing"] = {k: v for k, v in routing.items() if k != "matched_terms"}
+    return saida
@@ -0,0 +1,219 @@
+"""
+Carrinho do Roberto: quantidades, máquina de estados e persistência.
+
+    pytest server/tests/test_carrinho.py
+"""
+
+import asyncio
+import calendar
+import time
+
+import httpx
+import pytest
+
+from server.agents import pedidos
+from server.agents.carrinho import Carrinho, CarrinhoStore, EstadoPedido, PAGAMENTO_PENDENTE
+from server.integrations import supabase_store
+
+CATALOGO = [
+    {"descricao": "Picanha Bovina", "preco": "79,90", "categoria": "Bovinos"},
+    {"descricao": "Linguiça Toscana", "preco": "24,90", "categoria": "Suínos"},
+]
+
+
+def _item(produto: str, quantidade: float, preco: float, unidade: str = "kg") -> dict:
+    return {"produto": produto, "quantidade": quantidade, "unidade": unidade, "preco_unitario": preco}
+
+
+def _carrinho_completo() -> Carrinho:
+    carrinho = Carrinho("5511999990000")
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    carrinho.adicionar(_item("Linguiça Toscana", 1, 24.9))
+    carrinho.concluir_itens()
+    carrinho.definir_cep("01310-100")
+    carrinho.definir_pagamento("PIX")
+    return carrinho
+
+
+# ===================================
+# QUANTIDADES
+# ===================================
+
+def test_repetir_item_define_quantidade():
+    carrinho = Carrinho("5511")
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    assert carrinho.itens["picanha bovina"]["quantidade"] == 2
+    assert carrinho.subtotal == pytest.approx(159.8)
+
+
+def test_somar_acumula_quantidade():
+    carrinho = Carrinho("5511")
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    carrinho.adicionar(_item("Picanha Bovina", 1, 79.9), somar=True)
+    assert carrinho.itens["picanha bovina"]["quantidade"] == 3
+    assert carrinho.subtotal == pytest.approx(239.7)
+
+
+def test_unidade_diferente_substitui_item():
+    carrinho = Carrinho("5511")
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    carrinho.adicionar(_item("Picanha Bovina", 3, 10.0, unidade="un"), somar=True)
+    assert carrinho.itens["picanha bovina"]["unidade"] == "un"
+    assert carrinho.subtotal == pytest.approx(30.0)
+
+
+def test_respond_repetido_nao_dobra_e_mais_soma():
+    carrinho = Carrinho("5511")
+    contexto = {"catalog_items": CATALOGO, "carrinho": carrinho}
+    pedidos.respond("quero 2kg de picanha", context=contexto)
+    pedidos.respond("quero 2kg de picanha", context=contexto)
+    assert [i["quantidade"] for i in carrinho.lista_itens()] == [2]
+    pedidos.respond("mais 1kg de picanha", context=contexto)
+    assert [i["quantidade"] for i in carrinho.lista_itens()] == [3]
+
+
+# ===================================
+# MÁQUINA DE ESTADOS
+# ===================================
+
+def test_avancar_segue_dados_coletados():
+    carrinho = Carrinho("5511")
+    assert carrinho.estado == EstadoPedido.INICIANDO
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    assert carrinho.estado == EstadoPedido.COLETANDO_ITENS
+    carrinho.concluir_itens()
+    assert carrinho.estado == EstadoPedido.COLETANDO_ENDERECO
+    carrinho.definir_cep("01310-100")
+    assert carrinho.estado == EstadoPedido.ESCOLHENDO_PAGAMENTO
+    carrinho.definir_pagamento("PIX")
+    assert carrinho.estado == EstadoPedido.CONFIRMANDO
+
+
+def test_remover_atualiza_total_e_estado():
+    carrinho = Carrinho("5511")
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    carrinho.adicionar(_item("Linguiça Toscana", 1, 24.9))
+    removido = carrinho.remover("linguica")
+    assert removido["produto"] == "Linguiça Toscana"
+    assert carrinho.subtotal == pytest.approx(159.8)
+    assert carrinho.remover("costela") is None
+    carrinho.remover("picanha")
+    assert carrinho.subtotal == pytest.approx(0)
+    assert carrinho.estado == EstadoPedido.INICIANDO
+
+
+def test_confirmar_so_a_partir_de_confirmando():
+    carrinho = Carrinho("5511")
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    assert carrinho.finalizar() is False
+    carrinho = _carrinho_completo()
+    assert carrinho.finalizar() is True
+    assert carrinho.estado == EstadoPedido.FINALIZADO
+    assert not carrinho.aberto
+    # Finalizado não volta a abrir nem muda itens/total
+    itens = [dict(i) for i in carrinho.lista_itens()]
+    subtotal = carrinho.subtotal
+    assert carrinho.adicionar(_item("Picanha Bovina", 1, 79.9)) is None
+    assert carrinho.adicionar(_item("Costela Bovina", 1, 39.9)) is None
+    assert carrinho.remover("linguica") is None
+    assert carrinho.alterar_quantidade("picanha", 5) is None
+    carrinho.limpar()
+    assert carrinho.lista_itens() == itens
+    assert carrinho.subtotal == pytest.approx(subtotal)
+    assert carrinho.estado == EstadoPedido.FINALIZADO
+
+
+# ===================================
+# PERSISTÊNCIA
+# ===================================
+
+def test_round_trip_linha_pedidos_delivery():
+    carrinho = _carrinho_completo()
+    row = carrinho.to_row()
+    assert row["forma_pagamento"] == "PIX"
+    restaurado = Carrinho.from_row(carrinho.telefone, dict(row, id=42))
+    assert restaurado.pedido_id == 42
+    assert [(i["produto"], i["quantidade"], i["unidade"]) for i in restaurado.lista_itens()] == \
+        [(i["produto"], i["quantidade"], i["unidade"]) for i in carrinho.lista_itens()]
+    assert restaurado.subtotal == pytest.approx(carrinho.subtotal)
+    assert (restaurado.cep, restaurado.forma_pagamento, restaurado.estado) == ("01310-100", "PIX", EstadoPedido.CONFIRMANDO)
+    assert restaurado.alterado is False
+
+
+def test_round_trip_pagamento_pendente():
+    carrinho = Carrinho("5511")
+    carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+    row = carrinho.to_row()
+    assert row["forma_pagamento"] == PAGAMENTO_PENDENTE
+    restaurado = Carrinho.from_row("5511", row)
+    assert restaurado.forma_pagamento is None
+    assert restaurado.estado == EstadoPedido.COLETANDO_ITENS
+
+
+def test_store_persiste_e_recarrega(monkeypatch):
+    banco = {}
+
+    async def salvar(telefone, dados, pedido_id=None):
+        banco[telefone] = dict(dados, id=pedido_id or 7)
+        return banco[telefone]
+
+    async def buscar(telefone):
+        return banco.get(telefone)
+
+    monkeypatch.setattr(supabase_store, "salvar_pedido_carrinho", salvar)
+    monkeypatch.setattr(supabase_store, "fetch_pedido_aberto", buscar)
+
+    async def cenario():
+        store = CarrinhoStore()
+        carrinho = await store.carregar("5511")
+        carrinho.adicionar(_item("Picanha Bovina", 2, 79.9))
+        assert await store.persistir(carrinho) is True
+        assert carrinho.pedido_id == 7 and carrinho.alterado is False
+        # Sem mudança no turno: não grava de novo
+        assert await store.persistir(carrinho) is False
+
+        # Outro processo (memória vazia) reidrata do banco
+        outro = await CarrinhoStore().carregar("5511")
+        assert outro.pedido_id == 7
+        assert [i["quantidade"] for i in outro.lista_itens()] == [2]
+
+        # Pedido finalizado sai da memória após gravar
+        completo = _carrinho_completo()
+        store._guardar(completo)
+        completo.finalizar()
+        assert await store.persistir(completo) is True
+        assert store.get(completo.telefone) is None
+
+    asyncio.run(cenario())
+
+
+def test_fetch_pedido_aberto_ignora_carrinho_abandonado(monkeypatch):
+    consultas = []
+
+    def responder(request):
+        consultas.append(dict(request.url.params))
+        return httpx.Response(200, json=[])
+
+    async def cliente(telefone):
+        return {"id": 3}
+
+    monkeypatch.setattr(supabase_store, "SUPABASE_URL", "http://supabase.teste")
+    monkeypatch.setattr(supabase_store, "SUPABASE_SERVICE_ROLE", "chave")
+    monkeypatch.setattr(supabase_store, "CARRINHO_EXPIRACAO_HORAS", 2)
+    monkeypatch.setattr(supabase_store, "_find_cliente_by_telefone", cliente)
+
+    async def cenario():
+        http = httpx.AsyncClient(base_url="http://supabase.teste/rest/v1", transport=httpx.MockTransport(responder))
+        monkeypatch.setattr(supabase_store, "_http_client_ativo", lambda: http)
+        try:
+            return await supabase_store.fetch_pedido_aberto("5511")
+        finally:
+            await http.aclose()
+
+    antes = time.time()
+    assert asyncio.run(cenario()) is None
+    filtro = consultas[0]["updated_at"]
+    assert filtro.startswith("gte.")
+    limite = calendar.timegm(time.strptime(filtro[4:], "%Y-%m-%dT%H:%M:%SZ"))
+    assert limite == pytest.approx(antes - 2 * 3600, abs=5)
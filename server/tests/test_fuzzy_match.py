@@ -0,0 +1,27 @@
+"""
+Matcher do catálogo: itens repetidos num mesmo pedido.
+
+    pytest server/tests/test_fuzzy_match.py
+"""
+
+from server.agents.fuzzy_match import get_product_matcher
+
+CATALOGO = [
+    {"descricao": "Picanha Bovina", "preco": "79,90", "categoria": "Bovinos"},
+    {"descricao": "Linguiça Toscana", "preco": "24,90", "categoria": "Suínos"},
+]
+
+
+def test_match_many_repetidos_nao_compartilham_resultado():
+    matcher = get_product_matcher(CATALOGO)
+    primeiro, segundo, ausente_1, ausente_2 = matcher.match_many(
+        ["picanha", "Picanha", "costela de porco", "costela de porco"]
+    )
+    assert primeiro == segundo and primeiro is not segundo
+    assert primeiro["product"] is CATALOGO[0]
+    primeiro["confidence"] = "alterado"
+    assert segundo["confidence"] == "alta"
+
+    assert ausente_1["found"] is False and ausente_1 == ausente_2
+    assert ausente_1 is not ausente_2
+    assert ausente_1["candidates"] is not ausente_2["candidates"]
@@ -0,0 +1,70 @@
+"""
+Orçamento de import do backend (cold start em Vercel/Docker).
+
+Mede `python -X importtime -c "import server.main"` em subprocessos novos e
+falha se o tempo acumulado de server.main passar do limite, ou se algum SDK
+pesado que deveria ser carregado sob demanda (openai, googleapiclient,
+google.auth, supabase) entrar já no import.
+
+    pytest server/tests/test_import_time.py
+    python server/tests/test_import_time.py
+
+IMPORT_BUDGET_MS ajusta o limite (padrão 900 ms; hoje ~0,6 s, quase tudo
+fastapi + httpx; com o SDK da OpenAI no import passava de 1,2 s).
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[2]
+LIMITE_MS = float(os.getenv("IMPORT_BUDGET_MS", "900"))
+EXECUCOES = 3
+# Carregados só na primeira chamada (openai_client, google_knowledge, supabase_store)
+MODULOS_SOB_DEMANDA = ("openai", "googleapiclient", "google.auth", "supabase")
+
+
+def _executar(codigo: str, *opcoes: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(RAIZ), LOG_LEVEL="ERROR")
+    return subprocess.run(
+        [sys.executable, *opcoes, "-c", codigo],
+        cwd=RAIZ, env=env, capture_output=True, text=True, timeout=120,
+    )
+
+
+def medir_import_ms() -> float:
+    """Menor tempo acumulado (ms) de `import server.main` entre as execuções"""
+    tempos = []
+    for _ in range(EXECUCOES):
+        proc = _executar("import server.main", "-X", "importtime")
+        assert proc.returncode == 0, proc.stderr[-2000:]
+        # "import time: self [us] | cumulative | imported package"
+        for linha in proc.stderr.splitlines():
+            partes = linha.split("|")
+            if linha.startswith("import time:") and len(partes) == 3 and partes[2].strip() == "server.main":
+                tempos.append(int(partes[1]) / 1000)
+    assert tempos, "linha de server.main não encontrada na saída do -X importtime"
+    return min(tempos)
+
+
+def test_import_dentro_do_orcamento():
+    ms = medir_import_ms()
+    assert ms <= LIMITE_MS, f"import server.main levou {ms:.0f} ms (limite {LIMITE_MS:.0f} ms)"
+
+
+def test_sdks_pesados_nao_carregados_no_import():
+    codigo = (
+        "import sys, server.main; "
+        f"print(','.join(m for m in {MODULOS_SOB_DEMANDA!r} if m in sys.modules))"
+    )
+    proc = _executar(codigo)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    carregados = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ""
+    assert not carregados, f"importados no cold start: {carregados}"
+
+
+if __name__ == "__main__":
+    print(f"import server.main: {medir_import_ms():.0f} ms (limite {LIMITE_MS:.0f} ms)")
+    test_sdks_pesados_nao_carregados_no_import()
+    print("SDKs sob demanda: ok")
@@ -0,0 +1,42 @@
+"""
+Normalização de texto: normalizar o resultado de novo não muda nada.
+
+    pytest server/tests/test_normalizacao.py
+"""
+
+import pytest
+
+from server.normalizacao import limpar_texto, normalizar_ptbr
+
+CASOS = [
+    ("OlÃ¡ â R$ 9", "Olá - R$ 9"),
+    ("Picanha â R$ 79.90/kg", "Picanha - R$ 79,90/kg"),
+    ("Total: R$ 1.234.56", "Total: R$ 1.234,56"),
+    ("Total: R$ 1.234,56", "Total: R$ 1.234,56"),
+    ("Entrega â\x80\x93 hoje", "Entrega - hoje"),
+    ("OlÃ\x83Â¡ â\x80\x94 tudo bem?", "Olá - tudo bem?"),
+    ("câmera \t fria\r\n\r\n\r\nok", "câmera fria\n\nok"),
+    ("Oi 😀 Ã¡", "Oi 😀 Ã¡"),
+]
+
+
+@pytest.fixture(autouse=True)
+def _sem_cache():
+    # Sem o LRU: o cache guarda o resultado como chave de si mesmo e
+    # esconderia uma segunda passada diferente
+    for func in (limpar_texto, normalizar_ptbr):
+        func.cache.clear()
+    yield
+
+
+@pytest.mark.parametrize("entrada,esperado", CASOS)
+def test_normalizar_ptbr(entrada, esperado):
+    assert normalizar_ptbr(entrada) == esperado
+
+
+@pytest.mark.parametrize("entrada", [e for e, _ in CASOS])
+@pytest.mark.parametrize("func", [limpar_texto, normalizar_ptbr], ids=["limpar", "normalizar"])
+def test_idempotente(func, entrada):
+    uma = func(entrada)
+    func.cache.clear()
+    assert func(uma) == uma
@@ -0,0 +1,92 @@
+"""
+Webhook com lote: entrega da Evolution com `data[]` de várias mensagens.
+
+Parser → _processar_eventos com handle_message/send_text/persist_conversation
+substituídos (sem OpenAI, Evolution ou Supabase).
+
+    pytest server/tests/test_webhook_lote.py
+"""
+
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+from server import main
+from server.integrations.webhook_parser import parse_incoming_events
+
+TELEFONES = [f"55119000000{i:02d}" for i in range(5)]
+
+
+def _lote(quantidade: int, ids=None) -> dict:
+    ids = ids or [f"EVT{i:03d}" for i in range(quantidade)]
+    return {
+        "event": "messages.upsert",
+        "instance": "teste",
+        "data": [
+            {
+                "key": {"remoteJid": f"{TELEFONES[i % len(TELEFONES)]}@s.whatsapp.net", "fromMe": False, "id": event_id},
+                "pushName": "Cliente Teste",
+                "message": {"conversation": f"mensagem {i}"},
+                "messageType": "conversation",
+            }
+            for i, event_id in enumerate(ids)
+        ],
+    }
+
+
+@pytest.fixture
+def turnos(monkeypatch):
+    """Orquestrador falso: registra início/fim de cada turno por telefone"""
+    for cache in (main._DEDUP_EVENT_CACHE, main._SENT_CACHE, main._GLOBAL_DEDUP_CACHE):
+        cache.clear()
+    registro = {"ordem": defaultdict(list), "ativos": defaultdict(int), "sobreposicoes": 0}
+
+    async def handle_message(payload, recursos=None):
+        telefone = payload["telefoneCliente"]
+        registro["ativos"][telefone] += 1
+        if registro["ativos"][telefone] > 1:
+            registro["sobreposicoes"] += 1
+        registro["ordem"][telefone].append(payload["mensagem"])
+        await asyncio.sleep(0.001)
+        registro["ativos"][telefone] -= 1
+        return {"resposta_bot": f"ok: {payload['mensagem']}", "cliente": {"telefone": telefone}}
+
+    async def send_text(telefone, texto):
+        return {"sent": True}
+
+    async def persist_conversation(result):
+        return {"ok": True}
+
+    monkeypatch.setattr(main, "handle_message", handle_message)
+    monkeypatch.setattr(main, "send_text", send_text)
+    monkeypatch.setattr(main, "persist_conversation", persist_conversation)
+    return registro
+
+
+def test_parser_lote_50_mensagens_em_ordem():
+    eventos = parse_incoming_events(_lote(50))
+    assert len(eventos) == 50
+    assert [ev["event_id"] for ev in eventos] == [f"EVT{i:03d}" for i in range(50)]
+    assert [ev["texto"] for ev in eventos] == [f"mensagem {i}" for i in range(50)]
+
+
+def test_lote_mesmo_telefone_em_sequencia(turnos):
+    eventos = parse_incoming_events(_lote(50))
+    processed, ignored = asyncio.run(main._processar_eventos(eventos, source="evolution"))
+
+    assert not ignored
+    assert [r["event_id"] for r in processed] == [f"EVT{i:03d}" for i in range(50)]
+    assert turnos["sobreposicoes"] == 0
+    for n, telefone in enumerate(TELEFONES):
+        assert turnos["ordem"][telefone] == [f"mensagem {i}" for i in range(n, 50, len(TELEFONES))]
+
+
+def test_lote_descarta_ids_duplicados(turnos):
+    ids = ["A", "B", "A", "C", "B"]
+    eventos = parse_incoming_events(_lote(len(ids), ids=ids))
+    processed, ignored = asyncio.run(main._processar_eventos(eventos, source="evolution"))
+
+    assert [r["event_id"] for r in processed] == ["A", "B", "C"]
+    assert [(r["ignored"], r["event_id"]) for r in ignored] == [("duplicate_event", "A"), ("duplicate_event", "B")]
+    assert sum(len(msgs) for msgs in turnos["ordem"].values()) == 3
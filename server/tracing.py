@@ -0,0 +1,282 @@
+"""
+Tracing Leve e Métricas - 3A Frios
+==================================
+
+Spans por etapa do turno de conversa (histórico, contexto, agente, OpenAI,
+Evolution, persistência) agregados em histogramas de latência e expostos em
+`GET /metrics` no formato texto do Prometheus.
+
+- `span("etapa", agent=...)`: context manager (sync e async) que mede a
+  etapa e registra no histograma `tresafrios_stage_duration_seconds`.
+- `@medir("etapa")`: o mesmo como decorator de função sync/async.
+- `TracingMiddleware`: request id (header `X-Request-ID` ou gerado) num
+  ContextVar, visto por todos os spans da requisição (inclusive dentro de
+  `handle_message`), e latência por rota em
+  `tresafrios_http_request_duration_seconds`.
+
+Com TRACING_ENABLED=0 o decorator devolve a função original, `span` devolve
+um context manager vazio compartilhado e o middleware não é instalado.
+
+p50/p95/p99: `histogram_quantile` no Prometheus ou `GET /metrics?formato=json`
+(estimativa por interpolação nos buckets).
+"""
+
+import functools
+import inspect
+import logging
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+from .config import TRACING_ENABLED
+
+logger = logging.getLogger("3afrios.tracing")
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTIS = (0.5, 0.95, 0.99)
+
+METRICA_ETAPAS = "tresafrios_stage_duration_seconds"
+METRICA_HTTP = "tresafrios_http_request_duration_seconds"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def request_id_atual() -> Optional[str]:
+    return _request_id.get()
+
+
+def novo_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+# ===================================
+# HISTOGRAMAS
+# ===================================
+
+class Histograma:
+    """Contagem por bucket (cumulativa só na exportação), soma e total"""
+
+    __slots__ = ("contagens", "soma", "total")
+
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, segundos: float) -> None:
+        self.contagens[bisect_left(BUCKETS, segundos)] += 1
+        self.soma += segundos
+        self.total += 1
+
+    def quantil(self, q: float) -> Optional[float]:
+        """Estimativa por interpolação linear dentro do bucket (como histogram_quantile)"""
+        if not self.total:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for i, n in enumerate(self.contagens):
+            if acumulado + n >= alvo and n:
+                inicio = BUCKETS[i - 1] if i > 0 else 0.0
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                return inicio + (BUCKETS[i] - inicio) * ((alvo - acumulado) / n)
+            acumulado += n
+        return BUCKETS[-1]
+
+
+class MetricsRegistry:
+    """Histogramas por (métrica, labels)"""
+
+    def __init__(self):
+        self._series: Dict[str, Dict[Tuple[Tuple[str, str], ...], Histograma]] = {}
+
+    def observar(self, metrica: str, labels: Tuple[Tuple[str, str], ...], segundos: float) -> None:
+        series = self._series.setdefault(metrica, {})
+        hist = series.get(labels)
+        if hist is None:
+            hist = series[labels] = Histograma()
+        hist.observar(segundos)
+
+    def limpar(self) -> None:
+        self._series.clear()
+
+    def exportar_prometheus(self) -> str:
+        linhas: List[str] = []
+        for metrica, series in sorted(self._series.items()):
+            linhas.append(f"# TYPE {metrica} histogram")
+            for labels, hist in sorted(series.items()):
+                base = ",".join(f'{k}="{_escapar(v)}"' for k, v in labels)
+                sep = "," if base else ""
+                acumulado = 0
+                for limite, n in zip(BUCKETS, hist.contagens):
+                    acumulado += n
+                    linhas.append(f'{metrica}_bucket{{{base}{sep}le="{limite}"}} {acumulado}')
+                linhas.append(f'{metrica}_bucket{{{base}{sep}le="+Inf"}} {hist.total}')
+                linhas.append(f"{metrica}_sum{{{base}}} {hist.soma:.6f}")
+                linhas.append(f"{metrica}_count{{{base}}} {hist.total}")
+        return "\n".join(linhas) + "\n"
+
+    def resumo(self) -> Dict[str, List[Dict[str, Any]]]:
+        """p50/p95/p99 (ms) por série, para consulta sem Prometheus"""
+        saida: Dict[str, List[Dict[str, Any]]] = {}
+        for metrica, series in sorted(self._series.items()):
+            itens = []
+            for labels, hist in sorted(series.items()):
+                item: Dict[str, Any] = dict(labels)
+                item["count"] = hist.total
+                item["media_ms"] = round(hist.soma / hist.total * 1000, 2) if hist.total else None
+                for q in QUANTIS:
+                    valor = hist.quantil(q)
+                    item[f"p{int(q * 100)}_ms"] = round(valor * 1000, 2) if valor is not None else None
+                itens.append(item)
+            saida[metrica] = itens
+        return saida
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Instância global
+_registry = MetricsRegistry()
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Retorna o registro global de métricas"""
+    return _registry
+
+
+# ===================================
+# SPANS
+# ===================================
+
+class Span:
+    """Mede uma etapa; usável com `with` e `async with`"""
+
+    __slots__ = ("etapa", "labels", "inicio")
+
+    def __init__(self, etapa: str, labels: Tuple[Tuple[str, str], ...]):
+        self.etapa = etapa
+        self.labels = labels
+        self.inicio = 0.0
+
+    def __enter__(self) -> "Span":
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duracao = time.perf_counter() - self.inicio
+        status = "erro" if exc_type is not None else "ok"
+        _registry.observar(METRICA_ETAPAS, (("stage", self.etapa),) + self.labels + (("status", status),), duracao)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[Trace] req={_request_id.get()} {self.etapa} {dict(self.labels)} {duracao * 1000:.1f}ms {status}")
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+class _SpanVazio:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return None
+
+
+_SPAN_VAZIO = _SpanVazio()
+
+
+def span(etapa: str, **labels: Any):
+    """Span da etapa; labels de baixa cardinalidade (ex.: agente, rota)"""
+    if not TRACING_ENABLED:
+        return _SPAN_VAZIO
+    return Span(etapa, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def medir(etapa: str):
+    """Decorator: mede cada chamada da função (sync ou async) como um span"""
+    def decorator(func):
+        if not TRACING_ENABLED:
+            return func
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper_async(*args, **kwargs):
+                with Span(etapa, ()):
+                    return await func(*args, **kwargs)
+            return wrapper_async
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(etapa, ()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ===================================
+# MIDDLEWARE ASGI
+# ===================================
+
+class TracingMiddleware:
+    """Request id por requisição e latência por rota (template, não o path bruto)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._rotas: Dict[Any, str] = {}
+
+    def _rota(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "nao_encontrada"
+        rota = self._rotas.get(endpoint)
+        if rota is None:
+            app = scope.get("app")
+            for r in getattr(app, "routes", ()):
+                if getattr(r, "endpoint", None) is endpoint:
+                    rota = r.path
+                    break
+            rota = self._rotas[endpoint] = rota or getattr(endpoint, "__name__", "desconhecida")
+        return rota
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for nome, valor in scope.get("headers") or ():
+            if nome == b"x-request-id":
+                rid = valor.decode("latin-1")[:64]
+                break
+        token = _request_id.set(rid or novo_request_id())
+        status = {"codigo": 500}
+
+        async def send_com_request_id(message):
+            if message["type"] == "http.response.start":
+                status["codigo"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", _request_id.get().encode("latin-1"))]
+            await send(message)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_com_request_id)
+        finally:
+            rota = self._rota(scope)
+            # Streams (SSE) ficam abertos por minutos: não entram no histograma
+            if not rota.endswith("/stream"):
+                labels = (("method", scope.get("method", "")), ("route", rota), ("status", str(status["codigo"])))
+                _registry.observar(METRICA_HTTP, labels, time.perf_counter() - inicio)
+            _request_id.reset(token)
@@ -11,7 +11,7 @@ import { Badge } from '@/components/ui/badge'
 import { ClienteDelivery } from '@/lib/supabase'
 import { LeadScoreBadge } from '@/components/lead-score-badge'
 import { LeadStatusBadge } from '@/components/lead-status-badge'
-import { useLeads } from '@/hooks/use-leads'
+import { useTodosLeads } from '@/hooks/use-leads'
 import { useRecentConversations } from '@/hooks/use-conversations'
 import { useCampaigns } from '@/hooks/use-campaigns'
 import { MapPin, Phone, Calendar, DollarSign, Users, MessageSquare, Megaphone, Settings, BarChart3, Snowflake, TrendingUp, Target, Clock, Star } from 'lucide-react'
@@ -68,7 +68,8 @@ export default function Dashboard() {
   })
 
   // Hooks para dados de analytics
-  const { data: leads = [] } = useLeads()
+  // Base inteira só nas abas que agregam/exportam; a lista de leads pagina
+  const { data: leads = [] } = useTodosLeads(activeTab === "analytics" || activeTab === "settings")
   const { data: conversations = [] } = useRecentConversations()
   const { data: campaigns = [] } = useCampaigns()
 
@@ -260,10 +260,10 @@ export function LeadActions({ client }: LeadActionsProps) {
         <div className="border-t pt-4">
           <div className="flex items-center gap-2 mb-2">
             <History className="h-4 w-4 text-gray-500" />
-            <span className="text-sm font-medium">Última Atualização</span>
+            <span className="text-sm font-medium">Última Interação</span>
           </div>
           <p className="text-xs text-gray-500">
-            {new Date(client.updated_at).toLocaleString('pt-BR')}
+            {new Date(client.last_message_at ?? client.updated_at).toLocaleString('pt-BR')}
           </p>
         </div>
       </CardContent>
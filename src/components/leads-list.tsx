@@ -1,13 +1,13 @@
 'use client'
 
-import { useState } from 'react'
+import { useEffect, useState } from 'react'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { Input } from '@/components/ui/input'
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select'
 import { Badge } from '@/components/ui/badge'
 import { Button } from '@/components/ui/button'
 import { Search, MessageCircle, Filter, Clock } from 'lucide-react'
-import { useLeads } from '@/hooks/use-leads'
+import { useLeads, type LeadsParams } from '@/hooks/use-leads'
 import { useRecentConversations } from '@/hooks/use-conversations'
 import { LeadScoreBadge } from './lead-score-badge'
 import { LeadStatusBadge } from './lead-status-badge'
@@ -19,11 +19,46 @@ interface LeadsListProps {
   showOnlyWithConversations?: boolean
 }
 
+const TAMANHO_PAGINA = 50
+// Limite do GET /api/leads por requisição
+const LIMITE_MAXIMO = 500
+
+// Faixas do filtro de score -> lead_score_min/max do backend
+const FAIXAS_SCORE: Record<string, Pick<LeadsParams, 'lead_score_min' | 'lead_score_max'>> = {
+  high: { lead_score_min: 7 },
+  medium: { lead_score_min: 4, lead_score_max: 6 },
+  low: { lead_score_max: 3 },
+}
+
 export function LeadsList({ onSelectClient, selectedClientId, showOnlyWithConversations = false }: LeadsListProps) {
-  const { data: leads, isLoading, error } = useLeads()
   const [searchTerm, setSearchTerm] = useState('')
+  const [busca, setBusca] = useState('')
   const [statusFilter, setStatusFilter] = useState<string>('all')
   const [scoreFilter, setScoreFilter] = useState<string>('all')
+  const [paginas, setPaginas] = useState(1)
+  // Conversas das últimas 24h (fixado na montagem para a chave da consulta não mudar)
+  const [desde24h] = useState(() => new Date(Date.now() - 24 * 60 * 60 * 1000).toISOString())
+
+  // Busca no backend só depois de uma pausa na digitação
+  useEffect(() => {
+    const timer = setTimeout(() => setBusca(searchTerm.trim()), 300)
+    return () => clearTimeout(timer)
+  }, [searchTerm])
+
+  // Filtro novo volta para a primeira página
+  useEffect(() => {
+    setPaginas(1)
+  }, [busca, statusFilter, scoreFilter])
+
+  const { data: pagina, isLoading, error } = useLeads({
+    busca: busca || undefined,
+    lead_status: statusFilter === 'all' ? undefined : [statusFilter],
+    ...(FAIXAS_SCORE[scoreFilter] ?? {}),
+    mensagem_desde: showOnlyWithConversations ? desde24h : undefined,
+    ordenar: 'ultima_mensagem',
+    limit: Math.min(TAMANHO_PAGINA * paginas, LIMITE_MAXIMO),
+  })
+  const filteredLeads = pagina?.leads
 
   const { data: recentConvs } = useRecentConversations()
 
@@ -37,29 +72,6 @@ export function LeadsList({ onSelectClient, selectedClientId, showOnlyWithConver
     }
   })
 
-  const filteredLeads = leads?.filter(lead => {
-    // Verificações de segurança para evitar erros
-    const nome = lead.nome || ''
-    const telefone = lead.telefone || ''
-    
-    const matchesSearch = nome.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         telefone.includes(searchTerm)
-    
-    const matchesStatus = statusFilter === 'all' || lead.lead_status === statusFilter
-    
-    const matchesScore = scoreFilter === 'all' || 
-                        (scoreFilter === 'high' && (lead.lead_score || 0) >= 7) ||
-                        (scoreFilter === 'medium' && (lead.lead_score || 0) >= 4 && (lead.lead_score || 0) < 7) ||
-                        (scoreFilter === 'low' && (lead.lead_score || 0) < 4)
-    
-    // Filtro adicional para mostrar apenas leads com conversas
-    const hasConversations = showOnlyWithConversations
-      ? lastById.has(String(lead.id))
-      : true
-
-    return matchesSearch && matchesStatus && matchesScore && hasConversations
-  })
-
   if (isLoading) {
     return (
       <Card className="h-full">
@@ -92,7 +104,7 @@ export function LeadsList({ onSelectClient, selectedClientId, showOnlyWithConver
             {showOnlyWithConversations ? 'Conversas Recentes' : 'Leads'}
           </CardTitle>
           <Badge variant="secondary">
-            {filteredLeads?.length || 0}
+            {pagina?.total ?? filteredLeads?.length ?? 0}
           </Badge>
         </div>
         
@@ -202,6 +214,13 @@ export function LeadsList({ onSelectClient, selectedClientId, showOnlyWithConver
                   </div>
                 )
               })}
+              {pagina?.hasMore && TAMANHO_PAGINA * paginas < LIMITE_MAXIMO && (
+                <div className="p-4 text-center">
+                  <Button variant="outline" size="sm" onClick={() => setPaginas((n) => n + 1)}>
+                    Carregar mais
+                  </Button>
+                </div>
+              )}
             </div>
           ) : (
             <div className="text-center py-12 text-gray-500">
@@ -1,6 +1,6 @@
 'use client'
 
-import { useQuery, useQueryClient } from '@tanstack/react-query'
+import { QueryClient, useQuery, useQueryClient } from '@tanstack/react-query'
 import { getSupabase } from '@/lib/supabase'
 import { useEffect } from 'react'
 
@@ -15,12 +15,29 @@ interface TempMessage {
   timestamp: string
 }
 
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+
+// função: mapTempMessage(r: any)
+function mapTempMessage(r: any): TempMessage {
+  return {
+    id: String(r.id),
+    cliente_id: r.cliente_id,
+    mensagem_cliente: (r.mensagem_cliente ?? r.mensagem ?? '') as string,
+    resposta_bot: (r.resposta_bot ?? '') as string,
+    tipo_mensagem: (r.tipo_mensagem ?? r.tipo ?? 'texto') as 'texto' | 'audio',
+    agente_responsavel: r.agente_responsavel,
+    acao_especial: r.acao_especial,
+    timestamp: (r.timestamp ?? r.created_at ?? new Date().toISOString()) as string,
+  }
+}
+
 // função: useConversations(clienteId: string)
 export function useConversations(clienteId: string | number) {
   const cid = typeof clienteId === 'string' && /^\d+$/.test(clienteId) ? Number(clienteId) : clienteId
+  const queryKey = ['conversations', String(clienteId)]
 
   const query = useQuery({
-    queryKey: ['conversations', String(clienteId)],
+    queryKey,
     queryFn: async () => {
       const supabase = getSupabase()
       const { data, error } = await supabase
@@ -33,108 +50,127 @@ export function useConversations(clienteId: string | number) {
         console.error('Erro ao buscar conversas:', error)
         return []
       }
-      const rows = (data || []) as any[]
-      return rows.map((r) => ({
-        id: String(r.id),
-        cliente_id: r.cliente_id,
-        mensagem_cliente: (r.mensagem_cliente ?? r.mensagem ?? '') as string,
-        resposta_bot: (r.resposta_bot ?? '') as string,
-        tipo_mensagem: (r.tipo_mensagem ?? r.tipo ?? 'texto') as 'texto' | 'audio',
-        agente_responsavel: r.agente_responsavel,
-        acao_especial: r.acao_especial,
-        timestamp: (r.timestamp ?? r.created_at ?? new Date().toISOString()) as string,
-      }))
+      return ((data || []) as any[]).map(mapTempMessage)
     },
     enabled: !!clienteId,
-    refetchInterval: 2000,  // Reduzido para 2 segundos
-    staleTime: 1000,       // Reduzido para 1 segundo
+    // Novas mensagens chegam pelo stream SSE; sem polling
+    staleTime: 30000,
   })
 
   const queryClient = useQueryClient()
 
   useEffect(() => {
-    if (!clienteId) return
-    const supabase = getSupabase()
-    const filtro = typeof cid === 'number' ? cid : clienteId
-    
-    // Canal para mensagens específicas do cliente
-    const clientChannel = supabase
-      .channel(`realtime_messages_${filtro}`)
-      .on(
-        'postgres_changes',
-        { 
-          event: '*', // Captura INSERT, UPDATE e DELETE
-          schema: 'public', 
-          table: 'temp_messages', 
-          filter: `cliente_id=eq.${filtro}` 
-        },
-        (payload) => {
-          // Atualiza imediatamente
-          query.refetch()
-          
-          // Invalida o cache de conversas recentes também
-          queryClient.invalidateQueries({ queryKey: ['conversations', 'recent'] })
-        }
-      )
-      .subscribe()
-
-    // Canal para todas as mensagens (útil para atualizações gerais)
-    const globalChannel = supabase
-      .channel('realtime_messages_global')
-      .on(
-        'postgres_changes',
-        { 
-          event: 'INSERT', 
-          schema: 'public', 
-          table: 'temp_messages'
-        },
-        () => {
-          queryClient.invalidateQueries({ queryKey: ['conversations', 'recent'] })
-        }
-      )
-      .subscribe()
-
-    return () => { 
-      supabase.removeChannel(clientChannel)
-      supabase.removeChannel(globalChannel)
+    if (!clienteId || typeof EventSource === 'undefined') return
+
+    // Stream do backend só com as mensagens deste cliente
+    const source = new EventSource(
+      `${API_BASE_URL}/api/conversas/stream?cliente_id=${encodeURIComponent(String(clienteId))}`
+    )
+
+    source.addEventListener('mensagem', (event) => {
+      const msg = mapTempMessage(JSON.parse((event as MessageEvent).data))
+      queryClient.setQueryData<TempMessage[]>(queryKey, (atual) => {
+        if (!atual) return atual
+        return atual.some((m) => m.id === msg.id) ? atual : [...atual, msg]
+      })
+    })
+
+    // Eventos perdidos (fila cheia ou reconexão): recarrega a conversa
+    source.addEventListener('resync', () => {
+      queryClient.invalidateQueries({ queryKey })
+    })
+
+    return () => {
+      source.close()
     }
-  }, [clienteId, query, queryClient])
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [clienteId, queryClient])
 
   return query
 }
 
+// Conversas recentes: janela de 24h, limitada no banco
+const JANELA_RECENTES_MS = 24 * 60 * 60 * 1000
+const LIMITE_RECENTES = 1000
+const CHAVE_RECENTES = ['conversations', 'recent']
+
+// função: mesclarRecente(atual: TempMessage[] | undefined, msg: TempMessage)
+// Mensagem do stream entra no topo da lista (ordem decrescente) sem refazer a consulta
+function mesclarRecente(atual: TempMessage[] | undefined, msg: TempMessage): TempMessage[] | undefined {
+  if (!atual) return atual
+  const cutoff = Date.now() - JANELA_RECENTES_MS
+  const outras = atual.filter((m) => m.id !== msg.id && new Date(m.timestamp).getTime() >= cutoff)
+  return [msg, ...outras].slice(0, LIMITE_RECENTES)
+}
+
+// Stream global (sem cliente_id): um EventSource por aba, compartilhado
+// pelos componentes que usam useRecentConversations
+const assinantesRecentes = new Map<QueryClient, number>()
+let streamRecentes: EventSource | null = null
+
+// função: assinarStreamRecentes(queryClient: QueryClient)
+function assinarStreamRecentes(queryClient: QueryClient): () => void {
+  assinantesRecentes.set(queryClient, (assinantesRecentes.get(queryClient) ?? 0) + 1)
+
+  if (!streamRecentes) {
+    streamRecentes = new EventSource(`${API_BASE_URL}/api/conversas/stream`)
+    // Mensagem nova de qualquer cliente: mescla no cache de cada QueryClient
+    streamRecentes.addEventListener('mensagem', (event) => {
+      const msg = mapTempMessage(JSON.parse((event as MessageEvent).data))
+      assinantesRecentes.forEach((_, qc) => {
+        qc.setQueryData<TempMessage[]>(CHAVE_RECENTES, (atual) => mesclarRecente(atual, msg))
+      })
+    })
+    // Eventos perdidos (fila cheia ou reconexão): recarrega a lista
+    streamRecentes.addEventListener('resync', () => {
+      assinantesRecentes.forEach((_, qc) => {
+        qc.invalidateQueries({ queryKey: CHAVE_RECENTES })
+      })
+    })
+  }
+
+  return () => {
+    const restantes = (assinantesRecentes.get(queryClient) ?? 1) - 1
+    if (restantes > 0) {
+      assinantesRecentes.set(queryClient, restantes)
+    } else {
+      assinantesRecentes.delete(queryClient)
+    }
+    if (assinantesRecentes.size === 0 && streamRecentes) {
+      streamRecentes.close()
+      streamRecentes = null
+    }
+  }
+}
+
 // função: useRecentConversations()
 export function useRecentConversations() {
+  const queryClient = useQueryClient()
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return
+    return assinarStreamRecentes(queryClient)
+  }, [queryClient])
+
   return useQuery({
-    queryKey: ['conversations', 'recent'],
+    queryKey: CHAVE_RECENTES,
     queryFn: async () => {
       const supabase = getSupabase()
+      const desde = new Date(Date.now() - JANELA_RECENTES_MS).toISOString()
       const { data, error } = await supabase
         .from('temp_messages')
         .select('*')
+        .gte('timestamp', desde)
         .order('timestamp', { ascending: false })
+        .limit(LIMITE_RECENTES)
 
       if (error) {
         console.error('Erro ao buscar conversas recentes:', error)
         return []
       }
-      const rows = (data || []) as any[]
-      const mapped = rows.map((r) => {
-        const ts = (r.timestamp ?? r.created_at ?? new Date().toISOString()) as string
-        return {
-          id: String(r.id),
-          cliente_id: r.cliente_id,
-          mensagem_cliente: (r.mensagem_cliente ?? r.mensagem ?? '') as string,
-          resposta_bot: (r.resposta_bot ?? '') as string,
-          tipo_mensagem: (r.tipo_mensagem ?? r.tipo ?? 'texto') as 'texto' | 'audio',
-          agente_responsavel: r.agente_responsavel,
-          acao_especial: r.acao_especial,
-          timestamp: ts,
-        }
-      })
-      // Filtra últimas 24h com base no timestamp efetivo
-      const cutoff = Date.now() - 24 * 60 * 60 * 1000
-      return mapped.filter((m) => new Date(m.timestamp).getTime() >= cutoff)
+      return ((data || []) as any[]).map(mapTempMessage)
     },
+    // Novas mensagens chegam pelo stream SSE; sem polling
+    staleTime: 30000,
   })
-}
\ No newline at end of file
+}
@@ -1,45 +1,112 @@
 'use client'
 
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
+import { hashKey, keepPreviousData, useQuery, useMutation, useQueryClient, type QueryKey } from '@tanstack/react-query'
 import { getSupabase, ClienteDelivery } from '@/lib/supabase'
 
-export function useLeads() {
-  return useQuery<ClienteDelivery[]>({
-    queryKey: ['leads'],
-    queryFn: async () => {
-      const supabase = getSupabase()
-      const { data, error } = await supabase
-        .from('clientes_delivery')
-        .select('*')
-        .order('updated_at', { ascending: false })
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+
+// Consultas (queryHash) que devem ignorar o cache curto do backend na
+// próxima leitura: marcadas após editar um lead, consumidas uma a uma
+const semCacheNaProxima = new Set<string>()
+
+export type LeadsParams = {
+  busca?: string
+  lead_status?: string[]
+  lead_score_min?: number
+  lead_score_max?: number
+  mensagem_desde?: string
+  ordenar?: 'ultima_mensagem' | 'lead_score' | 'atualizado' | 'criado' | 'nome'
+  limit?: number
+  offset?: number
+}
+
+export type LeadsPagina = {
+  leads: ClienteDelivery[]
+  total: number | null
+  hasMore: boolean
+}
+
+const PAGINA_VAZIA: LeadsPagina = { leads: [], total: 0, hasMore: false }
+
+// função: fetchLeadsPagina(params: LeadsParams, semCache: boolean)
+async function fetchLeadsPagina(params: LeadsParams = {}, semCache = false): Promise<LeadsPagina> {
+  const query = new URLSearchParams({ limit: String(params.limit ?? 50), offset: String(params.offset ?? 0) })
+  if (params.busca) query.set('busca', params.busca)
+  params.lead_status?.forEach((s) => query.append('lead_status', s))
+  if (params.lead_score_min !== undefined) query.set('lead_score_min', String(params.lead_score_min))
+  if (params.lead_score_max !== undefined) query.set('lead_score_max', String(params.lead_score_max))
+  if (params.mensagem_desde) query.set('mensagem_desde', params.mensagem_desde)
+  if (params.ordenar) query.set('ordenar', params.ordenar)
+  if (semCache) query.set('cache', 'false')
+
+  const response = await fetch(`${API_BASE_URL}/api/leads?${query}`)
+  if (!response.ok) {
+    throw new Error('Erro ao buscar leads')
+  }
+  const pagina = await response.json()
+  return {
+    leads: (pagina.data ?? []) as ClienteDelivery[],
+    total: pagina.pagination?.total ?? null,
+    hasMore: !!pagina.pagination?.has_more,
+  }
+}
 
-      if (error) {
+// função: fetchTodosLeads(semCache: boolean)
+async function fetchTodosLeads(semCache = false): Promise<ClienteDelivery[]> {
+  const leads: ClienteDelivery[] = []
+  while (true) {
+    const pagina = await fetchLeadsPagina({ ordenar: 'criado', limit: 500, offset: leads.length }, semCache)
+    leads.push(...pagina.leads)
+    if (!pagina.hasMore || pagina.leads.length === 0) break
+  }
+  return leads
+}
+
+// função: consultarLeads(queryKey: QueryKey)
+// ['leads', 'pagina', params] ou ['leads', 'todos']
+async function consultarLeads(queryKey: QueryKey): Promise<LeadsPagina | ClienteDelivery[]> {
+  const chave = hashKey(queryKey)
+  const semCache = semCacheNaProxima.delete(chave)
+  if (queryKey[1] === 'todos') {
+    return fetchTodosLeads(semCache)
+  }
+  return fetchLeadsPagina(queryKey[2] as LeadsParams, semCache)
+}
+
+// Uma página, filtrada e ordenada no backend: só o que a lista mostra
+export function useLeads(params: LeadsParams = {}) {
+  return useQuery<LeadsPagina>({
+    queryKey: ['leads', 'pagina', params],
+    queryFn: async ({ queryKey }) => {
+      try {
+        return (await consultarLeads(queryKey)) as LeadsPagina
+      } catch (error) {
         console.error('Erro ao buscar leads:', error)
-        return []
+        return PAGINA_VAZIA
       }
-      return (data ?? []) as ClienteDelivery[]
     },
+    // Ao trocar filtro ou página, mantém a lista anterior até a nova chegar
+    placeholderData: keepPreviousData,
   })
 }
 
-export function useLeadsByScore(minScore: number) {
+export function useLeadsByScore(minScore: number, limit = 50) {
+  return useLeads({ lead_score_min: minScore, ordenar: 'lead_score', limit })
+}
+
+// Base inteira (analytics e exportação); só busca enquanto `ativo`
+export function useTodosLeads(ativo = true) {
   return useQuery<ClienteDelivery[]>({
-    queryKey: ['leads', 'by-score', minScore],
-    queryFn: async () => {
-      const supabase = getSupabase()
-      const { data, error } = await supabase
-        .from('clientes_delivery')
-        .select('*')
-        .gte('lead_score', minScore)
-        .order('lead_score', { ascending: false })
-
-      if (error) {
-        console.error('Erro ao buscar leads por score:', error)
+    queryKey: ['leads', 'todos'],
+    queryFn: async ({ queryKey }) => {
+      try {
+        return (await consultarLeads(queryKey)) as ClienteDelivery[]
+      } catch (error) {
+        console.error('Erro ao buscar leads:', error)
         return []
       }
-
-      return (data ?? []) as ClienteDelivery[]
     },
+    enabled: ativo,
   })
 }
 
@@ -63,7 +130,11 @@ export function useUpdateLead() {
       return data as ClienteDelivery
     },
     onSuccess: () => {
+      // Cada consulta de leads já carregada relê sem o cache do backend
+      queryClient.getQueryCache().findAll({ queryKey: ['leads'] }).forEach((consulta) => {
+        semCacheNaProxima.add(consulta.queryHash)
+      })
       queryClient.invalidateQueries({ queryKey: ['leads'] })
     },
   })
-}
\ No newline at end of file
+}
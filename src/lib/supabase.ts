@@ -27,6 +27,11 @@ export interface ClienteDelivery {
   valor_potencial?: number
   created_at: string
   updated_at: string
+  // Resumo da conversa (GET /api/leads, migrations/leads_resumo.sql)
+  last_message_at?: string | null
+  ultima_mensagem?: string | null
+  ultimo_agente?: string | null
+  total_mensagens?: number | null
 }
 
 export interface PedidoDelivery {